@@ -1,60 +1,33 @@
-from flask import Flask, render_template, jsonify, request
+import time
+_bootstrap_t0 = time.perf_counter()
+
+from flask import Flask, Response, render_template, jsonify, request, stream_with_context
 import os
 import sys
-import subprocess
 import json
 from pathlib import Path
 from dotenv import load_dotenv
 import anthropic
-import time
-import sqlite3
+import threading
 from datetime import datetime
-from google.cloud import secretmanager
-
 
-def get_secret(secret_name, project_id=None):
-    """
-    Fetch secret from Google Secret Manager.
-    Falls back to environment variable if Secret Manager is not available (local development).
-
-    Args:
-        secret_name: Name of the secret to fetch
-        project_id: GCP project ID (optional, will use default if not provided)
+from bootstrap import Bootstrap, DONE as STEP_DONE
+from secret_store import get_secret
+from engine_readiness import EngineReadiness
+from session_history import SessionHistory
+from conversation_store import ConversationStore, InvalidCursor
+from project_context import ProjectContextCache
+from project_index import ProjectIndex, format_chunks
+from script_jobs import ScriptJobRunner, QueueFull, FINISHED as FINISHED_JOB_STATES
 
-    Returns:
-        Secret value as string, or None if not found
-    """
-    try:
-        # Try to get from Google Secret Manager first (for Cloud Run)
-        client = secretmanager.SecretManagerServiceClient()
-
-        # If project_id not provided, try to get it from environment
-        if not project_id:
-            project_id = os.environ.get('GCP_PROJECT') or os.environ.get('GOOGLE_CLOUD_PROJECT')
-
-        if not project_id:
-            print(f"⚠ No GCP project ID found, falling back to environment variable for {secret_name}")
-            return os.environ.get(secret_name.upper())
-
-        # Build the resource name of the secret version
-        name = f"projects/{project_id}/secrets/{secret_name}/versions/latest"
-
-        # Access the secret version
-        response = client.access_secret_version(request={"name": name})
-        secret_value = response.payload.data.decode('UTF-8')
-        print(f"✓ Successfully fetched '{secret_name}' from Google Secret Manager")
-        return secret_value
-
-    except Exception as e:
-        # Fallback to environment variable (for local development)
-        print(f"⚠ Could not fetch from Secret Manager ({e}), falling back to environment variable")
-        return os.environ.get(secret_name.upper())
+# Startup steps and their timing; one JSON line per startup is appended to
+# STARTUP_REPORT_PATH once the deferred steps are done (empty: print only)
+startup = Bootstrap(
+    report_path=os.environ.get('STARTUP_REPORT_PATH', str(Path(__file__).parent / 'startup_timing.jsonl')) or None,
+    t0=_bootstrap_t0
+)
+startup.record('imports', _bootstrap_t0)
 
-# Clean up any stale milvus processes on startup
-print("Cleaning up stale processes...")
-subprocess.run(['killall', '-9', 'milvus'], stderr=subprocess.DEVNULL)
-time.sleep(1)
-print("✓ Cleanup complete")
 
 # Add Archive to Python path for importing query engine
 # Dynamically resolves to Internal-Projects/GEN AI Agent/Archive
@@ -71,6 +44,14 @@ archive_query_engine = None
 archive_llm = None
 zebra_rag = None
 
+# Serialize initialization so a request arriving during warm-up waits for it
+# instead of loading a second copy of the engine
+_archive_lock = threading.Lock()
+_zebra_lock = threading.Lock()
+
+# Per-engine warm-up state reported by /ready
+engine_readiness = EngineReadiness()
+
 def get_archive_engine():
     """Lazy initialization of Archive query engine - only loads when first used"""
     global archive_query_engine, archive_llm
@@ -78,21 +59,29 @@ def get_archive_engine():
     if archive_query_engine is not None:
         return archive_query_engine, archive_llm
 
-    print("Initializing Archive query engine...")
-    try:
-        from src.query_engine import QueryEngine
-        from src.llm_layer import LLMLayer
-        from src import config as archive_config
-
-        # Initialize Archive components with database path (resolved dynamically)
-        archive_db_path = str(archive_path / 'milvus_edelivery.db')
-        archive_query_engine = QueryEngine(db_path=archive_db_path)
-        archive_llm = LLMLayer(model_name=archive_config.LLM_MODEL)
-        print(f"✓ Archive query engine initialized successfully (DB: {archive_db_path})")
-        return archive_query_engine, archive_llm
-    except Exception as e:
-        print(f"✗ Could not initialize Archive query engine: {e}")
-        raise
+    with _archive_lock:
+        if archive_query_engine is not None:
+            return archive_query_engine, archive_llm
+
+        print("Initializing Archive query engine...")
+        try:
+            from src.query_engine import QueryEngine
+            from src.llm_layer import LLMLayer
+            from src import config as archive_config
+
+            # Initialize Archive components with database path (resolved dynamically).
+            # Under gunicorn the master runs the index server that owns this file and
+            # INDEX_SERVER_URI routes Milvus calls to it; otherwise Milvus Lite is embedded.
+            archive_db_path = str(archive_path / 'milvus_edelivery.db')
+            query_engine = QueryEngine(db_path=archive_db_path)
+            archive_llm = LLMLayer(model_name=archive_config.LLM_MODEL)
+            archive_query_engine = query_engine
+            engine_readiness.mark_ready('archive')
+            print(f"✓ Archive query engine initialized successfully (DB: {archive_db_path})")
+            return archive_query_engine, archive_llm
+        except Exception as e:
+            print(f"✗ Could not initialize Archive query engine: {e}")
+            raise
 
 def get_zebra_rag():
     """Lazy initialization of Zebra Project RAG - only loads when first used"""
@@ -101,90 +90,192 @@ def get_zebra_rag():
     if zebra_rag is not None:
         return zebra_rag
 
-    print("Initializing Zebra Project RAG...")
-    try:
-        # Ensure ChromaDB is available (download from GCS if needed)
-        from chromadb_gcs_utils import ensure_chromadb_available
+    with _zebra_lock:
+        if zebra_rag is not None:
+            return zebra_rag
 
-        zebra_db_path = str(zebra_path / 'chroma_db')
+        print("Initializing Zebra Project RAG...")
+        try:
+            # Ensure ChromaDB is available (download from GCS if needed)
+            from chromadb_gcs_utils import ensure_chromadb_available
 
-        # Download ChromaDB from GCS if not available locally
-        chromadb_ready = ensure_chromadb_available(
-            local_db_path=zebra_db_path,
-            bucket_name=os.environ.get('ZEBRA_CHROMADB_BUCKET', 'zebra-chromadb-storage'),
-            gcs_folder=os.environ.get('ZEBRA_CHROMADB_FOLDER', 'chroma_db'),
-            force_download=False  # Only download if not exists locally
-        )
+            zebra_db_path = str(zebra_path / 'chroma_db')
 
-        if not chromadb_ready:
-            raise Exception("ChromaDB could not be loaded from GCS or local storage")
+            # Download ChromaDB from GCS if not available locally
+            chromadb_ready = ensure_chromadb_available(
+                local_db_path=zebra_db_path,
+                bucket_name=os.environ.get('ZEBRA_CHROMADB_BUCKET', 'zebra-chromadb-storage'),
+                gcs_folder=os.environ.get('ZEBRA_CHROMADB_FOLDER', 'chroma_db'),
+                force_download=False  # Only download if not exists locally
+            )
 
-        # Initialize Zebra RAG with ChromaDB path
-        from printer_rag import PrinterRAG
-        zebra_rag = PrinterRAG(db_path=zebra_db_path, collection_name='printer_specs')
-        print(f"✓ Zebra Project RAG initialized successfully (DB: {zebra_db_path})")
-        return zebra_rag
-    except Exception as e:
-        print(f"✗ Could not initialize Zebra Project RAG: {e}")
-        raise
+            if not chromadb_ready:
+                raise Exception("ChromaDB could not be loaded from GCS or local storage")
+
+            # Initialize Zebra RAG with ChromaDB path
+            from printer_rag import PrinterRAG
+            zebra_rag = PrinterRAG(db_path=zebra_db_path, collection_name='printer_specs')
+            engine_readiness.mark_ready('zebra')
+            print(f"✓ Zebra Project RAG initialized successfully (DB: {zebra_db_path})")
+            return zebra_rag
+        except Exception as e:
+            print(f"✗ Could not initialize Zebra Project RAG: {e}")
+            raise
+
+# Synthetic queries run during warm-up: a short and a long one, so the
+# tokenizer, embedding model and vector indexes are exercised before real traffic
+WARMUP_QUERIES = [
+    "warm-up",
+    "Which printer supports 300 dpi thermal transfer printing with wireless connectivity "
+    "and what are the delivery dates and totals recorded for it?"
+]
+
+def warm_archive_engine():
+    """Load the Archive engine and run retrieval-only queries (no LLM call)"""
+    query_engine, _ = get_archive_engine()
+    start = time.perf_counter()
+    for query in WARMUP_QUERIES:
+        query_engine.query(query)
+    return {'queries': len(WARMUP_QUERIES), 'query_s': round(time.perf_counter() - start, 2)}
+
+def warm_zebra_rag():
+    """Load the Zebra RAG and query its collection directly (no LLM call)"""
+    rag = get_zebra_rag()
+    start = time.perf_counter()
+    count = rag.collection.count()
+    if count:
+        rag.collection.query(query_texts=WARMUP_QUERIES, n_results=min(5, count))
+    else:
+        # Empty collection: still load the embedding model and tokenizer
+        rag.embedding_function(WARMUP_QUERIES)
+    return {
+        'queries': len(WARMUP_QUERIES),
+        'query_s': round(time.perf_counter() - start, 2),
+        'documents': count
+    }
+
+engine_readiness.register('archive', warm_archive_engine)
+engine_readiness.register('zebra', warm_zebra_rag)
+
+# Engines warmed at boot and required by /ready (comma-separated; empty disables warm-up)
+WARMUP_ENGINES = [
+    name.strip()
+    for name in os.environ.get('WARMUP_ENGINES', 'archive,zebra').split(',')
+    if name.strip()
+]
+if os.environ.get('WARMUP_ON_START', 'true').lower() not in ('true', '1', 'yes'):
+    WARMUP_ENGINES = []
 
 app = Flask(__name__)
 
-# Initialize Anthropic client
-# Try to fetch API key from Google Secret Manager first, fallback to environment variable
-print("Fetching Anthropic API key...")
-anthropic_api_key = get_secret('anthropickey', 'acl-ai-projects')
+# Seconds a chat request waits for the deferred Anthropic client step
+ANTHROPIC_CLIENT_WAIT_S = float(os.environ.get('ANTHROPIC_CLIENT_WAIT_S', 30))
+
+
+def create_anthropic_client():
+    """
+    Build the Anthropic client (deferred startup step)
 
-if anthropic_api_key is None:
-    print("Error: ANTHROPIC_API_KEY not found in Secret Manager or environment variables.")
-    print("Please set the 'anthropickey' secret in Google Secret Manager or ANTHROPIC_API_KEY environment variable.")
-    exit(1)
+    Tries to fetch the API key from Google Secret Manager first,
+    falls back to the ANTHROPIC_API_KEY environment variable.
+    """
+    print("Fetching Anthropic API key...")
+    anthropic_api_key = get_secret('anthropickey', 'acl-ai-projects')
+
+    if anthropic_api_key is None:
+        raise RuntimeError(
+            "ANTHROPIC_API_KEY not found in Secret Manager or environment variables. "
+            "Please set the 'anthropickey' secret in Google Secret Manager or ANTHROPIC_API_KEY environment variable."
+        )
+
+    anthropic_client = anthropic.Anthropic(api_key=anthropic_api_key)
+    print("✓ Anthropic client initialized successfully")
+    return anthropic_client
+
+
+def get_anthropic_client():
+    """Anthropic client, waiting for its startup step if it is still running (None if it failed)"""
+    startup.wait('anthropic_client', timeout=ANTHROPIC_CLIENT_WAIT_S)
+    return startup.result('anthropic_client')
 
-# Initialize the Anthropic client
-client = anthropic.Anthropic(api_key=anthropic_api_key)
-print("✓ Anthropic client initialized successfully")
 
 # Database path for conversations (SQLite for local, will work with Cloud SQL too)
 DB_PATH = Path(__file__).parent / 'conversations.db'
 
+# Data access for conversations and messages (per-thread connections, WAL, indexes)
+conversation_store = ConversationStore(DB_PATH)
+
 # Initialize database
 def init_db():
     """Initialize the conversations database"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    # Create conversations table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS conversations (
-            id TEXT PRIMARY KEY,
-            project_id TEXT NOT NULL,
-            title TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-
-    # Create messages table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            conversation_id TEXT NOT NULL,
-            role TEXT NOT NULL,
-            content TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (conversation_id) REFERENCES conversations (id) ON DELETE CASCADE
-        )
-    ''')
-
-    conn.commit()
-    conn.close()
+    conversation_store.init_schema()
     print(f"✓ Database initialized at {DB_PATH}")
 
-# Initialize database on startup
-init_db()
+# Chat history per session: LRU-bounded cache in front of the messages table,
+# so memory stays bounded and history survives restarts and spans workers
+session_history = SessionHistory(
+    conversation_store,
+    max_sessions=int(os.environ.get('SESSION_CACHE_SIZE', 1000)),
+    max_turns=int(os.environ.get('SESSION_HISTORY_TURNS', 20))
+)
+
+# File list and README of each project for the system prompt,
+# re-read only when the project directory's files change
+project_contexts = ProjectContextCache(
+    check_interval_s=float(os.environ.get('PROJECT_CONTEXT_CHECK_S', 2))
+)
+
+# Claude model answering chat for projects without a RAG engine
+GENERIC_CHAT_MODEL = "claude-haiku-4-5-20251001"
+
+# Approximate prompt tokens spent on retrieved project file excerpts per question
+PROJECT_CONTEXT_TOKENS = int(os.environ.get('PROJECT_CONTEXT_TOKENS', 4000))
+
+
+def embed_project_chunks(texts):
+    """Embed project file chunks with the Archive's embedding model (one shared instance)"""
+    from src.model_loader import load_embedding_model
+    return load_embedding_model().encode(texts, batch_size=32, show_progress_bar=False)
+
+
+# Chunked, embedded code and documentation of each project (recursive, updated incrementally);
+# PROJECT_INDEX_EMBEDDINGS=false ranks chunks lexically without loading a model
+use_project_embeddings = os.environ.get('PROJECT_INDEX_EMBEDDINGS', 'true').lower() in ('true', '1', 'yes')
 
-# Store conversation history per session (in-memory, will reset on server restart)
-conversation_histories = {}
+
+def open_project_index():
+    return ProjectIndex(
+        str(Path(__file__).parent / 'project_index.db'),
+        embed=embed_project_chunks if use_project_embeddings else None,
+        model_name=f"{os.environ.get('EMBEDDING_MODEL', 'all-MiniLM-L6-v2')}:{os.environ.get('EMBEDDING_BACKEND', 'torch')}",
+        check_interval_s=float(os.environ.get('PROJECT_CONTEXT_CHECK_S', 2))
+    )
+
+
+# Project scripts run as background jobs: a bounded queue and SCRIPT_JOB_WORKERS runner
+# threads per process, with per-job wall-clock, CPU and memory limits
+def open_script_jobs():
+    return ScriptJobRunner(
+        str(Path(__file__).parent / 'script_jobs.db'),
+        max_workers=int(os.environ.get('SCRIPT_JOB_WORKERS', 2)),
+        max_queued=int(os.environ.get('SCRIPT_JOB_QUEUE', 20)),
+        timeout_s=float(os.environ.get('SCRIPT_JOB_TIMEOUT_S', 300)),
+        cpu_seconds=int(os.environ.get('SCRIPT_JOB_CPU_S', 120)),
+        memory_mb=int(os.environ.get('SCRIPT_JOB_MEMORY_MB', 1024))
+    )
+
+
+# The three SQLite databases are independent: open and migrate them concurrently
+_databases = startup.run_parallel({
+    'conversation_db': init_db,
+    'project_index_db': open_project_index,
+    'script_jobs_db': open_script_jobs
+})
+project_index = _databases['project_index_db']
+script_jobs = _databases['script_jobs_db']
+
+# How often a job output stream checks for new output
+JOB_STREAM_POLL_S = 0.25
 
 # Project configuration
 PROJECTS = [
@@ -291,9 +382,55 @@ def project_detail(project_id):
     else:
         return "Project not found", 404
 
+def resolve_script(project, filename):
+    """
+    Path of a script inside a project
+
+    Returns:
+        (base_path, file_path, error) where error is an (message, HTTP status) tuple or None
+    """
+    base_path = os.path.abspath(os.path.join(os.path.dirname(__file__), project['path']))
+    file_path = os.path.abspath(os.path.join(base_path, filename))
+
+    # Security check - ensure file is within project directory
+    if os.path.commonpath([base_path, file_path]) != base_path:
+        return base_path, file_path, ('Invalid file path', 403)
+    if not os.path.exists(file_path):
+        return base_path, file_path, ('File not found', 404)
+    if not filename.endswith('.py'):
+        return base_path, file_path, ('Only Python files can be executed', 400)
+    return base_path, file_path, None
+
+def submit_script(project, filename, on_finish=None):
+    """
+    Queue a project script as a background job
+
+    Returns:
+        (job, error) where error is an (message, HTTP status) tuple or None
+    """
+    base_path, file_path, error = resolve_script(project, filename)
+    if error:
+        return None, error
+    try:
+        job = script_jobs.submit(project['id'], filename, ['python3', file_path], base_path, on_finish=on_finish)
+    except QueueFull:
+        return None, ('Too many scripts are queued; try again shortly', 429)
+    return job, None
+
+def format_job_output(job, output):
+    """Chat message with a finished job's output"""
+    stdout = ''.join(o['text'] for o in output if o['stream'] == 'stdout')
+    stderr = ''.join(o['text'] for o in output if o['stream'] == 'stderr')
+    message = f"Output of {job['filename']} ({job['status']}, exit code {job['returncode']}):\n```\n{stdout}\n```"
+    if stderr:
+        message += f"\n\nErrors:\n```\n{stderr}\n```"
+    if job['error']:
+        message += f"\n\n{job['error']}"
+    return message
+
 @app.route('/api/run-script', methods=['POST'])
 def run_script():
-    """Execute a Python script from a project"""
+    """Execute a Python script from a project as a background job (see /api/jobs)"""
     try:
         data = request.get_json()
         project_id = data.get('project_id')
@@ -307,102 +444,120 @@ def run_script():
         if not project:
             return jsonify({'error': 'Project not found'}), 404
 
-        # Build the file path
-        base_path = os.path.join(os.path.dirname(__file__), project['path'])
-        file_path = os.path.join(base_path, filename)
-
-        # Security check - ensure file is within project directory
-        if not os.path.abspath(file_path).startswith(os.path.abspath(base_path)):
-            return jsonify({'error': 'Invalid file path'}), 403
-
-        # Check if file exists and is a Python file
-        if not os.path.exists(file_path):
-            return jsonify({'error': 'File not found'}), 404
-
-        if not filename.endswith('.py'):
-            return jsonify({'error': 'Only Python files can be executed'}), 400
-
-        # Execute the script
-        try:
-            result = subprocess.run(
-                ['python3', file_path],
-                capture_output=True,
-                text=True,
-                timeout=30,  # 30 second timeout
-                cwd=base_path
-            )
-
-            return jsonify({
-                'success': True,
-                'stdout': result.stdout,
-                'stderr': result.stderr,
-                'returncode': result.returncode
-            })
-
-        except subprocess.TimeoutExpired:
-            return jsonify({'error': 'Script execution timeout (30 seconds)'}), 408
-        except Exception as e:
-            return jsonify({'error': f'Execution error: {str(e)}'}), 500
+        job, error = submit_script(project, filename)
+        if error:
+            return jsonify({'error': error[0]}), error[1]
+        return jsonify({
+            'success': True,
+            'job': job,
+            'status_url': f"/api/jobs/{job['id']}",
+            'stream_url': f"/api/jobs/{job['id']}/stream"
+        }), 202
 
     except Exception as e:
         print(f"Error in run-script endpoint: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Queue a project script; same body as /api/run-script"""
+    return run_script()
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Job status and its output after ?after=<seq> (default: all of it)"""
+    job = script_jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    try:
+        after = int(request.args.get('after', -1))
+    except ValueError:
+        return jsonify({'error': 'after must be an integer'}), 400
+    return jsonify({'job': job, 'output': script_jobs.output(job_id, after)})
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued or running job"""
+    job = script_jobs.cancel(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({'job': job})
+
+@app.route('/api/jobs/<job_id>/stream', methods=['GET'])
+def stream_job(job_id):
+    """
+    A job's output as server-sent events
+
+    Events: "output" ({'seq', 'stream', 'text'}) as the script prints,
+    then "done" with the finished job.
+    """
+    if not script_jobs.get(job_id):
+        return jsonify({'error': 'Job not found'}), 404
+    try:
+        after = int(request.args.get('after', -1))
+    except ValueError:
+        return jsonify({'error': 'after must be an integer'}), 400
+
+    def generate():
+        seq = after
+        while True:
+            job = script_jobs.get(job_id)
+            for piece in script_jobs.output(job_id, seq):
+                seq = piece['seq']
+                yield sse_event('output', piece)
+            # Output is written before the final status, so it has all been sent
+            if job is None or job['status'] in FINISHED_JOB_STATES:
+                yield sse_event('done', {'job': job})
+                return
+            time.sleep(JOB_STREAM_POLL_S)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def _page_limit():
+    """Optional ?limit= page size (the store clamps it); raises ValueError if not an integer"""
+    limit = request.args.get('limit')
+    return int(limit) if limit is not None else None
+
 @app.route('/api/conversations/<project_id>', methods=['GET'])
 def get_conversations(project_id):
-    """Get all conversations for a project"""
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT c.id, c.title, c.created_at, c.updated_at,
-                   (SELECT content FROM messages WHERE conversation_id = c.id ORDER BY created_at DESC LIMIT 1) as last_message
-            FROM conversations c
-            WHERE c.project_id = ?
-            ORDER BY c.updated_at DESC
-        ''', (project_id,))
-
-        conversations = []
-        for row in cursor.fetchall():
-            conversations.append({
-                'id': row[0],
-                'title': row[1] or 'Untitled Conversation',
-                'created_at': row[2],
-                'updated_at': row[3],
-                'preview': (row[4] or 'No messages yet')[:50]
-            })
+    """
+    Get one page of a project's conversations, most recently updated first
 
-        conn.close()
-        return jsonify(conversations)
+    Query parameters: limit (page size), cursor (next_cursor of the previous page)
+    """
+    try:
+        conversations, next_cursor = conversation_store.list_conversations(
+            project_id, _page_limit(), request.args.get('cursor')
+        )
+        return jsonify({'items': conversations, 'next_cursor': next_cursor})
+    except (InvalidCursor, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error getting conversations: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/conversations/<conversation_id>/messages', methods=['GET'])
 def get_conversation_messages(conversation_id):
-    """Get all messages for a conversation"""
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT role, content, created_at
-            FROM messages
-            WHERE conversation_id = ?
-            ORDER BY created_at ASC
-        ''', (conversation_id,))
-
-        messages = []
-        for row in cursor.fetchall():
-            messages.append({
-                'role': row[0],
-                'content': row[1],
-                'created_at': row[2]
-            })
+    """
+    Get one page of a conversation's messages, newest page first (messages oldest first)
 
-        conn.close()
-        return jsonify(messages)
+    Query parameters: limit (page size), before (next_cursor of the previous page),
+    bodies=false (preview and length instead of the full content)
+    """
+    try:
+        messages, next_cursor = conversation_store.get_messages(
+            conversation_id,
+            _page_limit(),
+            request.args.get('before'),
+            bodies=request.args.get('bodies', 'true').lower() not in ('false', '0', 'no')
+        )
+        return jsonify({'items': messages, 'next_cursor': next_cursor})
+    except (InvalidCursor, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error getting messages: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -416,16 +571,7 @@ def create_conversation():
         project_id = data.get('project_id')
         title = data.get('title', 'New Conversation')
 
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            INSERT INTO conversations (id, project_id, title)
-            VALUES (?, ?, ?)
-        ''', (conversation_id, project_id, title))
-
-        conn.commit()
-        conn.close()
+        conversation_store.create_conversation(conversation_id, project_id, title)
 
         return jsonify({'success': True, 'id': conversation_id})
     except Exception as e:
@@ -439,17 +585,7 @@ def update_conversation_title(conversation_id):
         data = request.get_json()
         title = data.get('title')
 
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            UPDATE conversations
-            SET title = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        ''', (title, conversation_id))
-
-        conn.commit()
-        conn.close()
+        conversation_store.update_title(conversation_id, title)
 
         return jsonify({'success': True})
     except Exception as e:
@@ -464,24 +600,8 @@ def save_message(conversation_id):
         role = data.get('role')
         content = data.get('content')
 
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        # Save message
-        cursor.execute('''
-            INSERT INTO messages (conversation_id, role, content)
-            VALUES (?, ?, ?)
-        ''', (conversation_id, role, content))
-
-        # Update conversation timestamp
-        cursor.execute('''
-            UPDATE conversations
-            SET updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        ''', (conversation_id,))
-
-        conn.commit()
-        conn.close()
+        # Save message (and update the conversation timestamp) through the history cache
+        session_history.append(conversation_id, role, content)
 
         return jsonify({'success': True})
     except Exception as e:
@@ -492,20 +612,147 @@ def save_message(conversation_id):
 def delete_conversation(conversation_id):
     """Delete a conversation and all its messages"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        # Delete conversation (CASCADE will delete messages automatically)
-        cursor.execute('DELETE FROM conversations WHERE id = ?', (conversation_id,))
-
-        conn.commit()
-        conn.close()
+        conversation_store.delete_conversation(conversation_id)
+        session_history.forget(conversation_id)
 
         return jsonify({'success': True})
     except Exception as e:
         print(f"Error deleting conversation: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/health')
+def health():
+    """Liveness probe: the process is up and serving requests"""
+    return jsonify({'status': 'ok'})
+
+@app.route('/ready')
+def ready():
+    """Readiness probe: 200 once the Anthropic client and every warm-up engine are ready, 503 before that"""
+    is_ready = startup.state('anthropic_client') == STEP_DONE and engine_readiness.is_ready(WARMUP_ENGINES)
+    return jsonify({
+        'ready': is_ready,
+        'required': WARMUP_ENGINES,
+        'engines': engine_readiness.snapshot(),
+        'startup': startup.report()
+    }), 200 if is_ready else 503
+
+def zebra_response_text(recommendation):
+    """Answer text of a Zebra recommendation, formatted from the results if there is no LLM response"""
+    if 'llm_response' in recommendation:
+        return recommendation['llm_response']
+    if 'explanation' in recommendation:
+        return recommendation['explanation']
+
+    # Fallback: format results manually
+    results = recommendation.get('results', [])
+    if not results:
+        return "No printers found matching your requirements."
+    response_text = f"Found {len(results)} printer(s):\n\n"
+    for i, printer in enumerate(results[:3], 1):
+        response_text += f"{i}. {printer.get('model', 'Unknown')}\n"
+        response_text += f"   {printer.get('text', '')[:200]}...\n\n"
+    return response_text
+
+def build_generic_prompt(project, project_id, message):
+    """
+    System prompt for a project without a RAG engine
+
+    Returns:
+        (system_prompt, excerpts) where excerpts are the retrieved file chunks
+    """
+    # Get project context (cached until a file in the project directory changes)
+    base_path = os.path.join(os.path.dirname(__file__), project['path'])
+    context = project_contexts.get(project_id, base_path)
+    description_section = context['description_section']
+
+    # Only the file excerpts most relevant to this question, within the token budget
+    try:
+        excerpts = project_index.search(project_id, base_path, message, PROJECT_CONTEXT_TOKENS)
+    except Exception as e:
+        print(f"⚠ Project index search failed for {project_id}: {str(e)}")
+        excerpts = []
+    file_contents_section = format_chunks(excerpts)
+
+    system_prompt = f"""You are a helpful AI assistant for the project "{project['name']}".
+Project description: {project['description']}
+Project location: {project['path']}
+{description_section}
+Available files and directories in this project:
+{context['files_json']}
+{file_contents_section}
+
+Above are the excerpts of the project's files (at any depth, paths relative to the project root) most relevant to the question. You can:
+- Understand the project structure and purpose
+- Explain what the project does based on the documentation and code
+- Answer specific questions about the code
+- Provide guidance on development tasks
+- Explain concepts and features
+- Debug issues and suggest improvements
+- RUN PYTHON SCRIPTS - When the user asks to run a file, respond with: RUN_SCRIPT:filename.py
+- General programming assistance
+
+IMPORTANT: When the user asks to run/execute a Python file, respond ONLY with:
+RUN_SCRIPT:filename.py
+
+For example:
+- User: "run main.py" -> You respond: RUN_SCRIPT:main.py
+- User: "execute test.py" -> You respond: RUN_SCRIPT:test.py
+
+When referencing code, be specific about which file you're talking about.
+Be conversational, helpful, and concise. Format code with proper markdown when needed."""
+    return system_prompt, excerpts
+
+def chat_history(session_id, message):
+    """Last SESSION_HISTORY_TURNS messages (including this one) to stay within token limits"""
+    if not session_id:
+        return [{"role": "user", "content": message}]
+    history = session_history.get(session_id)
+    # The window may start mid-exchange; the Messages API needs a user turn first
+    while history and history[0]['role'] != 'user':
+        history.pop(0)
+    return history
+
+def run_requested_script(assistant_message, project, session_id):
+    """
+    Start the script named by a RUN_SCRIPT:filename.py reply as a background job
+
+    The reply shown in place of the command is added to the conversation
+    here, before the job is queued, so the job's output (added when it
+    finishes) always comes after it.
+
+    Returns:
+        (assistant_message, script_output): the message to show in place of
+        the command and the job ({'job_id', 'filename', 'status'}; None if not started)
+    """
+    filename = assistant_message.replace('RUN_SCRIPT:', '').strip()
+
+    def reply(message):
+        if session_id:
+            session_history.append(session_id, 'assistant', message)
+        return message
+
+    def add_output_to_conversation(job):
+        if session_id:
+            session_history.append(session_id, 'assistant', format_job_output(job, script_jobs.output(job['id'])))
+
+    base_path, file_path, error = resolve_script(project, filename)
+    if error:
+        return reply(f"Could not find or execute {filename}. Please make sure it's a valid Python file in the project."), None
+
+    job_id = script_jobs.new_job_id()
+    message = reply(f"Running {filename}... (job `{job_id}`)")
+    try:
+        job = script_jobs.submit(project['id'], filename, ['python3', file_path], base_path,
+                                 on_finish=add_output_to_conversation, job_id=job_id)
+    except QueueFull:
+        return reply(f"Could not run {filename}: too many scripts are queued; try again shortly."), None
+
+    return message, {
+        'job_id': job['id'],
+        'filename': filename,
+        'status': job['status']
+    }
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """Handle chatbot conversations using Claude AI"""
@@ -513,7 +760,8 @@ def chat():
         data = request.get_json()
         message = data.get('message', '')
         project_id = data.get('project_id')
-        session_id = data.get('session_id', 'default')
+        # Conversation id; without one the request is answered without history
+        session_id = data.get('session_id')
 
         # Find the project
         project = next((p for p in PROJECTS if p['id'] == project_id), None)
@@ -522,6 +770,10 @@ def chat():
                 'response': 'Project not found. Please select a valid project.'
             })
 
+        # Write the user turn through to the messages table
+        if session_id:
+            session_history.append(session_id, 'user', message)
+
         # Check if this is the Zebra Project and initialize RAG lazily
         if project_id == 'zebra-project':
             try:
@@ -535,29 +787,18 @@ def chat():
                     requirements=message,
                     n_results=5
                 )
+                response_text = zebra_response_text(recommendation)
 
-                # Extract response text
-                if 'llm_response' in recommendation:
-                    response_text = recommendation['llm_response']
-                elif 'explanation' in recommendation:
-                    response_text = recommendation['explanation']
-                else:
-                    # Fallback: format results manually
-                    results = recommendation.get('results', [])
-                    if results:
-                        response_text = f"Found {len(results)} printer(s):\n\n"
-                        for i, printer in enumerate(results[:3], 1):
-                            response_text += f"{i}. {printer.get('model', 'Unknown')}\n"
-                            response_text += f"   {printer.get('text', '')[:200]}...\n\n"
-                    else:
-                        response_text = "No printers found matching your requirements."
+                if session_id:
+                    session_history.append(session_id, 'assistant', response_text)
 
                 return jsonify({
                     'response': response_text,
                     'session_id': session_id,
                     'zebra_query': True,
                     'metadata': {
-                        'printers_found': len(recommendation.get('results', []))
+                        'printers_found': len(recommendation.get('results', [])),
+                        'cache': recommendation.get('cache', 'miss')
                     }
                 })
 
@@ -578,10 +819,12 @@ def chat():
                 query_engine, llm = get_archive_engine()
 
                 # Query the Archive vector database
-                results = query_engine.query(message)
+                results = query_engine.query(message, sql_llm=llm)
 
                 # Generate answer using Archive LLM
                 response = llm.generate_answer(results["context"], message)
+                if session_id:
+                    session_history.append(session_id, 'assistant', response['answer'])
 
                 # Return only the answer (matching interactive mode behavior)
                 return jsonify({
@@ -604,183 +847,33 @@ def chat():
                 }), 500
 
         # Check if Anthropic client is initialized for non-Archive projects
+        client = get_anthropic_client()
         if not client:
             return jsonify({
                 'response': 'Anthropic API is not configured. Please add your ANTHROPIC_API_KEY to the .env file.'
             }), 500
 
-        # Get project context
-        base_path = os.path.join(os.path.dirname(__file__), project['path'])
-        project_files = []
-        project_description_content = ""
-        file_contents = {}
-
-        # Helper function to read file content safely
-        def read_file_safely(file_path, max_size=10000):
-            """Read file content with size limit"""
-            try:
-                # Skip binary files
-                binary_extensions = ['.png', '.jpg', '.jpeg', '.gif', '.pdf', '.zip', '.tar', '.gz',
-                                   '.exe', '.bin', '.so', '.dylib', '.dll', '.pyc', '.pyo']
-                if any(file_path.lower().endswith(ext) for ext in binary_extensions):
-                    return None
-
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read(max_size)
-                    if len(content) >= max_size:
-                        content += "\n...[truncated - file too large]"
-                    return content
-            except (UnicodeDecodeError, PermissionError, FileNotFoundError):
-                return None
-            except Exception as e:
-                print(f"Error reading file {file_path}: {str(e)}")
-                return None
-
-        if os.path.exists(base_path):
-            try:
-                items = os.listdir(base_path)
-                for item in items:
-                    if not item.startswith('.'):
-                        item_path = os.path.join(base_path, item)
-                        is_dir = os.path.isdir(item_path)
-                        project_files.append({
-                            'name': item,
-                            'type': 'directory' if is_dir else 'file'
-                        })
-
-                        # Read file contents for text files (not directories)
-                        if not is_dir:
-                            content = read_file_safely(item_path)
-                            if content:
-                                file_contents[item] = content
-
-                # Look for description files (README.md, description.txt, DESCRIPTION.md, etc.)
-                description_files = ['README.md', 'readme.md', 'README.txt', 'readme.txt',
-                                   'DESCRIPTION.md', 'description.md', 'DESCRIPTION.txt', 'description.txt',
-                                   'INFO.md', 'info.md', 'INFO.txt', 'info.txt']
-
-                for desc_file in description_files:
-                    desc_path = os.path.join(base_path, desc_file)
-                    if os.path.exists(desc_path) and os.path.isfile(desc_path):
-                        try:
-                            with open(desc_path, 'r', encoding='utf-8') as f:
-                                project_description_content = f.read()
-                                # Limit to first 3000 characters to avoid token limits
-                                if len(project_description_content) > 3000:
-                                    project_description_content = project_description_content[:3000] + "\n...[truncated]"
-                                break
-                        except Exception as e:
-                            print(f"Error reading description file {desc_file}: {str(e)}")
-                            pass
-            except Exception:
-                pass
-
-        # Initialize conversation history for this session if not exists
-        if session_id not in conversation_histories:
-            conversation_histories[session_id] = []
-
-        # Build system prompt with project context
-        description_section = ""
-        if project_description_content:
-            description_section = f"\n\nProject Documentation:\n{project_description_content}\n"
-
-        # Build file contents section
-        file_contents_section = ""
-        if file_contents:
-            file_contents_section = "\n\nFile Contents:\n"
-            for filename, content in file_contents.items():
-                file_contents_section += f"\n--- {filename} ---\n{content}\n"
-
-        system_prompt = f"""You are a helpful AI assistant for the project "{project['name']}".
-Project description: {project['description']}
-Project location: {project['path']}
-{description_section}
-Available files and directories in this project:
-{json.dumps(project_files, indent=2) if project_files else 'No files found or directory not accessible.'}
-{file_contents_section}
-
-You have access to the actual file contents above. You can:
-- Understand the project structure and purpose
-- Explain what the project does based on the documentation and code
-- Answer specific questions about the code
-- Provide guidance on development tasks
-- Explain concepts and features
-- Debug issues and suggest improvements
-- RUN PYTHON SCRIPTS - When the user asks to run a file, respond with: RUN_SCRIPT:filename.py
-- General programming assistance
-
-IMPORTANT: When the user asks to run/execute a Python file, respond ONLY with:
-RUN_SCRIPT:filename.py
-
-For example:
-- User: "run main.py" -> You respond: RUN_SCRIPT:main.py
-- User: "execute test.py" -> You respond: RUN_SCRIPT:test.py
-
-When referencing code, be specific about which file you're talking about.
-Be conversational, helpful, and concise. Format code with proper markdown when needed."""
-
-        # Add user message to conversation history
-        conversation_histories[session_id].append({
-            "role": "user",
-            "content": message
-        })
-
-        # Keep only last 10 messages to avoid token limits
-        if len(conversation_histories[session_id]) > 20:
-            conversation_histories[session_id] = conversation_histories[session_id][-20:]
+        system_prompt, _ = build_generic_prompt(project, project_id, message)
 
         # Call Claude AI
         response = client.messages.create(
-            model="claude-haiku-4-5-20251001",
+            model=GENERIC_CHAT_MODEL,
             max_tokens=2048,
             system=system_prompt,
-            messages=conversation_histories[session_id]
+            messages=chat_history(session_id, message)
         )
 
         # Extract assistant response
         assistant_message = response.content[0].text
 
-        # Check if Claude wants to run a script
+        # Check if Claude wants to run a script (its reply is added to the history there)
         script_output = None
         if assistant_message.startswith('RUN_SCRIPT:'):
-            filename = assistant_message.replace('RUN_SCRIPT:', '').strip()
-
-            # Execute the script
-            file_path = os.path.join(base_path, filename)
-            if os.path.exists(file_path) and filename.endswith('.py'):
-                try:
-                    result = subprocess.run(
-                        ['python3', file_path],
-                        capture_output=True,
-                        text=True,
-                        timeout=30,
-                        cwd=base_path
-                    )
-
-                    script_output = {
-                        'filename': filename,
-                        'stdout': result.stdout,
-                        'stderr': result.stderr,
-                        'returncode': result.returncode
-                    }
-
-                    # Update assistant message to be more conversational
-                    assistant_message = f"Running {filename}...\n\nOutput:\n```\n{result.stdout}\n```"
-                    if result.stderr:
-                        assistant_message += f"\n\nErrors:\n```\n{result.stderr}\n```"
-
-                except subprocess.TimeoutExpired:
-                    assistant_message = f"Script {filename} execution timed out (30 seconds limit)."
-                except Exception as e:
-                    assistant_message = f"Error executing {filename}: {str(e)}"
-            else:
-                assistant_message = f"Could not find or execute {filename}. Please make sure it's a valid Python file in the project."
+            assistant_message, script_output = run_requested_script(assistant_message, project, session_id)
 
         # Add assistant response to conversation history
-        conversation_histories[session_id].append({
-            "role": "assistant",
-            "content": assistant_message
-        })
+        elif session_id:
+            session_history.append(session_id, 'assistant', assistant_message)
 
         return jsonify({
             'response': assistant_message,
@@ -799,6 +892,225 @@ Be conversational, helpful, and concise. Format code with proper markdown when n
             'response': f'Sorry, I encountered an error: {str(e)}'
         }), 500
 
+def sse_event(event, data):
+    """One server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_zebra(message, session_id):
+    """Zebra events: printers found, then the LLM recommendation as it is generated"""
+    print(f"Using Zebra RAG for query (streaming): {message}")
+    rag = get_zebra_rag()
+
+    # Same recommendation cache as /api/chat and the printer_rag CLI: a hit is sent in one piece
+    cached = rag.cached_recommendation(message, n_results=5)
+    retrieval = cached or rag.retrieve_printers(requirements=message, n_results=5)
+    recommendations = retrieval['recommendations']
+    yield sse_event('retrieval', {
+        'printers': [
+            {'model': r['model'], 'category': r['category'], 'relevance_score': r['relevance_score']}
+            for r in recommendations
+        ],
+        'detected_filters': retrieval['detected_filters']
+    })
+
+    if cached is not None:
+        response_text = zebra_response_text(cached)
+        yield sse_event('token', {'text': response_text})
+    elif rag.use_llm and recommendations:
+        from printer_rag import LLMStreamError
+
+        pieces = []
+        try:
+            for text in rag.stream_llm_response(message, recommendations):
+                pieces.append(text)
+                yield sse_event('token', {'text': text})
+        except LLMStreamError as e:
+            # Show the error after whatever arrived; a truncated answer is never cached
+            error_text = f"\n\n{e}" if pieces else str(e)
+            pieces.append(error_text)
+            yield sse_event('token', {'text': error_text})
+            response_text = ''.join(pieces)
+        else:
+            response_text = ''.join(pieces)
+            rag.cache_recommendation({**retrieval, 'llm_response': response_text}, n_results=5)
+    else:
+        response_text = zebra_response_text(retrieval)
+        rag.cache_recommendation(retrieval, n_results=5)
+        yield sse_event('token', {'text': response_text})
+
+    if session_id:
+        session_history.append(session_id, 'assistant', response_text)
+    yield sse_event('done', {
+        'response': response_text,
+        'session_id': session_id,
+        'zebra_query': True,
+        'metadata': {'printers_found': len(recommendations), 'cache': retrieval.get('cache', 'miss')}
+    })
+
+def stream_archive(message, session_id):
+    """Archive events: retrieval counts, then the answer as the Archive LLM backend generates it"""
+    print(f"Using Archive query engine for query (streaming): {message}")
+    query_engine, llm = get_archive_engine()
+
+    results = query_engine.query(message, sql_llm=llm)
+    yield sse_event('retrieval', {
+        'sheets_retrieved': len(results['structure_results']),
+        'rows_retrieved': len(results['content_results'])
+    })
+
+    response = None
+    for event in llm.stream_answer(results["context"], message):
+        if 'text' in event:
+            yield sse_event('token', {'text': event['text']})
+        else:
+            response = event
+
+    if session_id:
+        session_history.append(session_id, 'assistant', response['answer'])
+    yield sse_event('done', {
+        'response': response['answer'],
+        'session_id': session_id,
+        'archive_query': True,
+        'metadata': {
+            'sheets_retrieved': len(results['structure_results']),
+            'rows_retrieved': len(results['content_results']),
+            'model': response['model'],
+            'tokens': response['token_usage'],
+            'backend': response.get('backend', 'unknown')
+        }
+    })
+
+def stream_generic(project, project_id, message, session_id):
+    """Generic project events: retrieved file excerpts, then Claude's reply as it is generated"""
+    client = get_anthropic_client()
+    if not client:
+        yield sse_event('error', {
+            'response': 'Anthropic API is not configured. Please add your ANTHROPIC_API_KEY to the .env file.'
+        })
+        return
+
+    system_prompt, excerpts = build_generic_prompt(project, project_id, message)
+    yield sse_event('retrieval', {
+        'excerpts': [
+            {'path': c['path'], 'start_line': c['start_line'], 'end_line': c['end_line']}
+            for c in excerpts
+        ]
+    })
+
+    # A reply that starts with RUN_SCRIPT: is a command, not text for the user:
+    # hold tokens back until the prefix is ruled out
+    pieces = []
+    streaming = False
+    with client.messages.stream(
+        model=GENERIC_CHAT_MODEL,
+        max_tokens=2048,
+        system=system_prompt,
+        messages=chat_history(session_id, message)
+    ) as stream:
+        for text in stream.text_stream:
+            pieces.append(text)
+            if streaming:
+                yield sse_event('token', {'text': text})
+                continue
+            so_far = ''.join(pieces)
+            if len(so_far) >= len('RUN_SCRIPT:') and not so_far.startswith('RUN_SCRIPT:'):
+                streaming = True
+                yield sse_event('token', {'text': so_far})
+        final = stream.get_final_message()
+
+    assistant_message = ''.join(pieces)
+    script_output = None
+    if assistant_message.startswith('RUN_SCRIPT:'):
+        # Adds its reply to the history before the job can finish
+        assistant_message, script_output = run_requested_script(assistant_message, project, session_id)
+    elif session_id:
+        session_history.append(session_id, 'assistant', assistant_message)
+    if not streaming:
+        yield sse_event('token', {'text': assistant_message})
+
+    yield sse_event('done', {
+        'response': assistant_message,
+        'session_id': session_id,
+        'script_output': script_output,
+        'metadata': {
+            'model': final.model,
+            'tokens': final.usage.input_tokens + final.usage.output_tokens
+        }
+    })
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Streaming variant of /api/chat (server-sent events)
+
+    Events: "retrieval" as soon as the project's retrieval step is done,
+    "token" for each piece of the answer, then "done" with the same fields
+    as the /api/chat response, or "error" with a "response" message.
+    """
+    data = request.get_json()
+    message = data.get('message', '')
+    project_id = data.get('project_id')
+    session_id = data.get('session_id')
+
+    project = next((p for p in PROJECTS if p['id'] == project_id), None)
+
+    def generate():
+        if not project:
+            yield sse_event('error', {'response': 'Project not found. Please select a valid project.'})
+            return
+
+        # Write the user turn through to the messages table
+        if session_id:
+            session_history.append(session_id, 'user', message)
+
+        try:
+            if project_id == 'zebra-project':
+                yield from stream_zebra(message, session_id)
+            elif project_id == 'gen-ai-agent':
+                yield from stream_archive(message, session_id)
+            else:
+                yield from stream_generic(project, project_id, message, session_id)
+        except anthropic.APIError as e:
+            print(f"Anthropic API error: {str(e)}")
+            yield sse_event('error', {'response': f'Sorry, there was an error with the AI service: {str(e)}'})
+        except Exception as e:
+            print(f"Error in chat stream: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            yield sse_event('error', {'response': f'Sorry, I encountered an error: {str(e)}'})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        # No caching, and no buffering by proxies (nginx), so events arrive as they are sent
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def warm_project_indexes():
+    """Index the projects answered from their files, so the first question doesn't pay for it"""
+    for project in PROJECTS:
+        if project['id'] in ('gen-ai-agent', 'zebra-project'):
+            continue
+        base_path = os.path.join(os.path.dirname(__file__), project['path'])
+        if os.path.exists(base_path):
+            project_index.refresh(project['id'], base_path)
+
+
+def start_engine_warmup():
+    """Warm up the RAG engines in the background; /ready reports 503 until they are done"""
+    if WARMUP_ENGINES:
+        print(f"Starting background warm-up: {', '.join(WARMUP_ENGINES)}")
+        engine_readiness.start(WARMUP_ENGINES)
+
+
+# Steps the first requests don't need run after import, while the server accepts
+# requests; chat waits for the Anthropic client, /ready for all of them
+startup.defer({
+    'anthropic_client': create_anthropic_client,
+    'engine_warmup': start_engine_warmup,
+    'project_index_warm': warm_project_indexes
+})
+
 if __name__ == '__main__':
     # Use PORT environment variable for Cloud Run compatibility
     port = int(os.environ.get('PORT', 5001))
@@ -0,0 +1,190 @@
+"""
+Bootstrap
+Timed application startup: serial, parallel and deferred steps, and a per-startup timing report
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+# Step lifecycle: pending -> running -> done | failed
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Bootstrap:
+    """
+    Runs and times the startup steps of the app
+
+    Critical steps run before the module finishes importing: on their own
+    (step()) or, when independent, concurrently (run_parallel()). Steps the
+    first requests don't need run in a background thread after the critical
+    ones (defer()), while the server is already accepting requests; callers
+    that need one of them wait for it (wait()).
+
+    Every step's offset from the start of the process's bootstrap, its
+    duration, thread and outcome are kept for report(). When the deferred
+    steps finish, the report is printed and appended as a JSON line to
+    report_path.
+    """
+
+    def __init__(self, report_path: Optional[str] = None, t0: Optional[float] = None):
+        """
+        Args:
+            report_path: JSON-lines file receiving one report per startup (None: print only)
+            t0: time.perf_counter() value offsets are measured from (default: now)
+        """
+        self.report_path = report_path
+        self._t0 = t0 if t0 is not None else time.perf_counter()
+        self._started_at = time.time()
+        self._lock = threading.Lock()
+        self._steps: Dict[str, Dict[str, Any]] = {}
+        self._results: Dict[str, Any] = {}
+        self._events: Dict[str, threading.Event] = {}
+        self._critical_s: Optional[float] = None
+        self._deferred: List[str] = []
+
+    def _elapsed(self) -> float:
+        return round(time.perf_counter() - self._t0, 4)
+
+    def _register(self, name: str, phase: str):
+        with self._lock:
+            self._steps[name] = {'phase': phase, 'state': PENDING}
+            self._events[name] = threading.Event()
+
+    def _run(self, name: str, fn: Callable[[], Any]) -> Any:
+        """Run and time one registered step"""
+        with self._lock:
+            self._steps[name].update(state=RUNNING, start_s=self._elapsed(), thread=threading.current_thread().name)
+        start = time.perf_counter()
+        try:
+            result = fn()
+        except Exception as e:
+            with self._lock:
+                self._steps[name].update(state=FAILED, duration_s=round(time.perf_counter() - start, 4), error=str(e))
+            self._events[name].set()
+            raise
+        with self._lock:
+            self._steps[name].update(state=DONE, duration_s=round(time.perf_counter() - start, 4))
+            self._results[name] = result
+        self._events[name].set()
+        return result
+
+    def record(self, name: str, start: float):
+        """Record a serial step that ran from time.perf_counter() value start until now"""
+        self._register(name, 'serial')
+        with self._lock:
+            self._steps[name].update(
+                state=DONE,
+                start_s=round(start - self._t0, 4),
+                duration_s=round(time.perf_counter() - start, 4),
+                thread=threading.current_thread().name
+            )
+        self._events[name].set()
+
+    def step(self, name: str, fn: Callable[[], Any]) -> Any:
+        """Run a critical step in the calling thread and return its result"""
+        self._register(name, 'serial')
+        return self._run(name, fn)
+
+    def run_parallel(self, steps: Dict[str, Callable[[], Any]]) -> Dict[str, Any]:
+        """
+        Run independent critical steps concurrently and wait for all of them
+
+        Returns:
+            Step name -> result
+
+        Raises:
+            The first step's exception if any step fails (after all have finished)
+        """
+        for name in steps:
+            self._register(name, 'parallel')
+        with ThreadPoolExecutor(max_workers=len(steps), thread_name_prefix='bootstrap') as pool:
+            futures = {name: pool.submit(self._run, name, fn) for name, fn in steps.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+    def defer(self, steps: Dict[str, Callable[[], Any]]):
+        """
+        Mark the critical path as finished and run the given steps concurrently in the background
+
+        A failed deferred step is recorded and reported; it does not stop the app.
+        """
+        self._critical_s = self._elapsed()
+        for name in steps:
+            self._register(name, 'deferred')
+        self._deferred = list(steps)
+
+        def run_all():
+            with ThreadPoolExecutor(max_workers=max(1, len(steps)), thread_name_prefix='bootstrap-deferred') as pool:
+                for name, fn in steps.items():
+                    pool.submit(self._run_deferred, name, fn)
+            self.finish()
+
+        threading.Thread(target=run_all, name='bootstrap-deferred', daemon=True).start()
+
+    def _run_deferred(self, name: str, fn: Callable[[], Any]):
+        try:
+            self._run(name, fn)
+        except Exception as e:
+            print(f"✗ Deferred startup step '{name}' failed: {e}")
+
+    def wait(self, name: str, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for a step to finish
+
+        Returns:
+            True if it finished successfully within the timeout
+        """
+        event = self._events.get(name)
+        if event is None or not event.wait(timeout):
+            return False
+        with self._lock:
+            return self._steps[name]['state'] == DONE
+
+    def state(self, name: str) -> Optional[str]:
+        """Lifecycle state of a step (None if it is unknown)"""
+        with self._lock:
+            info = self._steps.get(name)
+            return info['state'] if info else None
+
+    def result(self, name: str) -> Any:
+        """Result of a finished step (None if it failed or has not finished)"""
+        with self._lock:
+            return self._results.get(name)
+
+    def report(self) -> Dict[str, Any]:
+        """Timing of every step so far"""
+        with self._lock:
+            steps = [{'name': name, **info} for name, info in self._steps.items()]
+        steps.sort(key=lambda s: s.get('start_s', float('inf')))
+        finished = [s['start_s'] + s['duration_s'] for s in steps if 'duration_s' in s]
+        return {
+            'pid': os.getpid(),
+            'started_at': self._started_at,
+            'critical_s': self._critical_s,
+            'total_s': round(max(finished), 4) if finished else 0.0,
+            'steps': steps
+        }
+
+    def finish(self):
+        """Print the report and append it to report_path"""
+        report = self.report()
+        print(f"Startup timing (pid {report['pid']}): ready to serve after {report['critical_s']}s, "
+              f"all steps done after {report['total_s']}s")
+        for s in report['steps']:
+            line = f"  {s['name']:<24} {s['phase']:<9} +{s.get('start_s', 0):>7.3f}s  {s.get('duration_s', 0):>7.3f}s  {s['state']}"
+            if s.get('error'):
+                line += f"  ({s['error']})"
+            print(line)
+
+        if self.report_path:
+            try:
+                with open(self.report_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(report) + '\n')
+            except OSError as e:
+                print(f"⚠ Could not write startup report to {self.report_path}: {e}")
@@ -0,0 +1,569 @@
+"""
+Conversation Store
+Data access for conversations.db: per-thread connections, WAL mode and indexed queries
+"""
+
+import base64
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Applied to every new connection. WAL lets readers run alongside a writer (and
+# across gunicorn workers); synchronous=NORMAL is durable in WAL mode except for
+# the last transactions on power loss.
+CONNECTION_PRAGMAS = [
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA busy_timeout = 5000',
+    'PRAGMA cache_size = -16000',      # 16 MB page cache per connection
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA mmap_size = 268435456',    # Read pages through a 256 MB memory map
+]
+
+# Prepared statements: sqlite3 caches the compiled form per connection and SQL
+# text, so every query below is a constant and connections are long-lived
+STATEMENT_CACHE_SIZE = 64
+
+# Keyset pagination: pages are fetched with WHERE (sort key, id) < cursor, so
+# every page costs one index range scan no matter how deep it is
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+PREVIEW_CHARS = 50           # Last-message preview in the conversation list
+MESSAGE_PREVIEW_CHARS = 200  # Message preview when bodies are omitted
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS conversations (
+        id TEXT PRIMARY KEY,
+        project_id TEXT NOT NULL,
+        title TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        conversation_id TEXT NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (conversation_id) REFERENCES conversations (id) ON DELETE CASCADE
+    )
+    ''',
+    # Messages of a conversation in order; the rowid in each entry resolves ties
+    # and lets the latest-message lookup stay inside the index
+    'CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages (conversation_id, created_at)',
+    # Covers the conversation list: filter, (updated_at, id) keyset order (read
+    # backwards for newest first) and every listed column from the index
+    'DROP INDEX IF EXISTS idx_conversations_project',
+    '''
+    CREATE INDEX IF NOT EXISTS idx_conversations_project_updated
+    ON conversations (project_id, updated_at, id, title, created_at)
+    ''',
+]
+
+# One page of a project's conversations, newest first. The newest message per
+# conversation is found with an index seek that returns its rowid; only that
+# row is then read, and only a preview of its text is returned.
+LIST_CONVERSATIONS_SQL = '''
+    SELECT c.id, c.title, c.created_at, c.updated_at, substr(m.content, 1, {preview})
+    FROM conversations c
+    LEFT JOIN messages m ON m.id = (
+        SELECT id FROM messages
+        WHERE conversation_id = c.id
+        ORDER BY created_at DESC, id DESC
+        LIMIT 1
+    )
+    WHERE c.project_id = ? AND (c.updated_at, c.id) < (?, ?)
+    ORDER BY c.updated_at DESC, c.id DESC
+    LIMIT ?
+'''.format(preview=PREVIEW_CHARS)
+
+# One page of a conversation's messages, newest first (returned oldest first)
+GET_MESSAGES_SQL = '''
+    SELECT id, role, content, created_at
+    FROM messages
+    WHERE conversation_id = ? AND (created_at, id) < (?, ?)
+    ORDER BY created_at DESC, id DESC
+    LIMIT ?
+'''
+
+GET_MESSAGE_PREVIEWS_SQL = '''
+    SELECT id, role, substr(content, 1, {preview}), created_at, length(content)
+    FROM messages
+    WHERE conversation_id = ? AND (created_at, id) < (?, ?)
+    ORDER BY created_at DESC, id DESC
+    LIMIT ?
+'''.format(preview=MESSAGE_PREVIEW_CHARS)
+
+# Start of a descending keyset scan: later than every stored CURRENT_TIMESTAMP
+_FIRST_PAGE = ('9999-12-31 23:59:59', '')
+
+RECENT_MESSAGES_SQL = '''
+    SELECT id, role, content
+    FROM messages
+    WHERE conversation_id = ?
+    ORDER BY created_at DESC, id DESC
+    LIMIT ?
+'''
+
+LATEST_MESSAGE_ID_SQL = '''
+    SELECT id FROM messages
+    WHERE conversation_id = ?
+    ORDER BY created_at DESC, id DESC
+    LIMIT 1
+'''
+
+PREVIOUS_MESSAGE_ID_SQL = '''
+    SELECT id FROM messages
+    WHERE conversation_id = ? AND id != ?
+    ORDER BY created_at DESC, id DESC
+    LIMIT 1
+'''
+
+INSERT_MESSAGE_SQL = 'INSERT INTO messages (conversation_id, role, content) VALUES (?, ?, ?)'
+TOUCH_CONVERSATION_SQL = 'UPDATE conversations SET updated_at = CURRENT_TIMESTAMP WHERE id = ?'
+INSERT_CONVERSATION_SQL = 'INSERT INTO conversations (id, project_id, title) VALUES (?, ?, ?)'
+UPDATE_TITLE_SQL = 'UPDATE conversations SET title = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?'
+DELETE_MESSAGES_SQL = 'DELETE FROM messages WHERE conversation_id = ?'
+DELETE_CONVERSATION_SQL = 'DELETE FROM conversations WHERE id = ?'
+
+
+class InvalidCursor(ValueError):
+    """A page cursor that was not produced by this store"""
+
+
+def encode_cursor(sort_value, row_id) -> str:
+    """Opaque cursor for the row after which the next page starts"""
+    return base64.urlsafe_b64encode(json.dumps([sort_value, row_id]).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str]) -> tuple:
+    """
+    Keyset position of a cursor
+
+    Raises:
+        InvalidCursor: If the cursor is malformed
+    """
+    if not cursor:
+        return _FIRST_PAGE
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+    if not isinstance(sort_value, str) or not isinstance(row_id, (str, int)):
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+    return sort_value, row_id
+
+
+def page_size(limit: Optional[int]) -> int:
+    """Requested page size clamped to 1..MAX_PAGE_SIZE (DEFAULT_PAGE_SIZE when not given)"""
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+class ConversationStore:
+    """
+    Conversations and messages in SQLite
+
+    Each thread keeps one open connection (created on first use), so request
+    handlers reuse connections and their prepared statements instead of
+    opening the database for every statement.
+    """
+
+    def __init__(self, db_path):
+        """
+        Args:
+            db_path: SQLite database file (created if missing)
+        """
+        self.db_path = str(db_path)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def connection(self) -> sqlite3.Connection:
+        """This thread's connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, cached_statements=STATEMENT_CACHE_SIZE)
+            for pragma in CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def init_schema(self):
+        """Create tables and indexes and switch the database to WAL mode"""
+        conn = self.connection()
+        # Persistent: stored in the database file, so it only needs to be set once
+        conn.execute('PRAGMA journal_mode = WAL')
+        with conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+        conn.execute('ANALYZE')
+
+    def close(self):
+        """Close every connection opened by this store"""
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+    # ------------------------------------------------------------------
+    # Conversations
+    # ------------------------------------------------------------------
+
+    def list_conversations(
+        self,
+        project_id: str,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        One page of a project's conversations, most recently updated first
+
+        Args:
+            project_id: Project
+            limit: Page size (clamped to MAX_PAGE_SIZE)
+            cursor: next_cursor of the previous page (None for the first page)
+
+        Returns:
+            (conversations with a preview of their last message, cursor of the next page or None)
+
+        Raises:
+            InvalidCursor: If the cursor is malformed
+        """
+        limit = page_size(limit)
+        updated_at, conversation_id = decode_cursor(cursor)
+        rows = self.connection().execute(
+            LIST_CONVERSATIONS_SQL, (project_id, updated_at, conversation_id, limit + 1)
+        ).fetchall()
+
+        items = [
+            {
+                'id': row[0],
+                'title': row[1] or 'Untitled Conversation',
+                'created_at': row[2],
+                'updated_at': row[3],
+                'preview': row[4] or 'No messages yet'
+            }
+            for row in rows[:limit]
+        ]
+        next_cursor = encode_cursor(rows[limit - 1][3], rows[limit - 1][0]) if len(rows) > limit else None
+        return items, next_cursor
+
+    def create_conversation(self, conversation_id: str, project_id: str, title: str):
+        """Insert a conversation"""
+        conn = self.connection()
+        with conn:
+            conn.execute(INSERT_CONVERSATION_SQL, (conversation_id, project_id, title))
+
+    def update_title(self, conversation_id: str, title: str):
+        """Rename a conversation"""
+        conn = self.connection()
+        with conn:
+            conn.execute(UPDATE_TITLE_SQL, (title, conversation_id))
+
+    def delete_conversation(self, conversation_id: str):
+        """
+        Delete a conversation and its messages
+
+        Messages are deleted explicitly: ON DELETE CASCADE only fires with
+        PRAGMA foreign_keys on, which would also reject messages for unknown
+        conversation ids that existing clients may send.
+        """
+        conn = self.connection()
+        with conn:
+            conn.execute(DELETE_MESSAGES_SQL, (conversation_id,))
+            conn.execute(DELETE_CONVERSATION_SQL, (conversation_id,))
+
+    # ------------------------------------------------------------------
+    # Messages
+    # ------------------------------------------------------------------
+
+    def get_messages(
+        self,
+        conversation_id: str,
+        limit: Optional[int] = None,
+        before: Optional[str] = None,
+        bodies: bool = True
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        One page of a conversation's messages, paging from the newest backwards
+
+        Args:
+            conversation_id: Conversation
+            limit: Page size (clamped to MAX_PAGE_SIZE)
+            before: next_cursor of the previous (newer) page; None for the latest messages
+            bodies: False returns a preview and the length of each message instead of its content
+
+        Returns:
+            (messages oldest first, cursor of the next older page or None)
+
+        Raises:
+            InvalidCursor: If the cursor is malformed
+        """
+        limit = page_size(limit)
+        created_at, message_id = decode_cursor(before)
+        sql = GET_MESSAGES_SQL if bodies else GET_MESSAGE_PREVIEWS_SQL
+        rows = self.connection().execute(sql, (conversation_id, created_at, message_id, limit + 1)).fetchall()
+
+        next_cursor = encode_cursor(rows[limit - 1][3], rows[limit - 1][0]) if len(rows) > limit else None
+        rows = rows[:limit]
+        rows.reverse()
+        if bodies:
+            items = [{'id': row[0], 'role': row[1], 'content': row[2], 'created_at': row[3]} for row in rows]
+        else:
+            items = [
+                {'id': row[0], 'role': row[1], 'preview': row[2], 'created_at': row[3], 'length': row[4]}
+                for row in rows
+            ]
+        return items, next_cursor
+
+    def recent_messages(self, conversation_id: str, limit: int) -> List[Tuple[int, str, str]]:
+        """Last `limit` messages as (id, role, content), oldest first"""
+        rows = self.connection().execute(RECENT_MESSAGES_SQL, (conversation_id, limit)).fetchall()
+        rows.reverse()
+        return rows
+
+    def latest_message_id(self, conversation_id: str) -> Optional[int]:
+        """Id of the newest message, or None for an empty conversation"""
+        row = self.connection().execute(LATEST_MESSAGE_ID_SQL, (conversation_id,)).fetchone()
+        return row[0] if row else None
+
+    def add_message(self, conversation_id: str, role: str, content: str) -> Tuple[int, Optional[int]]:
+        """
+        Append a message and bump the conversation's updated_at
+
+        Returns:
+            (new message id, id of the message before it in this conversation or None)
+        """
+        conn = self.connection()
+        with conn:
+            message_id = conn.execute(INSERT_MESSAGE_SQL, (conversation_id, role, content)).lastrowid
+            # Read inside the write transaction, so no other writer can interleave
+            previous_id = conn.execute(PREVIOUS_MESSAGE_ID_SQL, (conversation_id, message_id)).fetchone()
+            conn.execute(TOUCH_CONVERSATION_SQL, (conversation_id,))
+        return message_id, previous_id[0] if previous_id else None
+
+
+# ============================================================================
+# Benchmark: synthetic history, new store vs. the previous per-call access
+# ============================================================================
+
+LEGACY_LIST_SQL = '''
+    SELECT c.id, c.title, c.created_at, c.updated_at,
+           (SELECT content FROM messages WHERE conversation_id = c.id ORDER BY created_at DESC LIMIT 1) as last_message
+    FROM conversations c
+    WHERE c.project_id = ?
+    ORDER BY c.updated_at DESC
+'''
+
+
+def seed_history(db_path: str, conversations: int, messages_per: int, projects: int = 3):
+    """Fill a new database with synthetic conversations in the previous schema (no indexes)"""
+    conn = sqlite3.connect(db_path)
+    with conn:
+        for statement in SCHEMA[:2]:
+            conn.execute(statement)
+        conn.executemany(
+            'INSERT INTO conversations (id, project_id, title, created_at, updated_at) VALUES (?, ?, ?, ?, ?)',
+            (
+                (f'conv-{i}', f'project-{i % projects}', f'Conversation {i}',
+                 f'2025-01-01 00:00:{i % 60:02d}', f'2025-{1 + i % 12:02d}-{1 + i % 28:02d} 12:00:00')
+                for i in range(conversations)
+            )
+        )
+        conn.executemany(
+            'INSERT INTO messages (conversation_id, role, content, created_at) VALUES (?, ?, ?, ?)',
+            (
+                (f'conv-{i}', 'user' if j % 2 == 0 else 'assistant',
+                 f'Message {j} of conversation {i} ' + 'lorem ipsum ' * 20,
+                 f'2025-01-01 00:{j // 60:02d}:{j % 60:02d}')
+                for i in range(conversations) for j in range(messages_per)
+            )
+        )
+    conn.close()
+
+
+def _time_ms(fn, repeat: int) -> float:
+    """Median wall time of fn() in milliseconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return times[len(times) // 2]
+
+
+def _all_pages(fetch) -> int:
+    """Follow next_cursor through every page of fetch(cursor); returns the item count"""
+    count, cursor = 0, None
+    while True:
+        items, cursor = fetch(cursor)
+        count += len(items)
+        if cursor is None:
+            return count
+
+
+def _legacy_call(db_path: str, sql: str, params: tuple, write: bool = False, timeout_s: float = None):
+    """
+    One statement on a fresh connection, as the endpoints did before this store
+
+    Raises:
+        sqlite3.OperationalError: If timeout_s is set and the statement runs longer
+    """
+    conn = sqlite3.connect(db_path)
+    if timeout_s is not None:
+        deadline = time.perf_counter() + timeout_s
+        conn.set_progress_handler(lambda: int(time.perf_counter() > deadline), 100000)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        if write:
+            conn.commit()
+        return rows
+    finally:
+        conn.close()
+
+
+def run_benchmark(
+    db_path: str,
+    conversations: int = 100000,
+    messages_per: int = 6,
+    repeat: int = 20,
+    legacy_list_timeout_s: float = 60
+) -> Dict[str, Any]:
+    """
+    Time the conversation endpoints' queries before and after the store
+
+    The legacy numbers use a fresh connection per statement on the
+    unindexed rollback-journal database; the store numbers use the same
+    data after init_schema() (indexes, WAL) through per-thread connections.
+    The legacy conversation list scans every message once per listed
+    conversation, so it is run once and abandoned after legacy_list_timeout_s
+    (reported as a lower bound). Legacy calls return everything, so they are
+    compared with the store walking every page (list_conversations_all,
+    get_messages); single-page timings have no legacy counterpart.
+
+    Returns:
+        {"legacy": {operation: ms}, "store": {operation: ms}, ...}
+    """
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+    start = time.perf_counter()
+    seed_history(db_path, conversations, messages_per)
+    seed_s = time.perf_counter() - start
+    conversation = f'conv-{conversations // 2}'
+    project = f'project-{(conversations // 2) % 3}'
+
+    legacy = {
+        'get_messages': _time_ms(lambda: _legacy_call(
+            db_path, 'SELECT role, content, created_at FROM messages WHERE conversation_id = ? ORDER BY created_at ASC',
+            (conversation,)), repeat),
+        'add_message': _time_ms(lambda: _legacy_call(
+            db_path, INSERT_MESSAGE_SQL, (conversation, 'user', 'benchmark'), write=True), repeat),
+    }
+    legacy_list_timed_out = False
+    try:
+        legacy['list_conversations_all'] = _time_ms(
+            lambda: _legacy_call(db_path, LEGACY_LIST_SQL, (project,), timeout_s=legacy_list_timeout_s), 1
+        )
+    except sqlite3.OperationalError:
+        legacy['list_conversations_all'] = legacy_list_timeout_s * 1000
+        legacy_list_timed_out = True
+
+    store = ConversationStore(db_path)
+    start = time.perf_counter()
+    store.init_schema()
+    index_s = time.perf_counter() - start
+    # A cursor half-way down the project's list: keyset pages cost the same at any depth
+    deep_cursor = None
+    for _ in range(conversations // 6 // MAX_PAGE_SIZE):
+        _, deep_cursor = store.list_conversations(project, MAX_PAGE_SIZE, deep_cursor)
+    results = {
+        'list_conversations': _time_ms(lambda: store.list_conversations(project), repeat),
+        'list_conversations_deep': _time_ms(lambda: store.list_conversations(project, cursor=deep_cursor), repeat),
+        'list_conversations_all': _time_ms(
+            lambda: _all_pages(lambda cursor: store.list_conversations(project, MAX_PAGE_SIZE, cursor)), 1
+        ),
+        'get_messages': _time_ms(
+            lambda: _all_pages(lambda cursor: store.get_messages(conversation, MAX_PAGE_SIZE, cursor)), repeat
+        ),
+        'add_message': _time_ms(lambda: store.add_message(conversation, 'user', 'benchmark'), repeat),
+        'recent_messages': _time_ms(lambda: store.recent_messages(conversation, 20), repeat),
+    }
+    plan = [
+        row[-1] for row in store.connection().execute(
+            'EXPLAIN QUERY PLAN ' + LIST_CONVERSATIONS_SQL, (project, *_FIRST_PAGE, DEFAULT_PAGE_SIZE + 1)
+        )
+    ]
+    store.close()
+
+    return {
+        'conversations': conversations,
+        'messages': conversations * messages_per,
+        'listed_per_project': conversations // 3,
+        'seed_s': round(seed_s, 1),
+        'index_s': round(index_s, 1),
+        'legacy': {k: round(v, 3) for k, v in legacy.items()},
+        'legacy_list_timed_out': legacy_list_timed_out,
+        'store': {k: round(v, 3) for k, v in results.items()},
+        'list_plan': plan
+    }
+
+
+def print_benchmark(report: Dict[str, Any]):
+    """Print a benchmark report"""
+    print(f"Synthetic history: {report['conversations']:,} conversations, {report['messages']:,} messages "
+          f"(seeded in {report['seed_s']}s, indexes built in {report['index_s']}s)")
+    print(f"{'operation':<26}{'legacy ms':>12}{'store ms':>12}{'speedup':>10}")
+    for operation, store_ms in report['store'].items():
+        legacy_ms = report['legacy'].get(operation)
+        if legacy_ms is None:
+            print(f"{operation:<26}{'-':>12}{store_ms:>12.3f}{'-':>10}")
+        else:
+            bound = '>' if operation == 'list_conversations_all' and report['legacy_list_timed_out'] else ''
+            print(f"{operation:<26}{bound + f'{legacy_ms:.3f}':>12}{store_ms:>12.3f}"
+                  f"{bound + f'{legacy_ms / max(store_ms, 1e-6):.1f}x':>10}")
+    print(f"list_conversations_all and get_messages return all {report['listed_per_project']:,} conversations "
+          f"of a project / all messages in pages of {MAX_PAGE_SIZE}; list_conversations returns one page of "
+          f"{DEFAULT_PAGE_SIZE} (deep = half-way down the list)")
+    print("list_conversations plan:")
+    for step in report['list_plan']:
+        print(f"  {step}")
+
+
+if __name__ == '__main__':
+    import argparse
+    import tempfile
+
+    parser = argparse.ArgumentParser(description='Benchmark conversations.db access on a synthetic history')
+    parser.add_argument('--conversations', type=int, default=100000, help='Synthetic conversations')
+    parser.add_argument('--messages-per', type=int, default=6, help='Messages per conversation')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed runs per operation (median reported)')
+    parser.add_argument('--legacy-list-timeout', type=float, default=60,
+                        help='Seconds before the unindexed conversation list is abandoned')
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'conversations_bench.db'),
+                        help='Scratch database (replaced)')
+    parser.add_argument('--output', help='Write the report as JSON')
+    args = parser.parse_args()
+
+    report = run_benchmark(
+        args.db, args.conversations, args.messages_per, args.repeat, args.legacy_list_timeout
+    )
+    print_benchmark(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to: {args.output}")
@@ -0,0 +1,114 @@
+"""
+Engine Readiness
+Background warm-up of the RAG engines and per-engine state for the /ready endpoint
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# Engine lifecycle: pending -> warming -> ready | failed
+PENDING = 'pending'
+WARMING = 'warming'
+READY = 'ready'
+FAILED = 'failed'
+
+
+class EngineReadiness:
+    """
+    Tracks the warm-up state of each registered engine
+
+    Each engine has a warm-up function that loads it (models, collections,
+    databases) and runs synthetic queries so the first user request does not
+    pay for cold indexes and tokenizers. Warm-ups run in daemon threads, one
+    per engine, so a slow engine does not hold back the others.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._warmups: Dict[str, Callable[[], Optional[Dict[str, Any]]]] = {}
+        self._status: Dict[str, Dict[str, Any]] = {}
+        self._threads: List[threading.Thread] = []
+
+    def register(self, name: str, warmup: Callable[[], Optional[Dict[str, Any]]]):
+        """
+        Register an engine
+
+        Args:
+            name: Engine name reported by /ready
+            warmup: Loads and exercises the engine; may return extra details to report
+        """
+        with self._lock:
+            self._warmups[name] = warmup
+            self._status[name] = {'state': PENDING}
+
+    def mark_ready(self, name: str, **details):
+        """
+        Record an engine as ready after lazy initialization by a request
+
+        An engine that is still warming stays "warming" until its synthetic
+        queries have run.
+        """
+        with self._lock:
+            status = self._status.setdefault(name, {})
+            if status.get('state') not in (WARMING, READY):
+                status.update(details)
+                status['state'] = READY
+                status.pop('error', None)
+
+    def warm(self, name: str) -> bool:
+        """
+        Run one engine's warm-up in the calling thread
+
+        Args:
+            name: Registered engine name
+
+        Returns:
+            True if the engine is ready
+        """
+        with self._lock:
+            warmup = self._warmups[name]
+            self._status[name] = {'state': WARMING, 'started_at': time.time()}
+
+        print(f"Warming up {name} engine...")
+        start = time.perf_counter()
+        try:
+            details = warmup() or {}
+        except Exception as e:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._status[name].update(state=FAILED, error=str(e), warmup_s=round(elapsed, 2))
+            print(f"✗ {name} warm-up failed after {elapsed:.1f}s: {e}")
+            return False
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._status[name].update(details)
+            self._status[name].update(state=READY, warmup_s=round(elapsed, 2))
+        print(f"✓ {name} engine warm ({elapsed:.1f}s)")
+        return True
+
+    def start(self, names: List[str]):
+        """
+        Warm up the given engines in background threads
+
+        Args:
+            names: Registered engine names; unknown names are ignored with a warning
+        """
+        for name in names:
+            if name not in self._warmups:
+                print(f"⚠ Unknown engine '{name}' in warm-up list, skipping")
+                continue
+            thread = threading.Thread(target=self.warm, args=(name,), name=f"warmup-{name}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Copy of every engine's current status"""
+        with self._lock:
+            return {name: dict(status) for name, status in self._status.items()}
+
+    def is_ready(self, names: List[str]) -> bool:
+        """True when every named engine is ready"""
+        with self._lock:
+            return all(self._status.get(name, {}).get('state') == READY for name in names)
@@ -0,0 +1,65 @@
+"""
+Gunicorn configuration for AI-Interns
+
+The master process starts one index server that owns the Archive Milvus Lite
+database before any worker is forked; workers reach it through
+INDEX_SERVER_URI, so every worker searches the same copy of the index.
+
+Run from the repository root:
+    gunicorn -c AI-Interns/gunicorn.conf.py
+"""
+
+import os
+import sys
+from pathlib import Path
+
+archive_path = Path(__file__).resolve().parents[1] / 'GEN AI Agent' / 'Archive'
+
+chdir = str(Path(__file__).resolve().parent)
+wsgi_app = 'app:app'
+bind = f"0.0.0.0:{os.environ.get('PORT', 5001)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+# Chat requests wait on the LLM; don't kill workers mid-answer
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 300))
+
+index_server = None
+
+
+def single_worker(server, reason):
+    """Fall back to one worker: only one process may open a Milvus Lite file"""
+    if server.num_workers > 1:
+        print(f"⚠ {reason}; running 1 worker instead of {server.num_workers}")
+        server.num_workers = 1
+
+
+def on_starting(server):
+    """Start the Archive index server and point workers at it"""
+    global index_server
+
+    if os.environ.get('ARCHIVE_INDEX_SERVER', 'true').lower() not in ('true', '1', 'yes'):
+        single_worker(server, "Archive index server disabled, the worker embeds Milvus Lite")
+        return
+    if os.environ.get('INDEX_SERVER_URI'):
+        print(f"✓ Using external Archive index server: {os.environ['INDEX_SERVER_URI']}")
+        return
+
+    db_path = archive_path / 'milvus_edelivery.db'
+    if not db_path.exists():
+        # The database may still be built or downloaded later; the worker that does so owns it
+        single_worker(server, f"Archive database not found ({db_path}), index server not started")
+        return
+
+    sys.path.insert(0, str(archive_path))
+    from src.index_server import IndexServer
+
+    index_server = IndexServer(str(db_path))
+    index_server.start()
+    # Inherited by workers, which read it when they import the Archive config
+    os.environ['INDEX_SERVER_URI'] = index_server.address
+
+
+def on_exit(server):
+    """Stop the index server after the workers have exited"""
+    if index_server is not None:
+        index_server.stop()
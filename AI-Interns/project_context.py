@@ -0,0 +1,166 @@
+"""
+Project Context
+Cached file list and documentation of a project for the chat system prompt
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+# Description files, in order of preference (README.md, description.txt, DESCRIPTION.md, etc.)
+DESCRIPTION_FILES = ['README.md', 'readme.md', 'README.txt', 'readme.txt',
+                     'DESCRIPTION.md', 'description.md', 'DESCRIPTION.txt', 'description.txt',
+                     'INFO.md', 'info.md', 'INFO.txt', 'info.txt']
+
+MAX_DESCRIPTION_CHARS = 3000   # Limit for the description to avoid token limits
+
+
+def directory_signature(base_path: str) -> Optional[Tuple]:
+    """
+    Fingerprint of a project directory's top-level entries
+
+    Changes when an entry is added, removed or renamed, or when a file's
+    size or modification time changes (e.g. the README is edited). Only
+    stat() calls, no file reads.
+
+    Returns:
+        Sorted (name, is_dir, mtime_ns, size) tuples, or None if the directory is missing
+    """
+    try:
+        entries = []
+        with os.scandir(base_path) as it:
+            for entry in it:
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    stat = entry.stat()
+                    entries.append((entry.name, entry.is_dir(), stat.st_mtime_ns, stat.st_size))
+                except OSError:
+                    entries.append((entry.name, False, None, None))
+        return tuple(sorted(entries))
+    except OSError:
+        return None
+
+
+def build_project_context(base_path: str) -> Dict[str, Any]:
+    """
+    Read a project directory into the system prompt sections
+
+    Returns:
+        Dictionary with "files" (name/type list), "files_json" and "description_section"
+    """
+    project_files = []
+    project_description_content = ""
+
+    if os.path.exists(base_path):
+        try:
+            for item in os.listdir(base_path):
+                if item.startswith('.'):
+                    continue
+                is_dir = os.path.isdir(os.path.join(base_path, item))
+                project_files.append({
+                    'name': item,
+                    'type': 'directory' if is_dir else 'file'
+                })
+
+            for desc_file in DESCRIPTION_FILES:
+                desc_path = os.path.join(base_path, desc_file)
+                if os.path.exists(desc_path) and os.path.isfile(desc_path):
+                    try:
+                        with open(desc_path, 'r', encoding='utf-8') as f:
+                            project_description_content = f.read()
+                        if len(project_description_content) > MAX_DESCRIPTION_CHARS:
+                            project_description_content = (
+                                project_description_content[:MAX_DESCRIPTION_CHARS] + "\n...[truncated]"
+                            )
+                        break
+                    except Exception as e:
+                        print(f"Error reading description file {desc_file}: {str(e)}")
+        except Exception:
+            pass
+
+    description_section = ""
+    if project_description_content:
+        description_section = f"\n\nProject Documentation:\n{project_description_content}\n"
+
+    return {
+        'files': project_files,
+        'files_json': (json.dumps(project_files, indent=2) if project_files
+                       else 'No files found or directory not accessible.'),
+        'description_section': description_section
+    }
+
+
+class ProjectContextCache:
+    """
+    Per-project cache of build_project_context()
+
+    A cached context is reused until the directory signature changes. The
+    signature (a stat() of each top-level entry) is checked at most once
+    every check_interval_s per project, so between checks a chat message
+    touches the disk not at all; edits show up within that interval.
+    """
+
+    def __init__(self, check_interval_s: float = 2.0):
+        """
+        Args:
+            check_interval_s: Minimum seconds between signature checks of one project
+        """
+        self.check_interval_s = check_interval_s
+        self._lock = threading.Lock()
+        # project_id -> {'base_path', 'signature', 'checked_at', 'context'}
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self.hits = 0
+        self.rebuilds = 0
+
+    def get(self, project_id: str, base_path: str) -> Dict[str, Any]:
+        """
+        Context of a project, rebuilt only if its directory changed
+
+        Args:
+            project_id: Cache key
+            base_path: Project directory
+
+        Returns:
+            Dictionary from build_project_context()
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(project_id)
+            if entry is not None and entry['base_path'] == base_path and now - entry['checked_at'] < self.check_interval_s:
+                self.hits += 1
+                return entry['context']
+
+        signature = directory_signature(base_path)
+        with self._lock:
+            entry = self._entries.get(project_id)
+            if entry is not None and entry['base_path'] == base_path and entry['signature'] == signature:
+                entry['checked_at'] = now
+                self.hits += 1
+                return entry['context']
+
+        context = build_project_context(base_path)
+        with self._lock:
+            self._entries[project_id] = {
+                'base_path': base_path,
+                'signature': signature,
+                'checked_at': now,
+                'context': context
+            }
+            self.rebuilds += 1
+        return context
+
+    def invalidate(self, project_id: Optional[str] = None):
+        """Drop one project's context (or all of them)"""
+        with self._lock:
+            if project_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(project_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Cached projects and hit/rebuild counters"""
+        with self._lock:
+            return {'projects': len(self._entries), 'hits': self.hits, 'rebuilds': self.rebuilds}
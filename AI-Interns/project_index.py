@@ -0,0 +1,391 @@
+"""
+Project Index
+Incremental, recursive chunk index of a project's code and documentation,
+searched per question within a token budget
+"""
+
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Files worth indexing (by extension, or by exact name for extension-less files)
+TEXT_EXTENSIONS = {'.py', '.md', '.txt', '.rst', '.js', '.ts', '.jsx', '.tsx', '.html', '.css',
+                   '.json', '.yaml', '.yml', '.toml', '.cfg', '.ini', '.sh', '.sql', '.csv'}
+TEXT_FILENAMES = {'Dockerfile', 'Makefile', 'Procfile'}
+
+# Directories that never hold project sources
+SKIP_DIRS = {'__pycache__', 'node_modules', 'venv', 'env', 'site-packages', 'chroma_db',
+             'build', 'dist'}
+
+MAX_FILE_BYTES = 256 * 1024   # Larger files are data, not sources
+CHUNK_CHARS = 1500            # Chunks end on a line boundary at or below this size
+CHARS_PER_TOKEN = 4           # Rough token estimate for the prompt budget
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS indexed_files (
+    project_id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    model TEXT NOT NULL,
+    PRIMARY KEY (project_id, path)
+);
+
+CREATE TABLE IF NOT EXISTS file_chunks (
+    project_id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    start_line INTEGER NOT NULL,
+    end_line INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    embedding BLOB,
+    PRIMARY KEY (project_id, path, seq)
+);
+"""
+
+# Model name recorded for chunks indexed without embeddings
+LEXICAL = 'lexical'
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of a text"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens; snake_case and paths split into their parts"""
+    return re.findall(r'[a-z0-9]+', text.lower())
+
+
+def is_indexable(name: str) -> bool:
+    """Whether a file name looks like source code or documentation"""
+    return name in TEXT_FILENAMES or os.path.splitext(name)[1].lower() in TEXT_EXTENSIONS
+
+
+def scan_project(base_path: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Indexable files under a project directory, recursively
+
+    Hidden entries and SKIP_DIRS are not descended into; files larger than
+    MAX_FILE_BYTES are skipped.
+
+    Returns:
+        Relative path (with "/" separators) -> (mtime_ns, size)
+    """
+    files = {}
+    for root, dirs, names in os.walk(base_path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.') and d not in SKIP_DIRS)
+        for name in names:
+            if name.startswith('.') or not is_indexable(name):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if stat.st_size > MAX_FILE_BYTES:
+                continue
+            files[os.path.relpath(path, base_path).replace(os.sep, '/')] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+def chunk_text(text: str, max_chars: int = CHUNK_CHARS) -> List[Tuple[int, int, str]]:
+    """
+    Split a file into chunks of whole lines
+
+    Args:
+        text: File content
+        max_chars: Maximum chunk size; longer single lines are cut
+
+    Returns:
+        (start_line, end_line, text) tuples with 1-based, inclusive line numbers
+    """
+    chunks = []
+    lines: List[str] = []
+    size = 0
+    start = 1
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line[:max_chars]
+        if lines and size + len(line) + 1 > max_chars:
+            chunks.append((start, number - 1, '\n'.join(lines)))
+            lines, size, start = [], 0, number
+        lines.append(line)
+        size += len(line) + 1
+    if lines:
+        chunks.append((start, start + len(lines) - 1, '\n'.join(lines)))
+    return [c for c in chunks if c[2].strip()]
+
+
+class ProjectIndex:
+    """
+    Searchable chunks of the code and documentation of each project
+
+    Files are found recursively (see scan_project), split into line chunks
+    and, when an embedding function is configured, embedded. Chunks and
+    vectors are persisted in SQLite keyed by each file's mtime and size, so
+    a refresh only reads and embeds files that changed, and restarts and
+    other workers reuse what is already indexed. A project is rescanned at
+    most once every check_interval_s.
+
+    Search ranks chunks by cosine similarity of the embeddings, or by BM25
+    when no embedding function is available, and returns the best chunks
+    that fit in a token budget.
+    """
+
+    def __init__(self, db_path: str, embed: Optional[Callable[[List[str]], np.ndarray]] = None,
+                 model_name: str = LEXICAL, check_interval_s: float = 2.0):
+        """
+        Args:
+            db_path: SQLite file for chunks and embeddings
+            embed: Texts -> (n, dim) array; None ranks chunks lexically
+            model_name: Name of the embedding model (a change re-embeds every file)
+            check_interval_s: Minimum seconds between rescans of one project
+        """
+        self.db_path = db_path
+        self.embed = embed
+        self.model_name = model_name if embed is not None else LEXICAL
+        self.check_interval_s = check_interval_s
+        self._lock = threading.Lock()
+        self._project_locks: Dict[str, threading.Lock] = {}
+        # project_id -> {'base_path', 'checked_at', 'files': {path: {'signature', 'chunks', 'vectors'}},
+        #                'chunks', 'matrix', 'bm25'}
+        self._projects: Dict[str, Dict] = {}
+
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Connection for one refresh"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _project_lock(self, project_id: str) -> threading.Lock:
+        with self._lock:
+            return self._project_locks.setdefault(project_id, threading.Lock())
+
+    def _embed(self, texts: List[str]) -> Optional[np.ndarray]:
+        """Unit-length embeddings, or None after switching to lexical ranking"""
+        if self.embed is None or not texts:
+            return None
+        try:
+            vectors = np.asarray(self.embed(texts), dtype=np.float32)
+        except Exception as e:
+            print(f"⚠️  Project index embeddings unavailable ({e}); ranking chunks lexically")
+            self.embed = None
+            self.model_name = LEXICAL
+            return None
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.clip(norms, 1e-12, None)
+
+    def refresh(self, project_id: str, base_path: str) -> Dict:
+        """
+        Bring a project's chunks up to date with its files
+
+        Args:
+            project_id: Project key
+            base_path: Project directory
+
+        Returns:
+            In-memory index of the project
+        """
+        with self._project_lock(project_id):
+            state = self._projects.get(project_id)
+            now = time.monotonic()
+            if state is not None and state['base_path'] == base_path and now - state['checked_at'] < self.check_interval_s:
+                return state
+            if state is None or state['base_path'] != base_path or state['model'] != self.model_name:
+                state = {'base_path': base_path, 'model': self.model_name, 'files': {},
+                         'chunks': [], 'matrix': None, 'bm25': None}
+
+            on_disk = scan_project(base_path)
+            files = state['files']
+            changed = [p for p, sig in on_disk.items() if p not in files or files[p]['signature'] != sig]
+            removed = [p for p in files if p not in on_disk]
+
+            if changed or removed:
+                with self._connect() as conn:
+                    for path in removed:
+                        files.pop(path)
+                        conn.execute('DELETE FROM indexed_files WHERE project_id = ? AND path = ?', (project_id, path))
+                        conn.execute('DELETE FROM file_chunks WHERE project_id = ? AND path = ?', (project_id, path))
+                    stale = self._load_stored(conn, project_id, changed, on_disk, files)
+                    self._index_files(conn, project_id, base_path, stale, on_disk, files)
+                self._rebuild(state)
+                print(f"✓ Project index {project_id}: {len(files)} files, {len(state['chunks'])} chunks "
+                      f"({len(stale)} re-indexed, {len(removed)} removed)")
+
+            state['checked_at'] = time.monotonic()
+            self._projects[project_id] = state
+            return state
+
+    def _load_stored(self, conn: sqlite3.Connection, project_id: str, paths: List[str],
+                     on_disk: Dict[str, Tuple[int, int]], files: Dict) -> List[str]:
+        """
+        Take chunks of unchanged files from the database
+
+        Returns:
+            Paths whose stored chunks are missing or out of date
+        """
+        stale = []
+        for path in paths:
+            row = conn.execute(
+                'SELECT mtime_ns, size, model FROM indexed_files WHERE project_id = ? AND path = ?',
+                (project_id, path)
+            ).fetchone()
+            if row is None or (row[0], row[1]) != on_disk[path] or row[2] != self.model_name:
+                stale.append(path)
+                continue
+            rows = conn.execute(
+                'SELECT start_line, end_line, text, embedding FROM file_chunks '
+                'WHERE project_id = ? AND path = ? ORDER BY seq',
+                (project_id, path)
+            ).fetchall()
+            vectors = None
+            if self.model_name != LEXICAL and rows:
+                vectors = np.stack([np.frombuffer(r[3], dtype=np.float32) for r in rows])
+            files[path] = {
+                'signature': on_disk[path],
+                'chunks': [(path, r[0], r[1], r[2]) for r in rows],
+                'vectors': vectors
+            }
+        return stale
+
+    def _index_files(self, conn: sqlite3.Connection, project_id: str, base_path: str, paths: List[str],
+                     on_disk: Dict[str, Tuple[int, int]], files: Dict):
+        """Read, chunk and embed files, and store the result"""
+        chunked = {}
+        for path in paths:
+            try:
+                with open(os.path.join(base_path, path), 'r', encoding='utf-8') as f:
+                    text = f.read()
+            except (UnicodeDecodeError, OSError):
+                text = ''
+            chunked[path] = [(path, start, end, chunk) for start, end, chunk in chunk_text(text)]
+
+        all_chunks = [c for path in paths for c in chunked[path]]
+        # The path is part of the embedded text so file names count towards relevance
+        vectors = self._embed([f"{c[0]}\n{c[3]}" for c in all_chunks])
+
+        offset = 0
+        for path in paths:
+            chunks = chunked[path]
+            file_vectors = vectors[offset:offset + len(chunks)] if vectors is not None else None
+            offset += len(chunks)
+            files[path] = {'signature': on_disk[path], 'chunks': chunks, 'vectors': file_vectors}
+
+            conn.execute('DELETE FROM file_chunks WHERE project_id = ? AND path = ?', (project_id, path))
+            conn.executemany(
+                'INSERT INTO file_chunks (project_id, path, seq, start_line, end_line, text, embedding) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(project_id, path, seq, c[1], c[2], c[3],
+                  file_vectors[seq].tobytes() if file_vectors is not None else None)
+                 for seq, c in enumerate(chunks)]
+            )
+            conn.execute(
+                'INSERT OR REPLACE INTO indexed_files (project_id, path, mtime_ns, size, model) VALUES (?, ?, ?, ?, ?)',
+                (project_id, path, on_disk[path][0], on_disk[path][1], self.model_name)
+            )
+
+    def _rebuild(self, state: Dict):
+        """Concatenate per-file chunks into the search structures"""
+        chunks, vectors = [], []
+        for path in sorted(state['files']):
+            entry = state['files'][path]
+            chunks.extend(entry['chunks'])
+            if entry['vectors'] is not None and len(entry['chunks']):
+                vectors.append(entry['vectors'])
+        state['chunks'] = chunks
+        state['model'] = self.model_name
+        state['matrix'] = np.vstack(vectors) if vectors and self.model_name != LEXICAL else None
+        state['bm25'] = None
+        if state['matrix'] is None:
+            docs = [Counter(tokenize(f"{c[0]}\n{c[3]}")) for c in chunks]
+            df = Counter(term for doc in docs for term in doc)
+            lengths = [sum(doc.values()) for doc in docs]
+            state['bm25'] = {
+                'docs': docs,
+                'lengths': lengths,
+                'avg_length': (sum(lengths) / len(lengths)) if lengths else 0.0,
+                'idf': {t: math.log(1 + (len(docs) - n + 0.5) / (n + 0.5)) for t, n in df.items()}
+            }
+
+    def _scores(self, state: Dict, query: str) -> np.ndarray:
+        """Relevance of every chunk to a query"""
+        if state['matrix'] is not None:
+            query_vector = self._embed([query])
+            if query_vector is not None:
+                return state['matrix'] @ query_vector[0]
+            # Embeddings failed since the index was built
+            self._rebuild(state)
+
+        bm25 = state['bm25']
+        terms = set(tokenize(query))
+        k1, b = 1.2, 0.75
+        scores = np.zeros(len(state['chunks']), dtype=np.float32)
+        for i, (doc, length) in enumerate(zip(bm25['docs'], bm25['lengths'])):
+            score = 0.0
+            for term in terms:
+                tf = doc.get(term)
+                if tf:
+                    score += bm25['idf'][term] * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / bm25['avg_length']))
+            scores[i] = score
+        return scores
+
+    def search(self, project_id: str, base_path: str, query: str, token_budget: int) -> List[Dict]:
+        """
+        Most relevant chunks of a project that fit in a token budget
+
+        Args:
+            project_id: Project key
+            base_path: Project directory
+            query: User question
+            token_budget: Approximate tokens available for chunk text
+
+        Returns:
+            Chunks ({'path', 'start_line', 'end_line', 'text', 'score'}) in file and line order
+        """
+        state = self.refresh(project_id, base_path)
+        if not state['chunks'] or token_budget <= 0:
+            return []
+
+        scores = self._scores(state, query)
+        selected = []
+        used = 0
+        for i in np.argsort(-scores, kind='stable'):
+            if scores[i] <= 0:
+                break
+            path, start, end, text = state['chunks'][i]
+            tokens = estimate_tokens(text) + estimate_tokens(path) + 8
+            if used + tokens > token_budget:
+                continue
+            used += tokens
+            selected.append({'path': path, 'start_line': start, 'end_line': end,
+                             'text': text, 'score': float(scores[i])})
+        return sorted(selected, key=lambda c: (c['path'], c['start_line']))
+
+    def stats(self) -> Dict[str, Dict]:
+        """Indexed files and chunks per project"""
+        with self._lock:
+            return {
+                project_id: {'files': len(state['files']), 'chunks': len(state['chunks']), 'model': state['model']}
+                for project_id, state in self._projects.items()
+            }
+
+
+def format_chunks(chunks: List[Dict]) -> str:
+    """System prompt section quoting retrieved chunks"""
+    if not chunks:
+        return ""
+    section = "\n\nRelevant excerpts from the project files:\n"
+    for chunk in chunks:
+        section += f"\n--- {chunk['path']} (lines {chunk['start_line']}-{chunk['end_line']}) ---\n{chunk['text']}\n"
+    return section
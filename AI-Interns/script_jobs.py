@@ -0,0 +1,427 @@
+"""
+Script Jobs
+Background execution of project scripts: a bounded queue and worker pool,
+per-job CPU/memory limits, and output stored incrementally in SQLite
+"""
+
+import os
+import queue
+import signal
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Job lifecycle: queued -> running -> succeeded | failed | timed_out | cancelled
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+TIMED_OUT = 'timed_out'
+CANCELLED = 'cancelled'
+FINISHED = (SUCCEEDED, FAILED, TIMED_OUT, CANCELLED)
+
+FLUSH_INTERVAL_S = 0.2      # How often buffered output is written and cancel requests are checked
+KILL_GRACE_S = 3            # SIGTERM -> SIGKILL delay when stopping a job
+MAX_OUTPUT_CHARS = 1_000_000  # Output kept per job; the rest is dropped
+
+# Run as `python -c LIMITS_WRAPPER <cpu_s> <memory_bytes> <command...>`: sets the
+# limits in the new process and execs the command. Unlike preexec_fn, nothing
+# runs between fork and exec in the (multi-threaded) server process.
+LIMITS_WRAPPER = """
+import os, resource, sys
+cpu_s, memory_bytes = int(sys.argv[1]), int(sys.argv[2])
+if cpu_s:
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_s, cpu_s + 5))
+if memory_bytes:
+    resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+os.execvp(sys.argv[3], sys.argv[3:])
+"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS script_jobs (
+    id TEXT PRIMARY KEY,
+    project_id TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    status TEXT NOT NULL,
+    returncode INTEGER,
+    error TEXT,
+    owner_pid INTEGER NOT NULL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    output_truncated INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+
+CREATE TABLE IF NOT EXISTS script_job_output (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    stream TEXT NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+
+CREATE INDEX IF NOT EXISTS idx_script_jobs_created ON script_jobs(created_at);
+"""
+
+JOB_COLUMNS = ('id', 'project_id', 'filename', 'status', 'returncode', 'error', 'cancel_requested',
+               'output_truncated', 'created_at', 'started_at', 'finished_at')
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+
+def _process_alive(pid: int) -> bool:
+    """Whether a process with this pid exists"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ScriptJobRunner:
+    """
+    Runs project scripts as background jobs
+
+    Submitted jobs wait in a bounded queue for one of max_workers runner
+    threads, so at most max_workers scripts run at once per process and a
+    request never waits for a script. Each script runs in its own process
+    group with RLIMIT_CPU and RLIMIT_AS applied, and is stopped after
+    timeout_s of wall time.
+
+    Job state and output are kept in SQLite (WAL), so any gunicorn worker
+    can report a job's status, stream its output or cancel it. Only the
+    process that runs a job executes it; a cancel from another worker is
+    picked up within FLUSH_INTERVAL_S.
+    """
+
+    def __init__(self, db_path: str, max_workers: int = 2, max_queued: int = 20, timeout_s: float = 300,
+                 cpu_seconds: int = 120, memory_mb: int = 1024, keep_jobs: int = 500):
+        """
+        Args:
+            db_path: SQLite file for job state and output
+            max_workers: Scripts running at once in this process
+            max_queued: Jobs waiting beyond the running ones before submit() refuses
+            timeout_s: Wall-clock limit per job
+            cpu_seconds: CPU time limit per job (RLIMIT_CPU)
+            memory_mb: Address space limit per job (RLIMIT_AS)
+            keep_jobs: Finished jobs kept in the database; older ones are deleted
+        """
+        self.db_path = db_path
+        self.max_workers = max_workers
+        self.timeout_s = timeout_s
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.keep_jobs = keep_jobs
+        self._queue: 'queue.Queue[Tuple[str, List[str], str, Optional[Callable]]]' = queue.Queue(maxsize=max_queued)
+        self._local = threading.local()
+        self._threads: List[threading.Thread] = []
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        self._fail_orphaned_jobs()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Per-thread connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _fail_orphaned_jobs(self):
+        """Mark jobs whose runner process no longer exists as failed"""
+        conn = self._connection()
+        rows = conn.execute(
+            'SELECT id, owner_pid FROM script_jobs WHERE status IN (?, ?)', (QUEUED, RUNNING)
+        ).fetchall()
+        for job_id, owner_pid in rows:
+            if not _process_alive(owner_pid):
+                conn.execute(
+                    'UPDATE script_jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?',
+                    (FAILED, 'Runner process exited before the job finished', time.time(), job_id)
+                )
+
+    def _ensure_workers(self):
+        """Start the runner threads in this process (again after a fork)"""
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._threads = [
+                threading.Thread(target=self._work, name=f'script-job-{i}', daemon=True)
+                for i in range(self.max_workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+            self._pid = os.getpid()
+
+    def submit(self, project_id: str, filename: str, command: List[str], cwd: str,
+               on_finish: Optional[Callable[[Dict], None]] = None, job_id: Optional[str] = None) -> Dict:
+        """
+        Queue a script
+
+        Args:
+            project_id: Project the script belongs to
+            filename: Script name shown in job status
+            command: Command line to execute
+            cwd: Working directory
+            on_finish: Called with the finished job (see get()) in the runner thread
+            job_id: Id for the job (default: a new one; see new_job_id())
+
+        Returns:
+            The queued job
+
+        Raises:
+            QueueFull: If max_queued jobs are already waiting
+        """
+        self._ensure_workers()
+        job_id = job_id or self.new_job_id()
+        conn = self._connection()
+        conn.execute(
+            'INSERT INTO script_jobs (id, project_id, filename, status, owner_pid, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+            (job_id, project_id, filename, QUEUED, os.getpid(), time.time())
+        )
+        try:
+            self._queue.put_nowait((job_id, command, cwd, on_finish))
+        except queue.Full:
+            conn.execute('DELETE FROM script_jobs WHERE id = ?', (job_id,))
+            raise QueueFull(f'{self._queue.maxsize} jobs are already queued')
+        self._prune()
+        return self.get(job_id)
+
+    @staticmethod
+    def new_job_id() -> str:
+        """Id for a job, for callers that refer to it before submitting it"""
+        return uuid.uuid4().hex
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Job status, or None if unknown"""
+        row = self._connection().execute(
+            f"SELECT {', '.join(JOB_COLUMNS)} FROM script_jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(JOB_COLUMNS, row))
+        job['cancel_requested'] = bool(job['cancel_requested'])
+        job['output_truncated'] = bool(job['output_truncated'])
+        return job
+
+    def output(self, job_id: str, after: int = -1, limit: int = 1000) -> List[Dict]:
+        """
+        Output recorded for a job
+
+        Args:
+            job_id: Job id
+            after: Only pieces with a larger seq
+            limit: Maximum pieces
+
+        Returns:
+            [{'seq', 'stream' ('stdout' or 'stderr'), 'text'}] in order
+        """
+        rows = self._connection().execute(
+            'SELECT seq, stream, text FROM script_job_output WHERE job_id = ? AND seq > ? ORDER BY seq LIMIT ?',
+            (job_id, after, limit)
+        ).fetchall()
+        return [{'seq': seq, 'stream': stream, 'text': text} for seq, stream, text in rows]
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """
+        Request cancellation; a queued job never starts, a running one is stopped
+
+        Returns:
+            The job, or None if unknown
+        """
+        conn = self._connection()
+        conn.execute(
+            f"UPDATE script_jobs SET cancel_requested = 1 WHERE id = ? AND status NOT IN ({', '.join('?' * len(FINISHED))})",
+            (job_id, *FINISHED)
+        )
+        # A queued job is cancelled right away; its runner thread skips it later
+        conn.execute(
+            'UPDATE script_jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?',
+            (CANCELLED, time.time(), job_id, QUEUED)
+        )
+        return self.get(job_id)
+
+    def _prune(self):
+        """Delete the oldest finished jobs beyond keep_jobs"""
+        conn = self._connection()
+        stale = [row[0] for row in conn.execute(
+            f"SELECT id FROM script_jobs WHERE status IN ({', '.join('?' * len(FINISHED))}) "
+            'ORDER BY created_at DESC LIMIT -1 OFFSET ?',
+            (*FINISHED, self.keep_jobs)
+        )]
+        for job_id in stale:
+            conn.execute('DELETE FROM script_job_output WHERE job_id = ?', (job_id,))
+            conn.execute('DELETE FROM script_jobs WHERE id = ?', (job_id,))
+
+    def _limited(self, command: List[str]) -> List[str]:
+        """Command wrapped to run under the CPU and memory limits (unchanged where rlimits don't exist)"""
+        if resource is None or not (self.cpu_seconds or self.memory_mb):
+            return command
+        memory_bytes = self.memory_mb * 1024 * 1024 if self.memory_mb else 0
+        return [sys.executable, '-c', LIMITS_WRAPPER, str(self.cpu_seconds or 0), str(memory_bytes), *command]
+
+    def _work(self):
+        """Runner thread: take jobs off the queue and run them"""
+        while True:
+            job_id, command, cwd, on_finish = self._queue.get()
+            try:
+                self._run(job_id, command, cwd)
+            except Exception as e:
+                print(f"✗ Script job {job_id} failed: {e}")
+                self._finish(job_id, FAILED, None, str(e))
+            finally:
+                self._queue.task_done()
+            if on_finish is not None:
+                try:
+                    on_finish(self.get(job_id))
+                except Exception as e:
+                    print(f"⚠ Script job {job_id} completion callback failed: {e}")
+
+    def _finish(self, job_id: str, status: str, returncode: Optional[int], error: Optional[str] = None):
+        """Record a job's final status"""
+        self._connection().execute(
+            'UPDATE script_jobs SET status = ?, returncode = ?, error = ?, finished_at = ? WHERE id = ?',
+            (status, returncode, error, time.time(), job_id)
+        )
+
+    def _run(self, job_id: str, command: List[str], cwd: str):
+        """Run one job to completion, recording its output as it is produced"""
+        conn = self._connection()
+        started = conn.execute(
+            'UPDATE script_jobs SET status = ?, started_at = ? WHERE id = ? AND status = ? AND cancel_requested = 0',
+            (RUNNING, time.time(), job_id, QUEUED)
+        ).rowcount
+        if not started:
+            # Cancelled while queued
+            return
+
+        process = subprocess.Popen(
+            self._limited(command),
+            cwd=cwd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+            # Print as it happens instead of when the pipe buffer fills
+            env={**os.environ, 'PYTHONUNBUFFERED': '1'},
+            # Own process group, so stopping the job also stops its children
+            start_new_session=True
+        )
+
+        pending: List[Tuple[str, str]] = []
+        pending_lock = threading.Lock()
+
+        def read(pipe, stream):
+            for line in pipe:
+                with pending_lock:
+                    pending.append((stream, line))
+            pipe.close()
+
+        readers = [
+            threading.Thread(target=read, args=(process.stdout, 'stdout'), daemon=True),
+            threading.Thread(target=read, args=(process.stderr, 'stderr'), daemon=True)
+        ]
+        for reader in readers:
+            reader.start()
+
+        seq = 0
+        written = 0
+        truncated = False
+        deadline = time.monotonic() + self.timeout_s
+        status = None
+
+        def flush():
+            nonlocal seq, written, truncated
+            with pending_lock:
+                pieces = pending[:]
+                pending.clear()
+            rows = []
+            for stream, text in pieces:
+                if written >= MAX_OUTPUT_CHARS:
+                    truncated = True
+                    continue
+                text = text[:MAX_OUTPUT_CHARS - written]
+                written += len(text)
+                rows.append((job_id, seq, stream, text))
+                seq += 1
+            if rows:
+                conn.executemany('INSERT INTO script_job_output (job_id, seq, stream, text) VALUES (?, ?, ?, ?)', rows)
+
+        while True:
+            try:
+                process.wait(timeout=FLUSH_INTERVAL_S)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+            flush()
+            if time.monotonic() > deadline:
+                status = TIMED_OUT
+                self._stop(process)
+                break
+            cancelled = conn.execute('SELECT cancel_requested FROM script_jobs WHERE id = ?', (job_id,)).fetchone()
+            if cancelled and cancelled[0]:
+                status = CANCELLED
+                self._stop(process)
+                break
+
+        for reader in readers:
+            reader.join(timeout=KILL_GRACE_S)
+        flush()
+
+        returncode = process.returncode
+        error = None
+        if status == TIMED_OUT:
+            error = f'Timed out after {self.timeout_s:g} seconds'
+        elif status is None:
+            status = SUCCEEDED if returncode == 0 else FAILED
+            if returncode < 0 and -returncode == getattr(signal, 'SIGXCPU', None):
+                error = f'CPU time limit of {self.cpu_seconds} seconds exceeded'
+            elif returncode < 0:
+                error = f'Terminated by signal {-returncode}'
+        if truncated:
+            conn.execute('UPDATE script_jobs SET output_truncated = 1 WHERE id = ?', (job_id,))
+        self._finish(job_id, status, returncode, error)
+
+    def _stop(self, process: subprocess.Popen):
+        """SIGTERM the job's process group, then SIGKILL it if it does not exit"""
+        try:
+            if os.name == 'posix':
+                os.killpg(process.pid, signal.SIGTERM)
+            else:
+                process.terminate()
+            process.wait(timeout=KILL_GRACE_S)
+        except subprocess.TimeoutExpired:
+            if os.name == 'posix':
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+            process.wait()
+        except ProcessLookupError:
+            process.wait()
+
+    def stats(self) -> Dict[str, int]:
+        """Queue depth and job counts by status"""
+        counts = dict(self._connection().execute('SELECT status, COUNT(*) FROM script_jobs GROUP BY status').fetchall())
+        return {'queued_here': self._queue.qsize(), 'max_workers': self.max_workers, **counts}
@@ -0,0 +1,94 @@
+"""
+Secret Store
+Secrets from Google Secret Manager with an environment variable fallback, cached per process
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+# Seconds a fetched secret is reused before Secret Manager is asked again
+SECRET_CACHE_TTL_S = float(os.environ.get('SECRET_CACHE_TTL_S', 3600))
+
+# Deadline for one Secret Manager call; without it a missing metadata
+# server or network makes the client wait out its own retry policy
+SECRET_MANAGER_TIMEOUT_S = float(os.environ.get('SECRET_MANAGER_TIMEOUT_S', 5))
+
+_cache: Dict[Tuple[str, Optional[str]], Tuple[float, Optional[str]]] = {}
+_lock = threading.Lock()
+_client = None
+
+
+def _secret_manager_client():
+    """Shared Secret Manager client (imported on first use: the import alone takes ~1 s)"""
+    global _client
+    if _client is None:
+        from google.cloud import secretmanager
+        _client = secretmanager.SecretManagerServiceClient()
+    return _client
+
+
+def fetch_secret(secret_name: str, project_id: Optional[str] = None) -> Optional[str]:
+    """
+    Fetch secret from Google Secret Manager.
+    Falls back to environment variable if Secret Manager is not available (local development).
+
+    Args:
+        secret_name: Name of the secret to fetch
+        project_id: GCP project ID (optional, will use default if not provided)
+
+    Returns:
+        Secret value as string, or None if not found
+    """
+    # If project_id not provided, try to get it from environment
+    if not project_id:
+        project_id = os.environ.get('GCP_PROJECT') or os.environ.get('GOOGLE_CLOUD_PROJECT')
+
+    if not project_id:
+        print(f"⚠ No GCP project ID found, falling back to environment variable for {secret_name}")
+        return os.environ.get(secret_name.upper())
+
+    try:
+        # Build the resource name of the secret version
+        name = f"projects/{project_id}/secrets/{secret_name}/versions/latest"
+
+        # Access the secret version; one attempt, bounded by SECRET_MANAGER_TIMEOUT_S
+        response = _secret_manager_client().access_secret_version(
+            request={"name": name},
+            retry=None,
+            timeout=SECRET_MANAGER_TIMEOUT_S
+        )
+        secret_value = response.payload.data.decode('UTF-8')
+        print(f"✓ Successfully fetched '{secret_name}' from Google Secret Manager")
+        return secret_value
+
+    except Exception as e:
+        # Fallback to environment variable (for local development)
+        print(f"⚠ Could not fetch from Secret Manager ({e}), falling back to environment variable")
+        return os.environ.get(secret_name.upper())
+
+
+def get_secret(secret_name: str, project_id: Optional[str] = None) -> Optional[str]:
+    """
+    Cached fetch_secret()
+
+    The value is kept in memory only (never written to disk) for
+    SECRET_CACHE_TTL_S. Concurrent callers share one fetch.
+    """
+    key = (secret_name, project_id)
+    with _lock:
+        cached = _cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] < SECRET_CACHE_TTL_S:
+            return cached[1]
+
+        value = fetch_secret(secret_name, project_id)
+        if value is not None:
+            _cache[key] = (time.monotonic(), value)
+        return value
+
+
+def clear_cache():
+    """Forget cached secrets (e.g. after a key rotation)"""
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,117 @@
+"""
+Session History
+Bounded in-memory cache of chat history in front of the SQLite messages table
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from conversation_store import ConversationStore
+
+
+class SessionHistory:
+    """
+    LRU cache of the last turns of each chat session, backed by the messages table
+
+    The messages table is the source of truth: new turns are written through
+    to it, and a session that is not cached (evicted, restarted, or served by
+    another worker) is reloaded from its last max_turns rows. A cached session
+    is revalidated against the newest message id on every read, so turns
+    written by another worker are picked up. At most max_sessions sessions
+    are held in memory; the least recently used one is evicted first.
+    """
+
+    def __init__(self, store: ConversationStore, max_sessions: int = 1000, max_turns: int = 20):
+        """
+        Args:
+            store: Data access for the messages table
+            max_sessions: Sessions kept in memory
+            max_turns: Messages per session kept in memory and sent to the model
+        """
+        self.store = store
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self._lock = threading.Lock()
+        # session_id -> {'last_id': newest message id, 'messages': [{'role', 'content'}, ...]}
+        self._sessions: 'OrderedDict[str, Dict]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _load(self, session_id: str) -> Dict:
+        """Last max_turns messages of a session, oldest first"""
+        rows = self.store.recent_messages(session_id, self.max_turns)
+        return {
+            'last_id': rows[-1][0] if rows else None,
+            'messages': [{'role': role, 'content': content} for _, role, content in rows]
+        }
+
+    def _store(self, session_id: str, entry: Dict):
+        """Insert or refresh a cache entry and evict past max_sessions (caller holds the lock)"""
+        self._sessions[session_id] = entry
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, session_id: str) -> List[Dict[str, str]]:
+        """
+        Recent messages of a session in Anthropic messages format
+
+        Returns:
+            Copy of the last max_turns messages, oldest first
+        """
+        last_id = self.store.latest_message_id(session_id)
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None and entry['last_id'] == last_id:
+                self._sessions.move_to_end(session_id)
+                self.hits += 1
+                return list(entry['messages'])
+            self.misses += 1
+
+        entry = self._load(session_id)
+
+        with self._lock:
+            self._store(session_id, entry)
+        return list(entry['messages'])
+
+    def append(self, session_id: str, role: str, content: str):
+        """
+        Write a turn to the messages table and the cache
+
+        Also bumps the conversation's updated_at, like saving a message through the API.
+        """
+        message_id, previous_id = self.store.add_message(session_id, role, content)
+
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                # Not cached: the next get() loads it, including this turn
+                return
+            if entry['last_id'] != previous_id:
+                # Another worker wrote to this session since it was cached; reload on next get()
+                self._sessions.pop(session_id)
+                return
+            entry['messages'].append({'role': role, 'content': content})
+            del entry['messages'][:-self.max_turns]
+            entry['last_id'] = message_id
+            self._sessions.move_to_end(session_id)
+
+    def forget(self, session_id: str):
+        """Drop a session from the cache (e.g. after its conversation is deleted)"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self) -> Dict[str, Optional[int]]:
+        """Cache size and hit/miss counters"""
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'max_turns': self.max_turns,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
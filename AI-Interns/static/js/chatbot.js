@@ -19,6 +19,9 @@
     let messageHistory = [];
     let isWaitingForResponse = false;
     let conversations = [];
+    // Keyset cursors for the next page (null = no more pages)
+    let conversationsCursor = null;
+    let messagesCursor = null;
     let deleteModal = null;
     let pendingDeleteConversation = null;
 
@@ -132,24 +135,32 @@
         chatInput.focus();
     }
 
-    // Load conversations from database
-    async function loadConversations() {
+    // Load conversations from database, one page at a time
+    async function loadConversations(append = false) {
         try {
-            const response = await fetch(`/api/conversations/${projectData.id}`);
+            let url = `/api/conversations/${projectData.id}?limit=50`;
+            if (append && conversationsCursor) {
+                url += `&cursor=${encodeURIComponent(conversationsCursor)}`;
+            }
+            const response = await fetch(url);
             if (response.ok) {
-                conversations = await response.json();
+                const page = await response.json();
+                conversations = append ? conversations.concat(page.items) : page.items;
+                conversationsCursor = page.next_cursor;
             }
         } catch (error) {
             console.error('Error loading conversations:', error);
         }
     }
 
-    // Load messages for a conversation
+    // Load the latest page of messages for a conversation
     async function loadConversationMessages(conversationId) {
         try {
-            const response = await fetch(`/api/conversations/${conversationId}/messages`);
+            const response = await fetch(`/api/conversations/${conversationId}/messages?limit=50`);
             if (response.ok) {
-                const messages = await response.json();
+                const page = await response.json();
+                const messages = page.items;
+                messagesCursor = page.next_cursor;
 
                 // Clear current messages
                 chatMessages.innerHTML = '';
@@ -160,6 +171,7 @@
                     addMessage(msg.role, msg.content, false); // false = don't save to DB
                     messageHistory.push({ role: msg.role, content: msg.content });
                 });
+                updateLoadEarlierButton();
 
                 // If no messages, show welcome
                 if (messages.length === 0) {
@@ -172,6 +184,46 @@
         }
     }
 
+    // Show a "Load earlier messages" button above the messages while older pages exist
+    function updateLoadEarlierButton() {
+        const existing = chatMessages.querySelector('.load-earlier-messages');
+        if (existing) existing.remove();
+        if (!messagesCursor) return;
+
+        const button = document.createElement('button');
+        button.className = 'load-earlier-messages';
+        button.textContent = 'Load earlier messages';
+        button.addEventListener('click', loadEarlierMessages);
+        chatMessages.insertBefore(button, chatMessages.firstChild);
+    }
+
+    // Prepend the next older page of messages
+    async function loadEarlierMessages() {
+        if (!messagesCursor || !currentSessionId) return;
+
+        try {
+            const url = `/api/conversations/${currentSessionId}/messages?limit=50&before=${encodeURIComponent(messagesCursor)}`;
+            const response = await fetch(url);
+            if (response.ok) {
+                const page = await response.json();
+                messagesCursor = page.next_cursor;
+
+                // Insert above the first loaded message, keeping the visible position
+                const button = chatMessages.querySelector('.load-earlier-messages');
+                const anchor = button ? button.nextSibling : chatMessages.firstChild;
+                const previousHeight = chatMessages.scrollHeight;
+                page.items.forEach(msg => {
+                    addMessage(msg.role, msg.content, false, anchor);
+                });
+                messageHistory = page.items.map(msg => ({ role: msg.role, content: msg.content })).concat(messageHistory);
+                chatMessages.scrollTop += chatMessages.scrollHeight - previousHeight;
+                updateLoadEarlierButton();
+            }
+        } catch (error) {
+            console.error('Error loading earlier messages:', error);
+        }
+    }
+
     // Create a new conversation
     async function createNewConversation(id, title) {
         try {
@@ -297,6 +349,19 @@
 
             sidebarConversations.appendChild(convItem);
         });
+
+        // More conversations on the server
+        if (conversationsCursor) {
+            const loadMoreBtn = document.createElement('button');
+            loadMoreBtn.className = 'conversation-load-more';
+            loadMoreBtn.textContent = 'Load more';
+            loadMoreBtn.addEventListener('click', async function() {
+                loadMoreBtn.disabled = true;
+                await loadConversations(true);
+                updateSidebar();
+            });
+            sidebarConversations.appendChild(loadMoreBtn);
+        }
     }
 
     // Switch to a different conversation
@@ -391,7 +456,7 @@
         }
 
         // Add user message to UI and save to database
-        addMessage('user', message, true);
+        addMessage('user', message, false); // saved by /api/chat
         messageHistory.push({ role: 'user', content: message });
 
         // Clear input
@@ -402,8 +467,8 @@
         const typingId = addTypingIndicator();
 
         try {
-            // Send to backend
-            const response = await fetch('/api/chat', {
+            // Send to backend; the answer streams in as server-sent events
+            const response = await fetch('/api/chat/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -414,17 +479,47 @@
                     session_id: currentSessionId
                 })
             });
+            if (!response.ok || !response.body) {
+                throw new Error(`Chat request failed (${response.status})`);
+            }
 
-            const data = await response.json();
+            // The assistant message replaces the typing indicator at the first token
+            let contentDiv = null;
+            let streamedText = '';
+            let responseText = null;
+            let scriptJob = null;
+            const showText = (text) => {
+                if (!contentDiv) {
+                    removeTypingIndicator(typingId);
+                    contentDiv = addMessage('assistant', '', false).querySelector('.message-content');
+                }
+                renderMessageContent(contentDiv, text);
+            };
+
+            await readEventStream(response, (event, data) => {
+                if (event === 'token') {
+                    streamedText += data.text;
+                    showText(streamedText);
+                } else if (event === 'done' || event === 'error') {
+                    // Final text (e.g. script output in place of a RUN_SCRIPT command); saved by the server
+                    responseText = data.response || 'No response received';
+                    scriptJob = data.script_output && data.script_output.job_id ? data.script_output : null;
+                    showText(responseText);
+                }
+            });
 
-            // Remove typing indicator
             removeTypingIndicator(typingId);
-
-            // Add assistant response
-            const responseText = data.response || 'No response received';
-            addMessage('assistant', responseText, true);
+            if (responseText === null) {
+                responseText = streamedText || 'No response received';
+                showText(responseText);
+            }
             messageHistory.push({ role: 'assistant', content: responseText });
 
+            // A RUN_SCRIPT reply started a background job: show its output as it runs
+            if (scriptJob) {
+                followScriptJob(scriptJob.job_id, contentDiv, responseText);
+            }
+
             // Update conversation preview
             updateConversationPreview(currentSessionId, message);
 
@@ -470,8 +565,91 @@
         }
     }
 
+    // Read a server-sent event stream, calling onEvent(event, data) for each event
+    async function readEventStream(response, onEvent) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) {
+                break;
+            }
+            buffer += decoder.decode(value, { stream: true });
+
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let event = 'message';
+                let data = '';
+                for (const line of block.split('\n')) {
+                    if (line.startsWith('event:')) {
+                        event = line.slice(6).trim();
+                    } else if (line.startsWith('data:')) {
+                        data += line.slice(5).trim();
+                    }
+                }
+                if (data) {
+                    onEvent(event, JSON.parse(data));
+                }
+            }
+        }
+    }
+
+    // Stream a script job's output into an assistant message until the job finishes
+    async function followScriptJob(jobId, contentDiv, header) {
+        let stdout = '';
+        let stderr = '';
+        let footer = '';
+        const render = () => {
+            let text = `${header}\n\n\`\`\`\n${stdout}\n\`\`\``;
+            if (stderr) {
+                text += `\n\nErrors:\n\`\`\`\n${stderr}\n\`\`\``;
+            }
+            renderMessageContent(contentDiv, text + footer);
+        };
+
+        try {
+            const response = await fetch(`/api/jobs/${jobId}/stream`);
+            if (!response.ok || !response.body) {
+                throw new Error(`Job stream failed (${response.status})`);
+            }
+            await readEventStream(response, (event, data) => {
+                if (event === 'output') {
+                    if (data.stream === 'stderr') {
+                        stderr += data.text;
+                    } else {
+                        stdout += data.text;
+                    }
+                } else if (event === 'done' && data.job) {
+                    footer = `\n\nFinished: ${data.job.status}, exit code ${data.job.returncode}`;
+                    if (data.job.error) {
+                        footer += ` (${data.job.error})`;
+                    }
+                }
+                render();
+            });
+        } catch (error) {
+            console.error('Script job error:', error);
+            footer = '\n\nCould not follow the script output.';
+            render();
+        }
+    }
+
+    // Render message text (markdown if marked is available)
+    function renderMessageContent(contentDiv, content) {
+        if (typeof marked !== 'undefined') {
+            contentDiv.innerHTML = marked.parse(content);
+        } else {
+            contentDiv.textContent = content;
+        }
+    }
+
     // Add message to chat
-    function addMessage(role, content, saveToDb = true) {
+    function addMessage(role, content, saveToDb = true, insertBefore = null) {
         const messageDiv = document.createElement('div');
         messageDiv.className = `chat-message ${role}-message`;
 
@@ -482,19 +660,21 @@
         const contentDiv = document.createElement('div');
         contentDiv.className = 'message-content';
 
-        // Parse markdown if marked is available
-        if (typeof marked !== 'undefined') {
-            contentDiv.innerHTML = marked.parse(content);
-        } else {
-            contentDiv.textContent = content;
-        }
+        renderMessageContent(contentDiv, content);
 
         messageDiv.appendChild(avatarDiv);
         messageDiv.appendChild(contentDiv);
-        chatMessages.appendChild(messageDiv);
+        if (insertBefore) {
+            // Older page being prepended: no scrolling
+            chatMessages.insertBefore(messageDiv, insertBefore);
+        } else {
+            chatMessages.appendChild(messageDiv);
+        }
 
         // Scroll behavior based on role
-        if (role === 'user') {
+        if (insertBefore) {
+            // Caller keeps the scroll position
+        } else if (role === 'user') {
             // For user messages, scroll to bottom
             chatMessages.scrollTop = chatMessages.scrollHeight;
         } else if (role === 'assistant') {
@@ -506,6 +686,8 @@
         if (saveToDb) {
             saveMessage(role, content);
         }
+
+        return messageDiv;
     }
 
     // Add typing indicator
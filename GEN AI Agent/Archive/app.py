@@ -2,18 +2,21 @@
 eDelivery RAG API
 FastAPI application that automatically downloads Milvus DB from GCS on startup
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import os
+import time
 from typing import Optional, List
 import logging
 
 # Import our modules
 from src.query_engine import QueryEngine
 from src.llm_layer import LLMLayer
-from src.milvus_gcs_utils import ensure_milvus_available
+from src.milvus_gcs_utils import ensure_milvus_available, milvus_exists_locally
 from src import config
+from src import metrics
+from src.tracing import get_span_tracer
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -35,6 +38,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+span_tracer = get_span_tracer("excel-rag")
+
 # Global variables for database and LLM
 query_engine: Optional[QueryEngine] = None
 llm_layer: Optional[LLMLayer] = None
@@ -50,6 +55,7 @@ class QueryRequest(BaseModel):
     question: str
     top_k_structure: Optional[int] = 5
     top_k_content: Optional[int] = 10
+    rerank: Optional[bool] = None  # None = RERANK_ENABLED
 
 
 class QueryResponse(BaseModel):
@@ -58,7 +64,7 @@ class QueryResponse(BaseModel):
     answer: str
     model: str
     backend: str
-    token_usage: str
+    token_usage: int
     retrieved_sheets: List[str]
     num_content_results: int
 
@@ -81,6 +87,7 @@ async def startup_event():
     logger.info(f"  Local Path: {DB_PATH}")
 
     try:
+        metrics.record_cache_lookup("milvus_db", milvus_exists_locally(DB_PATH))
         success = ensure_milvus_available(
             local_db_path=DB_PATH,
             bucket_name=GCS_BUCKET,
@@ -161,41 +168,59 @@ async def query_edelivery(request: QueryRequest):
             detail="Service not ready. Database or LLM not initialized."
         )
 
+    start = time.perf_counter()
+    outcome = "error"
     try:
-        logger.info(f"Processing query: {request.question}")
-
-        # Step 1: Retrieve relevant documents
-        results = query_engine.query(
-            query=request.question,
-            top_k_structure=request.top_k_structure,
-            top_k_content=request.top_k_content
-        )
-
-        logger.info(f"Retrieved {len(results['structure_results'])} sheets, {len(results['content_results'])} content items")
-
-        # Step 2: Generate answer with LLM
-        response = llm_layer.generate_answer(
-            context=results["context"],
-            query=request.question
-        )
-
-        # Step 3: Prepare response
-        retrieved_sheets = [s["sheet"] for s in results["structure_results"]]
-
-        return QueryResponse(
-            question=request.question,
-            answer=response["answer"],
-            model=response["model"],
-            backend=response["backend"],
-            token_usage=response["token_usage"],
-            retrieved_sheets=retrieved_sheets,
-            num_content_results=len(results["content_results"])
-        )
+        with span_tracer.start_span("api.query") as request_span:
+            request_span.set_inputs(question=request.question)
+            logger.info(f"Processing query: {request.question}")
+
+            # Step 1: Retrieve relevant documents
+            results = query_engine.query(
+                request.question,
+                top_k_structure=request.top_k_structure,
+                top_k_content=request.top_k_content,
+                rerank=request.rerank,
+                sql_llm=llm_layer
+            )
+            retrieval_outcome = "success" if results["structure_results"] else "empty"
+            metrics.observe_retrieval(results["timings"], llm_layer.backend, retrieval_outcome)
+            metrics.record_cache_lookups(results["cache_lookups"])
+
+            logger.info(f"Retrieved {len(results['structure_results'])} sheets, {len(results['content_results'])} content items")
+
+            # Step 2: Generate answer with LLM
+            llm_start = time.perf_counter()
+            response = llm_layer.generate_answer(
+                context=results["context"],
+                query=request.question
+            )
+            llm_outcome = "error" if response["backend"] == "error" else "success"
+            metrics.observe_stage("llm", time.perf_counter() - llm_start, llm_layer.backend, llm_outcome)
+            metrics.record_tokens(llm_layer.backend, response["model"], response["token_usage"])
+            outcome = llm_outcome if retrieval_outcome == "success" else retrieval_outcome
+            request_span.set_attributes({"outcome": outcome, "backend": llm_layer.backend})
+
+            # Step 3: Prepare response
+            retrieved_sheets = [s["sheet"] for s in results["structure_results"]]
+
+            return QueryResponse(
+                question=request.question,
+                answer=response["answer"],
+                model=response["model"],
+                backend=response["backend"],
+                token_usage=response["token_usage"],
+                retrieved_sheets=retrieved_sheets,
+                num_content_results=len(results["content_results"])
+            )
 
     except Exception as e:
         logger.error(f"Error processing query: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+    finally:
+        metrics.observe_request("query", time.perf_counter() - start, llm_layer.backend, outcome)
+
 
 @app.post("/search")
 async def search_only(request: QueryRequest):
@@ -209,12 +234,18 @@ async def search_only(request: QueryRequest):
             detail="Service not ready. Database not initialized."
         )
 
+    start = time.perf_counter()
+    outcome = "error"
     try:
         results = query_engine.query(
-            query=request.question,
+            request.question,
             top_k_structure=request.top_k_structure,
-            top_k_content=request.top_k_content
+            top_k_content=request.top_k_content,
+            rerank=request.rerank
         )
+        outcome = "success" if results["structure_results"] else "empty"
+        metrics.observe_retrieval(results["timings"], "none", outcome)
+        metrics.record_cache_lookups(results["cache_lookups"])
 
         return {
             "question": request.question,
@@ -227,6 +258,22 @@ async def search_only(request: QueryRequest):
         logger.error(f"Error during search: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+    finally:
+        metrics.observe_request("search", time.perf_counter() - start, "none", outcome)
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """
+    Prometheus scrape endpoint
+
+    Per-stage latency histograms (query_embedding, structure_search,
+    content_search, context_build, llm) labelled by backend and outcome,
+    plus request latency, LLM token counts and cache hit rates.
+    """
+    payload, content_type = metrics.render_metrics()
+    return Response(content=payload, media_type=content_type)
+
 
 if __name__ == "__main__":
     import uvicorn
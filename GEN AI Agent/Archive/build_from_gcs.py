@@ -5,11 +5,14 @@ Reads Excel from GCS bucket, builds Milvus database, and uploads it back to GCS
 """
 import argparse
 import os
+from contextlib import ExitStack
 from pathlib import Path
 from src.structure_db import StructureVectorDB
 from src.content_db import ContentVectorDB
-from src.gcs_utils import read_xlsx_from_gcs
-from src.milvus_gcs_utils import upload_milvus_to_gcs
+from src.gcs_utils import fetch_xlsx_from_gcs
+from src.milvus_gcs_utils import sidecar_paths, upload_milvus_to_gcs
+from src.row_store import row_store_path
+from src.table_store import build_table_store, table_store_path
 from src import config
 
 
@@ -18,7 +21,8 @@ def build_and_upload_milvus_db(
     excel_file_path: str = "edeliverydata/eDelivery_AIeDelivery_Database_V1.xlsx",
     local_db_path: str = config.DB_PATH,
     gcs_db_path: str = "milvus_edelivery.db",
-    drop_existing: bool = True
+    drop_existing: bool = True,
+    cache_dir: str = config.EXCEL_CACHE_DIR
 ):
     """
     Complete pipeline to build Milvus database from GCS Excel and upload back to GCS.
@@ -29,6 +33,7 @@ def build_and_upload_milvus_db(
         local_db_path: Local path to build Milvus database
         gcs_db_path: Path in GCS bucket to store the Milvus database
         drop_existing: Whether to drop existing collections
+        cache_dir: Optional workbook cache directory; unchanged workbooks skip the download
     """
     print("\n" + "="*80)
     print("BUILDING MILVUS DATABASE FROM GCS EXCEL FILE")
@@ -36,74 +41,75 @@ def build_and_upload_milvus_db(
     print(f"Excel Source: gs://{bucket_name}/{excel_file_path}")
     print(f"Local DB Path: {local_db_path}")
     print(f"GCS DB Upload: gs://{bucket_name}/{gcs_db_path}")
+    if cache_dir:
+        print(f"Workbook Cache: {cache_dir}")
     print("="*80)
 
-    # Step 1: Download and read Excel file from GCS
-    print("\n[Step 1/5] Reading Excel file from GCS...")
-    from google.cloud import storage
-    import pandas as pd
-    import io
-    import tempfile
-
-    try:
-        client = storage.Client()
-        bucket = client.bucket(bucket_name)
-        blob = bucket.blob(excel_file_path)
-        file_content = blob.download_as_bytes()
-
-        # Save to temporary file for processing
-        temp_excel_path = Path(tempfile.gettempdir()) / "temp_edelivery.xlsx"
-        with open(temp_excel_path, 'wb') as f:
-            f.write(file_content)
-
-        print(f"✓ Excel file downloaded ({len(file_content):,} bytes)")
-        print(f"  Temporary location: {temp_excel_path}")
-
-    except Exception as e:
-        print(f"✗ Error downloading Excel file from GCS: {e}")
-        return False
+    # Step 1: Stream Excel file from GCS to local disk
+    print("\n[Step 1/5] Fetching Excel file from GCS...")
+    # Temporary downloads are removed when this block exits; cached workbooks are kept
+    with ExitStack() as stack:
+        try:
+            excel_path = stack.enter_context(
+                fetch_xlsx_from_gcs(bucket_name, excel_file_path, cache_dir=cache_dir or None)
+            )
+        except Exception as e:
+            print(f"✗ Error downloading Excel file from GCS: {e}")
+            return False
 
-    # Step 2: Build structure database
-    print("\n[Step 2/5] Building Structure Database...")
-    try:
-        structure_db = StructureVectorDB(local_db_path)
-        structure_db.build_from_excel(str(temp_excel_path), drop_existing=drop_existing)
-        print("✓ Structure database built successfully")
-    except Exception as e:
-        print(f"✗ Error building structure database: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
+        # Step 2: Build structure database
+        print("\n[Step 2/5] Building Structure Database...")
+        try:
+            structure_db = StructureVectorDB(local_db_path)
+            structure_db.build_from_excel(excel_path, drop_existing=drop_existing)
+            print("✓ Structure database built successfully")
+        except Exception as e:
+            print(f"✗ Error building structure database: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
 
-    # Step 3: Build content database
-    print("\n[Step 3/5] Building Content Database...")
-    print("⚠️  This may take several minutes to hours depending on file size!")
-    try:
-        content_db = ContentVectorDB(local_db_path)
-        content_db.build_from_excel(str(temp_excel_path), drop_existing=drop_existing)
-        print("✓ Content database built successfully")
-    except Exception as e:
-        print(f"✗ Error building content database: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
+        # Step 3: Build content database
+        print("\n[Step 3/5] Building Content Database...")
+        print("⚠️  This may take several minutes to hours depending on file size!")
+        try:
+            content_db = ContentVectorDB(local_db_path)
+            content_db.build_from_excel(excel_path, drop_existing=drop_existing)
+            print("✓ Content database built successfully")
+        except Exception as e:
+            print(f"✗ Error building content database: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
 
-    # Step 4: Clean up temporary file
-    print("\n[Step 4/5] Cleaning up temporary files...")
-    try:
-        temp_excel_path.unlink()
-        print(f"✓ Removed temporary file: {temp_excel_path}")
-    except Exception as e:
-        print(f"⚠️  Warning: Could not remove temporary file: {e}")
+        # Step 4: Copy every sheet into the SQLite table store
+        print("\n[Step 4/5] Building Table Store...")
+        try:
+            build_table_store(excel_path, table_store_path(local_db_path))
+            print("✓ Table store built successfully")
+        except Exception as e:
+            print(f"✗ Error building table store: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
 
-    # Step 5: Upload Milvus database to GCS
-    print("\n[Step 5/5] Uploading Milvus database to GCS...")
+    # Step 5: Upload Milvus database, row store and table store to GCS
+    print("\n[Step 5/5] Uploading Milvus database, row store and table store to GCS...")
     try:
         success = upload_milvus_to_gcs(
             local_db_path=local_db_path,
             bucket_name=bucket_name,
             gcs_file_path=gcs_db_path
         )
+        # Row store (slim collections only) and table store go next to the database
+        local_sidecars = {"row store": row_store_path(local_db_path), "table store": table_store_path(local_db_path)}
+        for name, gcs_path in sidecar_paths(gcs_db_path).items():
+            if success and Path(local_sidecars[name]).exists():
+                success = upload_milvus_to_gcs(
+                    local_db_path=local_sidecars[name],
+                    bucket_name=bucket_name,
+                    gcs_file_path=gcs_path
+                )
 
         if success:
             print("\n" + "="*80)
@@ -158,6 +164,11 @@ def main():
         action="store_true",
         help="Keep existing collections (do not drop)"
     )
+    parser.add_argument(
+        "--cache-dir",
+        default=config.EXCEL_CACHE_DIR,
+        help="Directory for content-hash cached workbooks; unchanged workbooks skip the download"
+    )
 
     args = parser.parse_args()
 
@@ -166,7 +177,8 @@ def main():
         excel_file_path=args.excel_path,
         local_db_path=args.local_db,
         gcs_db_path=args.gcs_db_path,
-        drop_existing=not args.keep_existing
+        drop_existing=not args.keep_existing,
+        cache_dir=args.cache_dir
     )
 
     if success:
@@ -11,32 +11,49 @@ from src.query_engine import QueryEngine
 from src.cross_sheet_query import CrossSheetQueryEngine
 from src.llm_layer import LLMLayer
 from src.testing import ExcelRAGTester
+from src.index_benchmark import IndexBenchmark, build_grid, print_report, print_filtered_report, save_report
+from src.onnx_encoder import benchmark_backends, benchmark_passed, print_benchmark
+from src.table_store import build_table_store, table_store_path
 from src import config
 
 
-def build_databases(excel_path: str, db_path: str = config.DB_PATH, drop_existing: bool = False):
+def build_databases(
+    excel_path: str,
+    db_path: str = config.DB_PATH,
+    drop_existing: bool = False,
+    target_recall: float = config.TARGET_RECALL
+):
     """
-    Build both structure and content databases from Excel file
+    Build the structure and content databases and the table store from Excel file
 
     Args:
         excel_path: Path to Excel file
         db_path: Path to Milvus database
         drop_existing: Whether to drop existing collections
+        target_recall: Recall@k to tune ef/nprobe for (0 = keep config EF/NPROBE)
     """
     print("\n" + "=" * 60)
     print("BUILDING VECTOR DATABASES")
     print("=" * 60)
 
     # Build structure database
-    print("\n[1/2] Building Structure Database...")
+    print("\n[1/3] Building Structure Database...")
     structure_db = StructureVectorDB(db_path)
-    structure_db.build_from_excel(excel_path, drop_existing=drop_existing)
+    structure_db.build_from_excel(excel_path, drop_existing=drop_existing, target_recall=target_recall)
 
     # Build content database
-    print("\n[2/2] Building Content Database...")
+    print("\n[2/3] Building Content Database...")
     print("WARNING: This may take several hours for large files!")
     content_db = ContentVectorDB(db_path)
-    content_db.build_from_excel(excel_path, drop_existing=drop_existing)
+    content_db.build_from_excel(excel_path, drop_existing=drop_existing, target_recall=target_recall)
+
+    # Copy every sheet into SQLite for exact aggregate answers
+    print("\n[3/3] Building Table Store...")
+    store_path = table_store_path(db_path)
+    if store_path is None:
+        print("⚠️  No TABLE_STORE_PATH for a Milvus server; skipping the table store")
+    else:
+        build_table_store(excel_path, store_path)
 
     print("\n" + "=" * 60)
     print("DATABASE BUILD COMPLETE!")
@@ -50,7 +67,8 @@ def run_query(
     top_k_structure: int = config.TOP_K_STRUCTURE,
     top_k_content: int = config.TOP_K_CONTENT,
     entity: str = None,
-    cross_sheet: bool = False
+    cross_sheet: bool = False,
+    rerank: bool = None
 ):
     """
     Run a query through the complete RAG pipeline
@@ -63,6 +81,7 @@ def run_query(
         top_k_content: Number of content results
         entity: Optional entity identifier for cross-sheet queries
         cross_sheet: Use enhanced cross-sheet engine
+        rerank: Rerank content rows with the cross-encoder (default: RERANK_ENABLED)
     """
     print("\n" + "=" * 60)
     print("EXCEL-RAG QUERY" + (" (CROSS-SHEET MODE)" if cross_sheet else ""))
@@ -82,7 +101,8 @@ def run_query(
             results = engine.query(query, top_k_structure, top_k_content)
     else:
         engine = QueryEngine(db_path)
-        results = engine.query(query, top_k_structure, top_k_content)
+        llm = LLMLayer(model_name=llm_model)
+        results = engine.query(query, top_k_structure, top_k_content, rerank=rerank, sql_llm=llm)
 
     # Display retrieval results
     print("\n--- RETRIEVED STRUCTURE ---")
@@ -97,14 +117,20 @@ def run_query(
                 preview = content["text"][:80]
                 entity_mark = " [*]" if content.get("entity_match") else ""
                 print(f"  {i}. {preview}...{entity_mark} (score: {content['score']:.4f})")
+    elif results.get("sql"):
+        print(f"(answered by SQL) {results['sql']['sql']}")
+        for row in results["sql"]["rows"][:10]:
+            print(f"  {row}")
     else:
         for i, content in enumerate(results["content_results"], 1):
             preview = content["text"][:100]
-            print(f"{i}. [{content['sheet']}] {preview}... (score: {content['score']:.4f})")
+            rerank_note = f", rerank: {content['rerank_score']:.4f}" if "rerank_score" in content else ""
+            print(f"{i}. [{content['sheet']}] {preview}... (score: {content['score']:.4f}{rerank_note})")
 
     # Generate LLM answer
     print("\n--- GENERATING ANSWER ---")
-    llm = LLMLayer(model_name=llm_model)
+    if cross_sheet:
+        llm = LLMLayer(model_name=llm_model)
     response = llm.generate_answer(results["context"], query)
 
     print(f"\nModel: {response['model']} ({response['backend']})")
@@ -127,6 +153,152 @@ def run_tests(db_path: str = config.DB_PATH, query: str = "digital delivery syst
     tester.run_all_tests(sample_query=query)
 
 
+def run_eval(
+    cases_path: str,
+    db_path: str = config.DB_PATH,
+    top_k_structure: int = config.TOP_K_STRUCTURE,
+    top_k_content: int = config.TOP_K_CONTENT,
+    baseline_path: str = None,
+    output_path: str = None
+) -> bool:
+    """
+    Evaluate retrieval quality and stage latency on labeled cases
+
+    Args:
+        cases_path: Labeled cases file (JSON list or JSONL)
+        db_path: Path to Milvus database
+        top_k_structure: Number of sheets to route to
+        top_k_content: Number of content rows to retrieve
+        baseline_path: Optional report to compare against
+        output_path: Optional path to write the report (reusable as a baseline)
+
+    Returns:
+        True unless quality regressed against the baseline
+    """
+    tester = ExcelRAGTester(db_path)
+    result = tester.test_labeled_retrieval(
+        cases_path,
+        top_k_structure=top_k_structure,
+        top_k_content=top_k_content,
+        baseline_path=baseline_path,
+        output_path=output_path
+    )
+    return result["passed"]
+
+
+def run_benchmark(
+    excel_path: str,
+    output_path: str,
+    index_types: list,
+    m_values: list,
+    ef_construction_values: list,
+    ef_values: list,
+    nlist_values: list,
+    nprobe_values: list,
+    top_k: int = config.TOP_K_CONTENT,
+    num_queries: int = 200,
+    max_rows: int = None,
+    queries_file: str = None,
+    filtered: bool = False,
+    layouts: list = None,
+    sheets_per_query: int = config.TOP_K_STRUCTURE,
+    uri: str = None
+):
+    """
+    Sweep index settings and report recall@k, latency, build time and index size
+
+    With filtered=True, compare sheet-filtered content search across collection
+    layouts instead of sweeping index settings.
+
+    Args:
+        excel_path: Path to Excel file
+        output_path: Where to write the JSON report
+        index_types: Index types to try (e.g., HNSW, IVF_FLAT, FLAT)
+        m_values: HNSW M values
+        ef_construction_values: HNSW efConstruction values
+        ef_values: HNSW ef search values
+        nlist_values: IVF nlist values
+        nprobe_values: IVF nprobe search values
+        top_k: k for recall@k
+        num_queries: Number of sampled queries (ignored with queries_file)
+        max_rows: Optional cap on content rows
+        queries_file: Optional file with one query per line
+        filtered: Run the filtered-search layout benchmark
+        layouts: Layouts to compare (default: dynamic, scalar, partition_key)
+        sheets_per_query: Sheets in each query's filter
+        uri: Milvus server URI for the layout benchmark (default: scratch Milvus Lite files)
+    """
+    queries = None
+    if queries_file:
+        with open(queries_file) as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    grid = build_grid(index_types, m_values, ef_construction_values, ef_values, nlist_values, nprobe_values)
+    benchmark = IndexBenchmark(
+        excel_path,
+        top_k=top_k,
+        num_queries=num_queries,
+        max_rows=max_rows,
+        queries=queries
+    )
+    try:
+        if filtered:
+            report = benchmark.run_filtered(layouts or ["dynamic", "scalar", "partition_key"], sheets_per_query, uri)
+        else:
+            report = benchmark.run(grid)
+    finally:
+        benchmark.cleanup()
+
+    if filtered:
+        print_filtered_report(report)
+    else:
+        print_report(report)
+    save_report(report, output_path)
+
+
+def run_embedding_benchmark(
+    excel_path: str,
+    output_path: str,
+    backends: list,
+    num_texts: int = 500,
+    single_queries: int = 200,
+    queries_file: str = None
+) -> bool:
+    """
+    Compare PyTorch and int8 ONNX embedding backends: encode latency, memory and parity
+
+    Args:
+        excel_path: Excel file whose rows are sampled as texts (ignored with queries_file)
+        output_path: Where to write the JSON report
+        backends: Backends to compare ("torch", "onnx")
+        num_texts: Number of rows sampled from the workbook
+        single_queries: Number of one-text encode calls timed per backend
+        queries_file: Optional file with one text per line
+
+    Returns:
+        True if every backend ran and its embeddings match PyTorch within PARITY_MIN_COSINE
+    """
+    if queries_file:
+        with open(queries_file) as f:
+            texts = [line.strip() for line in f if line.strip()]
+    else:
+        content_df = ContentVectorDB.extract_content_from_excel(excel_path)
+        texts = content_df["text"].sample(n=min(num_texts, len(content_df)), random_state=42).tolist()
+
+    report = benchmark_backends(
+        texts,
+        config.EMBEDDING_MODEL,
+        config.ONNX_MODEL_DIR,
+        backends,
+        config.ONNX_QUANTIZATION,
+        config.ONNX_NUM_THREADS,
+        single_queries
+    )
+    print_benchmark(report)
+    save_report(report, output_path)
+    return benchmark_passed(report)
+
+
 def interactive_mode(db_path: str = config.DB_PATH, llm_model: str = config.LLM_MODEL):
     """
     Interactive query mode
@@ -158,7 +330,7 @@ def interactive_mode(db_path: str = config.DB_PATH, llm_model: str = config.LLM_
 
             # Execute query
             print("\nSearching...")
-            results = engine.query(query)
+            results = engine.query(query, sql_llm=llm)
 
             # Generate answer
             response = llm.generate_answer(results["context"], query)
@@ -201,6 +373,12 @@ def main():
         action="store_true",
         help="Drop existing collections"
     )
+    build_parser.add_argument(
+        "--target-recall",
+        type=float,
+        default=config.TARGET_RECALL,
+        help="Tune ef/nprobe to reach this recall@k after building (0 = skip)"
+    )
 
     # Query command
     query_parser = subparsers.add_parser("query", help="Run a single query")
@@ -239,6 +417,12 @@ def main():
         action="store_true",
         help="Use enhanced cross-sheet query engine"
     )
+    query_parser.add_argument(
+        "--rerank",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Rerank content rows with the cross-encoder (default: RERANK_ENABLED)"
+    )
 
     # Test command
     test_parser = subparsers.add_parser("test", help="Run test suite")
@@ -253,6 +437,158 @@ def main():
         help="Sample query for testing"
     )
 
+    # Eval command
+    eval_parser = subparsers.add_parser(
+        "eval",
+        help="Score retrieval on labeled cases (routing accuracy, recall@k, MRR, stage latency)"
+    )
+    eval_parser.add_argument(
+        "cases",
+        help="Labeled cases file (JSONL or JSON list of {query, expected_sheet, expected_row})"
+    )
+    eval_parser.add_argument(
+        "--db",
+        default=config.DB_PATH,
+        help="Path to Milvus database"
+    )
+    eval_parser.add_argument(
+        "--top-k-structure",
+        type=int,
+        default=config.TOP_K_STRUCTURE,
+        help="Number of sheets to route to"
+    )
+    eval_parser.add_argument(
+        "--top-k-content",
+        type=int,
+        default=config.TOP_K_CONTENT,
+        help="Number of content rows to retrieve"
+    )
+    eval_parser.add_argument(
+        "--baseline",
+        help="Baseline report to compare against (exit code 1 on quality regression)"
+    )
+    eval_parser.add_argument(
+        "--output",
+        help="Write this run's report as JSON (use as a future --baseline)"
+    )
+
+    # Benchmark command
+    bench_parser = subparsers.add_parser(
+        "benchmark",
+        help="Sweep index settings and measure recall@k and latency against exact search"
+    )
+    bench_parser.add_argument(
+        "--excel",
+        default=config.EXCEL_FILE,
+        help="Path to Excel file"
+    )
+    bench_parser.add_argument(
+        "--output",
+        default="index_benchmark.json",
+        help="Path for the JSON report"
+    )
+    bench_parser.add_argument(
+        "--index-types",
+        nargs="+",
+        default=[config.INDEX_TYPE, "IVF_FLAT", "FLAT"],
+        help="Index types to benchmark"
+    )
+    bench_parser.add_argument("--m", nargs="+", type=int, default=[8, 16, 32], help="HNSW M values")
+    bench_parser.add_argument(
+        "--ef-construction", nargs="+", type=int, default=[100, 200], help="HNSW efConstruction values"
+    )
+    bench_parser.add_argument(
+        "--ef", nargs="+", type=int, default=[16, 32, 64, 128, 256], help="HNSW ef search values"
+    )
+    bench_parser.add_argument(
+        "--nlist", nargs="+", type=int, default=[128, 1024, 4096], help="IVF nlist values"
+    )
+    bench_parser.add_argument(
+        "--nprobe", nargs="+", type=int, default=[1, 8, 32, 128, 400], help="IVF nprobe search values"
+    )
+    bench_parser.add_argument(
+        "--top-k",
+        type=int,
+        default=config.TOP_K_CONTENT,
+        help="k for recall@k"
+    )
+    bench_parser.add_argument(
+        "--num-queries",
+        type=int,
+        default=200,
+        help="Number of rows sampled as queries"
+    )
+    bench_parser.add_argument(
+        "--max-rows",
+        type=int,
+        help="Benchmark on a random sample of at most this many content rows"
+    )
+    bench_parser.add_argument(
+        "--queries-file",
+        help="File with one query per line (instead of sampled rows)"
+    )
+    bench_parser.add_argument(
+        "--filtered",
+        action="store_true",
+        help="Compare sheet-filtered content search across collection layouts instead of sweeping indexes"
+    )
+    bench_parser.add_argument(
+        "--layouts",
+        nargs="+",
+        choices=["dynamic", "scalar", "partition_key"],
+        default=["dynamic", "scalar", "partition_key"],
+        help="Content layouts for --filtered (dynamic = original quick-setup layout)"
+    )
+    bench_parser.add_argument(
+        "--sheets-per-query",
+        type=int,
+        default=config.TOP_K_STRUCTURE,
+        help="Sheets in each query's filter for --filtered (default: TOP_K_STRUCTURE)"
+    )
+    bench_parser.add_argument(
+        "--uri",
+        help="Milvus server URI for --filtered (partition keys need a server; default: scratch Milvus Lite)"
+    )
+
+    # Embedding backend benchmark command
+    embed_parser = subparsers.add_parser(
+        "embed-bench",
+        help="Compare PyTorch and int8 ONNX embedding backends (latency, memory, parity)"
+    )
+    embed_parser.add_argument(
+        "--excel",
+        default=config.EXCEL_FILE,
+        help="Excel file whose rows are sampled as texts"
+    )
+    embed_parser.add_argument(
+        "--queries-file",
+        help="File with one text per line (instead of sampled rows)"
+    )
+    embed_parser.add_argument(
+        "--backends",
+        nargs="+",
+        choices=["torch", "onnx"],
+        default=["torch", "onnx"],
+        help="Backends to compare"
+    )
+    embed_parser.add_argument(
+        "--num-texts",
+        type=int,
+        default=500,
+        help="Number of rows sampled from the workbook"
+    )
+    embed_parser.add_argument(
+        "--single-queries",
+        type=int,
+        default=200,
+        help="One-text encode calls timed per backend"
+    )
+    embed_parser.add_argument(
+        "--output",
+        default="embedding_benchmark.json",
+        help="Path for the JSON report"
+    )
+
     # Interactive command
     interactive_parser = subparsers.add_parser("interactive", help="Interactive query mode")
     interactive_parser.add_argument(
@@ -270,7 +606,7 @@ def main():
 
     # Execute command
     if args.command == "build":
-        build_databases(args.excel, args.db, args.drop)
+        build_databases(args.excel, args.db, args.drop, args.target_recall)
     elif args.command == "query":
         run_query(
             args.question,
@@ -279,10 +615,52 @@ def main():
             args.top_k_structure,
             args.top_k_content,
             args.entity if hasattr(args, 'entity') else None,
-            args.cross_sheet if hasattr(args, 'cross_sheet') else False
+            args.cross_sheet if hasattr(args, 'cross_sheet') else False,
+            args.rerank
         )
     elif args.command == "test":
         run_tests(args.db, args.query)
+    elif args.command == "eval":
+        passed = run_eval(
+            args.cases,
+            args.db,
+            args.top_k_structure,
+            args.top_k_content,
+            args.baseline,
+            args.output
+        )
+        if not passed:
+            raise SystemExit(1)
+    elif args.command == "benchmark":
+        run_benchmark(
+            args.excel,
+            args.output,
+            args.index_types,
+            args.m,
+            args.ef_construction,
+            args.ef,
+            args.nlist,
+            args.nprobe,
+            args.top_k,
+            args.num_queries,
+            args.max_rows,
+            args.queries_file,
+            args.filtered,
+            args.layouts,
+            args.sheets_per_query,
+            args.uri
+        )
+    elif args.command == "embed-bench":
+        passed = run_embedding_benchmark(
+            args.excel,
+            args.output,
+            args.backends,
+            args.num_texts,
+            args.single_queries,
+            args.queries_file
+        )
+        if not passed:
+            raise SystemExit(1)
     elif args.command == "interactive":
         interactive_mode(args.db, args.llm)
     else:
@@ -14,14 +14,42 @@ load_dotenv(dotenv_path=env_path)
 # Database settings
 # ============================================================================
 DB_PATH = os.getenv("DB_PATH", "./milvus_edelivery.db")
+# Index server (see src/index_server.py): empty = embed Milvus Lite in this process;
+# unix:/path.sock or host:port = connect to the process that owns DB_PATH (multi-worker serving).
+# Not MILVUS_URI: pymilvus reads that variable itself at import and rejects unix: addresses.
+INDEX_SERVER_URI = os.getenv("INDEX_SERVER_URI", "")
+INDEX_SERVER_POOL_SIZE = int(os.getenv("INDEX_SERVER_POOL_SIZE", "4"))  # Connections per worker process
 STRUCTURE_COLLECTION = "excel_structure_vectors"
 CONTENT_COLLECTION = "excel_vectors"
+SEARCH_PARAMS_COLLECTION = "excel_search_params"  # Tuned ef/nprobe per collection
+SHEET_ROUTER_COLLECTION = "excel_sheet_centroids"  # Per-sheet content centroids for routing
+
+# Content collection layout for sheet-filtered search (see src/content_db.py):
+#   "partition_key" - sheet is the Milvus partition key, so filtered searches only touch
+#                     the candidate sheets' partitions (Milvus server only)
+#   "scalar"        - sheet is a typed VARCHAR field with an INVERTED index (Milvus Lite
+#                     has no partition support)
+#   "auto"          - partition_key on a Milvus server, scalar on Milvus Lite
+CONTENT_SHEET_LAYOUT = os.getenv("CONTENT_SHEET_LAYOUT", "auto")
+CONTENT_NUM_PARTITIONS = int(os.getenv("CONTENT_NUM_PARTITIONS", "64"))  # Partition-key buckets
+MAX_TEXT_LENGTH = 65535  # Milvus VARCHAR limit (bytes) for stored row text
+
+# Where content rows live (see src/row_store.py):
+#   "arrow"  - Milvus holds only the vector, the row id and an integer sheet id; row text and
+#              all original columns are in a memory-mapped Arrow file next to the DB (<db>.rows.arrow)
+#   "milvus" - row text and sheet name are stored in Milvus (pre-row-store layout)
+CONTENT_ROW_STORE = os.getenv("CONTENT_ROW_STORE", "arrow")
+ROW_STORE_PATH = os.getenv("ROW_STORE_PATH", "")  # Empty = next to DB_PATH
+ROW_CONTEXT_CHARS = int(os.getenv("ROW_CONTEXT_CHARS", "400"))  # Per-row cap for full rows in the LLM context
 
 # ============================================================================
 # Embedding settings
 # ============================================================================
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
 EMBEDDING_DIM = 384  # all-MiniLM-L6-v2 produces 384-dim vectors
+# "torch" (sentence-transformers) or "onnx" (int8-quantized, ONNX Runtime + tokenizers, no torch import).
+# Used for building and querying; check parity with `python main.py embed-bench` before switching.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
 
 # ============================================================================
 # Milvus settings
@@ -38,6 +66,11 @@ M = int(os.getenv("M", "16"))  # Number of connections per layer (higher = bette
 EF_CONSTRUCTION = int(os.getenv("EF_CONSTRUCTION", "200"))  # Size of dynamic candidate list for construction
 EF = int(os.getenv("EF", "128"))  # Size of dynamic candidate list for search (increased from 64 for better recall)
 
+# Search auto-tuning (see src/search_tuning.py)
+TARGET_RECALL = float(os.getenv("TARGET_RECALL", "0.95"))  # Recall@k to tune ef/nprobe for at build time (0 = skip)
+TUNING_QUERIES = int(os.getenv("TUNING_QUERIES", "200"))  # Held-out queries used for tuning
+USE_TUNED_SEARCH_PARAMS = os.getenv("USE_TUNED_SEARCH_PARAMS", "true").lower() == "true"  # false = always use EF/NPROBE
+
 # ============================================================================
 # Batch processing
 # ============================================================================
@@ -47,6 +80,7 @@ BATCH_SIZE = int(os.getenv("BATCH_SIZE", "1000"))
 # Excel settings
 # ============================================================================
 EXCEL_FILE = os.getenv("EXCEL_FILE", "eDelivery_AIeDelivery_Database_V1.xlsx")
+EXCEL_CACHE_DIR = os.getenv("EXCEL_CACHE_DIR", "")  # Content-hash cache for GCS workbooks (empty = no cache)
 
 # ============================================================================
 # Query settings
@@ -54,6 +88,36 @@ EXCEL_FILE = os.getenv("EXCEL_FILE", "eDelivery_AIeDelivery_Database_V1.xlsx")
 TOP_K_STRUCTURE = int(os.getenv("TOP_K_STRUCTURE", "5"))  # Top-k sheets/columns (increased from 3)
 TOP_K_CONTENT = int(os.getenv("TOP_K_CONTENT", "10"))     # Top-k rows (increased from 5)
 
+# Sheet routing (see src/sheet_router.py): pick sheets with one matrix-vector product over
+# per-sheet centroids of the content embeddings, computed at build time and held in memory.
+# Falls back to a Milvus search of the structure collection if no centroids were built.
+SHEET_ROUTER_ENABLED = os.getenv("SHEET_ROUTER_ENABLED", "true").lower() == "true"
+SHEET_ROUTER_CENTROIDS = int(os.getenv("SHEET_ROUTER_CENTROIDS", "1"))  # k-means centroids per sheet
+SHEET_ROUTER_USE_HEADERS = os.getenv("SHEET_ROUTER_USE_HEADERS", "true").lower() == "true"  # Also match "Sheet: X, Columns: ..." vectors
+
+# Exact SQL path (see src/table_store.py): the build also copies every sheet into SQLite;
+# aggregate/filter questions are translated to SQL over the routed sheets and only the
+# computed result goes to the LLM. Falls back to vector retrieval if no SQL is produced.
+TABLE_STORE_PATH = os.getenv("TABLE_STORE_PATH", "")  # Empty = next to DB_PATH (<db>.tables.sqlite)
+SQL_ROUTER_ENABLED = os.getenv("SQL_ROUTER_ENABLED", "true").lower() == "true"
+SQL_MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", "50"))  # Result rows passed to the LLM
+SQL_TIMEOUT_S = float(os.getenv("SQL_TIMEOUT_S", "10"))  # Abort generated queries after this long
+
+# Cross-encoder reranking (see src/reranker.py): retrieve RERANK_CANDIDATES rows by
+# vector search, rescore them and send only the best RERANK_TOP_K to the LLM
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_BACKEND = os.getenv("RERANK_BACKEND", "onnx")  # "onnx" (int8-quantized ONNX Runtime) or "torch"
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "30"))  # Rows retrieved for rescoring
+RERANK_TOP_K = int(os.getenv("RERANK_TOP_K", "4"))  # Rows kept after rescoring
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "32"))  # Pairs per cross-encoder forward pass
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "10000"))  # Cached (query, row) scores
+
+# ONNX export for the "onnx" model backend (see src/model_loader.py)
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "./onnx_models")  # Exported/quantized models are saved here
+ONNX_QUANTIZATION = os.getenv("ONNX_QUANTIZATION", "")  # "avx2", "avx512", "avx512_vnni", "arm64" (empty = detect)
+ONNX_NUM_THREADS = int(os.getenv("ONNX_NUM_THREADS", "0"))  # ONNX Runtime intra-op threads (0 = runtime default)
+
 # ============================================================================
 # API Keys (loaded from environment)
 # ============================================================================
@@ -73,6 +137,17 @@ LANGCHAIN_TRACING_V2 = os.getenv("LANGCHAIN_TRACING_V2", "false").lower() == "tr
 LANGCHAIN_PROJECT = os.getenv("LANGCHAIN_PROJECT", "excel-rag-system")
 LANGCHAIN_ENDPOINT = os.getenv("LANGCHAIN_ENDPOINT", "https://api.smith.langchain.com")
 
+# Trace export: runs are sampled and sent in batches from a background thread
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))  # Head sampling: fraction of normal runs kept
+TRACE_SLOW_THRESHOLD_S = float(os.getenv("TRACE_SLOW_THRESHOLD_S", "5.0"))  # Tail sampling: always keep slower runs
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", "1000"))  # Runs buffered before new ones are dropped
+TRACE_BATCH_SIZE = int(os.getenv("TRACE_BATCH_SIZE", "50"))  # Runs per export request
+TRACE_FLUSH_INTERVAL_S = float(os.getenv("TRACE_FLUSH_INTERVAL_S", "2.0"))  # Max wait before a partial batch is sent
+
+# Span tracing (src/tracing.py reads these from the environment directly, since the
+# module is shared with the Zebra project): TRACE_EXPORTERS ("jsonl", "langsmith"),
+# TRACE_JSONL_PATH (default traces.jsonl), TRACE_RELEASE (release label on every span)
+
 # ============================================================================
 # Logging Configuration
 # ============================================================================
@@ -2,12 +2,146 @@
 Content Vector DB Module
 Handles encoding and storage of Excel row-level content
 """
-import os
+import json
+import numpy as np
 import pandas as pd
 from typing import List, Dict, Any, Optional
-from sentence_transformers import SentenceTransformer
-from pymilvus import MilvusClient
+from pymilvus import MilvusClient, DataType
 from . import config
+from .model_loader import load_embedding_model
+from .search_tuning import tune_search_params, resolve_search_params, clear_search_params
+from .sheet_router import compute_sheet_centroids, save_sheet_centroids
+from .row_store import RowStore, is_milvus_lite, row_store_path, write_row_store
+from .index_server import open_milvus_client
+
+# Index types Milvus Lite (local .db files) can build
+LITE_INDEX_TYPES = ("FLAT", "IVF_FLAT", "AUTOINDEX")
+
+# Collection layouts: "dynamic" is the original quick-setup layout (sheet/text stored
+# as dynamic JSON fields), kept so existing databases and benchmarks still work
+SHEET_LAYOUTS = ("partition_key", "scalar", "dynamic")
+
+
+def resolve_sheet_layout(uri: str, layout: str = None) -> str:
+    """
+    Content collection layout to build for a database
+
+    Args:
+        uri: Milvus Lite file path or Milvus server URI
+        layout: "partition_key", "scalar", "dynamic" or "auto" (default: config.CONTENT_SHEET_LAYOUT)
+
+    Returns:
+        Concrete layout name
+    """
+    layout = layout or config.CONTENT_SHEET_LAYOUT
+    if layout == "auto":
+        return "scalar" if is_milvus_lite(uri) else "partition_key"
+    if layout not in SHEET_LAYOUTS:
+        raise ValueError(f"Unknown content layout: {layout} (expected one of {SHEET_LAYOUTS} or 'auto')")
+    if layout == "partition_key" and is_milvus_lite(uri):
+        print("⚠️  Milvus Lite does not support partitions; using the scalar sheet layout")
+        return "scalar"
+    return layout
+
+
+def vector_index_type(lite: bool, index_type: str = config.INDEX_TYPE) -> str:
+    """Index type to build, falling back to AUTOINDEX where Milvus Lite lacks the configured one"""
+    if lite and index_type not in LITE_INDEX_TYPES:
+        return "AUTOINDEX"
+    return index_type
+
+
+def build_content_schema(
+    layout: str,
+    dim: int = config.EMBEDDING_DIM,
+    auto_id: bool = True,
+    slim: bool = False
+):
+    """
+    Schema for the content collection
+
+    Args:
+        layout: "partition_key", "scalar" or "dynamic"
+        dim: Embedding dimension
+        auto_id: Let Milvus assign primary keys
+        slim: Store only the vector, the row id (primary key) and an integer
+            sheet id; text and columns live in the row store
+
+    Returns:
+        CollectionSchema
+    """
+    schema = MilvusClient.create_schema(auto_id=auto_id, enable_dynamic_field=(layout == "dynamic"))
+    schema.add_field("id", DataType.INT64, is_primary=True)
+    schema.add_field("vector", DataType.FLOAT_VECTOR, dim=dim)
+    if layout != "dynamic" and slim:
+        schema.add_field("sheet_id", DataType.INT64, is_partition_key=(layout == "partition_key"))
+    elif layout != "dynamic":
+        schema.add_field(
+            "sheet",
+            DataType.VARCHAR,
+            max_length=256,
+            is_partition_key=(layout == "partition_key")
+        )
+        schema.add_field("text", DataType.VARCHAR, max_length=config.MAX_TEXT_LENGTH)
+    return schema
+
+
+def build_content_index_params(client: MilvusClient, layout: str, index_type: str, slim: bool = False):
+    """
+    Index parameters for the content collection: the vector index, plus an
+    INVERTED index on sheet so sheet filters are resolved without a scan
+
+    Args:
+        client: Milvus client used to prepare the parameters
+        layout: "partition_key", "scalar" or "dynamic"
+        index_type: Vector index type (e.g., "HNSW", "IVF_FLAT", "AUTOINDEX")
+        slim: Index the integer sheet_id field instead of sheet
+
+    Returns:
+        IndexParams ready to pass to create_collection
+    """
+    if index_type == "HNSW":
+        params = {"M": config.M, "efConstruction": config.EF_CONSTRUCTION}
+    elif index_type.startswith("IVF"):
+        params = {"nlist": config.NLIST}
+    else:
+        params = {}
+
+    index_params = client.prepare_index_params()
+    index_params.add_index(
+        field_name="vector",
+        index_type=index_type,
+        metric_type=config.METRIC_TYPE,
+        params=params
+    )
+    if layout != "dynamic":
+        index_params.add_index(field_name="sheet_id" if slim else "sheet", index_type="INVERTED")
+    return index_params
+
+
+def sheet_filter_expression(sheets: List[str]) -> str:
+    """
+    Milvus filter expression matching any of the given sheets
+
+    A single IN term lets Milvus prune partition-key buckets (and use the sheet
+    index) instead of evaluating a chain of OR comparisons.
+    """
+    # JSON string escaping matches Milvus string literal rules (quotes, backslashes)
+    values = ", ".join(json.dumps(sheet, ensure_ascii=False) for sheet in sheets)
+    return f"sheet in [{values}]"
+
+
+def sheet_id_filter_expression(sheet_ids: List[int]) -> str:
+    """Milvus filter expression matching any of the given sheet ids (slim collections)"""
+    return f"sheet_id in [{', '.join(str(i) for i in sheet_ids)}]"
+
+
+def _truncate_utf8(text: str, max_bytes: int) -> str:
+    """Cut text to at most max_bytes of UTF-8 without splitting a character"""
+    encoded = text.encode("utf-8")
+    if len(encoded) <= max_bytes:
+        return text
+    return encoded[:max_bytes].decode("utf-8", errors="ignore")
 
 
 class ContentVectorDB:
@@ -23,14 +157,65 @@ class ContentVectorDB:
             db_path: Path to Milvus Lite database file
         """
         self.db_path = db_path
-        self.client = MilvusClient(db_path)
+        self.client = open_milvus_client(db_path)
         self.collection_name = config.CONTENT_COLLECTION
-        # Uses HF_TOKEN environment variable if available
-        self.model = SentenceTransformer(
-            config.EMBEDDING_MODEL,
-            token=os.environ.get('HF_TOKEN')
+        # Shared with the other DB; EMBEDDING_BACKEND picks PyTorch or int8 ONNX Runtime
+        self.model = load_embedding_model()
+        self._search_params = None
+        self._slim = None
+        self._row_store = None
+
+    def is_slim(self) -> bool:
+        """
+        True if the collection keeps only vectors and row ids (rows in the row store)
+
+        Existing collections are detected from their schema, so databases
+        built before the row store keep working; new collections follow
+        CONTENT_ROW_STORE.
+        """
+        if self._slim is None:
+            if self.client.has_collection(self.collection_name):
+                fields = self.client.describe_collection(self.collection_name)["fields"]
+                self._slim = any(f["name"] == "sheet_id" for f in fields)
+            else:
+                return self._slim_for_layout(resolve_sheet_layout(self.db_path))
+        return self._slim
+
+    def _slim_for_layout(self, layout: str) -> bool:
+        """
+        Whether a new collection with this layout keeps its rows in the row store
+
+        A Milvus server URI has no file to put the row store next to, so
+        without ROW_STORE_PATH its rows stay in Milvus.
+        """
+        return (
+            config.CONTENT_ROW_STORE == "arrow"
+            and layout != "dynamic"
+            and row_store_path(self.db_path) is not None
         )
 
+    def get_row_store(self) -> RowStore:
+        """
+        Memory-mapped row store for this database
+
+        Cached between searches and reopened when the file changes on disk,
+        e.g. after a rebuild or a database reload replaced it.
+
+        Raises:
+            ValueError: If the collection is slim on a Milvus server and ROW_STORE_PATH is not set
+        """
+        row_store = self._row_store
+        if row_store is None or not row_store.is_current():
+            store_path = row_store_path(self.db_path)
+            if store_path is None:
+                raise ValueError(
+                    f"{self.collection_name} keeps its rows in a row store; "
+                    f"set ROW_STORE_PATH to use it with the Milvus server at {self.db_path}"
+                )
+            row_store = RowStore(store_path)
+            self._row_store = row_store
+        return row_store
+
     def create_collection(self, drop_existing: bool = False):
         """
         Create the content vector collection
@@ -40,38 +225,35 @@ class ContentVectorDB:
         """
         if drop_existing and self.client.has_collection(self.collection_name):
             self.client.drop_collection(self.collection_name)
+            clear_search_params(self.client, self.collection_name)
             print(f"Dropped existing collection: {self.collection_name}")
 
         if not self.client.has_collection(self.collection_name):
-            # Use HNSW parameters if HNSW index, otherwise use IVF parameters
-            if config.INDEX_TYPE == "HNSW":
-                index_params = {
-                    "index_type": config.INDEX_TYPE,
-                    "metric_type": config.METRIC_TYPE,
-                    "params": {
-                        "M": config.M,
-                        "efConstruction": config.EF_CONSTRUCTION
-                    }
-                }
-            else:
-                index_params = {
-                    "index_type": config.INDEX_TYPE,
-                    "metric_type": config.METRIC_TYPE,
-                    "params": {"nlist": config.NLIST}
-                }
-
+            layout = resolve_sheet_layout(self.db_path)
+            index_type = vector_index_type(is_milvus_lite(self.db_path))
+            if index_type != config.INDEX_TYPE:
+                print(f"⚠️  Milvus Lite does not support {config.INDEX_TYPE}; building {index_type}")
+
+            slim = self._slim_for_layout(layout)
+            if config.CONTENT_ROW_STORE == "arrow" and layout != "dynamic" and not slim:
+                print("⚠️  No ROW_STORE_PATH for a Milvus server; keeping row text and columns in Milvus")
+            extra = {"num_partitions": config.CONTENT_NUM_PARTITIONS} if layout == "partition_key" else {}
             self.client.create_collection(
                 collection_name=self.collection_name,
-                dimension=config.EMBEDDING_DIM,
-                metric_type=config.METRIC_TYPE,
-                auto_id=True,
-                index_params=index_params
+                schema=build_content_schema(layout, auto_id=not slim, slim=slim),
+                index_params=build_content_index_params(self.client, layout, index_type, slim=slim),
+                **extra
             )
+            self._slim = slim
+            print(f"Using {layout} sheet layout")
+            if slim:
+                print(f"Row text and columns stored in {row_store_path(self.db_path)}")
             print(f"Created collection: {self.collection_name}")
         else:
             print(f"Collection already exists: {self.collection_name}")
 
-    def extract_content_from_excel(self, excel_path: str, max_columns: int = 5) -> pd.DataFrame:
+    @staticmethod
+    def extract_content_from_excel(excel_path: str, max_columns: int = 5) -> pd.DataFrame:
         """
         Extract row-level content from Excel file
 
@@ -80,7 +262,7 @@ class ContentVectorDB:
             max_columns: Maximum number of columns to concatenate (default: 5)
 
         Returns:
-            DataFrame with columns: sheet, text
+            DataFrame with columns: sheet, text (embedded), fields (JSON of every column)
         """
         all_sheets = pd.read_excel(excel_path, sheet_name=None)
 
@@ -98,9 +280,19 @@ class ContentVectorDB:
             # Join with " | " separator for clarity
             combined_text = text_parts[0].str.cat(text_parts[1:], sep=" | ", na_rep="")
 
+            # Full row for the row store (the embedded text only covers the first columns)
+            fields = df.to_json(
+                orient="records",
+                lines=True,
+                date_format="iso",
+                force_ascii=False,
+                default_handler=str
+            ).splitlines()
+
             temp = pd.DataFrame({
                 "sheet": sheet_name,
-                "text": combined_text
+                "text": combined_text,
+                "fields": fields
             })
             dfs.append(temp)
 
@@ -130,19 +322,35 @@ class ContentVectorDB:
 
         print(f"Embeddings generated. Inserting into database...")
 
+        # Slim collections: rows go to the row store, Milvus gets row id + sheet id
+        slim = self.is_slim()
+        if slim:
+            sheet_ids = write_row_store(content_df, row_store_path(self.db_path))
+            self._row_store = None
+
         # Insert in batches
         for i in range(0, total_rows, batch_size):
             batch_end = min(i + batch_size, total_rows)
 
             # Prepare batch data
-            batch_data = [
-                {
-                    "vector": embeddings[j].tolist(),
-                    "sheet": content_df["sheet"].iloc[j],
-                    "text": content_df["text"].iloc[j]
-                }
-                for j in range(i, batch_end)
-            ]
+            if slim:
+                batch_data = [
+                    {
+                        "id": j,
+                        "vector": embeddings[j].tolist(),
+                        "sheet_id": sheet_ids[str(content_df["sheet"].iloc[j])]
+                    }
+                    for j in range(i, batch_end)
+                ]
+            else:
+                batch_data = [
+                    {
+                        "vector": embeddings[j].tolist(),
+                        "sheet": str(content_df["sheet"].iloc[j]),
+                        "text": _truncate_utf8(content_df["text"].iloc[j], config.MAX_TEXT_LENGTH)
+                    }
+                    for j in range(i, batch_end)
+                ]
 
             # Insert batch
             self.client.insert(collection_name=self.collection_name, data=batch_data)
@@ -152,12 +360,41 @@ class ContentVectorDB:
                 print(f"Inserted {batch_end}/{total_rows} rows...")
 
         print(f"Successfully inserted all {total_rows} rows into {self.collection_name}")
+        return embeddings
+
+    def _get_search_params(self) -> Dict[str, Any]:
+        """Search parameters for this collection (loaded once, then cached)"""
+        if self._search_params is None:
+            self._search_params = resolve_search_params(self.client, self.collection_name)
+        return self._search_params
+
+    def tune_search(self, vectors, target_recall: float = config.TARGET_RECALL) -> Dict[str, Any]:
+        """
+        Tune ef/nprobe for a target recall and store the result with the collection
+
+        Args:
+            vectors: Embeddings inserted into the collection
+            target_recall: Recall@k to reach
+
+        Returns:
+            Tuning record (empty if the index type has nothing to tune)
+        """
+        record = tune_search_params(
+            self.client,
+            self.collection_name,
+            vectors,
+            target_recall=target_recall,
+            top_k=config.TOP_K_CONTENT
+        )
+        self._search_params = None
+        return record
 
     def search(
         self,
         query: str,
         top_k: int = config.TOP_K_CONTENT,
-        sheet_filter: Optional[List[str]] = None
+        sheet_filter: Optional[List[str]] = None,
+        query_embedding: Optional[np.ndarray] = None
     ) -> List[Dict[str, Any]]:
         """
         Search for relevant content based on query
@@ -166,77 +403,107 @@ class ContentVectorDB:
             query: User query text
             top_k: Number of top results to return
             sheet_filter: Optional list of sheet names to filter by
+            query_embedding: Optional pre-computed embedding of query, shape (1, dim)
 
         Returns:
             List of search results with sheet, text, and relevance scores
+            (plus row_id and all original columns as "fields" for slim collections)
         """
-        # Encode query
-        query_emb = self.model.encode([query])
+        # Encode query (unless the caller already did)
+        query_emb = query_embedding if query_embedding is not None else self.model.encode([query])
 
-        # Prepare search parameters based on index type
-        if config.INDEX_TYPE == "HNSW":
-            search_params = {
-                "metric_type": config.METRIC_TYPE,
-                "params": {"ef": config.EF}
-            }
-        else:
-            search_params = {
-                "metric_type": config.METRIC_TYPE,
-                "params": {"nprobe": config.NPROBE}
-            }
+        # Tuned ef/nprobe stored with the collection, else config.EF/NPROBE
+        search_params = self._get_search_params()
 
-        # Build filter expression if sheet filter provided
-        filter_expr = None
-        if sheet_filter:
-            # Milvus filter expression for matching sheets
-            sheet_conditions = [f"sheet == '{sheet}'" for sheet in sheet_filter]
-            filter_expr = " or ".join(sheet_conditions)
+        slim = self.is_slim()
+        row_store = self.get_row_store() if slim else None
 
-        # Search
+        # Restrict to the routed sheets (partition-pruned with the partition_key layout)
+        filter_expr = None
+        if sheet_filter and slim:
+            sheet_ids = row_store.sheet_id_list(sheet_filter)
+            if not sheet_ids:
+                return []
+            filter_expr = sheet_id_filter_expression(sheet_ids)
+        elif sheet_filter:
+            filter_expr = sheet_filter_expression(sheet_filter)
+
+        # Search (slim collections return only ids; rows come from the row store)
         results = self.client.search(
             collection_name=self.collection_name,
             data=query_emb.tolist(),
             limit=top_k,
-            output_fields=["sheet", "text"],
+            output_fields=[] if slim else ["sheet", "text"],
             search_params=search_params,
             filter=filter_expr
         )
 
+        hits = [hit for query_hits in results for hit in query_hits]
+        if slim:
+            rows = row_store.fetch([hit["id"] for hit in hits])
+            for hit, row in zip(hits, rows):
+                hit["entity"] = {**row, "row_id": hit["id"]}
+
         # Format results with deduplication
         formatted_results = []
         seen_texts = set()
 
-        for hits in results:
-            for hit in hits:
-                text = hit["entity"]["text"]
-                # Skip near-duplicates (exact match)
-                if text in seen_texts:
-                    continue
-
-                seen_texts.add(text)
-                formatted_results.append({
-                    "sheet": hit["entity"]["sheet"],
-                    "text": text,
-                    "score": hit["distance"]
-                })
+        for hit in hits:
+            text = hit["entity"]["text"]
+            # Skip near-duplicates (exact match)
+            if text in seen_texts:
+                continue
+
+            seen_texts.add(text)
+            result = {
+                "sheet": hit["entity"]["sheet"],
+                "text": text,
+                "score": hit["distance"]
+            }
+            if slim:
+                result["row_id"] = hit["entity"]["row_id"]
+                result["fields"] = hit["entity"]["fields"]
+            formatted_results.append(result)
 
         return formatted_results
 
-    def build_from_excel(self, excel_path: str, drop_existing: bool = False):
+    def build_from_excel(
+        self,
+        excel_path: str,
+        drop_existing: bool = False,
+        target_recall: float = config.TARGET_RECALL
+    ):
         """
         Complete pipeline: extract content from Excel and insert into DB
 
         Args:
             excel_path: Path to Excel file
             drop_existing: If True, recreate the collection
+            target_recall: Tune ef/nprobe for this recall@k after inserting (0 = skip)
         """
         print(f"Building content database from: {excel_path}")
 
+        # Row ids index the row store, which is rewritten on every build
+        if self.client.has_collection(self.collection_name) and not drop_existing and self.is_slim():
+            print("⚠️  Row ids refer to the rebuilt row store; recreating the collection")
+            drop_existing = True
+
+        # Tuning needs every vector in the collection, so only tune fresh builds
+        fresh = drop_existing or not self.client.has_collection(self.collection_name)
+
         # Create collection
         self.create_collection(drop_existing=drop_existing)
 
         # Extract and insert content
         content_df = self.extract_content_from_excel(excel_path)
-        self.insert_content_batched(content_df)
+        embeddings = self.insert_content_batched(content_df)
+
+        if target_recall and fresh and embeddings is not None:
+            self.tune_search(embeddings, target_recall)
+
+        # Per-sheet centroids for the in-memory sheet router
+        if embeddings is not None:
+            centroids, centroid_sheets = compute_sheet_centroids(embeddings, content_df["sheet"].tolist())
+            save_sheet_centroids(self.client, centroids, centroid_sheets)
 
         print("Content database build complete!")
@@ -4,12 +4,156 @@ Handles reading XLSX files from GCS buckets
 """
 from google.cloud import storage
 import pandas as pd
-import io
+import base64
+import hashlib
 import os
-from typing import Optional
+import shutil
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
 
+# Download in 8 MB chunks so the blob never has to sit in memory as one buffer
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
 
-def read_xlsx_from_gcs(bucket_name: str, file_path: str, credentials_path: Optional[str] = None) -> pd.DataFrame:
+# Workbooks smaller than this stay in memory; larger ones spill to disk
+SPOOL_MAX_SIZE = 16 * 1024 * 1024
+
+
+def _get_blob(bucket_name: str, file_path: str, credentials_path: Optional[str] = None) -> storage.Blob:
+    """
+    Look up a blob and load its metadata (size, hashes, generation)
+
+    Args:
+        bucket_name: Name of the GCS bucket
+        file_path: Path to the object within the bucket
+        credentials_path: Optional path to service account JSON key file
+
+    Returns:
+        storage.Blob with metadata populated and chunked downloads enabled
+    """
+    # Set credentials if provided
+    if credentials_path:
+        os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = credentials_path
+
+    client = storage.Client()
+    bucket = client.bucket(bucket_name)
+    blob = bucket.get_blob(file_path)
+    if blob is None:
+        raise FileNotFoundError(f"gs://{bucket_name}/{file_path} does not exist")
+
+    blob.chunk_size = DOWNLOAD_CHUNK_SIZE
+    return blob
+
+
+def blob_content_hash(blob: storage.Blob) -> str:
+    """
+    Get a stable content hash for a blob from its GCS metadata (no download)
+
+    Uses the MD5 hash when GCS provides one. Composite objects only carry a
+    CRC32C, so those fall back to CRC32C plus size.
+
+    Args:
+        blob: Blob with metadata loaded
+
+    Returns:
+        Hex digest identifying the blob content
+    """
+    if blob.md5_hash:
+        return base64.b64decode(blob.md5_hash).hex()
+    key = f"{blob.crc32c}:{blob.size}".encode()
+    return hashlib.sha256(key).hexdigest()
+
+
+def get_gcs_content_hash(bucket_name: str, file_path: str, credentials_path: Optional[str] = None) -> str:
+    """
+    Get the content hash of a GCS object from its metadata, without downloading it
+
+    Args:
+        bucket_name: Name of the GCS bucket
+        file_path: Path to the object within the bucket
+        credentials_path: Optional path to service account JSON key file
+
+    Returns:
+        Hex digest identifying the object content
+    """
+    return blob_content_hash(_get_blob(bucket_name, file_path, credentials_path))
+
+
+def _stream_blob_to_path(blob: storage.Blob, dest_path: Path):
+    """Stream a blob to disk via a temporary file and atomically move it into place"""
+    dest_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=dest_path.parent, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            blob.download_to_file(f)
+        os.replace(tmp_name, dest_path)
+    except Exception:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+
+
+@contextmanager
+def fetch_xlsx_from_gcs(
+    bucket_name: str,
+    file_path: str,
+    cache_dir: Optional[str] = None,
+    credentials_path: Optional[str] = None
+) -> Iterator[str]:
+    """
+    Stream an XLSX file from GCS to local disk and yield its path
+
+    The blob is downloaded in chunks straight to a file, so memory use stays
+    flat regardless of workbook size. With cache_dir set, the file is kept
+    under its content hash and later calls for an unchanged workbook skip
+    the download entirely. Without a cache the file is removed on exit.
+
+    Args:
+        bucket_name: Name of the GCS bucket
+        file_path: Path to the XLSX file within the bucket
+        cache_dir: Optional directory for content-hash cached workbooks
+        credentials_path: Optional path to service account JSON key file
+
+    Yields:
+        Local filesystem path to the workbook
+
+    Example:
+        >>> with fetch_xlsx_from_gcs("my-bucket", "data/spreadsheet.xlsx") as path:
+        ...     structure_db.build_from_excel(path)
+    """
+    blob = _get_blob(bucket_name, file_path, credentials_path)
+    suffix = Path(file_path).suffix or ".xlsx"
+
+    if cache_dir:
+        cached_path = Path(cache_dir) / f"{blob_content_hash(blob)}{suffix}"
+        if cached_path.exists() and cached_path.stat().st_size == blob.size:
+            print(f"✓ Using cached workbook for gs://{bucket_name}/{file_path}")
+            print(f"  Cache: {cached_path}")
+        else:
+            print(f"  Downloading: gs://{bucket_name}/{file_path} -> {cached_path}")
+            _stream_blob_to_path(blob, cached_path)
+            print(f"✓ Workbook downloaded ({blob.size:,} bytes)")
+        yield str(cached_path)
+        return
+
+    temp_dir = tempfile.mkdtemp(prefix="xlsx_")
+    temp_path = Path(temp_dir) / f"workbook{suffix}"
+    try:
+        print(f"  Downloading: gs://{bucket_name}/{file_path} -> {temp_path}")
+        _stream_blob_to_path(blob, temp_path)
+        print(f"✓ Workbook downloaded ({blob.size:,} bytes)")
+        yield str(temp_path)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def read_xlsx_from_gcs(
+    bucket_name: str,
+    file_path: str,
+    credentials_path: Optional[str] = None,
+    cache_dir: Optional[str] = None
+) -> pd.DataFrame:
     """
     Read an XLSX file from Google Cloud Storage bucket
 
@@ -18,6 +162,7 @@ def read_xlsx_from_gcs(bucket_name: str, file_path: str, credentials_path: Optio
         file_path: Path to the XLSX file within the bucket
         credentials_path: Optional path to service account JSON key file
                          If not provided, uses default credentials
+        cache_dir: Optional directory for content-hash cached workbooks
 
     Returns:
         pandas.DataFrame: The data from the XLSX file
@@ -30,22 +175,18 @@ def read_xlsx_from_gcs(bucket_name: str, file_path: str, credentials_path: Optio
         >>> print(df.head())
     """
     try:
-        # Set credentials if provided
-        if credentials_path:
-            os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = credentials_path
-
-        # Initialize GCS client
-        client = storage.Client()
-        bucket = client.bucket(bucket_name)
-        blob = bucket.blob(file_path)
-
-        # Download the blob content into a BytesIO object
-        # This keeps the file in memory, which is fine for smaller files.
-        # For very large files, consider streaming or processing in chunks.
-        file_content = blob.download_as_bytes()
+        if cache_dir:
+            with fetch_xlsx_from_gcs(bucket_name, file_path, cache_dir, credentials_path) as local_path:
+                df = pd.read_excel(local_path)
+        else:
+            blob = _get_blob(bucket_name, file_path, credentials_path)
 
-        # Use pandas to read the XLSX file from the in-memory bytes
-        df = pd.read_excel(io.BytesIO(file_content))
+            # Stream into a spooled file: small workbooks stay in memory,
+            # large ones spill to disk, and no second copy is ever made
+            with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as spool:
+                blob.download_to_file(spool)
+                spool.seek(0)
+                df = pd.read_excel(spool)
 
         print(f"✓ Successfully read XLSX file from gs://{bucket_name}/{file_path}")
         print(f"  Shape: {df.shape[0]} rows × {df.shape[1]} columns")
@@ -58,7 +199,8 @@ def read_xlsx_from_gcs(bucket_name: str, file_path: str, credentials_path: Optio
 
 
 def read_xlsx_from_local_or_gcs(file_path: str, bucket_name: Optional[str] = None,
-                                 credentials_path: Optional[str] = None) -> pd.DataFrame:
+                                 credentials_path: Optional[str] = None,
+                                 cache_dir: Optional[str] = None) -> pd.DataFrame:
     """
     Read an XLSX file from either local filesystem or GCS bucket
 
@@ -66,6 +208,7 @@ def read_xlsx_from_local_or_gcs(file_path: str, bucket_name: Optional[str] = Non
         file_path: Path to the XLSX file (local or GCS path)
         bucket_name: Optional GCS bucket name. If provided, reads from GCS
         credentials_path: Optional path to service account JSON key file
+        cache_dir: Optional directory for content-hash cached workbooks (GCS only)
 
     Returns:
         pandas.DataFrame: The data from the XLSX file
@@ -79,7 +222,7 @@ def read_xlsx_from_local_or_gcs(file_path: str, bucket_name: Optional[str] = Non
     """
     if bucket_name:
         # Read from GCS
-        return read_xlsx_from_gcs(bucket_name, file_path, credentials_path)
+        return read_xlsx_from_gcs(bucket_name, file_path, credentials_path, cache_dir)
     else:
         # Read from local filesystem
         try:
@@ -0,0 +1,570 @@
+"""
+Index Benchmark Module
+Sweeps Milvus index settings and measures recall and latency against exact search
+"""
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from itertools import product
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+from pymilvus import MilvusClient, DataType
+
+from .search_tuning import search_param_name, exact_top_k
+from .structure_db import StructureVectorDB
+from .content_db import (
+    ContentVectorDB,
+    build_content_index_params,
+    build_content_schema,
+    is_milvus_lite,
+    sheet_filter_expression,
+    vector_index_type
+)
+from . import config
+
+
+def build_index_params(client: MilvusClient, index_type: str, build_params: Dict[str, Any]):
+    """
+    Build Milvus index parameters for the vector field
+
+    Args:
+        client: Milvus client used to prepare the parameters
+        index_type: Index type (e.g., "HNSW", "IVF_FLAT", "FLAT")
+        build_params: Index build parameters (e.g., {"M": 16, "efConstruction": 200})
+
+    Returns:
+        IndexParams ready to pass to create_collection/create_index
+    """
+    index_params = client.prepare_index_params()
+    index_params.add_index(
+        field_name="vector",
+        index_type=index_type,
+        metric_type=config.METRIC_TYPE,
+        params=build_params
+    )
+    return index_params
+
+
+def recall_at_k(retrieved: List[List[int]], ground_truth: np.ndarray) -> float:
+    """Mean fraction of the true top-k neighbours found in each retrieved list"""
+    k = ground_truth.shape[1]
+    hits = [
+        len(set(ids[:k]) & set(truth.tolist())) / k
+        for ids, truth in zip(retrieved, ground_truth)
+    ]
+    return float(np.mean(hits)) if hits else 0.0
+
+
+def latency_percentiles(latencies_ms: List[float]) -> Dict[str, float]:
+    """p50/p95/p99 and mean of a list of latencies in milliseconds"""
+    return {
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "mean_ms": float(np.mean(latencies_ms)),
+    }
+
+
+def build_grid(
+    index_types: List[str],
+    m_values: List[int],
+    ef_construction_values: List[int],
+    ef_values: List[int],
+    nlist_values: List[int],
+    nprobe_values: List[int]
+) -> List[Dict[str, Any]]:
+    """
+    Expand per-parameter value lists into a list of index configurations
+
+    Returns:
+        List of {"index_type", "build_params", "search_values"} dictionaries
+    """
+    grid = []
+    for index_type in index_types:
+        if index_type == "HNSW":
+            for m, ef_construction in product(m_values, ef_construction_values):
+                grid.append({
+                    "index_type": index_type,
+                    "build_params": {"M": m, "efConstruction": ef_construction},
+                    "search_values": sorted(ef_values)
+                })
+        elif index_type.startswith("IVF"):
+            for nlist in nlist_values:
+                grid.append({
+                    "index_type": index_type,
+                    "build_params": {"nlist": nlist},
+                    "search_values": sorted(v for v in nprobe_values if v <= nlist)
+                })
+        else:
+            grid.append({"index_type": index_type, "build_params": {}, "search_values": [None]})
+    return grid
+
+
+class IndexBenchmark:
+    """
+    Builds the Archive collections under a grid of index settings and
+    measures build time, index size, recall@k and search latency
+    """
+
+    def __init__(
+        self,
+        excel_path: str,
+        top_k: int = config.TOP_K_CONTENT,
+        num_queries: int = 200,
+        max_rows: Optional[int] = None,
+        queries: Optional[List[str]] = None,
+        seed: int = 42
+    ):
+        """
+        Initialize the benchmark
+
+        Args:
+            excel_path: Path to Excel file to index
+            top_k: k used for recall@k and search limit
+            num_queries: Number of rows sampled as queries (ignored if queries given)
+            max_rows: Optional cap on content rows (random sample) to keep runs short
+            queries: Optional explicit query texts
+            seed: Random seed for row/query sampling
+        """
+        self.excel_path = excel_path
+        self.top_k = top_k
+        self.num_queries = num_queries
+        self.max_rows = max_rows
+        self.queries = queries
+        self.seed = seed
+        self.work_dir = tempfile.mkdtemp(prefix="milvus_bench_")
+
+        scratch_db = os.path.join(self.work_dir, "extract.db")
+        self.structure_db = StructureVectorDB(scratch_db)
+        self.content_db = ContentVectorDB(scratch_db)
+        self.model = self.content_db.model
+        self.datasets: Dict[str, Dict[str, Any]] = {}
+
+    def prepare(self):
+        """
+        Extract and embed the workbook, sample queries and compute exact ground truth
+
+        Sampled query rows are held out of the content collection: a query's
+        own row would otherwise be its exact top-1 neighbour and a guaranteed
+        ANN hit, inflating recall@k by up to 1/k.
+        """
+        print(f"Preparing benchmark data from: {self.excel_path}")
+        rng = random.Random(self.seed)
+
+        content_df = self.content_db.extract_content_from_excel(self.excel_path)
+        if self.max_rows and len(content_df) > self.max_rows:
+            content_df = content_df.sample(n=self.max_rows, random_state=self.seed).reset_index(drop=True)
+        content_texts = content_df["text"].tolist()
+        content_sheets = content_df["sheet"].astype(str).tolist()
+
+        structures = self.structure_db.extract_structure_from_excel(self.excel_path)
+        structure_texts = [s["text"] for s in structures]
+
+        if self.queries:
+            query_texts = list(self.queries)
+            query_sheets = [None] * len(query_texts)
+        else:
+            sample = rng.sample(range(len(content_texts)), min(self.num_queries, len(content_texts) - 1))
+            query_texts = [content_texts[i] for i in sample]
+            query_sheets = [content_sheets[i] for i in sample]
+            held_out = set(sample)
+            content_texts = [text for i, text in enumerate(content_texts) if i not in held_out]
+            content_sheets = [sheet for i, sheet in enumerate(content_sheets) if i not in held_out]
+        print(f"Using {len(query_texts)} queries, k={self.top_k}")
+
+        print("Embedding collections and queries...")
+        query_vectors = self.model.encode(query_texts, batch_size=32, show_progress_bar=True)
+
+        for name, texts in [("content", content_texts), ("structure", structure_texts)]:
+            vectors = self.model.encode(texts, batch_size=32, show_progress_bar=True)
+            self.datasets[name] = {
+                "vectors": np.asarray(vectors, dtype=np.float32),
+                "queries": np.asarray(query_vectors, dtype=np.float32),
+                "ground_truth": exact_top_k(vectors, query_vectors, self.top_k)
+            }
+            print(f"  {name}: {len(texts)} vectors")
+
+        self.datasets["content"]["sheets"] = content_sheets
+        self.datasets["content"]["texts"] = content_texts
+        self.datasets["content"]["query_sheets"] = query_sheets
+
+    def _dir_size(self, path: str) -> int:
+        """Total size in bytes of all files under path"""
+        return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+
+    def _build_collection(self, name: str, index_type: str, build_params: Dict[str, Any]):
+        """
+        Build one collection in a fresh Milvus Lite file
+
+        Returns:
+            (client, collection_name, build_time_seconds, index_size_bytes, db_dir)
+        """
+        vectors = self.datasets[name]["vectors"]
+        db_dir = tempfile.mkdtemp(dir=self.work_dir)
+        client = MilvusClient(os.path.join(db_dir, "bench.db"))
+        collection_name = f"bench_{name}"
+
+        schema = MilvusClient.create_schema(auto_id=False)
+        schema.add_field("id", DataType.INT64, is_primary=True)
+        schema.add_field("vector", DataType.FLOAT_VECTOR, dim=vectors.shape[1])
+        client.create_collection(collection_name=collection_name, schema=schema)
+
+        start = time.perf_counter()
+        for i in range(0, len(vectors), config.BATCH_SIZE):
+            batch = [
+                {"id": j, "vector": vectors[j].tolist()}
+                for j in range(i, min(i + config.BATCH_SIZE, len(vectors)))
+            ]
+            client.insert(collection_name=collection_name, data=batch)
+        # Seal segments so searches go through the index rather than a brute-force scan
+        client.flush(collection_name)
+        client.create_index(collection_name, build_index_params(client, index_type, build_params))
+        client.load_collection(collection_name)
+        build_time = time.perf_counter() - start
+
+        return client, collection_name, build_time, self._dir_size(db_dir), db_dir
+
+    def _search_all(
+        self,
+        client: MilvusClient,
+        collection_name: str,
+        queries: np.ndarray,
+        search_params: Dict[str, Any]
+    ):
+        """Run queries one at a time, returning retrieved ids and per-query latency (ms)"""
+        retrieved, latencies = [], []
+        for query in queries:
+            start = time.perf_counter()
+            results = client.search(
+                collection_name=collection_name,
+                data=[query.tolist()],
+                limit=self.top_k,
+                search_params=search_params
+            )
+            latencies.append((time.perf_counter() - start) * 1000)
+            retrieved.append([hit["id"] for hit in results[0]])
+        return retrieved, latencies
+
+    def run_config(self, name: str, index_config: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Build one index configuration and sweep its search parameter
+
+        Args:
+            name: Dataset name ("content" or "structure")
+            index_config: Entry from build_grid
+
+        Returns:
+            One result row per search parameter value
+        """
+        index_type = index_config["index_type"]
+        build_params = index_config["build_params"]
+        data = self.datasets[name]
+        n_vectors = len(data["vectors"])
+
+        if "nlist" in build_params and build_params["nlist"] > n_vectors:
+            print(f"  Skipping {name} {index_type} {build_params}: nlist exceeds {n_vectors} vectors")
+            return []
+
+        print(f"\n[{name}] {index_type} {build_params}")
+        client, collection_name, build_time, index_size, db_dir = self._build_collection(
+            name, index_type, build_params
+        )
+
+        try:
+            actual_index = client.describe_index(collection_name, "vector")
+        except Exception as e:
+            actual_index = {"error": str(e)}
+
+        param_name = search_param_name(index_type)
+        rows = []
+        try:
+            for value in index_config["search_values"]:
+                params = {}
+                if param_name == "ef":
+                    # Milvus requires ef >= limit
+                    value = max(value, self.top_k)
+                if param_name:
+                    params[param_name] = value
+                search_params = {"metric_type": config.METRIC_TYPE, "params": params}
+
+                retrieved, latencies = self._search_all(client, collection_name, data["queries"], search_params)
+                row = {
+                    "collection": name,
+                    "num_vectors": n_vectors,
+                    "index_type": index_type,
+                    "build_params": build_params,
+                    "actual_index": actual_index,
+                    "search_params": params,
+                    "build_time_s": build_time,
+                    "index_size_bytes": index_size,
+                    f"recall_at_{self.top_k}": recall_at_k(retrieved, data["ground_truth"]),
+                    **latency_percentiles(latencies)
+                }
+                rows.append(row)
+                print(f"  {params or '-'}: recall@{self.top_k}={row[f'recall_at_{self.top_k}']:.4f} "
+                      f"p50={row['p50_ms']:.2f}ms p99={row['p99_ms']:.2f}ms")
+        finally:
+            client.close()
+            shutil.rmtree(db_dir, ignore_errors=True)
+
+        return rows
+
+    def run(self, grid: List[Dict[str, Any]], collections: List[str] = ("content", "structure")) -> Dict[str, Any]:
+        """
+        Run the full sweep
+
+        Args:
+            grid: Index configurations from build_grid
+            collections: Which collections to benchmark
+
+        Returns:
+            Report dictionary with metadata and one row per (config, search param)
+        """
+        if not self.datasets:
+            self.prepare()
+
+        results = []
+        for name in collections:
+            for index_config in grid:
+                try:
+                    results.extend(self.run_config(name, index_config))
+                except Exception as e:
+                    print(f"  ✗ {name} {index_config['index_type']} {index_config['build_params']} failed: {e}")
+                    results.append({
+                        "collection": name,
+                        "index_type": index_config["index_type"],
+                        "build_params": index_config["build_params"],
+                        "error": str(e)
+                    })
+
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "excel_path": self.excel_path,
+            "embedding_model": config.EMBEDDING_MODEL,
+            "metric_type": config.METRIC_TYPE,
+            "top_k": self.top_k,
+            "num_queries": len(next(iter(self.datasets.values()))["queries"]),
+            "results": results
+        }
+
+    # ------------------------------------------------------------------
+    # Sheet-filtered search across content collection layouts
+    # ------------------------------------------------------------------
+
+    def _sheet_filters(self, sheets_per_query: int) -> List[List[str]]:
+        """
+        Sheet filter for each query, as structure routing would produce it
+
+        Sampled-row queries always include their own sheet; the rest are random
+        other sheets, so every filter covers sheets_per_query sheets.
+        """
+        rng = random.Random(self.seed)
+        data = self.datasets["content"]
+        all_sheets = sorted(set(data["sheets"]))
+        filters = []
+        for own_sheet in data["query_sheets"]:
+            chosen = [own_sheet] if own_sheet else []
+            others = [sheet for sheet in all_sheets if sheet not in chosen]
+            chosen += rng.sample(others, min(sheets_per_query - len(chosen), len(others)))
+            filters.append(chosen)
+        return filters
+
+    def _filtered_ground_truth(self, filters: List[List[str]]) -> List[List[int]]:
+        """Exact top-k row ids of each query restricted to its filter sheets"""
+        data = self.datasets["content"]
+        sheets = np.asarray(data["sheets"])
+        truth = []
+        for query, sheet_filter in zip(data["queries"], filters):
+            row_ids = np.flatnonzero(np.isin(sheets, sheet_filter))
+            if len(row_ids) == 0:
+                truth.append([])
+                continue
+            top = exact_top_k(data["vectors"][row_ids], query[None, :], self.top_k)[0]
+            truth.append(row_ids[top].tolist())
+        return truth
+
+    def _build_layout_collection(self, layout: str, uri: str):
+        """
+        Build the content collection under one sheet layout
+
+        Returns:
+            (client, collection_name, build_time_seconds, db_dir)
+        """
+        data = self.datasets["content"]
+        vectors = data["vectors"]
+        db_dir = tempfile.mkdtemp(dir=self.work_dir)
+        client = MilvusClient(uri or os.path.join(db_dir, "bench.db"))
+        collection_name = f"bench_content_{layout}"
+        if client.has_collection(collection_name):
+            client.drop_collection(collection_name)
+
+        index_type = vector_index_type(uri is None or is_milvus_lite(uri))
+        extra = {"num_partitions": config.CONTENT_NUM_PARTITIONS} if layout == "partition_key" else {}
+        start = time.perf_counter()
+        client.create_collection(
+            collection_name=collection_name,
+            schema=build_content_schema(layout, dim=vectors.shape[1], auto_id=False),
+            index_params=build_content_index_params(client, layout, index_type),
+            **extra
+        )
+        for i in range(0, len(vectors), config.BATCH_SIZE):
+            batch = [
+                {"id": j, "vector": vectors[j].tolist(), "sheet": data["sheets"][j], "text": data["texts"][j]}
+                for j in range(i, min(i + config.BATCH_SIZE, len(vectors)))
+            ]
+            client.insert(collection_name=collection_name, data=batch)
+        client.flush(collection_name)
+        build_time = time.perf_counter() - start
+        return client, collection_name, build_time, db_dir
+
+    def run_filtered(
+        self,
+        layouts: List[str] = ("dynamic", "scalar", "partition_key"),
+        sheets_per_query: int = config.TOP_K_STRUCTURE,
+        uri: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Compare sheet-filtered content search latency across collection layouts
+
+        Each layout is built with the configured index type (AUTOINDEX where
+        Milvus Lite lacks it) and searched once per query with that query's
+        sheet filter and once unfiltered. Recall is measured against exact
+        search restricted to the filter sheets.
+
+        Args:
+            layouts: Layouts to compare ("dynamic" is the original quick-setup layout)
+            sheets_per_query: Number of sheets in each filter (structure top-k)
+            uri: Milvus server URI to benchmark on (default: scratch Milvus Lite files)
+
+        Returns:
+            Report dictionary with one row per layout
+        """
+        if not self.datasets:
+            self.prepare()
+
+        data = self.datasets["content"]
+        filters = self._sheet_filters(sheets_per_query)
+        ground_truth = self._filtered_ground_truth(filters)
+        print(f"\nFiltered search: {len(filters)} queries, {sheets_per_query} sheets per filter, "
+              f"{len(set(data['sheets']))} sheets")
+
+        results = []
+        for layout in layouts:
+            print(f"\n[content] layout={layout}")
+            client = db_dir = None
+            try:
+                client, collection_name, build_time, db_dir = self._build_layout_collection(layout, uri)
+                # Warm up (loads segments and indexes)
+                client.search(collection_name=collection_name, data=[data["queries"][0].tolist()], limit=self.top_k)
+
+                filtered, filtered_ms = [], []
+                for query, sheet_filter in zip(data["queries"], filters):
+                    start = time.perf_counter()
+                    hits = client.search(
+                        collection_name=collection_name,
+                        data=[query.tolist()],
+                        limit=self.top_k,
+                        filter=sheet_filter_expression(sheet_filter),
+                        output_fields=["sheet", "text"]
+                    )
+                    filtered_ms.append((time.perf_counter() - start) * 1000)
+                    filtered.append([hit["id"] for hit in hits[0]])
+
+                _, unfiltered_ms = self._search_all(
+                    client, collection_name, data["queries"], {"metric_type": config.METRIC_TYPE, "params": {}}
+                )
+
+                recalls = [
+                    len(set(ids) & set(truth)) / len(truth)
+                    for ids, truth in zip(filtered, ground_truth) if truth
+                ]
+                row = {
+                    "layout": layout,
+                    "num_vectors": len(data["vectors"]),
+                    "build_time_s": build_time,
+                    f"filtered_recall_at_{self.top_k}": float(np.mean(recalls)) if recalls else 0.0,
+                    **latency_percentiles(filtered_ms),
+                    "unfiltered_p50_ms": float(np.percentile(unfiltered_ms, 50)),
+                    "unfiltered_p99_ms": float(np.percentile(unfiltered_ms, 99)),
+                }
+                results.append(row)
+                print(f"  filtered p50={row['p50_ms']:.2f}ms p99={row['p99_ms']:.2f}ms "
+                      f"(unfiltered p50={row['unfiltered_p50_ms']:.2f}ms), "
+                      f"recall@{self.top_k}={row[f'filtered_recall_at_{self.top_k}']:.4f}")
+            except Exception as e:
+                print(f"  ✗ layout {layout} failed: {e}")
+                results.append({"layout": layout, "error": str(e)})
+            finally:
+                if client is not None:
+                    if uri:
+                        client.drop_collection(collection_name)
+                    client.close()
+                if db_dir:
+                    shutil.rmtree(db_dir, ignore_errors=True)
+
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "excel_path": self.excel_path,
+            "embedding_model": config.EMBEDDING_MODEL,
+            "metric_type": config.METRIC_TYPE,
+            "index_type": vector_index_type(uri is None or is_milvus_lite(uri)),
+            "top_k": self.top_k,
+            "num_queries": len(filters),
+            "sheets_per_query": sheets_per_query,
+            "results": results
+        }
+
+    def cleanup(self):
+        """Remove the scratch directory"""
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+def print_report(report: Dict[str, Any]):
+    """Print a benchmark report as a table"""
+    recall_key = f"recall_at_{report['top_k']}"
+    print("\n" + "=" * 100)
+    print(f"INDEX BENCHMARK ({report['num_queries']} queries, k={report['top_k']}, {report['metric_type']})")
+    print("=" * 100)
+    print(f"{'collection':<10} {'index':<9} {'build params':<28} {'search':<14} "
+          f"{'recall':>7} {'p50ms':>7} {'p95ms':>7} {'p99ms':>7} {'build s':>8} {'size MB':>8}")
+    for row in report["results"]:
+        if "error" in row:
+            print(f"{row['collection']:<10} {row['index_type']:<9} {str(row['build_params']):<28} ERROR: {row['error']}")
+            continue
+        print(f"{row['collection']:<10} {row['index_type']:<9} {str(row['build_params']):<28} "
+              f"{str(row['search_params'] or '-'):<14} {row[recall_key]:>7.4f} {row['p50_ms']:>7.2f} "
+              f"{row['p95_ms']:>7.2f} {row['p99_ms']:>7.2f} {row['build_time_s']:>8.2f} "
+              f"{row['index_size_bytes'] / (1024 * 1024):>8.2f}")
+    print("=" * 100)
+
+
+def print_filtered_report(report: Dict[str, Any]):
+    """Print a filtered-search layout report as a table"""
+    recall_key = f"filtered_recall_at_{report['top_k']}"
+    print("\n" + "=" * 100)
+    print(f"FILTERED SEARCH BY LAYOUT ({report['num_queries']} queries, k={report['top_k']}, "
+          f"{report['sheets_per_query']} sheets per filter, {report['index_type']})")
+    print("=" * 100)
+    print(f"{'layout':<15} {'recall':>7} {'p50ms':>7} {'p95ms':>7} {'p99ms':>7} "
+          f"{'unfilt p50':>11} {'unfilt p99':>11} {'build s':>8}")
+    for row in report["results"]:
+        if "error" in row:
+            print(f"{row['layout']:<15} ERROR: {row['error']}")
+            continue
+        print(f"{row['layout']:<15} {row[recall_key]:>7.4f} {row['p50_ms']:>7.2f} {row['p95_ms']:>7.2f} "
+              f"{row['p99_ms']:>7.2f} {row['unfiltered_p50_ms']:>11.2f} {row['unfiltered_p99_ms']:>11.2f} "
+              f"{row['build_time_s']:>8.2f}")
+    print("=" * 100)
+
+
+def save_report(report: Dict[str, Any], output_path: str):
+    """Write a benchmark report as JSON"""
+    with open(output_path, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"Report written to: {output_path}")
@@ -0,0 +1,238 @@
+"""
+Index Server Module
+One process owns the Milvus Lite database and serves it over a local socket;
+web workers share it through a pooled client
+"""
+import itertools
+import os
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from pymilvus import MilvusClient
+
+from . import config
+
+# Seconds to wait for a started server to accept requests
+STARTUP_TIMEOUT_S = 30
+
+
+def default_address(db_path: str = config.DB_PATH) -> str:
+    """
+    Socket the index server for a database listens on
+
+    The socket lives in the temp directory (not next to the database) because
+    Unix socket paths are limited to ~100 bytes and deploy paths contain spaces.
+
+    Args:
+        db_path: Milvus Lite database file
+
+    Returns:
+        URI such as unix:/tmp/milvus_edelivery.sock
+    """
+    return f"unix:{Path(tempfile.gettempdir()) / Path(db_path).with_suffix('.sock').name}"
+
+
+class ClientPool:
+    """
+    Round-robin pool of connections to one Milvus server
+
+    Each pooled MilvusClient has its own connection alias and therefore its
+    own gRPC channel. Attribute access is forwarded to the next client, so
+    the pool is used wherever a MilvusClient is expected and concurrent
+    requests from request threads are spread over the channels.
+
+    Connections are opened lazily per process: a pool inherited across
+    fork() reconnects instead of reusing the parent's channels.
+    """
+
+    def __init__(self, uri: str, size: int = config.INDEX_SERVER_POOL_SIZE):
+        """
+        Initialize the pool
+
+        Args:
+            uri: Server address (unix:/path.sock or host:port)
+            size: Number of connections
+        """
+        self.uri = uri
+        self.size = max(1, size)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._clients: List[MilvusClient] = []
+        self._next = itertools.count()
+
+    def _connect(self) -> List[MilvusClient]:
+        """Pooled clients for the current process"""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._clients = [
+                    MilvusClient(uri=self.uri, alias=f"pool-{os.getpid()}-{i}-{self.uri}")
+                    for i in range(self.size)
+                ]
+                self._pid = os.getpid()
+            return self._clients
+
+    def get(self) -> MilvusClient:
+        """Next client in round-robin order"""
+        clients = self._clients if self._pid == os.getpid() else self._connect()
+        return clients[next(self._next) % len(clients)]
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def close(self):
+        """Close every connection of this process"""
+        with self._lock:
+            if self._pid == os.getpid():
+                for client in self._clients:
+                    client.close()
+            self._clients = []
+            self._pid = None
+
+
+_pools: Dict[str, ClientPool] = {}
+_pools_lock = threading.Lock()
+
+
+def open_milvus_client(db_path: str = config.DB_PATH):
+    """
+    Milvus client for a database
+
+    Args:
+        db_path: Milvus Lite database file (or server URI)
+
+    Returns:
+        The shared ClientPool for INDEX_SERVER_URI when an index server is configured,
+        else a MilvusClient that embeds Milvus Lite in this process
+    """
+    if not config.INDEX_SERVER_URI:
+        return MilvusClient(db_path)
+
+    with _pools_lock:
+        if config.INDEX_SERVER_URI not in _pools:
+            _pools[config.INDEX_SERVER_URI] = ClientPool(config.INDEX_SERVER_URI)
+        return _pools[config.INDEX_SERVER_URI]
+
+
+class IndexServer:
+    """
+    Milvus Lite server process owning one database file
+
+    Only one process may open a Milvus Lite file. Running it here, once, and
+    pointing every worker at its socket (INDEX_SERVER_URI) lets any number of
+    processes search the same index instead of each embedding its own copy.
+    """
+
+    def __init__(self, db_path: str = config.DB_PATH, address: Optional[str] = None):
+        """
+        Initialize the server
+
+        Args:
+            db_path: Milvus Lite database file
+            address: unix:/path.sock or host:port (default: default_address(db_path))
+        """
+        self.db_path = str(Path(db_path).resolve())
+        self.address = address or default_address(db_path)
+        self._server = None
+
+    def start(self, timeout_s: float = STARTUP_TIMEOUT_S):
+        """
+        Start the server and wait until it answers
+
+        Raises:
+            RuntimeError: If the database is held by another process or the server does not come up
+        """
+        from milvus_lite.server import Server
+
+        self._remove_socket()
+
+        self._server = Server(self.db_path, address=self.address)
+        if not self._server.init() or not self._server.start():
+            self._server = None
+            raise RuntimeError(f"Could not start Milvus Lite on {self.db_path} (is it open in another process?)")
+
+        # A plain socket probe, not a MilvusClient: start() runs in the gunicorn
+        # master, and a gRPC channel created there would be inherited by every fork
+        deadline = time.monotonic() + timeout_s
+        while True:
+            try:
+                self._probe()
+                break
+            except OSError as e:
+                if time.monotonic() > deadline:
+                    self.stop()
+                    raise RuntimeError(f"Index server did not answer on {self.address}: {e}")
+                time.sleep(0.2)
+        print(f"✓ Index server listening on {self.address} ({self.db_path})")
+
+    def _probe(self):
+        """
+        Connect to the server's socket and disconnect
+
+        Raises:
+            OSError: If nothing accepts connections on the address yet
+        """
+        if self.address.startswith("unix:"):
+            family, target = socket.AF_UNIX, self.address[len("unix:"):]
+        else:
+            host, port = self.address.split("://")[-1].rsplit(":", 1)
+            family, target = socket.AF_INET, (host, int(port))
+        with socket.socket(family, socket.SOCK_STREAM) as sock:
+            sock.settimeout(1)
+            sock.connect(target)
+
+    def _remove_socket(self):
+        """Delete a Unix socket file left by a previous server"""
+        if self.address.startswith("unix:"):
+            socket_path = self.address[len("unix:"):]
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+
+    def stop(self):
+        """Stop the server process"""
+        if self._server is not None:
+            self._server.stop()
+            self._server = None
+            self._remove_socket()
+            print(f"✓ Index server stopped ({self.address})")
+
+    def serve_forever(self):
+        """Run until SIGINT/SIGTERM"""
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        signal.signal(signal.SIGINT, lambda *_: stop.set())
+        try:
+            while not stop.wait(1):
+                if self._server is None or self._server._p.poll() is not None:
+                    print("✗ Milvus Lite process exited")
+                    break
+        finally:
+            self.stop()
+
+
+def main():
+    """Command-line entry point"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve a Milvus Lite database to other processes over a local socket")
+    parser.add_argument("--db-path", default=config.DB_PATH, help=f"Milvus Lite database (default: {config.DB_PATH})")
+    parser.add_argument("--address", help="unix:/path.sock or host:port (default: socket in the temp directory)")
+    args = parser.parse_args()
+
+    server = IndexServer(args.db_path, args.address)
+    try:
+        server.start()
+    except RuntimeError as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+    print(f"  Clients: INDEX_SERVER_URI={server.address}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,41 @@
 """
 LangSmith Integration Module
 Provides tracing and diagnostic capabilities for Excel-RAG system
+
+Runs are sampled and handed to a background exporter, so tracing never adds
+a network round-trip to the request that produced them.
 """
+import atexit
 import os
+import random
 import time
+import uuid
 from typing import Dict, Any, Optional, List
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from . import config
+from .tracing import BackgroundExporter
+
+
+def should_sample(execution_time: Optional[float] = None, error: bool = False) -> bool:
+    """
+    Decide whether to keep a run
+
+    Tail sampling always keeps failed runs and runs slower than
+    config.TRACE_SLOW_THRESHOLD_S; everything else is head-sampled at
+    config.TRACE_SAMPLE_RATE.
+
+    Args:
+        execution_time: Run duration in seconds, if known
+        error: True if the run failed
+
+    Returns:
+        True if the run should be exported
+    """
+    if error:
+        return True
+    if execution_time is not None and execution_time >= config.TRACE_SLOW_THRESHOLD_S:
+        return True
+    return random.random() < config.TRACE_SAMPLE_RATE
 
 
 class LangSmithTracer:
@@ -19,6 +48,8 @@ class LangSmithTracer:
         """Initialize LangSmith tracer if available"""
         self.enabled = config.is_langsmith_enabled()
         self.client = None
+        self.exporter = None
+        self._batch_ingest = True
 
         if self.enabled:
             try:
@@ -27,7 +58,16 @@ class LangSmithTracer:
                     api_key=config.LANGCHAIN_API_KEY,
                     api_url=config.LANGCHAIN_ENDPOINT
                 )
-                print(f"✓ LangSmith tracing enabled (Project: {config.LANGCHAIN_PROJECT})")
+                self.exporter = BackgroundExporter(
+                    self._send_batch,
+                    max_queue_size=config.TRACE_QUEUE_SIZE,
+                    batch_size=config.TRACE_BATCH_SIZE,
+                    flush_interval=config.TRACE_FLUSH_INTERVAL_S,
+                    name="langsmith-exporter"
+                )
+                atexit.register(self.exporter.flush)
+                print(f"✓ LangSmith tracing enabled (Project: {config.LANGCHAIN_PROJECT}, "
+                      f"sample rate: {config.TRACE_SAMPLE_RATE})")
             except ImportError:
                 print("⚠ LangSmith package not installed. Install with: pip install langsmith")
                 self.enabled = False
@@ -38,6 +78,71 @@ class LangSmithTracer:
             if not config.LANGCHAIN_API_KEY:
                 print("ℹ LangSmith not configured (set LANGCHAIN_API_KEY in .env)")
 
+    def _record_run(
+        self,
+        trace_data: Dict[str, Any],
+        run_type: str,
+        execution_time: Optional[float] = None,
+        error: Optional[str] = None
+    ):
+        """
+        Sample a finished run and queue it for export
+
+        Args:
+            trace_data: name, inputs, outputs, metadata and tags of the run
+            run_type: LangSmith run type (chain, llm, retriever, ...)
+            execution_time: Run duration in seconds
+            error: Error message if the run failed
+        """
+        if not self.enabled or not self.exporter:
+            return
+        if not should_sample(execution_time, error is not None):
+            return
+
+        run_id = str(uuid.uuid4())
+        end_time = datetime.now(timezone.utc)
+        start_time = end_time - timedelta(seconds=execution_time or 0)
+        run = {
+            "id": run_id,
+            "trace_id": run_id,
+            "dotted_order": f"{start_time.strftime('%Y%m%dT%H%M%S%fZ')}{run_id}",
+            "session_name": config.LANGCHAIN_PROJECT,
+            "name": trace_data["name"],
+            "run_type": run_type,
+            "inputs": trace_data.get("inputs", {}),
+            "outputs": trace_data.get("outputs", {}),
+            "extra": {"metadata": trace_data.get("metadata", {})},
+            "tags": trace_data.get("tags", []),
+            "start_time": start_time,
+            "end_time": end_time,
+        }
+        if error is not None:
+            run["error"] = error
+        self.exporter.submit(run)
+
+    def _send_batch(self, runs: List[Dict[str, Any]]):
+        """Exporter sink: one batch request, or one create_run per run on older clients"""
+        if self._batch_ingest and hasattr(self.client, "batch_ingest_runs"):
+            try:
+                self.client.batch_ingest_runs(create=runs)
+                return
+            except Exception as e:
+                print(f"⚠ LangSmith batch ingest failed, falling back to single runs: {e}")
+                self._batch_ingest = False
+
+        for run in runs:
+            run = dict(run)
+            project_name = run.pop("session_name")
+            self.client.create_run(project_name=project_name, **run)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until queued runs are exported (e.g. before a short-lived script exits)"""
+        return self.exporter.flush(timeout) if self.exporter else True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Exporter counters (submitted, exported, dropped, failed, queued)"""
+        return self.exporter.get_stats() if self.exporter else {}
+
     def trace_query(
         self,
         query: str,
@@ -80,12 +185,8 @@ class LangSmithTracer:
                 "tags": ["excel-rag", "query"]
             }
 
-            # Log to LangSmith
-            self.client.create_run(
-                **trace_data,
-                run_type="chain",
-                project_name=config.LANGCHAIN_PROJECT
-            )
+            # Queue for LangSmith
+            self._record_run(trace_data, "chain", execution_time)
 
         except Exception as e:
             print(f"⚠ LangSmith tracing error: {e}")
@@ -125,11 +226,7 @@ class LangSmithTracer:
                 "tags": ["excel-rag", "retrieval", retrieval_type]
             }
 
-            self.client.create_run(
-                **trace_data,
-                run_type="retriever",
-                project_name=config.LANGCHAIN_PROJECT
-            )
+            self._record_run(trace_data, "retriever", execution_time)
 
         except Exception as e:
             print(f"⚠ LangSmith tracing error: {e}")
@@ -140,7 +237,8 @@ class LangSmithTracer:
         response: str,
         model: str,
         token_usage: int,
-        execution_time: float
+        execution_time: float,
+        error: Optional[str] = None
     ):
         """
         Trace an LLM API call
@@ -151,6 +249,7 @@ class LangSmithTracer:
             model: Model name
             token_usage: Number of tokens used
             execution_time: Execution time in seconds
+            error: Error message if the call failed (always kept by sampling)
         """
         if not self.enabled or not self.client:
             return
@@ -171,11 +270,7 @@ class LangSmithTracer:
                 "tags": ["excel-rag", "llm", model]
             }
 
-            self.client.create_run(
-                **trace_data,
-                run_type="llm",
-                project_name=config.LANGCHAIN_PROJECT
-            )
+            self._record_run(trace_data, "llm", execution_time, error=error)
 
         except Exception as e:
             print(f"⚠ LangSmith tracing error: {e}")
@@ -184,15 +279,17 @@ class LangSmithTracer:
         self,
         operation: str,
         error: Exception,
-        context: Dict[str, Any] = None
+        context: Dict[str, Any] = None,
+        execution_time: Optional[float] = None
     ):
         """
-        Log an error to LangSmith
+        Log an error to LangSmith (errors are always kept by sampling)
 
         Args:
             operation: Operation that failed
             error: Exception object
             context: Additional context
+            execution_time: Time until the failure in seconds
         """
         if not self.enabled or not self.client:
             return
@@ -210,11 +307,7 @@ class LangSmithTracer:
                 "tags": ["excel-rag", "error", operation]
             }
 
-            self.client.create_run(
-                **trace_data,
-                run_type="chain",
-                project_name=config.LANGCHAIN_PROJECT
-            )
+            self._record_run(trace_data, "chain", execution_time, error=str(error))
 
         except Exception as e:
             print(f"⚠ LangSmith error logging failed: {e}")
@@ -251,27 +344,28 @@ def trace_function(func):
             result = func(*args, **kwargs)
             execution_time = time.time() - start_time
 
-            # Log successful execution
-            if tracer.client:
-                tracer.client.create_run(
-                    name=f"excel_rag_{func.__name__}",
-                    run_type="chain",
-                    inputs={"args": str(args)[:200], "kwargs": str(kwargs)[:200]},
-                    outputs={"result": str(result)[:200]},
-                    metadata={
+            # Log successful execution (sampled, exported in the background)
+            tracer._record_run(
+                {
+                    "name": f"excel_rag_{func.__name__}",
+                    "inputs": {"args": str(args)[:200], "kwargs": str(kwargs)[:200]},
+                    "outputs": {"result": str(result)[:200]},
+                    "metadata": {
                         "timestamp": datetime.now().isoformat(),
                         "execution_time_seconds": execution_time,
                         "function": func.__name__
                     },
-                    tags=["excel-rag", "function", func.__name__],
-                    project_name=config.LANGCHAIN_PROJECT
-                )
+                    "tags": ["excel-rag", "function", func.__name__]
+                },
+                "chain",
+                execution_time
+            )
 
             return result
 
         except Exception as e:
             execution_time = time.time() - start_time
-            tracer.log_error(func.__name__, e, {"args": str(args)[:200]})
+            tracer.log_error(func.__name__, e, {"args": str(args)[:200]}, execution_time)
             raise
 
     return wrapper
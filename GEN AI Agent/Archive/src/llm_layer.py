@@ -2,10 +2,14 @@
 LLM Integration Layer
 Handles LLM-based answer generation from retrieved context
 """
+import json
 import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, Optional
+from .tracing import get_span_tracer
 from . import config
 
+_span_tracer = get_span_tracer("excel-rag")
+
 # Import tracer (will be None if not enabled)
 try:
     from .langsmith_integration import get_tracer
@@ -100,36 +104,110 @@ class LLMLayer:
 
         # Route to appropriate backend
         try:
-            if self.backend == "ollama":
-                result = self._generate_ollama(full_prompt, system_prompt)
-            elif self.backend == "openai":
-                result = self._generate_openai(full_prompt, system_prompt)
-            elif self.backend == "anthropic":
-                result = self._generate_anthropic(full_prompt, system_prompt)
-            elif self.backend == "mock":
-                result = self._generate_mock(full_prompt, context, query)
-            else:
-                result = self._generate_local(full_prompt)
-
-            # Trace LLM call if enabled
-            if self.enable_tracing and self.tracer:
-                execution_time = time.time() - start_time
-                self.tracer.trace_llm_call(
-                    prompt=full_prompt,
-                    response=result.get("answer", ""),
-                    model=result.get("model", self.model_name),
-                    token_usage=result.get("token_usage", 0),
-                    execution_time=execution_time
-                )
+            with _span_tracer.start_span("llm_generate", kind="llm") as span:
+                span.set_attributes({"backend": self.backend, "model": self.model_name})
+                result = self._generate(full_prompt, system_prompt, context, query)
+
+                span.set_attributes({"token_usage": result.get("token_usage", 0), "prompt_chars": len(full_prompt)})
+                if result.get("backend") == "error":
+                    span.record_error(result.get("answer"))
 
+            self._trace_result(full_prompt, result, start_time)
             return result
 
         except Exception as e:
             # Log error if tracing enabled
             if self.enable_tracing and self.tracer:
-                self.tracer.log_error("llm_generation", e, {"query": query})
+                self.tracer.log_error("llm_generation", e, {"query": query}, time.time() - start_time)
             raise
 
+    def stream_answer(
+        self,
+        context: str,
+        query: str,
+        system_prompt: Optional[str] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Generate answer from context and query, incrementally
+
+        The Ollama, OpenAI and Anthropic backends stream their output; other
+        backends yield their whole answer as a single piece.
+
+        Args:
+            context: Retrieved context from query engine
+            query: User's original question
+            system_prompt: Optional custom system prompt
+
+        Yields:
+            {'text': piece} for each piece of the answer as it is generated, then
+            the result dictionary of generate_answer() ('answer', 'model', 'token_usage', 'backend')
+        """
+        start_time = time.time()
+
+        if system_prompt is None:
+            system_prompt = self._get_default_system_prompt()
+        full_prompt = self._build_prompt(system_prompt, context, query)
+
+        streamers = {
+            "ollama": self._stream_ollama,
+            "openai": self._stream_openai,
+            "anthropic": self._stream_anthropic
+        }
+
+        try:
+            with _span_tracer.start_span("llm_generate", kind="llm") as span:
+                span.set_attributes({"backend": self.backend, "model": self.model_name, "stream": True})
+                result = None
+                if self.backend in streamers:
+                    for event in streamers[self.backend](full_prompt, system_prompt):
+                        if "text" in event:
+                            yield event
+                        else:
+                            result = event
+                else:
+                    result = self._generate(full_prompt, system_prompt, context, query)
+                    if result.get("answer"):
+                        yield {"text": result["answer"]}
+
+                span.set_attributes({"token_usage": result.get("token_usage", 0), "prompt_chars": len(full_prompt)})
+                if result.get("backend") == "error":
+                    span.record_error(result.get("answer"))
+
+            self._trace_result(full_prompt, result, start_time)
+            yield result
+
+        except Exception as e:
+            if self.enable_tracing and self.tracer:
+                self.tracer.log_error("llm_generation", e, {"query": query}, time.time() - start_time)
+            raise
+
+    def _generate(self, full_prompt: str, system_prompt: str, context: str, query: str) -> Dict[str, Any]:
+        """Generate a complete answer on the configured backend"""
+        if self.backend == "ollama":
+            return self._generate_ollama(full_prompt, system_prompt)
+        elif self.backend == "openai":
+            return self._generate_openai(full_prompt, system_prompt)
+        elif self.backend == "anthropic":
+            return self._generate_anthropic(full_prompt, system_prompt)
+        elif self.backend == "mock":
+            return self._generate_mock(full_prompt, context, query)
+        else:
+            return self._generate_local(full_prompt)
+
+    def _trace_result(self, full_prompt: str, result: Dict[str, Any], start_time: float):
+        """Trace LLM call if enabled (nested span export to LangSmith supersedes the flat run)"""
+        if self.enable_tracing and self.tracer and not _span_tracer.exports_to("langsmith"):
+            execution_time = time.time() - start_time
+            self.tracer.trace_llm_call(
+                prompt=full_prompt,
+                response=result.get("answer", ""),
+                model=result.get("model", self.model_name),
+                token_usage=result.get("token_usage", 0),
+                execution_time=execution_time,
+                # Backends report failures as an "error" backend rather than raising
+                error=result.get("answer") if result.get("backend") == "error" else None
+            )
+
     def _get_default_system_prompt(self) -> str:
         """Get default system prompt for Excel analyst"""
         return """You are an expert data analyst with access to an Excel database.
@@ -337,6 +415,201 @@ Answer:"""
                 "backend": "error"
             }
 
+    def _stream_ollama(self, prompt: str, system_prompt: str) -> Iterator[Dict[str, Any]]:
+        """
+        Stream answer from Ollama (newline-delimited JSON from /api/generate)
+
+        Note: Requires Ollama to be running: ollama serve
+        """
+        import requests
+
+        model = config.OLLAMA_MODEL
+        base_url = config.OLLAMA_BASE_URL
+        if not base_url:
+            yield {
+                "answer": "Ollama not configured. Set OLLAMA_BASE_URL in .env file",
+                "model": "ollama",
+                "token_usage": 0,
+                "backend": "error"
+            }
+            return
+
+        full_prompt = f"{system_prompt}\n\n{prompt}"
+        payload = {
+            "model": model,
+            "prompt": full_prompt,
+            "stream": True,
+            "options": {
+                "temperature": self.temperature,
+                "num_predict": self.max_tokens
+            }
+        }
+
+        pieces = []
+        token_count = None
+        try:
+            with requests.post(f"{base_url}/api/generate", json=payload, stream=True, timeout=60) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("response"):
+                        pieces.append(chunk["response"])
+                        yield {"text": chunk["response"]}
+                    if chunk.get("done"):
+                        token_count = chunk.get("prompt_eval_count", 0) + chunk.get("eval_count", 0)
+        except requests.exceptions.ConnectionError:
+            yield {
+                "answer": f"Cannot connect to Ollama at {config.OLLAMA_BASE_URL}. Is Ollama running? (ollama serve)",
+                "model": "ollama",
+                "token_usage": 0,
+                "backend": "error"
+            }
+            return
+        except requests.exceptions.Timeout:
+            yield {
+                "answer": "Ollama request timed out. Try a smaller query or increase timeout.",
+                "model": "ollama",
+                "token_usage": 0,
+                "backend": "error"
+            }
+            return
+        except Exception as e:
+            yield {
+                "answer": f"Error calling Ollama API: {str(e)}",
+                "model": "ollama",
+                "token_usage": 0,
+                "backend": "error"
+            }
+            return
+
+        answer = "".join(pieces)
+        yield {
+            "answer": answer,
+            "model": f"ollama/{model}",
+            # Older Ollama versions don't report token counts; estimate them
+            "token_usage": token_count if token_count is not None else len(answer.split()) + len(full_prompt.split()),
+            "backend": "ollama"
+        }
+
+    def _stream_openai(self, prompt: str, system_prompt: str) -> Iterator[Dict[str, Any]]:
+        """
+        Stream answer from OpenAI API (openai>=1.0.0)
+
+        Note: Requires openai package and API key to be installed
+        """
+        try:
+            from openai import OpenAI
+
+            if not config.OPENAI_API_KEY:
+                yield {
+                    "answer": "OpenAI API key not set. Please set OPENAI_API_KEY in .env file",
+                    "model": self.model_name,
+                    "token_usage": 0,
+                    "backend": "error"
+                }
+                return
+
+            client = OpenAI(api_key=config.OPENAI_API_KEY)
+            stream = client.chat.completions.create(
+                model=self.model_name,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+
+            pieces = []
+            token_usage = 0
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    pieces.append(chunk.choices[0].delta.content)
+                    yield {"text": chunk.choices[0].delta.content}
+                if chunk.usage:
+                    token_usage = chunk.usage.total_tokens
+
+            yield {
+                "answer": "".join(pieces),
+                "model": self.model_name,
+                "token_usage": token_usage,
+                "backend": "openai"
+            }
+
+        except ImportError:
+            yield {
+                "answer": "OpenAI package not installed. Please: pip install openai",
+                "model": self.model_name,
+                "token_usage": 0,
+                "backend": "error"
+            }
+        except Exception as e:
+            yield {
+                "answer": f"Error calling OpenAI API: {str(e)}",
+                "model": self.model_name,
+                "token_usage": 0,
+                "backend": "error"
+            }
+
+    def _stream_anthropic(self, prompt: str, system_prompt: str) -> Iterator[Dict[str, Any]]:
+        """
+        Stream answer from Anthropic Claude API
+
+        Note: Requires anthropic package and API key to be installed
+        """
+        try:
+            import anthropic
+
+            if not config.ANTHROPIC_API_KEY:
+                yield {
+                    "answer": "Anthropic API key not set. Please set ANTHROPIC_API_KEY in .env file",
+                    "model": self.model_name,
+                    "token_usage": 0,
+                    "backend": "error"
+                }
+                return
+
+            client = anthropic.Anthropic(api_key=config.ANTHROPIC_API_KEY)
+
+            with client.messages.stream(
+                model=self.model_name,
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                system=system_prompt,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ]
+            ) as stream:
+                for text in stream.text_stream:
+                    yield {"text": text}
+                message = stream.get_final_message()
+
+            yield {
+                "answer": "".join(block.text for block in message.content if block.type == "text"),
+                "model": self.model_name,
+                "token_usage": message.usage.input_tokens + message.usage.output_tokens,
+                "backend": "anthropic"
+            }
+
+        except ImportError:
+            yield {
+                "answer": "Anthropic package not installed. Please: pip install anthropic",
+                "model": self.model_name,
+                "token_usage": 0,
+                "backend": "error"
+            }
+        except Exception as e:
+            yield {
+                "answer": f"Error calling Anthropic API: {str(e)}",
+                "model": self.model_name,
+                "token_usage": 0,
+                "backend": "error"
+            }
+
     def _generate_local(self, prompt: str) -> Dict[str, Any]:
         """
         Generate answer using local model (placeholder for future implementation)
@@ -0,0 +1,134 @@
+"""
+Metrics Module
+Prometheus histograms and counters for per-stage query latency, LLM tokens and cache hit rates
+"""
+from typing import Dict, Optional
+
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+# Latency buckets (seconds): millisecond vector searches up to multi-second LLM calls
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+# QueryEngine.query timing keys -> stage label
+RETRIEVAL_STAGES = {
+    "embedding_ms": "query_embedding",
+    "structure_search_ms": "structure_search",
+    "sql_generate_ms": "sql_generate",
+    "sql_execute_ms": "sql_execute",
+    "content_search_ms": "content_search",
+    "rerank_ms": "rerank",
+    "context_build_ms": "context_build",
+}
+
+STAGE_LATENCY = Histogram(
+    "edelivery_stage_duration_seconds",
+    "Latency of each query pipeline stage",
+    ["stage", "backend", "outcome"],
+    buckets=LATENCY_BUCKETS
+)
+REQUEST_LATENCY = Histogram(
+    "edelivery_request_duration_seconds",
+    "End-to-end latency of API requests",
+    ["endpoint", "backend", "outcome"],
+    buckets=LATENCY_BUCKETS
+)
+LLM_TOKENS = Counter(
+    "edelivery_llm_tokens_total",
+    "Tokens used by LLM calls",
+    ["backend", "model"]
+)
+LLM_TOKENS_PER_REQUEST = Histogram(
+    "edelivery_llm_tokens_per_request",
+    "Tokens used per LLM call",
+    ["backend"],
+    buckets=TOKEN_BUCKETS
+)
+CACHE_LOOKUPS = Counter(
+    "edelivery_cache_lookups_total",
+    "Cache lookups by cache and result",
+    ["cache", "result"]
+)
+CACHE_HIT_RATIO = Gauge(
+    "edelivery_cache_hit_ratio",
+    "Fraction of lookups served from cache since startup",
+    ["cache"]
+)
+
+# Running hit/total counts per cache (for the hit-ratio gauge)
+_cache_counts: Dict[str, Dict[str, int]] = {}
+
+
+def observe_stage(stage: str, seconds: float, backend: str, outcome: str = "success"):
+    """Record the latency of one pipeline stage"""
+    STAGE_LATENCY.labels(stage=stage, backend=backend, outcome=outcome).observe(seconds)
+
+
+def observe_retrieval(timings: Dict[str, float], backend: str, outcome: str = "success"):
+    """
+    Record retrieval stage latencies from QueryEngine.query
+
+    Args:
+        timings: The "timings" dictionary (milliseconds) returned by QueryEngine.query
+        backend: LLM backend label
+        outcome: "success", "empty" or "error"
+    """
+    for key, stage in RETRIEVAL_STAGES.items():
+        if key in timings:
+            observe_stage(stage, timings[key] / 1000, backend, outcome)
+
+
+def observe_request(endpoint: str, seconds: float, backend: str, outcome: str):
+    """Record the end-to-end latency of an API request"""
+    REQUEST_LATENCY.labels(endpoint=endpoint, backend=backend, outcome=outcome).observe(seconds)
+
+
+def record_tokens(backend: str, model: str, tokens: Optional[int]):
+    """Record token usage of one LLM call"""
+    if not tokens:
+        return
+    LLM_TOKENS.labels(backend=backend, model=model).inc(tokens)
+    LLM_TOKENS_PER_REQUEST.labels(backend=backend).observe(tokens)
+
+
+def record_cache_lookup(cache: str, hit: bool, count: int = 1):
+    """
+    Record cache lookups and update the cache's hit ratio
+
+    Args:
+        cache: Cache name (e.g., "milvus_db")
+        hit: True if the lookups were served from cache
+        count: Number of lookups with this outcome
+    """
+    if count <= 0:
+        return
+    CACHE_LOOKUPS.labels(cache=cache, result="hit" if hit else "miss").inc(count)
+    counts = _cache_counts.setdefault(cache, {"hits": 0, "total": 0})
+    counts["hits"] += count if hit else 0
+    counts["total"] += count
+    CACHE_HIT_RATIO.labels(cache=cache).set(counts["hits"] / counts["total"])
+
+
+def record_cache_lookups(lookups: Dict[str, Dict[str, int]]):
+    """
+    Record the per-cache hit/miss counts of one query
+
+    Args:
+        lookups: The "cache_lookups" dictionary returned by QueryEngine.query
+    """
+    for cache, counts in lookups.items():
+        record_cache_lookup(cache, True, counts.get("hits", 0))
+        record_cache_lookup(cache, False, counts.get("misses", 0))
+
+
+def render_metrics():
+    """
+    Current metrics in Prometheus text exposition format
+
+    Returns:
+        (payload bytes, content type)
+    """
+    return generate_latest(), CONTENT_TYPE_LATEST
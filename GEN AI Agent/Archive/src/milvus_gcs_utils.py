@@ -6,7 +6,7 @@ Follows the same pattern as Zebra ChromaDB GCS utilities
 from google.cloud import storage
 import os
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional
 
 
 def download_milvus_from_gcs(
@@ -174,6 +174,57 @@ def milvus_exists_in_gcs(bucket_name: str, gcs_file_path: str) -> bool:
         return False
 
 
+def sidecar_paths(db_path: str) -> Dict[str, str]:
+    """
+    Files that ship next to a Milvus database (local path or GCS object path)
+
+    Returns:
+        Name -> path for the row store (row text and columns of slim collections)
+        and the table store (SQLite copy for exact aggregate answers)
+    """
+    from .row_store import ROW_STORE_SUFFIX
+    from .table_store import TABLE_STORE_SUFFIX
+
+    return {
+        "row store": str(Path(db_path).with_suffix(ROW_STORE_SUFFIX)),
+        "table store": str(Path(db_path).with_suffix(TABLE_STORE_SUFFIX))
+    }
+
+
+def ensure_sidecars_available(
+    local_db_path: str,
+    bucket_name: str,
+    gcs_file_path: str,
+    force_download: bool = False
+):
+    """
+    Download the files that belong to a Milvus database, if they were uploaded.
+
+    Args:
+        local_db_path: Local Milvus DB path (the files live next to it)
+        bucket_name: GCS bucket name containing Milvus DB
+        gcs_file_path: Milvus DB path in GCS (the files live next to it)
+        force_download: If True, download even if local copies exist
+    """
+    from .row_store import row_store_path
+    from .table_store import table_store_path
+
+    local_paths = {"row store": row_store_path(local_db_path), "table store": table_store_path(local_db_path)}
+    for name, gcs_path in sidecar_paths(gcs_file_path).items():
+        local_path = local_paths[name]
+        if not force_download and Path(local_path).exists():
+            continue
+        try:
+            blob = storage.Client().bucket(bucket_name).blob(gcs_path)
+            if not blob.exists():
+                print(f"⚠️  No {name} in gs://{bucket_name}/{gcs_path}")
+                continue
+        except Exception as e:
+            print(f"⚠️  Could not check {name} in GCS: {e}")
+            continue
+        download_milvus_from_gcs(bucket_name=bucket_name, gcs_file_path=gcs_path, local_db_path=local_path)
+
+
 def ensure_milvus_available(
     local_db_path: str,
     bucket_name: str = "edeliverydata",
@@ -195,6 +246,9 @@ def ensure_milvus_available(
     Returns:
         bool: True if Milvus database is available, False otherwise
     """
+    # Row store and table store ship next to the database: fetch them alongside if present
+    ensure_sidecars_available(local_db_path, bucket_name, gcs_file_path, force_download)
+
     # Check if already exists locally
     if not force_download and milvus_exists_locally(local_db_path):
         print("Using existing local Milvus database")
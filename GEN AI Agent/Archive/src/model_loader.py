@@ -0,0 +1,114 @@
+"""
+Model Loader Module
+Loads sentence-transformers models on PyTorch or on an int8-quantized ONNX Runtime backend
+"""
+import os
+import threading
+from typing import Dict, Tuple
+
+from . import config
+from .onnx_encoder import default_quantization, export_quantized_onnx, load_onnx_encoder, onnx_model_dir
+
+# Embedding models shared by the structure and content DBs, keyed by (model, backend)
+_embedding_models: Dict[Tuple[str, str], object] = {}
+_embedding_lock = threading.Lock()
+
+
+def load_onnx_model(model_cls, model_name: str, quantization: str = "", **kwargs):
+    """
+    Load a sentence-transformers model on ONNX Runtime with int8 dynamic quantization
+
+    The first call exports the model to ONNX, quantizes it and saves both under
+    ONNX_MODEL_DIR; later calls (and restarts) load the quantized file directly.
+
+    Args:
+        model_cls: SentenceTransformer or CrossEncoder
+        model_name: Hugging Face model name or local path
+        quantization: "avx2", "avx512", "avx512_vnni" or "arm64" (default: ONNX_QUANTIZATION or detected)
+        **kwargs: Extra keyword arguments for model_cls
+
+    Returns:
+        Model instance running on ONNX Runtime
+
+    Raises:
+        ImportError: If optimum/onnxruntime are not installed
+    """
+    local_dir = onnx_model_dir(model_name, config.ONNX_MODEL_DIR)
+    file_name = export_quantized_onnx(
+        model_cls,
+        model_name,
+        local_dir,
+        default_quantization(quantization or config.ONNX_QUANTIZATION),
+        **kwargs
+    )
+    return model_cls(local_dir, backend="onnx", model_kwargs={"file_name": file_name}, **kwargs)
+
+
+def load_model(model_cls, model_name: str, backend: str = "torch", **kwargs):
+    """
+    Load a sentence-transformers model on the requested backend
+
+    Args:
+        model_cls: SentenceTransformer or CrossEncoder
+        model_name: Hugging Face model name or local path
+        backend: "torch" or "onnx" (int8-quantized ONNX Runtime)
+        **kwargs: Extra keyword arguments for model_cls
+
+    Returns:
+        Model instance; falls back to PyTorch if the ONNX backend cannot be loaded
+    """
+    # Uses HF_TOKEN environment variable if available
+    kwargs.setdefault("token", os.environ.get("HF_TOKEN"))
+
+    if backend == "onnx":
+        try:
+            return load_onnx_model(model_cls, model_name, **kwargs)
+        except ImportError as e:
+            print(f"⚠️  ONNX backend unavailable ({e}); using PyTorch for {model_name}")
+        except Exception as e:
+            print(f"⚠️  Could not load {model_name} on ONNX Runtime: {e}; using PyTorch")
+    elif backend != "torch":
+        print(f"⚠️  Unknown model backend '{backend}'; using PyTorch for {model_name}")
+
+    return model_cls(model_name, **kwargs)
+
+
+def load_embedding_model(model_name: str = config.EMBEDDING_MODEL, backend: str = config.EMBEDDING_BACKEND):
+    """
+    Embedding model with a SentenceTransformer-style encode(), shared per (model, backend)
+
+    The "onnx" backend runs the int8-quantized export through ONNX Runtime and
+    tokenizers only, so PyTorch is not imported at query time.
+
+    Args:
+        model_name: Embedding model name
+        backend: "torch" or "onnx"
+
+    Returns:
+        SentenceTransformer or OnnxSentenceEncoder
+    """
+    with _embedding_lock:
+        key = (model_name, backend)
+        if key not in _embedding_models:
+            model = None
+            if backend == "onnx":
+                try:
+                    model = load_onnx_encoder(
+                        model_name,
+                        config.ONNX_MODEL_DIR,
+                        config.ONNX_QUANTIZATION,
+                        config.ONNX_NUM_THREADS,
+                        token=os.environ.get("HF_TOKEN")
+                    )
+                    print(f"✓ Embedding model on ONNX Runtime (int8): {model_name}")
+                except ImportError as e:
+                    print(f"⚠️  ONNX backend unavailable ({e}); using PyTorch for {model_name}")
+                except Exception as e:
+                    print(f"⚠️  Could not load {model_name} on ONNX Runtime: {e}; using PyTorch")
+            elif backend != "torch":
+                print(f"⚠️  Unknown embedding backend '{backend}'; using PyTorch for {model_name}")
+            if model is None:
+                from sentence_transformers import SentenceTransformer
+                model = load_model(SentenceTransformer, model_name, "torch")
+            _embedding_models[key] = model
+        return _embedding_models[key]
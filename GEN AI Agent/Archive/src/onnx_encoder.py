@@ -0,0 +1,505 @@
+"""
+ONNX Encoder Module
+Int8-quantized ONNX export of sentence-transformers models and a torch-free encoder for them
+
+This file is self-contained (numpy, onnxruntime and tokenizers at query time;
+sentence-transformers/optimum only for the one-off export). The Zebra printer
+RAG, which embeds with the same MiniLM model, imports it too
+(Zebra Project/src/archive_shared.py).
+
+Usage:
+    encoder = load_onnx_encoder("all-MiniLM-L6-v2", "./onnx_models")
+    embeddings = encoder.encode(["query text"])
+
+Export ahead of time (e.g. in a Docker build), or compare against PyTorch:
+    python onnx_encoder.py export --model all-MiniLM-L6-v2
+    python onnx_encoder.py bench --model all-MiniLM-L6-v2 --texts-file queries.txt
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Minimum cosine similarity to the PyTorch embedding for every text
+PARITY_MIN_COSINE = 0.98
+
+
+def default_quantization(override: str = "") -> str:
+    """ONNX Runtime quantization config for this CPU ("arm64" or "avx2")"""
+    if override:
+        return override
+    return "arm64" if platform.machine().lower() in ("arm64", "aarch64") else "avx2"
+
+
+def onnx_model_dir(model_name: str, model_root: str) -> str:
+    """Local directory holding the exported ONNX files for a model"""
+    return os.path.join(model_root, model_name.replace("/", "__"))
+
+
+def quantized_file_name(quantization: str) -> str:
+    """Path of the quantized model file inside an exported model directory"""
+    return f"onnx/model_qint8_{quantization}.onnx"
+
+
+def export_quantized_onnx(model_cls, model_name: str, model_dir: str, quantization: str, **kwargs) -> str:
+    """
+    Export a model to ONNX with int8 dynamic quantization (skipped if already exported)
+
+    Args:
+        model_cls: sentence-transformers SentenceTransformer or CrossEncoder
+        model_name: Hugging Face model name or local path
+        model_dir: Directory to save the exported model to
+        quantization: "avx2", "avx512", "avx512_vnni" or "arm64"
+        **kwargs: Extra keyword arguments for model_cls (e.g. token)
+
+    Returns:
+        Quantized model file name, relative to model_dir
+
+    Raises:
+        ImportError: If sentence-transformers, optimum or onnxruntime are not installed
+    """
+    file_name = quantized_file_name(quantization)
+    if os.path.exists(os.path.join(model_dir, file_name)):
+        return file_name
+
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    print(f"Exporting {model_name} to ONNX with int8 quantization ({quantization})...")
+    model = model_cls(model_name, backend="onnx", **kwargs)
+    model.save_pretrained(model_dir)
+    export_dynamic_quantized_onnx_model(model, quantization, model_dir)
+    print(f"✓ Saved quantized model to {model_dir}")
+    return file_name
+
+
+def _read_json(path: str) -> Dict[str, Any]:
+    """Read a JSON file, or {} if it does not exist"""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+class OnnxSentenceEncoder:
+    """
+    SentenceTransformer-compatible encode() on ONNX Runtime and tokenizers
+
+    Pooling, normalization and max sequence length are read from the
+    sentence-transformers files saved with the exported model, so outputs
+    match the PyTorch model up to quantization error. PyTorch is never imported.
+    """
+
+    backend = "onnx"
+
+    def __init__(self, model_dir: str, file_name: str, num_threads: int = 0):
+        """
+        Initialize the encoder
+
+        Args:
+            model_dir: Directory written by export_quantized_onnx
+            file_name: ONNX file to run, relative to model_dir
+            num_threads: ONNX Runtime intra-op threads (0 = runtime default)
+        """
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, file_name),
+            options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        output_names = [o.name for o in self.session.get_outputs()]
+        self.output_name = "last_hidden_state" if "last_hidden_state" in output_names else output_names[0]
+
+        modules = _read_json(os.path.join(model_dir, "modules.json")) or []
+        pooling_path = next((m["path"] for m in modules if m["type"].endswith("Pooling")), "1_Pooling")
+        pooling = _read_json(os.path.join(model_dir, pooling_path, "config.json"))
+        if pooling.get("pooling_mode_cls_token"):
+            self.pooling_mode = "cls"
+        elif pooling.get("pooling_mode_max_tokens"):
+            self.pooling_mode = "max"
+        else:
+            self.pooling_mode = "mean"
+        self.normalize = any(m["type"].endswith("Normalize") for m in modules)
+
+        settings = _read_json(os.path.join(model_dir, "sentence_bert_config.json"))
+        self.max_seq_length = settings.get("max_seq_length", 256)
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.max_seq_length)
+        pad_token = _read_json(os.path.join(model_dir, "special_tokens_map.json")).get("pad_token", "[PAD]")
+        if isinstance(pad_token, dict):
+            pad_token = pad_token.get("content", "[PAD]")
+        pad_id = self.tokenizer.token_to_id(pad_token)
+        self.tokenizer.enable_padding(pad_id=pad_id if pad_id is not None else 0, pad_token=pad_token)
+
+    def _pool(self, token_embeddings: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        """Pool token embeddings (batch, seq, dim) into sentence embeddings (batch, dim)"""
+        if self.pooling_mode == "cls":
+            return token_embeddings[:, 0]
+        mask = attention_mask[:, :, None].astype(np.float32)
+        if self.pooling_mode == "max":
+            return np.where(mask > 0, token_embeddings, -1e9).max(axis=1)
+        return (token_embeddings * mask).sum(axis=1) / mask.sum(axis=1).clip(min=1e-9)
+
+    def encode(self, sentences, batch_size: int = 32, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        """
+        Encode sentences
+
+        Args:
+            sentences: A string or list of strings
+            batch_size: Sentences per forward pass (sorted by length to limit padding)
+            show_progress_bar: Accepted for SentenceTransformer compatibility (ignored)
+
+        Returns:
+            float32 array of shape (n, dim), or (dim,) for a single string
+        """
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+        if len(sentences) == 0:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        order = np.argsort([-len(s) for s in sentences], kind="stable")
+        embeddings: List[Optional[np.ndarray]] = [None] * len(sentences)
+
+        for start in range(0, len(sentences), batch_size):
+            batch_ids = order[start:start + batch_size]
+            encodings = self.tokenizer.encode_batch([sentences[i] for i in batch_ids])
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": attention_mask
+            }
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+            token_embeddings = self.session.run([self.output_name], feeds)[0]
+            pooled = self._pool(token_embeddings, attention_mask)
+            if self.normalize or kwargs.get("normalize_embeddings"):
+                pooled = pooled / np.linalg.norm(pooled, axis=1, keepdims=True).clip(min=1e-12)
+
+            for row, i in enumerate(batch_ids):
+                embeddings[i] = pooled[row]
+
+        result = np.stack(embeddings).astype(np.float32)
+        return result[0] if single else result
+
+
+def load_onnx_encoder(
+    model_name: str,
+    model_root: str = "./onnx_models",
+    quantization: str = "",
+    num_threads: int = 0,
+    token: Optional[str] = None
+) -> OnnxSentenceEncoder:
+    """
+    Int8-quantized ONNX encoder for a sentence-transformers model, exporting it on first use
+
+    Args:
+        model_name: Hugging Face model name or local path
+        model_root: Directory holding exported models
+        quantization: Quantization config (default: detected from the CPU)
+        num_threads: ONNX Runtime intra-op threads (0 = runtime default)
+        token: Hugging Face token for the export download
+
+    Returns:
+        OnnxSentenceEncoder
+
+    Raises:
+        ImportError: If onnxruntime/tokenizers (or, for the export, optimum) are missing
+    """
+    model_dir = onnx_model_dir(model_name, model_root)
+    file_name = quantized_file_name(default_quantization(quantization))
+    if not os.path.exists(os.path.join(model_dir, file_name)):
+        from sentence_transformers import SentenceTransformer
+        export_quantized_onnx(SentenceTransformer, model_name, model_dir, default_quantization(quantization), token=token)
+    return OnnxSentenceEncoder(model_dir, file_name, num_threads)
+
+
+# ============================================================================
+# Parity check and benchmark
+# ============================================================================
+
+def embedding_parity(reference: np.ndarray, candidate: np.ndarray, k: int = 10) -> Dict[str, float]:
+    """
+    Compare embeddings of the same texts from two backends
+
+    Args:
+        reference: Reference embeddings (PyTorch), shape (n, dim)
+        candidate: Embeddings to check, shape (n, dim)
+        k: Neighbourhood size for the overlap check
+
+    Returns:
+        mean/min/p1 cosine between matching rows, the mean overlap of each
+        text's k nearest neighbours under both backends, and parity_ok
+    """
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True).clip(min=1e-12)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True).clip(min=1e-12)
+    cosine = (reference * candidate).sum(axis=1)
+
+    k = min(k, len(reference) - 1)
+    overlap = 1.0
+    if k > 0:
+        ref_neighbours = np.argsort(-(reference @ reference.T), axis=1)[:, 1:k + 1]
+        cand_neighbours = np.argsort(-(candidate @ candidate.T), axis=1)[:, 1:k + 1]
+        overlap = float(np.mean([
+            len(set(a) & set(b)) / k for a, b in zip(ref_neighbours.tolist(), cand_neighbours.tolist())
+        ]))
+
+    return {
+        "mean_cosine": float(cosine.mean()),
+        "min_cosine": float(cosine.min()),
+        "p01_cosine": float(np.percentile(cosine, 1)),
+        f"neighbour_overlap_at_{k}": overlap,
+        "parity_ok": bool(cosine.min() >= PARITY_MIN_COSINE)
+    }
+
+
+def _memory_mb() -> Dict[str, float]:
+    """Process RSS/peak RSS and container (cgroup) memory in MB, where available"""
+    memory = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    key = "rss_mb" if line.startswith("VmRSS") else "peak_rss_mb"
+                    memory[key] = int(line.split()[1]) / 1024
+    except OSError:
+        import resource
+        # ru_maxrss is KB on Linux, bytes on macOS
+        scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+        memory["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    for path in ("/sys/fs/cgroup/memory.current", "/sys/fs/cgroup/memory/memory.usage_in_bytes"):
+        try:
+            with open(path) as f:
+                memory["container_mb"] = int(f.read().strip()) / (1024 * 1024)
+            break
+        except (OSError, ValueError):
+            continue
+    return memory
+
+
+def _run_worker(options: Dict[str, Any]):
+    """Benchmark one backend in this (fresh) process and print the result as JSON"""
+    with open(options["texts_path"]) as f:
+        texts = json.load(f)
+
+    baseline_memory = _memory_mb()
+    start = time.perf_counter()
+    if options["backend"] == "onnx":
+        model = load_onnx_encoder(
+            options["model_name"],
+            options["model_root"],
+            options["quantization"],
+            options["num_threads"],
+            token=os.environ.get("HF_TOKEN")
+        )
+    else:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(options["model_name"], token=os.environ.get("HF_TOKEN"))
+    load_s = time.perf_counter() - start
+    loaded_memory = _memory_mb()
+
+    for text in texts[:3]:
+        model.encode([text])
+
+    latencies = []
+    for text in texts[:options["single_queries"]]:
+        start = time.perf_counter()
+        model.encode([text])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    embeddings = model.encode(texts, batch_size=32, show_progress_bar=False)
+    batch_s = time.perf_counter() - start
+    np.save(options["embeddings_path"], np.asarray(embeddings, dtype=np.float32))
+
+    result = {
+        "backend": options["backend"],
+        "load_s": load_s,
+        "encode_p50_ms": float(np.percentile(latencies, 50)),
+        "encode_p95_ms": float(np.percentile(latencies, 95)),
+        "encode_p99_ms": float(np.percentile(latencies, 99)),
+        "batch_texts_per_s": len(texts) / batch_s if batch_s else 0.0,
+        "memory_before_load": baseline_memory,
+        "memory_after_load": loaded_memory,
+        "memory_after_encode": _memory_mb()
+    }
+    print("RESULT " + json.dumps(result))
+
+
+def benchmark_backends(
+    texts: List[str],
+    model_name: str,
+    model_root: str = "./onnx_models",
+    backends: List[str] = ("torch", "onnx"),
+    quantization: str = "",
+    num_threads: int = 0,
+    single_queries: int = 200
+) -> Dict[str, Any]:
+    """
+    Compare encode latency, memory and output parity of embedding backends
+
+    Each backend runs in its own Python process so load time includes the
+    runtime import and memory figures are not shared between backends.
+
+    Args:
+        texts: Texts to encode (single-query latency uses the first single_queries)
+        model_name: Model to benchmark
+        model_root: Directory holding exported ONNX models
+        backends: Backends to compare ("torch", "onnx")
+        quantization: ONNX quantization config (default: detected)
+        num_threads: ONNX Runtime intra-op threads (0 = runtime default)
+        single_queries: Number of one-text encode calls timed
+
+    Returns:
+        Report with one row per backend and parity of each backend against torch
+    """
+    work_dir = tempfile.mkdtemp(prefix="embed_bench_")
+    texts_path = os.path.join(work_dir, "texts.json")
+    with open(texts_path, "w") as f:
+        json.dump(list(texts), f)
+
+    results, embeddings = [], {}
+    for backend in backends:
+        print(f"\n[{backend}] encoding {len(texts)} texts...")
+        options = {
+            "backend": backend,
+            "model_name": model_name,
+            "model_root": model_root,
+            "quantization": quantization,
+            "num_threads": num_threads,
+            "texts_path": texts_path,
+            "embeddings_path": os.path.join(work_dir, f"{backend}.npy"),
+            "single_queries": single_queries
+        }
+        process = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "_worker", json.dumps(options)],
+            capture_output=True,
+            text=True
+        )
+        lines = [line for line in process.stdout.splitlines() if line.startswith("RESULT ")]
+        if process.returncode != 0 or not lines:
+            error = (process.stderr.strip().splitlines() or ["worker failed"])[-1]
+            print(f"  ✗ {backend} failed: {error}")
+            results.append({"backend": backend, "error": error})
+            continue
+
+        row = json.loads(lines[-1][len("RESULT "):])
+        embeddings[backend] = np.load(options["embeddings_path"])
+        results.append(row)
+        print(f"  load={row['load_s']:.2f}s p50={row['encode_p50_ms']:.2f}ms "
+              f"p99={row['encode_p99_ms']:.2f}ms peak RSS={row['memory_after_encode'].get('peak_rss_mb', 0):.0f}MB")
+
+    parity = {}
+    if "torch" in embeddings:
+        for backend, values in embeddings.items():
+            if backend != "torch":
+                parity[backend] = embedding_parity(embeddings["torch"], values)
+
+    for path in os.listdir(work_dir):
+        os.remove(os.path.join(work_dir, path))
+    os.rmdir(work_dir)
+
+    return {
+        "model": model_name,
+        "num_texts": len(texts),
+        "single_queries": min(single_queries, len(texts)),
+        "quantization": default_quantization(quantization),
+        "results": results,
+        "parity": parity
+    }
+
+
+def benchmark_passed(report: Dict[str, Any]) -> bool:
+    """True if every backend ran and matches PyTorch within PARITY_MIN_COSINE"""
+    return (
+        all("error" not in row for row in report["results"])
+        and all(parity["parity_ok"] for parity in report["parity"].values())
+    )
+
+
+def print_benchmark(report: Dict[str, Any]):
+    """Print a backend benchmark report as a table"""
+    print("\n" + "=" * 90)
+    print(f"EMBEDDING BACKENDS ({report['model']}, {report['num_texts']} texts, "
+          f"{report['single_queries']} single-text encodes)")
+    print("=" * 90)
+    print(f"{'backend':<8} {'load s':>7} {'p50ms':>7} {'p95ms':>7} {'p99ms':>7} "
+          f"{'texts/s':>8} {'RSS MB':>7} {'peak MB':>8} {'cgroup MB':>10}")
+    for row in report["results"]:
+        if "error" in row:
+            print(f"{row['backend']:<8} ERROR: {row['error']}")
+            continue
+        memory = row["memory_after_encode"]
+        print(f"{row['backend']:<8} {row['load_s']:>7.2f} {row['encode_p50_ms']:>7.2f} "
+              f"{row['encode_p95_ms']:>7.2f} {row['encode_p99_ms']:>7.2f} {row['batch_texts_per_s']:>8.1f} "
+              f"{memory.get('rss_mb', 0):>7.0f} {memory.get('peak_rss_mb', 0):>8.0f} "
+              f"{memory.get('container_mb', 0):>10.0f}")
+    for backend, parity in report["parity"].items():
+        mark = "✓" if parity["parity_ok"] else "✗"
+        details = ", ".join(f"{key}={value:.4f}" for key, value in parity.items() if key != "parity_ok")
+        print(f"{mark} {backend} vs torch: {details}")
+    print("=" * 90)
+
+
+def main():
+    """Command-line entry point"""
+    import argparse
+
+    if len(sys.argv) == 3 and sys.argv[1] == "_worker":
+        _run_worker(json.loads(sys.argv[2]))
+        return
+
+    parser = argparse.ArgumentParser(description="Int8 ONNX export and backend benchmark for embedding models")
+    subparsers = parser.add_subparsers(dest="command")
+
+    export_parser = subparsers.add_parser("export", help="Export and quantize a model")
+    export_parser.add_argument("--model", default="all-MiniLM-L6-v2", help="Model name")
+    export_parser.add_argument("--model-dir", default="./onnx_models", help="Directory for exported models")
+    export_parser.add_argument("--quantization", default="", help="avx2, avx512, avx512_vnni or arm64")
+
+    bench_parser = subparsers.add_parser("bench", help="Compare torch and ONNX encode latency, memory and parity")
+    bench_parser.add_argument("--model", default="all-MiniLM-L6-v2", help="Model name")
+    bench_parser.add_argument("--texts-file", required=True, help="File with one text per line")
+    bench_parser.add_argument("--model-dir", default="./onnx_models", help="Directory for exported models")
+    bench_parser.add_argument("--quantization", default="", help="avx2, avx512, avx512_vnni or arm64")
+    bench_parser.add_argument("--backends", nargs="+", default=["torch", "onnx"], help="Backends to compare")
+    bench_parser.add_argument("--single-queries", type=int, default=200, help="One-text encode calls to time")
+    bench_parser.add_argument("--output", help="Write the report as JSON")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        load_onnx_encoder(args.model, args.model_dir, args.quantization, token=os.environ.get("HF_TOKEN"))
+    elif args.command == "bench":
+        with open(args.texts_file) as f:
+            texts = [line.strip() for line in f if line.strip()]
+        report = benchmark_backends(
+            texts, args.model, args.model_dir, args.backends, args.quantization,
+            single_queries=args.single_queries
+        )
+        print_benchmark(report)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"Report written to: {args.output}")
+        if not benchmark_passed(report):
+            sys.exit(1)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
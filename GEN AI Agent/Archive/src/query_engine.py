@@ -2,11 +2,18 @@
 Query Engine Module
 Implements dual-vector retrieval strategy for Excel-RAG
 """
-from typing import Dict, Any, List
+import threading
+import time
+from typing import Dict, Any, List, Optional
 from .structure_db import StructureVectorDB
 from .content_db import ContentVectorDB
+from .reranker import get_reranker
+from .table_store import TableStore, format_sql_result, is_aggregate_question, open_table_store, table_store_path
+from .tracing import get_span_tracer
 from . import config
 
+_tracer = get_span_tracer("excel-rag")
+
 
 class QueryEngine:
     """
@@ -23,66 +30,270 @@ class QueryEngine:
         self.structure_db = StructureVectorDB(db_path)
         self.content_db = ContentVectorDB(db_path)
 
+        # Full sheets in SQLite for exact aggregate answers (None if not built)
+        self.table_store_path = table_store_path(db_path)
+        self.table_store = open_table_store(self.table_store_path)
+        self._table_store_lock = threading.Lock()
+        if self.table_store is None and config.SQL_ROUTER_ENABLED:
+            print("⚠️  No table store found; aggregate questions use vector retrieval only")
+
+    def get_table_store(self) -> Optional[TableStore]:
+        """
+        Table store for the SQL path
+
+        Reopened when the file was replaced since it was opened (rebuild,
+        GCS reload) or has appeared since startup.
+
+        Returns:
+            TableStore, or None if it has not been built
+        """
+        with self._table_store_lock:
+            if self.table_store is None or not self.table_store.is_current():
+                # The old connection is left to other threads still querying it
+                self.table_store = open_table_store(self.table_store_path)
+            return self.table_store
+
     def query(
         self,
         user_query: str,
         top_k_structure: int = config.TOP_K_STRUCTURE,
-        top_k_content: int = config.TOP_K_CONTENT
+        top_k_content: int = config.TOP_K_CONTENT,
+        rerank: Optional[bool] = None,
+        sql_llm=None
     ) -> Dict[str, Any]:
         """
         Execute dual-vector retrieval on user query
 
+        With reranking, RERANK_CANDIDATES rows are retrieved, rescored by the
+        cross-encoder and at most RERANK_TOP_K of them are kept.
+
+        With sql_llm, aggregate and filter questions are first translated to
+        SQL over the routed sheets in the table store; if that succeeds the
+        computed result replaces the retrieved rows in the context.
+
         Args:
             user_query: User's natural language query
             top_k_structure: Number of sheets/columns to retrieve
             top_k_content: Number of content rows to retrieve
+            rerank: Rerank content rows with a cross-encoder (default: config.RERANK_ENABLED)
+            sql_llm: LLMLayer that writes SQL for aggregate questions (None = vector retrieval only)
 
         Returns:
             Dictionary containing:
                 - query: Original query
                 - structure_results: Retrieved sheet/column info
-                - content_results: Retrieved row content
+                - content_results: Retrieved row content (empty when answered by SQL)
+                - sql: SQL statement and result, or None
                 - context: Formatted context for LLM
+                - timings: Per-stage latency in milliseconds
+                - cache_lookups: Cache hits/misses per cache (e.g., "rerank_scores")
         """
         print(f"\nProcessing query: '{user_query}'")
+        rerank = config.RERANK_ENABLED if rerank is None else rerank
+        timings = {}
+        cache_lookups = {}
+        start = time.perf_counter()
+
+        with _tracer.start_span("excel_rag.query") as query_span:
+            query_span.set_inputs(query=user_query)
+            query_span.set_attributes({
+                "top_k_structure": top_k_structure,
+                "top_k_content": top_k_content,
+                "rerank": rerank
+            })
+
+            # Step 0: Embed the query once for both searches (both DBs use the same model)
+            with _tracer.start_span("embedding", kind="embedding"):
+                stage_start = time.perf_counter()
+                query_embedding = self.structure_db.model.encode([user_query])
+                timings["embedding_ms"] = (time.perf_counter() - stage_start) * 1000
+
+            # Step 1: Structure Retrieval
+            print(f"Step 1: Searching structure DB for top-{top_k_structure} sheets/columns...")
+            with _tracer.start_span("structure_search", kind="retriever") as span:
+                stage_start = time.perf_counter()
+                structure_results = self.structure_db.search(
+                    user_query,
+                    top_k=top_k_structure,
+                    query_embedding=query_embedding
+                )
+                timings["structure_search_ms"] = (time.perf_counter() - stage_start) * 1000
+                span.set_attributes({
+                    "results": len(structure_results),
+                    "sheets": [r["sheet"] for r in structure_results],
+                    "router": "centroids" if self.structure_db.get_router() is not None else "milvus"
+                })
 
-        # Step 1: Structure Retrieval
-        print(f"Step 1: Searching structure DB for top-{top_k_structure} sheets/columns...")
-        structure_results = self.structure_db.search(user_query, top_k=top_k_structure)
+            if not structure_results:
+                print("No structure results found")
+                timings["total_ms"] = (time.perf_counter() - start) * 1000
+                query_span.set_attribute("outcome", "empty")
+                return {
+                    "query": user_query,
+                    "structure_results": [],
+                    "content_results": [],
+                    "sql": None,
+                    "context": "No relevant data found for this query.",
+                    "timings": timings,
+                    "cache_lookups": cache_lookups
+                }
 
-        if not structure_results:
-            print("No structure results found")
-            return {
-                "query": user_query,
-                "structure_results": [],
-                "content_results": [],
-                "context": "No relevant data found for this query."
-            }
+            # Extract sheet names for filtering content search
+            relevant_sheets = [r["sheet"] for r in structure_results]
+            print(f"Found relevant sheets: {relevant_sheets}")
 
-        # Extract sheet names for filtering content search
-        relevant_sheets = [r["sheet"] for r in structure_results]
-        print(f"Found relevant sheets: {relevant_sheets}")
+            # Step 1b: Exact SQL answer for aggregate/filter questions
+            if (
+                sql_llm is not None
+                and config.SQL_ROUTER_ENABLED
+                and is_aggregate_question(user_query)
+            ):
+                sql_result = self._sql_query(user_query, relevant_sheets, sql_llm, timings)
+                if sql_result is not None:
+                    context = self._build_sql_context(structure_results, sql_result, user_query)
+                    timings["total_ms"] = (time.perf_counter() - start) * 1000
+                    query_span.set_attribute("outcome", "sql")
+                    return {
+                        "query": user_query,
+                        "structure_results": structure_results,
+                        "content_results": [],
+                        "sql": sql_result,
+                        "context": context,
+                        "timings": timings,
+                        "cache_lookups": cache_lookups
+                    }
 
-        # Step 2: Content Retrieval (filtered by sheets)
-        print(f"Step 2: Searching content DB for top-{top_k_content} rows in relevant sheets...")
-        content_results = self.content_db.search(
-            user_query,
-            top_k=top_k_content,
-            sheet_filter=relevant_sheets
-        )
+            # Step 2: Content Retrieval (filtered by sheets); a wider candidate set when reranking
+            num_candidates = max(config.RERANK_CANDIDATES, top_k_content) if rerank else top_k_content
+            print(f"Step 2: Searching content DB for top-{num_candidates} rows in relevant sheets...")
+            with _tracer.start_span("content_search", kind="retriever") as span:
+                stage_start = time.perf_counter()
+                content_results = self.content_db.search(
+                    user_query,
+                    top_k=num_candidates,
+                    sheet_filter=relevant_sheets,
+                    query_embedding=query_embedding
+                )
+                timings["content_search_ms"] = (time.perf_counter() - stage_start) * 1000
+                span.set_attributes({"results": len(content_results), "sheet_filter": relevant_sheets})
 
-        print(f"Retrieved {len(content_results)} content rows")
+            print(f"Retrieved {len(content_results)} content rows")
 
-        # Step 3: Build context for LLM
-        context = self._build_context(structure_results, content_results, user_query)
+            # Step 2b: Cross-encoder rerank, keeping only the best rows for the LLM
+            if rerank and content_results:
+                with _tracer.start_span("rerank", kind="reranker") as span:
+                    stage_start = time.perf_counter()
+                    keep = min(top_k_content, config.RERANK_TOP_K)
+                    lookups = cache_lookups.setdefault("rerank_scores", {"hits": 0, "misses": 0})
+                    content_results = get_reranker().rerank(user_query, content_results, keep, lookups=lookups)
+                    timings["rerank_ms"] = (time.perf_counter() - stage_start) * 1000
+                    span.set_attributes({"candidates": num_candidates, "results": len(content_results)})
+                print(f"Reranked to top {len(content_results)} rows")
+
+            # Step 3: Build context for LLM
+            with _tracer.start_span("context_build") as span:
+                stage_start = time.perf_counter()
+                context = self._build_context(structure_results, content_results, user_query)
+                timings["context_build_ms"] = (time.perf_counter() - stage_start) * 1000
+                span.set_attribute("context_chars", len(context))
+
+            timings["total_ms"] = (time.perf_counter() - start) * 1000
+            query_span.set_attribute("outcome", "success")
 
         return {
             "query": user_query,
             "structure_results": structure_results,
             "content_results": content_results,
-            "context": context
+            "sql": None,
+            "context": context,
+            "timings": timings,
+            "cache_lookups": cache_lookups
         }
 
+    def _sql_query(
+        self,
+        user_query: str,
+        sheets: List[str],
+        sql_llm,
+        timings: Dict[str, float]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Translate the question to SQL over the routed sheets and run it
+
+        Args:
+            user_query: User's natural language query
+            sheets: Routed sheet names (their tables are shown to the SQL generator)
+            sql_llm: LLMLayer that writes the SQL
+            timings: Per-stage timings to add sql_generate_ms/sql_execute_ms to
+
+        Returns:
+            Dictionary with "sql", "columns", "rows" and "truncated", or None to
+            fall back to vector retrieval
+        """
+        table_store = self.get_table_store()
+        if table_store is None:
+            return None
+
+        print("Step 1b: Aggregate question, generating SQL over the table store...")
+        with _tracer.start_span("sql_generate") as span:
+            stage_start = time.perf_counter()
+            sql = table_store.generate_sql(sql_llm, user_query, sheets)
+            timings["sql_generate_ms"] = (time.perf_counter() - stage_start) * 1000
+            span.set_attribute("sql", sql or "")
+
+        if sql is None:
+            print("No SQL generated, using vector retrieval")
+            return None
+
+        with _tracer.start_span("sql_execute", kind="tool") as span:
+            stage_start = time.perf_counter()
+            try:
+                result = table_store.execute(sql)
+            except Exception as e:
+                span.record_error(e)
+                print(f"⚠️  SQL failed ({e}), using vector retrieval")
+                return None
+            finally:
+                timings["sql_execute_ms"] = (time.perf_counter() - stage_start) * 1000
+            span.set_attributes({"rows": len(result["rows"]), "truncated": result["truncated"]})
+
+        if not result["rows"]:
+            print(f"SQL returned no rows ({sql}), using vector retrieval")
+            return None
+
+        print(f"SQL returned {len(result['rows'])} rows: {sql}")
+        return {"sql": sql, **result}
+
+    def _build_sql_context(
+        self,
+        structure_results: List[Dict[str, Any]],
+        sql_result: Dict[str, Any],
+        query: str
+    ) -> str:
+        """
+        Build the LLM context for a question answered by SQL
+
+        Args:
+            structure_results: Routed sheets
+            sql_result: Output of _sql_query
+            query: Original user query
+
+        Returns:
+            Formatted context string
+        """
+        context_parts = ["=== RELEVANT EXCEL STRUCTURE ==="]
+        for i, struct in enumerate(structure_results, 1):
+            context_parts.append(f"\n{i}. Sheet: {struct['sheet']}")
+            context_parts.append(f"   Columns: {struct['columns']}")
+
+        context_parts.append("\n\n=== EXACT RESULT (SQL over all rows of the workbook) ===")
+        context_parts.append(format_sql_result(sql_result["sql"], sql_result))
+
+        context_parts.append("\n\n=== USER QUESTION ===")
+        context_parts.append(f"{query}")
+
+        return "\n".join(context_parts)
+
     def _build_context(
         self,
         structure_results: List[Dict[str, Any]],
@@ -112,8 +323,13 @@ class QueryEngine:
         # Add content information
         context_parts.append("\n\n=== RELEVANT DATA ROWS ===")
         for i, content in enumerate(content_results, 1):
-            context_parts.append(f"\n{i}. [{content['sheet']}] {content['text'][:200]}...")
-            context_parts.append(f"   Relevance: {content['score']:.4f}")
+            # Full row from the row store when available (the embedded text has only the first columns)
+            if content.get("fields"):
+                row_text = " | ".join(f"{k}: {v}" for k, v in content["fields"].items() if v is not None)
+                context_parts.append(f"\n{i}. [{content['sheet']}] {row_text[:config.ROW_CONTEXT_CHARS]}...")
+            else:
+                context_parts.append(f"\n{i}. [{content['sheet']}] {content['text'][:200]}...")
+            context_parts.append(f"   Relevance: {content.get('rerank_score', content['score']):.4f}")
 
         # Add query at the end
         context_parts.append(f"\n\n=== USER QUESTION ===")
@@ -174,6 +390,8 @@ class QueryEngine:
             stats["content_exists"] = self.content_db.client.has_collection(
                 config.CONTENT_COLLECTION
             )
+            router = self.structure_db.get_router()
+            stats["sheet_router"] = router.get_stats() if router is not None else None
         except Exception as e:
             stats["error"] = str(e)
 
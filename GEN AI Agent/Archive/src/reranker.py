@@ -0,0 +1,152 @@
+"""
+Reranker Module
+Cross-encoder rescoring of retrieved content rows, with batching and a score cache
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from . import config
+from .model_loader import load_model
+
+
+class CrossEncoderReranker:
+    """
+    Rescores (query, row) pairs with a cross-encoder
+
+    Scores are cached per (query, row text) in an LRU, so repeated queries and
+    rows shared between queries are not scored twice. Uncached pairs are
+    scored together in batches.
+    """
+
+    def __init__(
+        self,
+        model_name: str = config.RERANK_MODEL,
+        backend: str = config.RERANK_BACKEND,
+        batch_size: int = config.RERANK_BATCH_SIZE,
+        cache_size: int = config.RERANK_CACHE_SIZE
+    ):
+        """
+        Initialize the reranker
+
+        Args:
+            model_name: Cross-encoder model name
+            backend: "onnx" (int8-quantized ONNX Runtime) or "torch"
+            batch_size: Pairs scored per forward pass
+            cache_size: Maximum number of cached pair scores (0 = no cache)
+        """
+        from sentence_transformers import CrossEncoder
+
+        self.model_name = model_name
+        self.model = load_model(CrossEncoder, model_name, backend)
+        self.backend = getattr(self.model, "backend", "torch")
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        print(f"✓ Reranker loaded: {model_name} ({self.backend})")
+
+    def score(self, query: str, texts: List[str], lookups: Optional[Dict[str, int]] = None) -> List[float]:
+        """
+        Cross-encoder relevance scores for query against each text
+
+        Args:
+            query: User query
+            texts: Candidate row texts
+            lookups: Optional {"hits", "misses"} counts to add this call's cache lookups to
+
+        Returns:
+            One score per text (higher is more relevant)
+        """
+        scores: List[Optional[float]] = [None] * len(texts)
+        missing: Dict[str, List[int]] = {}
+
+        with self._lock:
+            for i, text in enumerate(texts):
+                key = (query, text)
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    scores[i] = self._cache[key]
+                    self.hits += 1
+                else:
+                    missing.setdefault(text, []).append(i)
+                    self.misses += 1
+
+        if lookups is not None:
+            misses = sum(len(indices) for indices in missing.values())
+            lookups["hits"] = lookups.get("hits", 0) + len(texts) - misses
+            lookups["misses"] = lookups.get("misses", 0) + misses
+
+        if missing:
+            unique_texts = list(missing)
+            predicted = self.model.predict(
+                [[query, text] for text in unique_texts],
+                batch_size=self.batch_size,
+                show_progress_bar=False
+            )
+            with self._lock:
+                for text, value in zip(unique_texts, predicted):
+                    value = float(value)
+                    for i in missing[text]:
+                        scores[i] = value
+                    if self.cache_size:
+                        self._cache[(query, text)] = value
+                        self._cache.move_to_end((query, text))
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return scores
+
+    def rerank(
+        self,
+        query: str,
+        results: List[Dict[str, Any]],
+        top_k: int,
+        lookups: Optional[Dict[str, int]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Reorder retrieved rows by cross-encoder score and keep the best
+
+        Args:
+            query: User query
+            results: Content results from ContentVectorDB.search
+            top_k: Number of rows to keep
+            lookups: Optional {"hits", "misses"} counts to add the score cache lookups to
+
+        Returns:
+            Top rows, each with an added "rerank_score", best first
+        """
+        if not results:
+            return []
+        scores = self.score(query, [r["text"] for r in results], lookups=lookups)
+        reranked = [{**result, "rerank_score": score} for result, score in zip(results, scores)]
+        reranked.sort(key=lambda r: r["rerank_score"], reverse=True)
+        return reranked[:top_k]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache statistics"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "model": self.model_name,
+                "backend": self.backend,
+                "cache_entries": len(self._cache),
+                "cache_hits": self.hits,
+                "cache_misses": self.misses,
+                "cache_hit_rate": self.hits / total if total else 0.0
+            }
+
+
+_reranker: Optional[CrossEncoderReranker] = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> CrossEncoderReranker:
+    """Shared reranker (loaded on first use)"""
+    global _reranker
+    with _reranker_lock:
+        if _reranker is None:
+            _reranker = CrossEncoderReranker()
+        return _reranker
@@ -0,0 +1,136 @@
+"""
+Row Store Module
+Memory-mapped Arrow file holding the text and full original columns of every content row
+"""
+import json
+import os
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import pandas as pd
+import pyarrow as pa
+
+from . import config
+
+# Row store file next to a Milvus database (or its GCS object): <db>.rows.arrow
+ROW_STORE_SUFFIX = ".rows.arrow"
+
+
+def is_milvus_lite(uri: str) -> bool:
+    """True if uri is a local Milvus Lite database file rather than a server address"""
+    return uri.endswith(".db")
+
+
+def row_store_path(db_path: str = config.DB_PATH) -> Optional[str]:
+    """
+    Location of the row store for a Milvus database
+
+    Args:
+        db_path: Milvus database path (or GCS object path) or Milvus server URI
+
+    Returns:
+        ROW_STORE_PATH if set, else db_path with ROW_STORE_SUFFIX;
+        None for a server URI, which has no file to put the store next to
+    """
+    if config.ROW_STORE_PATH:
+        return config.ROW_STORE_PATH
+    if not is_milvus_lite(db_path):
+        return None
+    return str(Path(db_path).with_suffix(ROW_STORE_SUFFIX))
+
+
+def file_signature(store_path: str) -> Tuple[int, int, int]:
+    """(inode, size, mtime_ns) of a row store file; changes when it is rewritten or replaced"""
+    stat = os.stat(store_path)
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def write_row_store(content_df: pd.DataFrame, store_path: str) -> Dict[str, int]:
+    """
+    Write content rows to an uncompressed Arrow IPC file
+
+    Row i of the file is row i of content_df; that position is the row id
+    stored in Milvus. The file is uncompressed so it can be memory-mapped
+    and read without copying.
+
+    Args:
+        content_df: DataFrame with 'sheet', 'text' and 'fields' (JSON of all columns)
+        store_path: File to create (replaced if it exists)
+
+    Returns:
+        Sheet name -> sheet id (the integer stored in Milvus for sheet filters)
+    """
+    sheets = list(dict.fromkeys(content_df["sheet"].astype(str)))
+    sheet_ids = {sheet: i for i, sheet in enumerate(sheets)}
+
+    table = pa.table({
+        "sheet": pa.DictionaryArray.from_arrays(
+            pa.array(content_df["sheet"].astype(str).map(sheet_ids).to_numpy(), pa.int32()),
+            pa.array(sheets, pa.string())
+        ),
+        "text": pa.array(content_df["text"].astype(str).tolist(), pa.large_string()),
+        "fields": pa.array(content_df["fields"].tolist(), pa.large_string())
+    })
+    table = table.replace_schema_metadata({"sheets": json.dumps(sheets)})
+
+    tmp_path = f"{store_path}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=65536)
+    os.replace(tmp_path, store_path)
+
+    print(f"✓ Row store written: {len(table)} rows, {os.path.getsize(store_path):,} bytes ({store_path})")
+    return sheet_ids
+
+
+class RowStore:
+    """
+    Read access to the row store
+
+    The file is memory-mapped: opening it reads no row data, and a lookup
+    only touches the pages of the requested rows.
+    """
+
+    def __init__(self, store_path: str):
+        """
+        Open the row store
+
+        Args:
+            store_path: File written by write_row_store
+        """
+        self.store_path = store_path
+        self.signature = file_signature(store_path)
+        self.table = pa.ipc.open_file(pa.memory_map(store_path, "r")).read_all()
+        self.sheets = json.loads(self.table.schema.metadata[b"sheets"])
+        self.sheet_ids = {sheet: i for i, sheet in enumerate(self.sheets)}
+
+    def __len__(self) -> int:
+        return self.table.num_rows
+
+    def is_current(self) -> bool:
+        """False once the file on disk was replaced (rebuild, database reload)"""
+        try:
+            return file_signature(self.store_path) == self.signature
+        except OSError:
+            return False
+
+    def sheet_id_list(self, sheets: Sequence[str]) -> List[int]:
+        """Sheet ids for sheet names (unknown sheets are skipped)"""
+        return [self.sheet_ids[sheet] for sheet in sheets if sheet in self.sheet_ids]
+
+    def fetch(self, row_ids: Sequence[int]) -> List[Dict[str, Any]]:
+        """
+        Rows by id
+
+        Args:
+            row_ids: Row ids from Milvus hits
+
+        Returns:
+            One dictionary per id with "sheet", "text" and "fields" (all original columns)
+        """
+        if not row_ids:
+            return []
+        rows = self.table.take(pa.array(row_ids, pa.int64())).to_pylist()
+        for row in rows:
+            row["fields"] = json.loads(row["fields"])
+        return rows
@@ -0,0 +1,330 @@
+"""
+Search Tuning Module
+Picks the cheapest ef/nprobe that meets a target recall and stores it next to the collection
+"""
+import json
+import random
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+from pymilvus import MilvusClient, DataType
+
+from . import config
+
+# Candidate search-effort values, tried cheapest first
+EF_CANDIDATES = [16, 24, 32, 48, 64, 96, 128, 192, 256, 384, 512]
+NPROBE_CANDIDATES = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096]
+
+# Tolerance when comparing ANN scores against the exact k-th score
+SCORE_TOLERANCE = 1e-5
+
+
+def search_param_name(index_type: str) -> Optional[str]:
+    """Name of the search-effort parameter for an index type ("ef", "nprobe" or None)"""
+    if index_type == "HNSW":
+        return "ef"
+    if index_type.startswith("IVF"):
+        return "nprobe"
+    return None
+
+
+def _similarity(vectors: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    """Similarity matrix (higher is closer) under config.METRIC_TYPE"""
+    if config.METRIC_TYPE == "L2":
+        return -(
+            (queries ** 2).sum(axis=1, keepdims=True)
+            - 2 * queries @ vectors.T
+            + (vectors ** 2).sum(axis=1)
+        )
+    if config.METRIC_TYPE == "COSINE":
+        vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True).clip(min=1e-12)
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True).clip(min=1e-12)
+    return queries @ vectors.T
+
+
+def _hit_similarity(distance: float) -> float:
+    """Convert a Milvus hit distance to the similarity scale used by _similarity"""
+    return -distance if config.METRIC_TYPE == "L2" else distance
+
+
+def exact_top_k(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    top_k: int,
+    chunk_size: int = 100000,
+    return_scores: bool = False
+):
+    """
+    Exact brute-force top-k search (ground truth for recall)
+
+    Vectors are scanned in chunks so memory stays bounded for large collections.
+
+    Args:
+        vectors: Collection vectors, shape (n, dim)
+        queries: Query vectors, shape (q, dim)
+        top_k: Number of neighbours per query
+        chunk_size: Number of collection vectors scored at a time
+        return_scores: Also return the similarity of each neighbour
+
+    Returns:
+        Row indices of the true top-k neighbours, shape (q, top_k), best first;
+        with return_scores, a tuple (ids, scores)
+    """
+    k = min(top_k, vectors.shape[0])
+    best_ids = np.empty((queries.shape[0], 0), dtype=np.int64)
+    best_scores = np.empty((queries.shape[0], 0), dtype=np.float32)
+
+    for offset in range(0, vectors.shape[0], chunk_size):
+        scores = _similarity(vectors[offset:offset + chunk_size], queries)
+        ids = np.broadcast_to(np.arange(offset, offset + scores.shape[1]), scores.shape)
+
+        scores = np.concatenate([best_scores, scores], axis=1)
+        ids = np.concatenate([best_ids, ids], axis=1)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, top, axis=1)
+        best_ids = np.take_along_axis(ids, top, axis=1)
+
+    order = best_scores.argsort(axis=1)[:, ::-1]
+    best_ids = np.take_along_axis(best_ids, order, axis=1)
+    if return_scores:
+        return best_ids, np.take_along_axis(best_scores, order, axis=1)
+    return best_ids
+
+
+def describe_vector_index(client: MilvusClient, collection_name: str, field_name: str = "vector") -> Dict[str, Any]:
+    """
+    Description of the vector index a collection was actually built with
+
+    This can differ from config.INDEX_TYPE: Milvus Lite builds AUTOINDEX for
+    index types it does not support, including for quick-setup collections.
+
+    Returns:
+        describe_index() result ("index_type", "nlist", ...), or {} if it cannot be read
+    """
+    try:
+        for index_name in client.list_indexes(collection_name, field_name=field_name):
+            return client.describe_index(collection_name, index_name) or {}
+    except Exception as e:
+        print(f"⚠️  Could not describe the vector index of {collection_name}: {e}")
+    return {}
+
+
+def default_search_params(index_type: str = config.INDEX_TYPE) -> Dict[str, Any]:
+    """Search parameters from config.EF / config.NPROBE for an index type"""
+    param_name = search_param_name(index_type)
+    if param_name == "ef":
+        return {"ef": config.EF}
+    if param_name == "nprobe":
+        return {"nprobe": config.NPROBE}
+    return {}
+
+
+# ============================================================================
+# Storage: one row per tuned collection in a small metadata collection that
+# lives in the same Milvus database (Milvus Lite has no collection properties)
+# ============================================================================
+
+def _ensure_params_collection(client: MilvusClient):
+    """Create the search-params metadata collection if it does not exist"""
+    if client.has_collection(config.SEARCH_PARAMS_COLLECTION):
+        return
+
+    schema = MilvusClient.create_schema(auto_id=False)
+    schema.add_field("collection", DataType.VARCHAR, is_primary=True, max_length=256)
+    schema.add_field("params", DataType.VARCHAR, max_length=8192)
+    # Milvus requires a vector field on every collection
+    schema.add_field("vector", DataType.FLOAT_VECTOR, dim=2)
+
+    index_params = client.prepare_index_params()
+    index_params.add_index(field_name="vector", index_type="FLAT", metric_type="L2")
+    client.create_collection(
+        collection_name=config.SEARCH_PARAMS_COLLECTION,
+        schema=schema,
+        index_params=index_params
+    )
+
+
+def save_search_params(client: MilvusClient, collection_name: str, record: Dict[str, Any]):
+    """
+    Store tuned search parameters for a collection
+
+    Args:
+        client: Milvus client for the database holding the collection
+        collection_name: Collection the parameters apply to
+        record: Tuning record; record["search_params"] is used at query time
+    """
+    _ensure_params_collection(client)
+    client.upsert(
+        collection_name=config.SEARCH_PARAMS_COLLECTION,
+        data=[{
+            "collection": collection_name,
+            "params": json.dumps(record, default=str),
+            "vector": [0.0, 0.0]
+        }]
+    )
+
+
+def load_search_params(client: MilvusClient, collection_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Load the tuning record stored for a collection
+
+    Returns:
+        The record saved by save_search_params, or None if the collection was never tuned
+    """
+    if not client.has_collection(config.SEARCH_PARAMS_COLLECTION):
+        return None
+
+    rows = client.query(
+        collection_name=config.SEARCH_PARAMS_COLLECTION,
+        filter=f'collection == "{collection_name}"',
+        output_fields=["params"]
+    )
+    if not rows:
+        return None
+    return json.loads(rows[0]["params"])
+
+
+def clear_search_params(client: MilvusClient, collection_name: str):
+    """Forget tuned parameters for a collection (e.g. when it is dropped)"""
+    if client.has_collection(config.SEARCH_PARAMS_COLLECTION):
+        client.delete(
+            collection_name=config.SEARCH_PARAMS_COLLECTION,
+            filter=f'collection == "{collection_name}"'
+        )
+
+
+def resolve_search_params(client: MilvusClient, collection_name: str) -> Dict[str, Any]:
+    """
+    Search parameters to use at query time
+
+    Tuned values stored with the collection take precedence over config.EF /
+    config.NPROBE unless USE_TUNED_SEARCH_PARAMS is disabled. The defaults
+    follow the collection's actual index type (none for AUTOINDEX or FLAT).
+
+    Returns:
+        Milvus search_params dictionary ({"metric_type", "params"})
+    """
+    index_type = describe_vector_index(client, collection_name).get("index_type", config.INDEX_TYPE)
+    params = default_search_params(index_type)
+    if config.USE_TUNED_SEARCH_PARAMS:
+        try:
+            record = load_search_params(client, collection_name)
+            if record and record.get("search_params"):
+                params = record["search_params"]
+        except Exception as e:
+            print(f"⚠️  Could not load tuned search params for {collection_name}: {e}")
+    return {"metric_type": config.METRIC_TYPE, "params": params}
+
+
+# ============================================================================
+# Tuning
+# ============================================================================
+
+def _candidate_values(param_name: str, limit: int, nlist: int = config.NLIST) -> List[int]:
+    """Candidate ef/nprobe values, cheapest first"""
+    if param_name == "ef":
+        # Milvus requires ef >= limit
+        return sorted({max(value, limit) for value in EF_CANDIDATES})
+    return [value for value in NPROBE_CANDIDATES if value <= nlist]
+
+
+def tune_search_params(
+    client: MilvusClient,
+    collection_name: str,
+    vectors: np.ndarray,
+    target_recall: float = config.TARGET_RECALL,
+    top_k: int = config.TOP_K_CONTENT,
+    num_queries: int = config.TUNING_QUERIES,
+    seed: int = 42
+) -> Dict[str, Any]:
+    """
+    Find the cheapest ef/nprobe that reaches target recall@k and store it
+
+    Queries are held out leave-one-out style: a sample of collection vectors is
+    searched for k+1 neighbours and the query's own row is discarded, both in
+    the exact ground truth and in the ANN results. A hit counts as correct when
+    its score reaches the exact k-th neighbour's score, so ties and duplicate
+    rows do not need id bookkeeping.
+
+    The parameter to tune comes from the collection's index description, not
+    config.INDEX_TYPE; AUTOINDEX, FLAT and unreadable indexes are skipped.
+
+    Args:
+        client: Milvus client for the database holding the collection
+        collection_name: Collection to tune (already populated)
+        vectors: The vectors inserted into the collection, shape (n, dim)
+        target_recall: Recall@k to reach (e.g., 0.95)
+        top_k: k used for recall@k, normally the query-time limit
+        num_queries: Number of held-out queries to sample
+        seed: Random seed for query sampling
+
+    Returns:
+        Tuning record as stored with the collection
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    index = describe_vector_index(client, collection_name)
+    index_type = index.get("index_type", "unknown")
+    param_name = search_param_name(index_type)
+    k = min(top_k, len(vectors) - 1)
+
+    if param_name is None or k < 1:
+        print(f"No search parameter to tune for {collection_name} ({index_type}, {len(vectors)} vectors)")
+        return {}
+
+    rng = random.Random(seed)
+    sample = rng.sample(range(len(vectors)), min(num_queries, len(vectors)))
+    queries = vectors[sample]
+
+    # Exact (k+1)-th score: the k-th neighbour once the query row itself is dropped
+    _, exact_scores = exact_top_k(vectors, queries, k + 1, return_scores=True)
+    thresholds = exact_scores[:, k] - SCORE_TOLERANCE
+
+    print(f"Tuning {param_name} for {collection_name}: target recall@{k}={target_recall:.2f}, "
+          f"{len(queries)} held-out queries")
+    client.flush(collection_name)
+
+    trials = []
+    chosen = None
+    for value in _candidate_values(param_name, k + 1, int(index.get("nlist", config.NLIST))):
+        search_params = {"metric_type": config.METRIC_TYPE, "params": {param_name: value}}
+        results = client.search(
+            collection_name=collection_name,
+            data=queries.tolist(),
+            limit=k + 1,
+            search_params=search_params
+        )
+
+        recalls = []
+        for hits, threshold in zip(results, thresholds):
+            # Drop the best hit: the query's own row (or an exact duplicate of it)
+            scores = sorted((_hit_similarity(hit["distance"]) for hit in hits), reverse=True)[1:]
+            recalls.append(sum(score >= threshold for score in scores) / k)
+        recall = float(np.mean(recalls))
+
+        trials.append({param_name: value, f"recall_at_{k}": recall})
+        print(f"  {param_name}={value}: recall@{k}={recall:.4f}")
+
+        if recall >= target_recall:
+            chosen = value
+            break
+
+    if chosen is None:
+        chosen = trials[-1][param_name]
+        print(f"⚠️  Target recall {target_recall:.2f} not reached; using largest {param_name}={chosen}")
+    else:
+        print(f"✓ Selected {param_name}={chosen} for {collection_name}")
+
+    record = {
+        "search_params": {param_name: chosen},
+        "index_type": index_type,
+        "metric_type": config.METRIC_TYPE,
+        "target_recall": target_recall,
+        "top_k": k,
+        "num_queries": len(queries),
+        "num_vectors": len(vectors),
+        "trials": trials,
+        "tuned_at": datetime.now().isoformat()
+    }
+    save_search_params(client, collection_name, record)
+    return record
@@ -0,0 +1,255 @@
+"""
+Sheet Router Module
+Routes queries to sheets with per-sheet centroids of the content embeddings, held in memory
+"""
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+from pymilvus import MilvusClient, DataType
+
+from . import config
+
+# Spherical k-means settings for multi-centroid sheets
+KMEANS_ITERATIONS = 20
+KMEANS_SAMPLE = 20000  # Rows per sheet used to fit centroids (all rows are far more than needed)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows (cosine similarity becomes a dot product)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True).clip(min=1e-12)
+
+
+def _spherical_kmeans(vectors: np.ndarray, k: int, seed: int = 0) -> np.ndarray:
+    """
+    Cluster unit vectors by cosine similarity
+
+    Args:
+        vectors: Normalized vectors, shape (n, dim)
+        k: Number of centroids (at most n)
+        seed: Random seed for initialization and sampling
+
+    Returns:
+        Normalized centroids, shape (k, dim)
+    """
+    rng = np.random.default_rng(seed)
+    if len(vectors) > KMEANS_SAMPLE:
+        vectors = vectors[rng.choice(len(vectors), KMEANS_SAMPLE, replace=False)]
+
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)]
+    for _ in range(KMEANS_ITERATIONS):
+        assignment = (vectors @ centroids.T).argmax(axis=1)
+        updated = np.stack([
+            vectors[assignment == c].sum(axis=0) if (assignment == c).any() else centroids[c]
+            for c in range(k)
+        ])
+        updated = _normalize(updated)
+        if np.allclose(updated, centroids, atol=1e-6):
+            break
+        centroids = updated
+    return centroids
+
+
+def compute_sheet_centroids(
+    embeddings: np.ndarray,
+    sheets: List[str],
+    centroids_per_sheet: int = config.SHEET_ROUTER_CENTROIDS
+) -> Tuple[np.ndarray, List[str]]:
+    """
+    Summarize each sheet's row embeddings as one or more centroids
+
+    Args:
+        embeddings: Content row embeddings, shape (n, dim)
+        sheets: Sheet name of each row
+        centroids_per_sheet: 1 = mean direction of the sheet; more = spherical k-means
+            clusters, so sheets mixing different kinds of rows are matched per kind
+
+    Returns:
+        (centroids, sheet of each centroid); centroids are normalized, shape (m, dim)
+    """
+    embeddings = _normalize(embeddings)
+    sheets = np.asarray([str(s) for s in sheets])
+
+    vectors = []
+    labels = []
+    for sheet in dict.fromkeys(sheets.tolist()):
+        rows = embeddings[sheets == sheet]
+        k = max(1, min(centroids_per_sheet, len(rows)))
+        if k == 1:
+            centroids = _normalize(rows.mean(axis=0, keepdims=True))
+        else:
+            centroids = _spherical_kmeans(rows, k)
+        vectors.append(centroids)
+        labels.extend([sheet] * len(centroids))
+
+    return np.concatenate(vectors), labels
+
+
+# ============================================================================
+# Storage: centroids live in a small collection in the same Milvus database,
+# so they ship with the .db file (GCS upload, build cache) like tuned search params
+# ============================================================================
+
+def save_sheet_centroids(client: MilvusClient, centroids: np.ndarray, sheets: List[str]):
+    """
+    Replace the stored sheet centroids
+
+    Args:
+        client: Milvus client for the database holding the content collection
+        centroids: Centroid vectors from compute_sheet_centroids
+        sheets: Sheet of each centroid
+    """
+    clear_sheet_centroids(client)
+
+    schema = MilvusClient.create_schema(auto_id=True)
+    schema.add_field("id", DataType.INT64, is_primary=True)
+    schema.add_field("sheet", DataType.VARCHAR, max_length=512)
+    schema.add_field("vector", DataType.FLOAT_VECTOR, dim=centroids.shape[1])
+
+    index_params = client.prepare_index_params()
+    index_params.add_index(field_name="vector", index_type="FLAT", metric_type="COSINE")
+    client.create_collection(
+        collection_name=config.SHEET_ROUTER_COLLECTION,
+        schema=schema,
+        index_params=index_params
+    )
+    client.insert(
+        collection_name=config.SHEET_ROUTER_COLLECTION,
+        data=[{"sheet": sheet, "vector": vector.tolist()} for sheet, vector in zip(sheets, centroids)]
+    )
+    print(f"✓ Saved {len(sheets)} centroids for {len(set(sheets))} sheets to {config.SHEET_ROUTER_COLLECTION}")
+
+
+def clear_sheet_centroids(client: MilvusClient):
+    """Drop the stored sheet centroids"""
+    if client.has_collection(config.SHEET_ROUTER_COLLECTION):
+        client.drop_collection(config.SHEET_ROUTER_COLLECTION)
+
+
+# Milvus query window limit; routing collections hold one row per sheet (or per centroid)
+MAX_ROUTING_ROWS = 16384
+
+
+def _query_all(client: MilvusClient, collection_name: str, output_fields: List[str]) -> List[Dict[str, Any]]:
+    """Every row of a small collection"""
+    return client.query(
+        collection_name=collection_name,
+        filter="",
+        limit=MAX_ROUTING_ROWS,
+        output_fields=output_fields
+    )
+
+
+class SheetRouter:
+    """
+    In-memory sheet router
+
+    Holds every routing vector in one normalized matrix; a query is routed
+    with a single matrix-vector product and a per-sheet max, with no Milvus
+    round-trip. Routing vectors are the build-time content centroids and,
+    optionally, the structure collection's "Sheet: X, Columns: ..." vectors.
+
+    Routing is always by cosine similarity, whatever config.METRIC_TYPE is:
+    centroids are mean directions of normalized rows, so only the angle to
+    them is meaningful. With normalized embeddings (e.g. all-MiniLM-L6-v2) L2
+    ranks routing vectors in the same order, but scores stay on the cosine scale.
+    """
+
+    def __init__(self, vectors: np.ndarray, labels: List[str], sheet_info: Dict[str, Dict[str, Any]]):
+        """
+        Initialize the router
+
+        Args:
+            vectors: Routing vectors, shape (m, dim)
+            labels: Sheet of each routing vector
+            sheet_info: Per-sheet "columns" and "text" from the structure collection
+        """
+        self.matrix = _normalize(vectors)
+        self.sheets = list(dict.fromkeys(labels))
+        sheet_index = {sheet: i for i, sheet in enumerate(self.sheets)}
+        self.labels = np.array([sheet_index[label] for label in labels], dtype=np.int64)
+        self.sheet_info = sheet_info
+
+    @classmethod
+    def load(
+        cls,
+        client: MilvusClient,
+        structure_collection: str = config.STRUCTURE_COLLECTION,
+        use_headers: bool = config.SHEET_ROUTER_USE_HEADERS
+    ) -> Optional["SheetRouter"]:
+        """
+        Load the router from the centroid and structure collections
+
+        Args:
+            client: Milvus client for the database
+            structure_collection: Collection with one header vector per sheet
+            use_headers: Add the header vectors to the routing matrix
+
+        Returns:
+            SheetRouter, or None if no centroids have been built
+        """
+        if not client.has_collection(config.SHEET_ROUTER_COLLECTION):
+            return None
+
+        centroid_rows = _query_all(client, config.SHEET_ROUTER_COLLECTION, ["sheet", "vector"])
+        if not centroid_rows:
+            return None
+
+        vectors = [row["vector"] for row in centroid_rows]
+        labels = [row["sheet"] for row in centroid_rows]
+        sheet_info = {}
+
+        if client.has_collection(structure_collection):
+            fields = ["sheet", "columns", "text"] + (["vector"] if use_headers else [])
+            for row in _query_all(client, structure_collection, fields):
+                sheet_info[row["sheet"]] = {"columns": row["columns"], "text": row["text"]}
+                if use_headers:
+                    vectors.append(row["vector"])
+                    labels.append(row["sheet"])
+
+        return cls(np.asarray(vectors, dtype=np.float32), labels, sheet_info)
+
+    def route(self, query_embedding: np.ndarray, top_k: int = config.TOP_K_STRUCTURE) -> List[Dict[str, Any]]:
+        """
+        Best-matching sheets for a query
+
+        Args:
+            query_embedding: Query embedding, shape (dim,) or (1, dim)
+            top_k: Number of sheets to return
+
+        Returns:
+            Results in StructureVectorDB.search format (sheet, columns, text, score),
+            where score is the cosine similarity of the sheet's closest routing vector
+        """
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32).reshape(-1))
+        scores = self.matrix @ query
+
+        # Best routing vector per sheet
+        sheet_scores = np.full(len(self.sheets), -np.inf, dtype=np.float32)
+        np.maximum.at(sheet_scores, self.labels, scores)
+
+        k = min(top_k, len(self.sheets))
+        if k <= 0:
+            return []
+        top = np.argpartition(-sheet_scores, k - 1)[:k]
+        top = top[np.argsort(-sheet_scores[top])]
+
+        results = []
+        for i in top:
+            sheet = self.sheets[i]
+            info = self.sheet_info.get(sheet, {})
+            results.append({
+                "sheet": sheet,
+                "columns": info.get("columns", ""),
+                "text": info.get("text", f"Sheet: {sheet}"),
+                "score": float(sheet_scores[i])
+            })
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Router size"""
+        return {
+            "sheets": len(self.sheets),
+            "routing_vectors": int(self.matrix.shape[0]),
+            "dim": int(self.matrix.shape[1])
+        }
@@ -2,12 +2,16 @@
 Structure Vector DB Module
 Handles encoding and storage of Excel schema (sheets, columns, descriptions)
 """
-import os
+import threading
+
+import numpy as np
 import pandas as pd
-from typing import List, Dict, Any
-from sentence_transformers import SentenceTransformer
-from pymilvus import MilvusClient
+from typing import List, Dict, Any, Optional
 from . import config
+from .model_loader import load_embedding_model
+from .search_tuning import tune_search_params, resolve_search_params, clear_search_params
+from .sheet_router import SheetRouter
+from .index_server import open_milvus_client
 
 
 class StructureVectorDB:
@@ -23,13 +27,14 @@ class StructureVectorDB:
             db_path: Path to Milvus Lite database file
         """
         self.db_path = db_path
-        self.client = MilvusClient(db_path)
+        self.client = open_milvus_client(db_path)
         self.collection_name = config.STRUCTURE_COLLECTION
-        # Uses HF_TOKEN environment variable if available
-        self.model = SentenceTransformer(
-            config.EMBEDDING_MODEL,
-            token=os.environ.get('HF_TOKEN')
-        )
+        # Shared with the other DB; EMBEDDING_BACKEND picks PyTorch or int8 ONNX Runtime
+        self.model = load_embedding_model()
+        self._search_params = None
+        self._router = None
+        self._router_loaded = False
+        self._router_lock = threading.Lock()
 
     def create_collection(self, drop_existing: bool = False):
         """
@@ -40,6 +45,7 @@ class StructureVectorDB:
         """
         if drop_existing and self.client.has_collection(self.collection_name):
             self.client.drop_collection(self.collection_name)
+            clear_search_params(self.client, self.collection_name)
             print(f"Dropped existing collection: {self.collection_name}")
 
         if not self.client.has_collection(self.collection_name):
@@ -133,6 +139,7 @@ class StructureVectorDB:
         # Insert all at once (structure data is small)
         self.client.insert(collection_name=self.collection_name, data=data)
         print(f"Inserted {len(data)} structure vectors into {self.collection_name}")
+        return embeddings
 
     def _get_actual_index_type(self) -> str:
         """
@@ -150,32 +157,86 @@ class StructureVectorDB:
         except:
             return config.INDEX_TYPE
 
-    def search(self, query: str, top_k: int = config.TOP_K_STRUCTURE) -> List[Dict[str, Any]]:
+    def _get_search_params(self) -> Dict[str, Any]:
+        """Search parameters for this collection (loaded once, then cached)"""
+        if self._search_params is None:
+            self._search_params = resolve_search_params(self.client, self.collection_name)
+        return self._search_params
+
+    def get_router(self) -> Optional[SheetRouter]:
+        """
+        In-memory sheet router (loaded once, then cached)
+
+        Returns:
+            SheetRouter, or None if routing is disabled or no centroids were built
+        """
+        with self._router_lock:
+            if not self._router_loaded:
+                if config.SHEET_ROUTER_ENABLED:
+                    try:
+                        self._router = SheetRouter.load(self.client, self.collection_name)
+                    except Exception as e:
+                        print(f"⚠️  Could not load sheet router: {e}")
+                    if self._router is not None:
+                        stats = self._router.get_stats()
+                        print(f"✓ Sheet router loaded: {stats['routing_vectors']} vectors for {stats['sheets']} sheets")
+                    else:
+                        print("⚠️  No sheet centroids found; routing with the structure collection")
+                self._router_loaded = True
+            return self._router
+
+    def tune_search(self, vectors, target_recall: float = config.TARGET_RECALL) -> Dict[str, Any]:
+        """
+        Tune ef/nprobe for a target recall and store the result with the collection
+
+        Args:
+            vectors: Embeddings inserted into the collection
+            target_recall: Recall@k to reach
+
+        Returns:
+            Tuning record (empty if the index type has nothing to tune)
+        """
+        record = tune_search_params(
+            self.client,
+            self.collection_name,
+            vectors,
+            target_recall=target_recall,
+            top_k=config.TOP_K_STRUCTURE
+        )
+        self._search_params = None
+        return record
+
+    def search(
+        self,
+        query: str,
+        top_k: int = config.TOP_K_STRUCTURE,
+        query_embedding: Optional[np.ndarray] = None
+    ) -> List[Dict[str, Any]]:
         """
         Search for relevant sheets/columns based on query
 
+        Uses the in-memory sheet router when centroids were built with the
+        content DB, otherwise a Milvus search of the structure collection.
+        Router scores are always cosine similarities (higher is better); Milvus
+        scores are distances under config.METRIC_TYPE (lower is better for L2).
+
         Args:
             query: User query text
             top_k: Number of top results to return
+            query_embedding: Optional pre-computed embedding of query, shape (1, dim)
 
         Returns:
             List of search results with sheet, columns, and relevance scores
         """
-        # Encode query
-        query_emb = self.model.encode([query])
+        # Encode query (unless the caller already did)
+        query_emb = query_embedding if query_embedding is not None else self.model.encode([query])
 
-        # Prepare search params based on index type
-        # Use config INDEX_TYPE to determine which params to use
-        if config.INDEX_TYPE == "HNSW":
-            search_params = {
-                "metric_type": config.METRIC_TYPE,
-                "params": {"ef": config.EF}
-            }
-        else:
-            search_params = {
-                "metric_type": config.METRIC_TYPE,
-                "params": {"nprobe": config.NPROBE}
-            }
+        router = self.get_router()
+        if router is not None:
+            return router.route(query_emb[0], top_k=top_k)
+
+        # Tuned ef/nprobe stored with the collection, else config.EF/NPROBE
+        search_params = self._get_search_params()
 
         # Search
         results = self.client.search(
@@ -199,21 +260,33 @@ class StructureVectorDB:
 
         return formatted_results
 
-    def build_from_excel(self, excel_path: str, drop_existing: bool = False):
+    def build_from_excel(
+        self,
+        excel_path: str,
+        drop_existing: bool = False,
+        target_recall: float = config.TARGET_RECALL
+    ):
         """
         Complete pipeline: extract structure from Excel and insert into DB
 
         Args:
             excel_path: Path to Excel file
             drop_existing: If True, recreate the collection
+            target_recall: Tune ef/nprobe for this recall@k after inserting (0 = skip)
         """
         print(f"Building structure database from: {excel_path}")
 
+        # Tuning needs every vector in the collection, so only tune fresh builds
+        fresh = drop_existing or not self.client.has_collection(self.collection_name)
+
         # Create collection
         self.create_collection(drop_existing=drop_existing)
 
         # Extract and insert structures
         structures = self.extract_structure_from_excel(excel_path)
-        self.insert_structures(structures)
+        embeddings = self.insert_structures(structures)
+
+        if target_recall and fresh and embeddings is not None:
+            self.tune_search(embeddings, target_recall)
 
         print("Structure database build complete!")
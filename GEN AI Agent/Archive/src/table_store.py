@@ -0,0 +1,336 @@
+"""
+Table Store Module
+Full copy of every sheet in SQLite, for exact answers to aggregate and filter questions
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import pandas as pd
+
+from . import config
+from .row_store import file_signature, is_milvus_lite
+
+# Table store file next to a Milvus database (or its GCS object): <db>.tables.sqlite
+TABLE_STORE_SUFFIX = ".tables.sqlite"
+
+# Metadata table: one row per sheet with its SQL table name and column mapping
+META_TABLE = "_sheets"
+
+# Example values stored per column so the SQL generator sees real category spellings
+EXAMPLE_VALUES = 3
+
+# Questions the top-k retrieved rows cannot answer (counts, sums, averages, top N, ...);
+# only explicit aggregate wording, since each match costs an extra LLM call for the SQL
+AGGREGATE_PATTERN = re.compile(
+    r"\b(how many|count|number of|total|sum|average|avg|median|"
+    r"group(?:ed)? by|top \d+|bottom \d+)\b",
+    re.IGNORECASE
+)
+
+# SQLite authorizer actions a generated query may perform (read-only SELECTs)
+_ALLOWED_ACTIONS = {
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_FUNCTION,
+    getattr(sqlite3, "SQLITE_RECURSIVE", 33)
+}
+
+SQL_SYSTEM_PROMPT = """You translate questions about an Excel workbook into a single SQLite query.
+
+Rules:
+1. Return exactly one SELECT statement (WITH ... SELECT is allowed) in a ```sql code block
+2. Use only the tables and double-quoted column names listed in the schema
+3. Compute the answer in SQL (SUM, COUNT, AVG, GROUP BY, ORDER BY ... LIMIT) instead of returning raw rows
+4. Text comparisons should be case-insensitive (use LIKE or LOWER()) unless the example values show the exact spelling
+5. If the schema cannot answer the question, reply with NO_SQL and nothing else"""
+
+
+def table_store_path(db_path: str = config.DB_PATH) -> Optional[str]:
+    """
+    Location of the table store for a Milvus database
+
+    Args:
+        db_path: Milvus database path (or GCS object path) or Milvus server URI
+
+    Returns:
+        TABLE_STORE_PATH if set, else db_path with TABLE_STORE_SUFFIX;
+        None for a server URI, which has no file to put the store next to
+    """
+    if config.TABLE_STORE_PATH:
+        return config.TABLE_STORE_PATH
+    if not is_milvus_lite(db_path):
+        return None
+    return str(Path(db_path).with_suffix(TABLE_STORE_SUFFIX))
+
+
+def is_aggregate_question(question: str) -> bool:
+    """True if the question asks for a computed answer rather than matching rows"""
+    return bool(AGGREGATE_PATTERN.search(question))
+
+
+def _identifier(name: str, prefix: str, taken: set) -> str:
+    """Unique SQL identifier derived from a sheet or column name"""
+    base = re.sub(r"[^0-9a-zA-Z]+", "_", str(name)).strip("_").lower() or prefix
+    if base[0].isdigit():
+        base = f"{prefix}_{base}"
+    identifier = base
+    suffix = 2
+    while identifier in taken:
+        identifier = f"{base}_{suffix}"
+        suffix += 1
+    taken.add(identifier)
+    return identifier
+
+
+def _sql_type(series: pd.Series) -> str:
+    """SQLite affinity used for a DataFrame column"""
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_integer_dtype(series):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(series):
+        return "REAL"
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "TIMESTAMP"
+    return "TEXT"
+
+
+def _sqlite_value(value):
+    """Cell value SQLite can store (mixed-type Excel columns arrive as objects)"""
+    if value is None or (isinstance(value, float) and pd.isna(value)) or value is pd.NaT:
+        return None
+    if isinstance(value, (int, float, str)):
+        return value
+    return str(value)
+
+
+def build_table_store(excel_path: str, store_path: str) -> Dict[str, Any]:
+    """
+    Copy every sheet of the workbook into a SQLite file
+
+    Each sheet becomes one table with all of its columns (not just the first
+    five used for embedding). The file is written next to store_path and
+    renamed into place, so readers never see a half-built store.
+
+    Args:
+        excel_path: Path to Excel file
+        store_path: SQLite file to create (replaced if it exists)
+
+    Returns:
+        Summary with the number of sheets and rows written
+    """
+    print(f"Building table store: {store_path}")
+    all_sheets = pd.read_excel(excel_path, sheet_name=None)
+
+    tmp_path = f"{store_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute(
+            f'CREATE TABLE "{META_TABLE}" (sheet TEXT PRIMARY KEY, table_name TEXT, columns TEXT, row_count INTEGER)'
+        )
+        table_names = {META_TABLE}
+        total_rows = 0
+
+        for sheet_name, df in all_sheets.items():
+            table = _identifier(sheet_name, "sheet", table_names)
+            column_names = set()
+            columns = []
+            for original in df.columns:
+                column = _identifier(original, "col", column_names)
+                series = df[original]
+                if _sql_type(series) == "TEXT":
+                    series = series.map(_sqlite_value)
+                elif _sql_type(series) == "TIMESTAMP":
+                    series = series.map(lambda v: None if pd.isna(v) else v.isoformat(sep=" "))
+                examples = series.dropna().astype(str).drop_duplicates().head(EXAMPLE_VALUES).tolist()
+                columns.append({
+                    "name": str(original),
+                    "column": column,
+                    "type": _sql_type(df[original]),
+                    "examples": examples,
+                    "data": series
+                })
+
+            table_df = pd.DataFrame({c["column"]: c.pop("data").values for c in columns})
+            table_df.to_sql(table, conn, index=False, chunksize=10000)
+            conn.execute(
+                f'INSERT INTO "{META_TABLE}" VALUES (?, ?, ?, ?)',
+                (str(sheet_name), table, json.dumps(columns), len(table_df))
+            )
+            total_rows += len(table_df)
+
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, store_path)
+    print(f"✓ Table store built: {len(all_sheets)} sheets, {total_rows} rows")
+    return {"sheets": len(all_sheets), "rows": total_rows}
+
+
+def extract_sql(text: str) -> Optional[str]:
+    """
+    SQL statement from an LLM reply
+
+    Returns:
+        The statement, or None if the reply declined (NO_SQL) or holds no SELECT
+    """
+    if not text or "NO_SQL" in text:
+        return None
+    match = re.search(r"```(?:sql)?\s*(.*?)```", text, re.DOTALL | re.IGNORECASE)
+    sql = (match.group(1) if match else text).strip().rstrip(";").strip()
+    if not re.match(r"^(SELECT|WITH)\b", sql, re.IGNORECASE):
+        return None
+    return sql
+
+
+class TableStore:
+    """
+    Read-only access to the SQLite table store
+
+    Generated SQL runs under an authorizer that only permits reads, with a
+    row cap and a time limit.
+    """
+
+    def __init__(self, store_path: str):
+        """
+        Open the store
+
+        Args:
+            store_path: SQLite file written by build_table_store
+        """
+        self.store_path = store_path
+        self.signature = file_signature(store_path)
+        self.conn = sqlite3.connect(f"file:{store_path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+
+        rows = self.conn.execute(f'SELECT sheet, table_name, columns, row_count FROM "{META_TABLE}"').fetchall()
+        self.sheets = {
+            sheet: {"table": table, "columns": json.loads(columns), "row_count": row_count}
+            for sheet, table, columns, row_count in rows
+        }
+        self.conn.set_authorizer(self._authorize)
+
+    def is_current(self) -> bool:
+        """False once the file on disk was replaced (rebuild, database reload)"""
+        try:
+            return file_signature(self.store_path) == self.signature
+        except OSError:
+            return False
+
+    @staticmethod
+    def _authorize(action, *args) -> int:
+        """Allow only read access from generated queries"""
+        return sqlite3.SQLITE_OK if action in _ALLOWED_ACTIONS else sqlite3.SQLITE_DENY
+
+    def describe(self, sheets: Optional[List[str]] = None) -> str:
+        """
+        Schema text for the SQL generator
+
+        Args:
+            sheets: Sheets to include (default: all)
+
+        Returns:
+            One block per table listing its columns, types and example values
+        """
+        parts = []
+        for sheet in sheets or list(self.sheets):
+            info = self.sheets.get(sheet)
+            if info is None:
+                continue
+            parts.append(f'Table "{info["table"]}" (sheet "{sheet}", {info["row_count"]} rows):')
+            for column in info["columns"]:
+                examples = ", ".join(repr(v[:40]) for v in column["examples"])
+                parts.append(f'  "{column["column"]}" {column["type"]} -- "{column["name"]}", e.g. {examples}')
+        return "\n".join(parts)
+
+    def execute(
+        self,
+        sql: str,
+        max_rows: int = config.SQL_MAX_ROWS,
+        timeout_s: float = config.SQL_TIMEOUT_S
+    ) -> Dict[str, Any]:
+        """
+        Run a read-only query
+
+        Args:
+            sql: SELECT statement
+            max_rows: Maximum rows returned
+            timeout_s: Abort the query after this many seconds
+
+        Returns:
+            Dictionary with "columns", "rows" and "truncated"
+
+        Raises:
+            sqlite3.Error: If the statement is invalid, not read-only or times out
+        """
+        deadline = time.monotonic() + timeout_s
+        with self._lock:
+            self.conn.set_progress_handler(lambda: int(time.monotonic() > deadline), 10000)
+            try:
+                cursor = self.conn.execute(sql)
+                rows = cursor.fetchmany(max_rows + 1)
+                columns = [d[0] for d in cursor.description or []]
+            finally:
+                self.conn.set_progress_handler(None, 0)
+
+        return {"columns": columns, "rows": rows[:max_rows], "truncated": len(rows) > max_rows}
+
+    def generate_sql(self, llm, question: str, sheets: Optional[List[str]] = None) -> Optional[str]:
+        """
+        Translate a question into SQL over the given sheets
+
+        Args:
+            llm: LLMLayer used for the translation
+            question: User question
+            sheets: Candidate sheets (e.g. from the sheet router)
+
+        Returns:
+            SQL statement, or None if the LLM could not produce one
+        """
+        schema = self.describe(sheets)
+        if not schema:
+            return None
+        response = llm.generate_answer(f"=== TABLES ===\n{schema}", question, system_prompt=SQL_SYSTEM_PROMPT)
+        if response.get("backend") == "error":
+            return None
+        return extract_sql(response.get("answer", ""))
+
+    def close(self):
+        """Close the connection"""
+        self.conn.close()
+
+
+def format_sql_result(sql: str, result: Dict[str, Any]) -> str:
+    """Computed result as context text for the answering LLM"""
+    lines = [f"SQL: {sql}", " | ".join(result["columns"])]
+    for row in result["rows"]:
+        lines.append(" | ".join("" if v is None else str(v) for v in row))
+    if not result["rows"]:
+        lines.append("(no rows)")
+    if result["truncated"]:
+        lines.append(f"(first {len(result['rows'])} rows shown)")
+    return "\n".join(lines)
+
+
+def open_table_store(store_path: Optional[str]) -> Optional[TableStore]:
+    """
+    Open the table store if it has been built
+
+    Returns:
+        TableStore, or None if there is no path, the file does not exist or cannot be read
+    """
+    if store_path is None or not os.path.exists(store_path):
+        return None
+    try:
+        return TableStore(store_path)
+    except sqlite3.Error as e:
+        print(f"⚠️  Could not open table store {store_path}: {e}")
+        return None
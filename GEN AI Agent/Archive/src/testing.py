@@ -2,13 +2,78 @@
 Testing Module
 Validates retrieval and LLM outputs at each stage
 """
-from typing import Dict, List, Any
+import io
+import json
+from contextlib import redirect_stdout
+from datetime import datetime
+from typing import Dict, List, Any, Optional
 from .structure_db import StructureVectorDB
 from .content_db import ContentVectorDB
 from .query_engine import QueryEngine
 from .llm_layer import LLMLayer
+from .index_benchmark import latency_percentiles
 from . import config
 
+# Retrieval stages timed by QueryEngine.query
+EVAL_STAGES = [
+    "embedding_ms", "structure_search_ms", "sql_generate_ms", "sql_execute_ms",
+    "content_search_ms", "rerank_ms", "context_build_ms", "total_ms"
+]
+
+# Quality metrics compared against a baseline (higher is better)
+EVAL_QUALITY_METRICS = ["routing_accuracy", "routing_top1", "content_recall_at_k", "mrr"]
+
+
+def _as_list(value) -> List[str]:
+    """Normalize a single label or list of labels to a list of strings"""
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(v) for v in value]
+    return [str(value)]
+
+
+def load_labeled_cases(path: str) -> List[Dict[str, Any]]:
+    """
+    Load labeled retrieval cases from a JSON list or JSONL file
+
+    Each case has a "query" plus "expected_sheet" (or "expected_sheets") and
+    optionally "expected_row" (or "expected_rows"). Expected rows are matched
+    case-insensitively as substrings of the retrieved row text, e.g.:
+
+        {"query": "cost of product xyz", "expected_sheet": "Pricing", "expected_row": "xyz"}
+
+    Args:
+        path: Path to the cases file
+
+    Returns:
+        List of cases with normalized "expected_sheets" and "expected_rows" lists
+    """
+    with open(path) as f:
+        text = f.read().strip()
+
+    if text.startswith("["):
+        raw_cases = json.loads(text)
+    else:
+        raw_cases = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    cases = []
+    for i, case in enumerate(raw_cases):
+        if "query" not in case:
+            raise ValueError(f"Case {i} in {path} has no 'query'")
+        cases.append({
+            "id": case.get("id", i),
+            "query": case["query"],
+            "expected_sheets": _as_list(case.get("expected_sheets", case.get("expected_sheet"))),
+            "expected_rows": _as_list(case.get("expected_rows", case.get("expected_row")))
+        })
+    return cases
+
+
+def _row_matches(expected: str, text: str) -> bool:
+    """Whether a retrieved row text matches an expected row label"""
+    return expected.strip().lower() in text.lower()
+
 
 class ExcelRAGTester:
     """
@@ -300,12 +365,241 @@ class ExcelRAGTester:
 
         return results
 
-    def run_all_tests(self, sample_query: str = "digital delivery system") -> List[Dict[str, Any]]:
+    def evaluate_case(
+        self,
+        case: Dict[str, Any],
+        top_k_structure: int = config.TOP_K_STRUCTURE,
+        top_k_content: int = config.TOP_K_CONTENT
+    ) -> Dict[str, Any]:
+        """
+        Run one labeled case through the retrieval pipeline and score it
+
+        Args:
+            case: Case from load_labeled_cases
+            top_k_structure: Number of sheets to route to
+            top_k_content: Number of content rows to retrieve
+
+        Returns:
+            Per-case scores, retrieved sheets and stage timings
+        """
+        # QueryEngine.query narrates every step; keep the eval report readable
+        with redirect_stdout(io.StringIO()):
+            query_results = self.query_engine.query(
+                case["query"],
+                top_k_structure=top_k_structure,
+                top_k_content=top_k_content
+            )
+
+        routed_sheets = [r["sheet"] for r in query_results["structure_results"]]
+        content_results = query_results["content_results"]
+        scores = {"id": case["id"], "query": case["query"], "routed_sheets": routed_sheets}
+
+        expected_sheets = case["expected_sheets"]
+        if expected_sheets:
+            scores["routing_accuracy"] = len(set(expected_sheets) & set(routed_sheets)) / len(expected_sheets)
+            scores["routing_top1"] = float(bool(routed_sheets) and routed_sheets[0] in expected_sheets)
+
+        expected_rows = case["expected_rows"]
+        if expected_rows:
+            found = [
+                any(_row_matches(expected, r["text"]) for r in content_results)
+                for expected in expected_rows
+            ]
+            scores["content_recall_at_k"] = sum(found) / len(expected_rows)
+
+            first_rank = next(
+                (rank for rank, r in enumerate(content_results, 1)
+                 if any(_row_matches(expected, r["text"]) for expected in expected_rows)),
+                None
+            )
+            scores["mrr"] = 1.0 / first_rank if first_rank else 0.0
+
+        scores["timings"] = query_results.get("timings", {})
+        scores["context_chars"] = len(query_results["context"])
+        return scores
+
+    def evaluate_labeled_cases(
+        self,
+        cases: List[Dict[str, Any]],
+        top_k_structure: int = config.TOP_K_STRUCTURE,
+        top_k_content: int = config.TOP_K_CONTENT
+    ) -> Dict[str, Any]:
+        """
+        Score a set of labeled cases
+
+        Args:
+            cases: Cases from load_labeled_cases
+            top_k_structure: Number of sheets to route to
+            top_k_content: Number of content rows to retrieve
+
+        Returns:
+            Report with aggregate metrics, stage latency percentiles and per-case scores
+        """
+        per_case = [self.evaluate_case(case, top_k_structure, top_k_content) for case in cases]
+
+        metrics = {}
+        for metric in EVAL_QUALITY_METRICS:
+            values = [c[metric] for c in per_case if metric in c]
+            if values:
+                metrics[metric] = sum(values) / len(values)
+
+        latency = {}
+        for stage in EVAL_STAGES:
+            values = [c["timings"][stage] for c in per_case if stage in c["timings"]]
+            if values:
+                latency[stage] = latency_percentiles(values)
+
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "num_cases": len(cases),
+            "settings": {
+                "top_k_structure": top_k_structure,
+                "top_k_content": top_k_content,
+                "index_type": config.INDEX_TYPE,
+                "structure_search_params": self.structure_db._get_search_params()["params"],
+                "content_search_params": self.content_db._get_search_params()["params"],
+                "embedding_model": config.EMBEDDING_MODEL
+            },
+            "metrics": metrics,
+            "latency": latency,
+            "mean_context_chars": sum(c["context_chars"] for c in per_case) / max(len(per_case), 1),
+            "cases": per_case
+        }
+
+    def compare_to_baseline(
+        self,
+        report: Dict[str, Any],
+        baseline: Dict[str, Any],
+        quality_tolerance: float = 0.01,
+        latency_tolerance: float = 0.25
+    ) -> Dict[str, Any]:
+        """
+        Compare an evaluation report against a stored baseline report
+
+        Args:
+            report: Report from evaluate_labeled_cases
+            baseline: Previously saved report
+            quality_tolerance: Allowed absolute drop in a quality metric
+            latency_tolerance: Allowed relative increase in a stage's p95 latency
+
+        Returns:
+            Dictionary with per-metric deltas and lists of regressions
+        """
+        comparison = {"quality": {}, "latency_p95": {}, "quality_regressions": [], "latency_regressions": []}
+
+        for metric in EVAL_QUALITY_METRICS:
+            if metric in report["metrics"] and metric in baseline.get("metrics", {}):
+                current, previous = report["metrics"][metric], baseline["metrics"][metric]
+                comparison["quality"][metric] = {"baseline": previous, "current": current, "delta": current - previous}
+                if current < previous - quality_tolerance:
+                    comparison["quality_regressions"].append(metric)
+
+        for stage in EVAL_STAGES:
+            if stage in report["latency"] and stage in baseline.get("latency", {}):
+                current, previous = report["latency"][stage]["p95_ms"], baseline["latency"][stage]["p95_ms"]
+                comparison["latency_p95"][stage] = {"baseline": previous, "current": current, "delta": current - previous}
+                if previous > 0 and current > previous * (1 + latency_tolerance):
+                    comparison["latency_regressions"].append(stage)
+
+        return comparison
+
+    def test_labeled_retrieval(
+        self,
+        cases_path: str,
+        top_k_structure: int = config.TOP_K_STRUCTURE,
+        top_k_content: int = config.TOP_K_CONTENT,
+        baseline_path: Optional[str] = None,
+        output_path: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Test 6: Labeled retrieval quality and per-stage latency
+
+        Computes structure-routing accuracy, content recall@k and MRR over a
+        file of labeled cases. With a baseline, fails on quality regressions
+        and flags stages whose p95 latency grew.
+
+        Args:
+            cases_path: Labeled cases file (see load_labeled_cases)
+            top_k_structure: Number of sheets to route to
+            top_k_content: Number of content rows to retrieve
+            baseline_path: Optional report to compare against
+            output_path: Optional path to write this run's report (usable as a baseline)
+
+        Returns:
+            Test results dictionary
+        """
+        print("\n=== TEST 6: LABELED RETRIEVAL ===")
+        print(f"Cases: {cases_path}")
+
+        results = {
+            "test_name": "Labeled Retrieval Test",
+            "passed": False,
+            "details": {"cases_path": cases_path}
+        }
+
+        try:
+            cases = load_labeled_cases(cases_path)
+            print(f"Evaluating {len(cases)} cases (top_k_structure={top_k_structure}, "
+                  f"top_k_content={top_k_content})...")
+            report = self.evaluate_labeled_cases(cases, top_k_structure, top_k_content)
+            results["details"]["report"] = report
+
+            print("\nQuality:")
+            for metric, value in report["metrics"].items():
+                print(f"  {metric:<22} {value:.4f}")
+            print("\nLatency (ms):           p50      p95      p99")
+            for stage, stats in report["latency"].items():
+                print(f"  {stage:<20} {stats['p50_ms']:>7.2f}  {stats['p95_ms']:>7.2f}  {stats['p99_ms']:>7.2f}")
+            print(f"\nMean context size: {report['mean_context_chars']:.0f} chars")
+
+            results["passed"] = True
+            if baseline_path:
+                with open(baseline_path) as f:
+                    baseline = json.load(f)
+                comparison = self.compare_to_baseline(report, baseline)
+                results["details"]["comparison"] = comparison
+
+                print(f"\nCompared to baseline {baseline_path} ({baseline.get('timestamp', 'unknown')}):")
+                for metric, delta in comparison["quality"].items():
+                    marker = "✗" if metric in comparison["quality_regressions"] else "✓"
+                    print(f"  {marker} {metric:<24} {delta['baseline']:.4f} -> {delta['current']:.4f} "
+                          f"({delta['delta']:+.4f})")
+                for stage, delta in comparison["latency_p95"].items():
+                    marker = "⚠️ " if stage in comparison["latency_regressions"] else "✓"
+                    print(f"  {marker} {stage + ' p95':<24} {delta['baseline']:.2f} -> {delta['current']:.2f} ms "
+                          f"({delta['delta']:+.2f})")
+
+                results["passed"] = not comparison["quality_regressions"]
+
+            if output_path:
+                with open(output_path, "w") as f:
+                    json.dump(report, f, indent=2, default=str)
+                print(f"\nReport written to: {output_path}")
+
+            if results["passed"]:
+                print("\n✓ Labeled retrieval evaluation passed")
+            else:
+                print("\n✗ Retrieval quality regressed against baseline")
+
+        except Exception as e:
+            results["details"]["error"] = str(e)
+            print(f"✗ Labeled retrieval error: {e}")
+
+        return results
+
+    def run_all_tests(
+        self,
+        sample_query: str = "digital delivery system",
+        cases_path: Optional[str] = None,
+        baseline_path: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
         """
         Run complete test suite
 
         Args:
             sample_query: Query to use for testing
+            cases_path: Optional labeled cases file; adds the labeled retrieval test
+            baseline_path: Optional baseline report for the labeled retrieval test
 
         Returns:
             List of all test results
@@ -322,6 +616,8 @@ class ExcelRAGTester:
         all_results.append(self.test_retrieval(sample_query))
         all_results.append(self.test_llm())
         all_results.append(self.test_end_to_end(sample_query))
+        if cases_path:
+            all_results.append(self.test_labeled_retrieval(cases_path, baseline_path=baseline_path))
 
         # Summary
         print("\n" + "=" * 60)
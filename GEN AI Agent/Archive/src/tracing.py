@@ -0,0 +1,546 @@
+"""
+Span Tracing Module
+Vendor-neutral spans with parent/child links, exported to a local JSONL file and/or LangSmith
+
+This file is self-contained (standard library only, LangSmith imported lazily)
+and also imported by the Zebra printer RAG (Zebra Project/src/archive_shared.py),
+so both pipelines emit the same trace format. Tracers of different services in
+one process share one exporter per sink, e.g. one writer per JSONL file.
+
+Configuration (environment variables, read on first use):
+    TRACE_EXPORTERS         Comma-separated sinks: "jsonl", "langsmith" (default: none)
+    TRACE_JSONL_PATH        JSONL output file (default: traces.jsonl)
+    TRACE_RELEASE           Release label stamped on every span (default: "dev")
+    TRACE_SAMPLE_RATE       Fraction of traces kept (default: 1.0)
+    TRACE_SLOW_THRESHOLD_S  Traces slower than this are always kept (default: 5.0)
+    TRACE_QUEUE_SIZE        Spans buffered per exporter before dropping (default: 1000)
+    TRACE_BATCH_SIZE        Spans per export batch (default: 50)
+    TRACE_FLUSH_INTERVAL_S  Max wait before a partial batch is exported (default: 2.0)
+
+Usage:
+    tracer = get_span_tracer("excel-rag")
+    with tracer.start_span("query", attributes={"top_k": 5}) as span:
+        with tracer.start_span("embedding", kind="embedding"):
+            ...
+        span.set_attribute("results", 3)
+
+Summarize or compare recorded traces:
+    python tracing.py summarize traces.jsonl
+    python tracing.py compare baseline.jsonl candidate.jsonl
+"""
+import atexit
+import contextvars
+import json
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, List, Callable, Iterator
+
+# Spans kept per trace while waiting for the root to finish (tail sampling buffer)
+MAX_SPANS_PER_TRACE = 1000
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+class BackgroundExporter:
+    """
+    Bounded queue drained by a daemon thread that hands batches to a sink
+
+    submit() never blocks: when the queue is full the item is dropped and
+    counted. Batches are flushed when they reach batch_size or every
+    flush_interval seconds, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        sink: Callable[[List[Dict[str, Any]]], None],
+        max_queue_size: int = 1000,
+        batch_size: int = 50,
+        flush_interval: float = 2.0,
+        name: str = "trace-exporter"
+    ):
+        """
+        Initialize and start the exporter thread
+
+        Args:
+            sink: Called with each batch of items (runs in the exporter thread)
+            max_queue_size: Items held before new ones are dropped
+            batch_size: Maximum items per sink call
+            flush_interval: Seconds to wait before flushing a partial batch
+            name: Thread name
+        """
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._stats = {"submitted": 0, "exported": 0, "dropped": 0, "failed": 0}
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Dict[str, Any]) -> bool:
+        """
+        Queue an item for export without blocking
+
+        Returns:
+            False if the queue was full and the item was dropped
+        """
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("submitted")
+        return True
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self._stats[key] += n
+
+    def _run(self):
+        """Exporter loop: collect a batch, hand it to the sink, repeat"""
+        while True:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            if batch:
+                self._export(batch)
+
+    def _export(self, batch: List[Dict[str, Any]]):
+        try:
+            self.sink(batch)
+            self._count("exported", len(batch))
+        except Exception as e:
+            self._count("failed", len(batch))
+            print(f"⚠ Trace export failed ({len(batch)} items dropped): {e}")
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Wait until everything queued so far has been exported
+
+        Returns:
+            True if the queue drained within timeout
+        """
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def get_stats(self) -> Dict[str, int]:
+        """Counts of submitted, exported, dropped and failed items, plus current queue depth"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["queued"] = self._queue.qsize()
+        return stats
+
+
+class Span:
+    """
+    One timed unit of work with attributes and an optional parent
+
+    Spans are created through SpanTracer.start_span, which links them to the
+    currently active span and records them when they end.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        kind: str = "chain",
+        parent: Optional["Span"] = None,
+        attributes: Optional[Dict[str, Any]] = None
+    ):
+        self.name = name
+        self.kind = kind
+        self.span_id = str(uuid.uuid4())
+        self.parent = parent
+        self.parent_id = parent.span_id if parent else None
+        self.root = parent.root if parent else self
+        self.trace_id = self.root.span_id
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.inputs: Dict[str, Any] = {}
+        self.outputs: Dict[str, Any] = {}
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.start_time = datetime.now(timezone.utc)
+        self.end_time: Optional[datetime] = None
+        self._start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+
+        # Sortable path from the root, as LangSmith expects for nested runs
+        own_order = f"{self.start_time.strftime('%Y%m%dT%H%M%S%fZ')}{self.span_id}"
+        self.dotted_order = f"{parent.dotted_order}.{own_order}" if parent else own_order
+
+        if parent is None:
+            # Trace-level state lives on the root span
+            self.sampled = False
+            self.trace_error = False
+            self.finished: List[Dict[str, Any]] = []
+
+    def set_attribute(self, key: str, value: Any):
+        """Attach a key/value attribute"""
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        """Attach several attributes"""
+        self.attributes.update(attributes)
+
+    def set_inputs(self, **inputs):
+        """Record inputs (shown as run inputs in LangSmith)"""
+        self.inputs.update(inputs)
+
+    def set_outputs(self, **outputs):
+        """Record outputs (shown as run outputs in LangSmith)"""
+        self.outputs.update(outputs)
+
+    def record_error(self, error: Any):
+        """Mark the span (and its trace) as failed"""
+        self.status = "error"
+        self.error = f"{type(error).__name__}: {error}" if isinstance(error, BaseException) else str(error)
+        self.root.trace_error = True
+
+    def end(self):
+        """Stop the clock"""
+        if self.end_time is None:
+            self.end_time = datetime.now(timezone.utc)
+            self.duration_ms = (time.perf_counter() - self._start) * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable representation (one JSONL line)"""
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time": self.start_time.isoformat(),
+            "end_time": self.end_time.isoformat() if self.end_time else None,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+            "inputs": self.inputs,
+            "outputs": self.outputs,
+            "dotted_order": self.dotted_order,
+        }
+
+
+class _NoopSpan:
+    """Stand-in span used when no exporter is configured"""
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        pass
+
+    def set_inputs(self, **inputs):
+        pass
+
+    def set_outputs(self, **outputs):
+        pass
+
+    def record_error(self, error: Any):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _jsonl_sink(path: str) -> Callable[[List[Dict[str, Any]]], None]:
+    """Sink appending span dictionaries to a JSONL file"""
+    def sink(spans: List[Dict[str, Any]]):
+        with open(path, "a") as f:
+            for span in spans:
+                f.write(json.dumps(span, default=str) + "\n")
+    return sink
+
+
+_exporters: Dict[tuple, "BackgroundExporter"] = {}
+_exporters_lock = threading.Lock()
+
+
+def _shared_exporter(
+    key: tuple,
+    make_sink: Callable[[], Callable[[List[Dict[str, Any]]], None]],
+    **exporter_args
+) -> "BackgroundExporter":
+    """Exporter for a sink (e.g. ("jsonl", path)), created once per process"""
+    with _exporters_lock:
+        if key not in _exporters:
+            _exporters[key] = BackgroundExporter(make_sink(), **exporter_args)
+        return _exporters[key]
+
+
+def _langsmith_sink(project_name: str) -> Callable[[List[Dict[str, Any]]], None]:
+    """Sink sending span dictionaries to LangSmith as nested runs"""
+    from langsmith import Client
+
+    client = Client(
+        api_key=os.getenv("LANGCHAIN_API_KEY"),
+        api_url=os.getenv("LANGCHAIN_ENDPOINT", "https://api.smith.langchain.com")
+    )
+
+    def sink(spans: List[Dict[str, Any]]):
+        runs = []
+        for span in spans:
+            run = {
+                "id": span["span_id"],
+                "trace_id": span["trace_id"],
+                "dotted_order": span["dotted_order"],
+                "session_name": project_name,
+                "name": span["name"],
+                "run_type": span["kind"],
+                "inputs": span["inputs"],
+                "outputs": span["outputs"],
+                "extra": {"metadata": span["attributes"]},
+                "start_time": span["start_time"],
+                "end_time": span["end_time"],
+            }
+            if span["parent_id"]:
+                run["parent_run_id"] = span["parent_id"]
+            if span["error"]:
+                run["error"] = span["error"]
+            runs.append(run)
+        client.batch_ingest_runs(create=runs)
+    return sink
+
+
+class SpanTracer:
+    """
+    Creates spans and ships finished traces to the configured exporters
+
+    Sampling is decided per trace: the head decision (TRACE_SAMPLE_RATE) is
+    taken when the root span starts, and when the root ends the trace is
+    kept anyway if it was slow or any span failed (tail sampling).
+    """
+
+    def __init__(
+        self,
+        service: str,
+        exporters: Optional[List[str]] = None,
+        jsonl_path: Optional[str] = None
+    ):
+        """
+        Initialize the tracer
+
+        Args:
+            service: Service name stamped on every span (e.g., "excel-rag")
+            exporters: Sinks to use ("jsonl", "langsmith"); defaults to TRACE_EXPORTERS
+            jsonl_path: JSONL file for the "jsonl" sink; defaults to TRACE_JSONL_PATH
+        """
+        if exporters is None:
+            exporters = [e.strip() for e in os.getenv("TRACE_EXPORTERS", "").split(",") if e.strip()]
+
+        self.service = service
+        self.release = os.getenv("TRACE_RELEASE", "dev")
+        self.sample_rate = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+        self.slow_threshold_ms = float(os.getenv("TRACE_SLOW_THRESHOLD_S", "5.0")) * 1000
+        self.jsonl_path = jsonl_path or os.getenv("TRACE_JSONL_PATH", "traces.jsonl")
+        self.exporters: Dict[str, BackgroundExporter] = {}
+
+        exporter_args = {
+            "max_queue_size": int(os.getenv("TRACE_QUEUE_SIZE", "1000")),
+            "batch_size": int(os.getenv("TRACE_BATCH_SIZE", "50")),
+            "flush_interval": float(os.getenv("TRACE_FLUSH_INTERVAL_S", "2.0")),
+        }
+        for name in exporters:
+            try:
+                if name == "jsonl":
+                    key = ("jsonl", os.path.abspath(self.jsonl_path))
+                    make_sink = lambda: _jsonl_sink(self.jsonl_path)
+                elif name == "langsmith":
+                    project_name = os.getenv("LANGCHAIN_PROJECT", service)
+                    key = ("langsmith", project_name)
+                    make_sink = lambda: _langsmith_sink(project_name)
+                else:
+                    print(f"⚠ Unknown trace exporter '{name}' (expected jsonl or langsmith)")
+                    continue
+                self.exporters[name] = _shared_exporter(key, make_sink, name=f"{name}-span-exporter", **exporter_args)
+            except Exception as e:
+                print(f"⚠ Could not start {name} trace exporter: {e}")
+
+        if self.exporters:
+            atexit.register(self.flush)
+            print(f"✓ Span tracing enabled for {service} (exporters: {', '.join(self.exporters)})")
+
+    @property
+    def enabled(self) -> bool:
+        """True if at least one exporter is configured"""
+        return bool(self.exporters)
+
+    def exports_to(self, name: str) -> bool:
+        """Whether the named exporter is active"""
+        return name in self.exporters
+
+    @contextmanager
+    def start_span(
+        self,
+        name: str,
+        kind: str = "chain",
+        attributes: Optional[Dict[str, Any]] = None
+    ) -> Iterator[Span]:
+        """
+        Time a block of work as a child of the currently active span
+
+        Exceptions raised inside the block mark the span as failed and are re-raised.
+
+        Args:
+            name: Span name (e.g., "content_search")
+            kind: Span kind / LangSmith run type (chain, llm, retriever, embedding, ...)
+            attributes: Initial attributes
+
+        Yields:
+            The active span
+        """
+        if not self.exporters:
+            yield _NOOP_SPAN
+            return
+
+        parent = _current_span.get()
+        span = Span(name, kind, parent, attributes)
+        span.attributes.setdefault("service", self.service)
+        span.attributes.setdefault("release", self.release)
+        if parent is None:
+            span.sampled = random.random() < self.sample_rate
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+            self._finish(span)
+
+    def _finish(self, span: Span):
+        """Buffer a finished span; export the whole trace when its root finishes"""
+        root = span.root
+        if len(root.finished) < MAX_SPANS_PER_TRACE:
+            root.finished.append(span.to_dict())
+        if span is not root:
+            return
+
+        keep = root.sampled or root.trace_error or root.duration_ms >= self.slow_threshold_ms
+        if keep:
+            for exporter in self.exporters.values():
+                for item in root.finished:
+                    exporter.submit(item)
+        root.finished = []
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until queued spans are exported"""
+        return all(exporter.flush(timeout) for exporter in self.exporters.values())
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """Exporter counters per sink"""
+        return {name: exporter.get_stats() for name, exporter in self.exporters.items()}
+
+
+_tracers: Dict[str, SpanTracer] = {}
+
+
+def get_span_tracer(service: str) -> SpanTracer:
+    """Get or create the span tracer for a service"""
+    if service not in _tracers:
+        _tracers[service] = SpanTracer(service)
+    return _tracers[service]
+
+
+# ============================================================================
+# Offline analysis of JSONL traces
+# ============================================================================
+
+def summarize_jsonl(path: str) -> Dict[str, Dict[str, float]]:
+    """
+    Per-span-name latency summary of a JSONL trace file
+
+    Returns:
+        {span name: {"count", "errors", "p50_ms", "p95_ms", "p99_ms", "mean_ms"}}
+    """
+    durations: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            span = json.loads(line)
+            durations.setdefault(span["name"], []).append(span["duration_ms"] or 0.0)
+            errors[span["name"]] = errors.get(span["name"], 0) + (span["status"] == "error")
+
+    def percentile(values: List[float], pct: float) -> float:
+        values = sorted(values)
+        index = min(len(values) - 1, max(0, int(round(pct / 100 * (len(values) - 1)))))
+        return values[index]
+
+    return {
+        name: {
+            "count": len(values),
+            "errors": errors[name],
+            "p50_ms": percentile(values, 50),
+            "p95_ms": percentile(values, 95),
+            "p99_ms": percentile(values, 99),
+            "mean_ms": sum(values) / len(values),
+        }
+        for name, values in sorted(durations.items())
+    }
+
+
+def _print_summary(summary: Dict[str, Dict[str, float]]):
+    print(f"{'span':<32} {'count':>7} {'errors':>7} {'p50ms':>9} {'p95ms':>9} {'p99ms':>9}")
+    for name, stats in summary.items():
+        print(f"{name:<32} {stats['count']:>7} {stats['errors']:>7} {stats['p50_ms']:>9.2f} "
+              f"{stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}")
+
+
+def _print_comparison(baseline: Dict[str, Dict[str, float]], candidate: Dict[str, Dict[str, float]]):
+    print(f"{'span':<32} {'base p50':>9} {'new p50':>9} {'base p95':>9} {'new p95':>9} {'p95 change':>11}")
+    for name in sorted(set(baseline) | set(candidate)):
+        base, new = baseline.get(name), candidate.get(name)
+        if not base or not new:
+            print(f"{name:<32} {'only in ' + ('baseline' if base else 'candidate'):>50}")
+            continue
+        change = (new["p95_ms"] - base["p95_ms"]) / base["p95_ms"] * 100 if base["p95_ms"] else 0.0
+        print(f"{name:<32} {base['p50_ms']:>9.2f} {new['p50_ms']:>9.2f} {base['p95_ms']:>9.2f} "
+              f"{new['p95_ms']:>9.2f} {change:>+10.1f}%")
+
+
+def main():
+    """CLI: summarize a trace file or compare two releases"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize or compare JSONL span traces")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    summarize_parser = subparsers.add_parser("summarize", help="Latency per span name")
+    summarize_parser.add_argument("path", help="JSONL trace file")
+    compare_parser = subparsers.add_parser("compare", help="Compare two trace files (e.g. two releases)")
+    compare_parser.add_argument("baseline", help="Baseline JSONL trace file")
+    compare_parser.add_argument("candidate", help="Candidate JSONL trace file")
+    args = parser.parse_args()
+
+    if args.command == "summarize":
+        _print_summary(summarize_jsonl(args.path))
+    else:
+        _print_comparison(summarize_jsonl(args.baseline), summarize_jsonl(args.candidate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+"""
+Archive Shared Modules
+Modules the printer RAG shares with the eDelivery Excel-RAG in GEN AI Agent/Archive/src
+"""
+
+import sys
+from pathlib import Path
+
+# Internal-Projects/GEN AI Agent/Archive, whose src package holds the shared modules;
+# appended, so Zebra's own top-level modules keep precedence
+ARCHIVE_PATH = Path(__file__).resolve().parents[2] / "GEN AI Agent" / "Archive"
+if str(ARCHIVE_PATH) not in sys.path:
+    sys.path.append(str(ARCHIVE_PATH))
+
+from src.onnx_encoder import OnnxSentenceEncoder, load_onnx_encoder  # noqa: E402
+from src.tracing import get_span_tracer  # noqa: E402
+
+__all__ = ["OnnxSentenceEncoder", "load_onnx_encoder", "get_span_tracer"]
@@ -0,0 +1,59 @@
+"""
+Embedding Functions
+ChromaDB embedding function for the printer collection, on PyTorch or int8 ONNX Runtime
+"""
+
+import os
+from typing import List
+
+import chromadb
+from chromadb.utils import embedding_functions
+
+from archive_shared import OnnxSentenceEncoder, load_onnx_encoder
+
+# Embedding model for ingestion and queries (384-dimensional)
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+
+class OnnxEmbeddingFunction(chromadb.EmbeddingFunction):
+    """ChromaDB embedding function backed by the int8-quantized ONNX encoder"""
+
+    def __init__(self, encoder: OnnxSentenceEncoder):
+        self.encoder = encoder
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        return self.encoder.encode(list(input)).tolist()
+
+
+def create_embedding_function(backend: str = None):
+    """
+    Embedding function shared by ingestion and PrinterRAG
+
+    Args:
+        backend: "torch" (sentence-transformers) or "onnx" (int8 ONNX Runtime, no
+            torch import); default: ZEBRA_EMBEDDING_BACKEND environment variable or "torch"
+
+    Returns:
+        ChromaDB embedding function; falls back to PyTorch if ONNX cannot be loaded
+    """
+    backend = backend or os.environ.get("ZEBRA_EMBEDDING_BACKEND", "torch")
+
+    if backend == "onnx":
+        try:
+            encoder = load_onnx_encoder(
+                EMBEDDING_MODEL,
+                os.environ.get("ONNX_MODEL_DIR", "./onnx_models"),
+                os.environ.get("ONNX_QUANTIZATION", ""),
+                int(os.environ.get("ONNX_NUM_THREADS", "0")),
+                token=os.environ.get("HF_TOKEN")
+            )
+            print(f"Embeddings: {EMBEDDING_MODEL} on ONNX Runtime (int8)")
+            return OnnxEmbeddingFunction(encoder)
+        except Exception as e:
+            print(f"Warning: ONNX embedding backend unavailable ({e}); using PyTorch")
+
+    # Uses HF_TOKEN environment variable if available
+    return embedding_functions.SentenceTransformerEmbeddingFunction(
+        model_name=EMBEDDING_MODEL,
+        model_kwargs={'token': os.environ.get('HF_TOKEN')}
+    )
@@ -4,8 +4,7 @@ Answers questions like "Given these requirements, what printer should I choose?"
 """
 
 import chromadb
-from chromadb.utils import embedding_functions
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 import json
 from pathlib import Path
 import re
@@ -14,11 +13,26 @@ import anthropic
 import ollama
 import time
 from dotenv import load_dotenv
+from archive_shared import get_span_tracer
+from embeddings import create_embedding_function
+from recommendation_cache import RecommendationCache
 
 # Load environment variables from centralized .env file in Internal-Projects directory
 env_path = Path(__file__).resolve().parents[2] / '.env'
 load_dotenv(dotenv_path=env_path)
 
+_tracer = get_span_tracer("printer-rag")
+
+# Claude model writing the recommendation text
+CLAUDE_MODEL = "claude-3-5-haiku-20241022"
+
+# LLM error text starts with this; such responses are not cached
+LLM_ERROR_PREFIX = "Error:"
+
+
+class LLMStreamError(Exception):
+    """Raised by stream_llm_response() when the response could not be generated completely"""
+
 class PrinterRAG:
     """
     RAG system for printer recommendations.
@@ -32,7 +46,10 @@ class PrinterRAG:
         use_llm: bool = True,
         llm_provider: str = "claude",
         anthropic_api_key: Optional[str] = None,
-        ollama_model: str = "llama3.2:1b"
+        ollama_model: str = "llama3.2:1b",
+        cache_path: Optional[str] = None,
+        use_cache: bool = True,
+        cache_similarity: Optional[float] = None
     ):
         """
         Initialize RAG system.
@@ -44,6 +61,11 @@ class PrinterRAG:
             llm_provider: LLM provider to use - 'claude' or 'ollama' (default: 'claude')
             anthropic_api_key: Anthropic API key (or set ANTHROPIC_API_KEY env var)
             ollama_model: Ollama model name (default: 'llama3.2:1b')
+            cache_path: Recommendation cache file (default: ZEBRA_RECOMMENDATION_CACHE env var,
+                        or recommendation_cache.db next to db_path)
+            use_cache: Whether to cache recommendations (default: True)
+            cache_similarity: Cosine similarity at which a similar question reuses a cached answer
+                              (default: ZEBRA_CACHE_SIMILARITY env var; unset: exact matches only)
         """
         self.db_path = db_path
         self.collection_name = collection_name
@@ -54,12 +76,8 @@ class PrinterRAG:
         # Initialize ChromaDB client
         self.client = chromadb.PersistentClient(path=db_path)
 
-        # Use same embedding function as ingestion
-        # Uses HF_TOKEN environment variable if available
-        self.embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="all-MiniLM-L6-v2",
-            model_kwargs={'token': os.environ.get('HF_TOKEN')}
-        )
+        # Use same embedding function as ingestion (ZEBRA_EMBEDDING_BACKEND: torch or onnx)
+        self.embedding_function = create_embedding_function()
 
         # Get collection
         try:
@@ -98,6 +116,25 @@ class PrinterRAG:
                 print(f"Warning: Unknown LLM provider '{self.llm_provider}'. Falling back to basic responses.")
                 self.use_llm = False
 
+        # Cache of finished recommendations, shared with other processes through a file
+        self.cache = None
+        if use_cache:
+            cache_path = cache_path or os.environ.get("ZEBRA_RECOMMENDATION_CACHE") or str(
+                Path(db_path).resolve().parent / "recommendation_cache.db"
+            )
+            if cache_similarity is None and os.environ.get("ZEBRA_CACHE_SIMILARITY"):
+                cache_similarity = float(os.environ["ZEBRA_CACHE_SIMILARITY"])
+            try:
+                self.cache = RecommendationCache(
+                    cache_path,
+                    self.collection,
+                    similarity_threshold=cache_similarity,
+                    check_interval_s=float(os.environ.get("ZEBRA_CACHE_CHECK_S", 30))
+                )
+                print(f"Recommendation cache: {cache_path} ({self.cache.stats()['entries']} entries)")
+            except Exception as e:
+                print(f"Warning: Recommendation cache unavailable ({e}); answering every query")
+
     def recommend_printer(
         self,
         requirements: str,
@@ -119,48 +156,185 @@ class PrinterRAG:
         """
         print(f"\nAnalyzing requirements: '{requirements}'")
 
-        # Extract structured requirements from natural language
-        auto_filters = self._extract_filters_from_query(requirements)
+        with _tracer.start_span("printer_rag.recommend") as request_span:
+            request_span.set_inputs(requirements=requirements)
+            request_span.set_attributes({"n_results": n_results, "llm_provider": self.llm_provider if self.use_llm else "none"})
+
+            cached, query_embeddings = self._cache_lookup(requirements, filters, n_results)
+            if cached is not None:
+                request_span.set_attributes({"filters": cached["detected_filters"], "cache": cached["cache"]})
+                print(f"Cache hit ({cached['cache']}): skipped vector search and LLM generation")
+                return cached
+
+            response = self.retrieve_printers(requirements, filters, n_results, query_embeddings=query_embeddings)
+            request_span.set_attribute("filters", response["detected_filters"])
+
+            LLM_start = time.perf_counter()
+            # Generate LLM-enhanced response if enabled
+            if self.use_llm and response["recommendations"]:
+                response["llm_response"] = self._generate_llm_response(requirements, response["recommendations"])
+            LLM_end = time.perf_counter()
+            print(f"LLM response generation took {LLM_end - LLM_start:.2f} seconds")
+
+            self.cache_recommendation(response, n_results, query_embeddings=query_embeddings)
+        return response
 
-        # Merge with provided filters
+    def _detect_filters(self, requirements: str, filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Filters extracted from the requirements, overridden by the explicit ones"""
+        detected = self._extract_filters_from_query(requirements)
         if filters:
-            auto_filters.update(filters)
-
-        print(f"Detected filters: {auto_filters}")
-
-        # Build where clause for ChromaDB
-        where_clause = None
-        if auto_filters:
-            where_clause = self._build_where_clause(auto_filters)
-
-        #Time Vector Search
-        start = time.perf_counter()
-        # Query vector database
-        results = self.collection.query(
-            query_texts=[requirements],
-            n_results=n_results * 2,  # Get more results to account for filtering
-            where=where_clause
-        )
+            detected.update(filters)
+        return detected
+
+    def _llm_label(self) -> str:
+        """Which LLM writes the answer (part of the cache key)"""
+        if not self.use_llm:
+            return "none"
+        if self.llm_provider == "claude":
+            return f"claude:{CLAUDE_MODEL}"
+        return f"{self.llm_provider}:{self.ollama_model}"
+
+    def _cache_lookup(
+        self,
+        requirements: str,
+        filters: Optional[Dict[str, Any]],
+        n_results: int
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[List[List[float]]]]:
+        """
+        Exact, then (if enabled) embedding-similarity cache lookup.
+
+        Returns:
+            (cached response or None, query embeddings computed for the similarity lookup or None)
+        """
+        if self.cache is None:
+            return None, None
+
+        with _tracer.start_span("cache_lookup") as span:
+            try:
+                context = self.cache.context_key(self._detect_filters(requirements, filters), n_results, self._llm_label())
+                cached = self.cache.get(requirements, context)
+                query_embeddings = None
+                if cached is None and self.cache.similarity_threshold is not None:
+                    with _tracer.start_span("embedding", kind="embedding"):
+                        query_embeddings = self.embedding_function([requirements])
+                    cached = self.cache.get_similar(context, query_embeddings[0])
+            except Exception as e:
+                span.record_error(e)
+                print(f"Warning: Recommendation cache lookup failed: {e}")
+                return None, None
+
+            span.set_attribute("result", cached["cache"] if cached else "miss")
+            if cached is None:
+                self.cache.record_miss()
+                return None, query_embeddings
+            cached["query"] = requirements
+            return cached, query_embeddings
+
+    def cached_recommendation(
+        self,
+        requirements: str,
+        filters: Optional[Dict[str, Any]] = None,
+        n_results: int = 10
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Cached recommend_printer() result for these requirements, without searching or calling the LLM.
+
+        Returns:
+            The response (with "cache": "exact" or "similar"), or None on a miss
+        """
+        cached, _ = self._cache_lookup(requirements, filters, n_results)
+        return cached
+
+    def cache_recommendation(
+        self,
+        response: Dict[str, Any],
+        n_results: int = 10,
+        query_embeddings: Optional[List[List[float]]] = None
+    ):
+        """
+        Cache a finished recommendation (retrieve_printers() result plus "llm_response").
+
+        Responses without recommendations or whose LLM call failed are not cached.
+
+        Args:
+            response: Response to cache; its "query" and "detected_filters" form the key
+            n_results: n_results it was retrieved with
+            query_embeddings: Embedding of the query, if already computed
+        """
+        if self.cache is None or not response.get("recommendations"):
+            return
+        if response.get("llm_response", "").startswith(LLM_ERROR_PREFIX):
+            return
+        try:
+            embedding = None
+            if self.cache.similarity_threshold is not None:
+                if query_embeddings is None:
+                    query_embeddings = self.embedding_function([response["query"]])
+                embedding = query_embeddings[0]
+            context = self.cache.context_key(response["detected_filters"], n_results, self._llm_label())
+            self.cache.put(response["query"], context, response, embedding)
+        except Exception as e:
+            print(f"Warning: Could not cache recommendation: {e}")
+
+    def retrieve_printers(
+        self,
+        requirements: str,
+        filters: Optional[Dict[str, Any]] = None,
+        n_results: int = 10,
+        query_embeddings: Optional[List[List[float]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Retrieval half of recommend_printer(): filters, vector search and ranking, no LLM call.
+
+        Args:
+            requirements: Natural language description of needs
+            filters: Optional metadata filters
+            n_results: Number of results to return
+            query_embeddings: Embedding of requirements, if already computed
+
+        Returns:
+            Dictionary with the query, detected filters and recommendations
+        """
+        with _tracer.start_span("printer_rag.retrieve"):
+            # Extract structured requirements from natural language, merged with provided filters
+            auto_filters = self._detect_filters(requirements, filters)
+
+            print(f"Detected filters: {auto_filters}")
+
+            # Build where clause for ChromaDB
+            where_clause = None
+            if auto_filters:
+                where_clause = self._build_where_clause(auto_filters)
+
+            #Time Vector Search
+            start = time.perf_counter()
+            # Embed separately from the query so each stage is timed on its own
+            if query_embeddings is None:
+                with _tracer.start_span("embedding", kind="embedding"):
+                    query_embeddings = self.embedding_function([requirements])
+
+            # Query vector database
+            with _tracer.start_span("vector_search", kind="retriever") as span:
+                results = self.collection.query(
+                    query_embeddings=query_embeddings,
+                    n_results=n_results * 2,  # Get more results to account for filtering
+                    where=where_clause
+                )
+                span.set_attribute("results", len(results["ids"][0]) if results.get("ids") else 0)
 
-        # Process and rank results
-        recommendations = self._process_results(results, requirements, 20)
-        end = time.perf_counter()
-        print(f"Vector search and processing took {end - start:.2f} seconds")
+            # Process and rank results
+            with _tracer.start_span("process_results") as span:
+                recommendations = self._process_results(results, requirements, 20)
+                span.set_attribute("models", [r["model"] for r in recommendations])
+            end = time.perf_counter()
+            print(f"Vector search and processing took {end - start:.2f} seconds")
 
-        response = {
+        return {
             "query": requirements,
             "detected_filters": auto_filters,
             "recommendations": recommendations
         }
 
-        LLM_start = time.perf_counter()
-        # Generate LLM-enhanced response if enabled
-        if self.use_llm and recommendations:
-            response["llm_response"] = self._generate_llm_response(requirements, recommendations)
-        LLM_end = time.perf_counter()
-        print(f"LLM response generation took {LLM_end - LLM_start:.2f} seconds")
-        return response
-
     def _extract_filters_from_query(self, query: str) -> Dict[str, Any]:
         """
         Extract structured filters from natural language query.
@@ -390,93 +564,95 @@ class PrinterRAG:
 
         return specs
 
-    def _generate_llm_response(
+    def _build_llm_prompt(
         self,
         user_query: str,
         recommendations: List[Dict[str, Any]]
     ) -> str:
         """
-        Generate a natural language response using LLM (Claude or Ollama) based on RAG results.
+        Build the LLM prompt from the top RAG results.
 
         Args:
             user_query: Original user query
             recommendations: List of printer recommendations from vector DB
 
         Returns:
-            Natural language response from the configured LLM
+            Prompt for the configured LLM
         """
         # Build comprehensive context from ALL search results
-        context_parts = []
-
-        for i, rec in enumerate(recommendations[:3], 1):  # Top 3 recommendations
-            model = rec['model']
-            category = rec['category']
-            score = rec['relevance_score']
-            specs = rec['key_specs']
-            metadata = rec.get('metadata', {})
-
-            context = f"\n{'='*80}\n"
-            context += f"PRINTER {i}: {model}\n"
-            context += f"{'='*80}\n\n"
-
-            # Basic info
-            context += f"Category: {category}\n"
-            context += f"Relevance Score: {score:.2%}\n"
-            context += f"Source File: {metadata.get('source_file', 'N/A')}\n\n"
-
-            # All metadata/specs
-            context += "=== METADATA & SPECIFICATIONS ===\n"
-            if metadata:
-                # Extract all useful metadata
-                if metadata.get('resolution_dpi'):
-                    context += f"Resolution: {metadata['resolution_dpi']} DPI\n"
-                if metadata.get('print_speed_ips'):
-                    context += f"Print Speed: {metadata['print_speed_ips']} inches/second\n"
-                if metadata.get('max_media_width_inches'):
-                    context += f"Max Media Width: {metadata['max_media_width_inches']} inches\n"
-                if metadata.get('energy_star'):
-                    context += f"Energy Star: Yes\n"
-
-                # Connectivity
-                conn = []
-                if metadata.get('has_usb'):
-                    conn.append('USB')
-                if metadata.get('has_ethernet'):
-                    conn.append('Ethernet')
-                if metadata.get('has_wifi'):
-                    conn.append('Wi-Fi')
-                if metadata.get('has_bluetooth'):
-                    conn.append('Bluetooth')
-                if conn:
-                    context += f"Connectivity: {', '.join(conn)}\n"
-
-                # URLs
-                if metadata.get('product_url'):
-                    context += f"\nProduct Page URL: {metadata['product_url']}\n"
-                if metadata.get('warranty_url'):
-                    context += f"Warranty Information URL: {metadata['warranty_url']}\n"
-
-            if specs:
-                context += f"\nAdditional Specs:\n"
-                for key, value in specs.items():
-                    if isinstance(value, list):
-                        context += f"  {key}: {', '.join(value)}\n"
-                    else:
-                        context += f"  {key}: {value}\n"
-
-            # ALL matching chunks (not limited to 2)
-            context += f"\n=== COMPLETE INFORMATION FROM ALL MATCHING SECTIONS ===\n"
-            for j, chunk in enumerate(rec['matching_chunks'], 1):
-                chunk_type = chunk['chunk_type'].replace('_', ' ').title()
-                content = chunk['content']  # No truncation - send full content
-                match_score = 1.0 - chunk['distance']
-
-                context += f"\n--- Section {j}: {chunk_type} (Match: {match_score:.1%}) ---\n"
-                context += f"{content}\n"
-
-            context_parts.append(context)
-
-        full_context = "\n".join(context_parts)
+        with _tracer.start_span("context_build") as context_span:
+            context_parts = []
+
+            for i, rec in enumerate(recommendations[:3], 1):  # Top 3 recommendations
+                model = rec['model']
+                category = rec['category']
+                score = rec['relevance_score']
+                specs = rec['key_specs']
+                metadata = rec.get('metadata', {})
+
+                context = f"\n{'='*80}\n"
+                context += f"PRINTER {i}: {model}\n"
+                context += f"{'='*80}\n\n"
+
+                # Basic info
+                context += f"Category: {category}\n"
+                context += f"Relevance Score: {score:.2%}\n"
+                context += f"Source File: {metadata.get('source_file', 'N/A')}\n\n"
+
+                # All metadata/specs
+                context += "=== METADATA & SPECIFICATIONS ===\n"
+                if metadata:
+                    # Extract all useful metadata
+                    if metadata.get('resolution_dpi'):
+                        context += f"Resolution: {metadata['resolution_dpi']} DPI\n"
+                    if metadata.get('print_speed_ips'):
+                        context += f"Print Speed: {metadata['print_speed_ips']} inches/second\n"
+                    if metadata.get('max_media_width_inches'):
+                        context += f"Max Media Width: {metadata['max_media_width_inches']} inches\n"
+                    if metadata.get('energy_star'):
+                        context += f"Energy Star: Yes\n"
+
+                    # Connectivity
+                    conn = []
+                    if metadata.get('has_usb'):
+                        conn.append('USB')
+                    if metadata.get('has_ethernet'):
+                        conn.append('Ethernet')
+                    if metadata.get('has_wifi'):
+                        conn.append('Wi-Fi')
+                    if metadata.get('has_bluetooth'):
+                        conn.append('Bluetooth')
+                    if conn:
+                        context += f"Connectivity: {', '.join(conn)}\n"
+
+                    # URLs
+                    if metadata.get('product_url'):
+                        context += f"\nProduct Page URL: {metadata['product_url']}\n"
+                    if metadata.get('warranty_url'):
+                        context += f"Warranty Information URL: {metadata['warranty_url']}\n"
+
+                if specs:
+                    context += f"\nAdditional Specs:\n"
+                    for key, value in specs.items():
+                        if isinstance(value, list):
+                            context += f"  {key}: {', '.join(value)}\n"
+                        else:
+                            context += f"  {key}: {value}\n"
+
+                # ALL matching chunks (not limited to 2)
+                context += f"\n=== COMPLETE INFORMATION FROM ALL MATCHING SECTIONS ===\n"
+                for j, chunk in enumerate(rec['matching_chunks'], 1):
+                    chunk_type = chunk['chunk_type'].replace('_', ' ').title()
+                    content = chunk['content']  # No truncation - send full content
+                    match_score = 1.0 - chunk['distance']
+
+                    context += f"\n--- Section {j}: {chunk_type} (Match: {match_score:.1%}) ---\n"
+                    context += f"{content}\n"
+
+                context_parts.append(context)
+
+            full_context = "\n".join(context_parts)
+            context_span.set_attribute("context_chars", len(full_context))
 
         # Create comprehensive prompt for Claude
         prompt = f"""You are an expert Zebra printer specialist helping customers choose the right printer for their needs.
@@ -511,38 +687,134 @@ CRITICAL - URL EMBEDDING:
 IMPORTANT: Use the COMPLETE information provided above. Reference specific details from the matching sections to give authoritative, detailed answers. Use Markdown formatting (###, -, **bold**) in your response for clarity.
 
 Your comprehensive recommendation:"""
+        return prompt
 
-        try:
-            if self.llm_provider == "claude" and self.anthropic_client:
-                # Call Claude API with increased token limit for detailed responses
-                message = self.anthropic_client.messages.create(
-                    model="claude-3-5-haiku-20241022",
-                    max_tokens=4000,  # Increased from 1500 to allow detailed responses
-                    messages=[
-                        {"role": "user", "content": prompt}
-                    ]
-                )
-                return message.content[0].text
+    def _generate_llm_response(
+        self,
+        user_query: str,
+        recommendations: List[Dict[str, Any]]
+    ) -> str:
+        """
+        Generate a natural language response using LLM (Claude or Ollama) based on RAG results.
 
-            elif self.llm_provider == "ollama":
-                # Call Ollama API
-                response = ollama.chat(
-                    model=self.ollama_model,
-                    messages=[
-                        {"role": "user", "content": prompt}
-                    ]
-                )
-                return response['message']['content']
+        Args:
+            user_query: Original user query
+            recommendations: List of printer recommendations from vector DB
 
-            else:
-                return "Error: No LLM client configured."
+        Returns:
+            Natural language response from the configured LLM
+        """
+        prompt = self._build_llm_prompt(user_query, recommendations)
+
+        with _tracer.start_span("llm_generate", kind="llm") as llm_span:
+            llm_span.set_attributes({"provider": self.llm_provider, "prompt_chars": len(prompt)})
+            try:
+                if self.llm_provider == "claude" and self.anthropic_client:
+                    # Call Claude API with increased token limit for detailed responses
+                    message = self.anthropic_client.messages.create(
+                        model=CLAUDE_MODEL,
+                        max_tokens=4000,  # Increased from 1500 to allow detailed responses
+                        messages=[
+                            {"role": "user", "content": prompt}
+                        ]
+                    )
+                    llm_span.set_attributes({
+                        "model": message.model,
+                        "input_tokens": message.usage.input_tokens,
+                        "output_tokens": message.usage.output_tokens
+                    })
+                    return message.content[0].text
+
+                elif self.llm_provider == "ollama":
+                    # Call Ollama API
+                    response = ollama.chat(
+                        model=self.ollama_model,
+                        messages=[
+                            {"role": "user", "content": prompt}
+                        ]
+                    )
+                    llm_span.set_attribute("model", self.ollama_model)
+                    return response['message']['content']
 
-        except Exception as e:
-            print(f"Error generating LLM response: {e}")
-            import traceback
-            traceback.print_exc()
-            return f"Error: Unable to generate enhanced response. {str(e)}"
+                else:
+                    llm_span.record_error("No LLM client configured")
+                    return f"{LLM_ERROR_PREFIX} No LLM client configured."
 
+            except Exception as e:
+                llm_span.record_error(e)
+                print(f"Error generating LLM response: {e}")
+                import traceback
+                traceback.print_exc()
+                return f"{LLM_ERROR_PREFIX} Unable to generate enhanced response. {str(e)}"
+
+
+    def stream_llm_response(
+        self,
+        user_query: str,
+        recommendations: List[Dict[str, Any]]
+    ) -> Iterator[str]:
+        """
+        Stream the LLM response for RAG results as it is generated.
+
+        Same prompt and models as _generate_llm_response(). A failure, also
+        one partway through the response, is raised rather than yielded, so
+        callers can tell a complete response from a truncated one.
+
+        Args:
+            user_query: Original user query
+            recommendations: List of printer recommendations from vector DB
+
+        Yields:
+            Pieces of the response text
+
+        Raises:
+            LLMStreamError: No LLM configured, or the LLM call failed; the message
+                            is the error text to show (starts with LLM_ERROR_PREFIX)
+        """
+        prompt = self._build_llm_prompt(user_query, recommendations)
+
+        with _tracer.start_span("llm_generate", kind="llm") as llm_span:
+            llm_span.set_attributes({"provider": self.llm_provider, "prompt_chars": len(prompt), "stream": True})
+            try:
+                if self.llm_provider == "claude" and self.anthropic_client:
+                    with self.anthropic_client.messages.stream(
+                        model=CLAUDE_MODEL,
+                        max_tokens=4000,
+                        messages=[
+                            {"role": "user", "content": prompt}
+                        ]
+                    ) as stream:
+                        for text in stream.text_stream:
+                            yield text
+                        message = stream.get_final_message()
+                    llm_span.set_attributes({
+                        "model": message.model,
+                        "input_tokens": message.usage.input_tokens,
+                        "output_tokens": message.usage.output_tokens
+                    })
+
+                elif self.llm_provider == "ollama":
+                    for chunk in ollama.chat(
+                        model=self.ollama_model,
+                        messages=[
+                            {"role": "user", "content": prompt}
+                        ],
+                        stream=True
+                    ):
+                        if chunk['message']['content']:
+                            yield chunk['message']['content']
+                    llm_span.set_attribute("model", self.ollama_model)
+
+                else:
+                    llm_span.record_error("No LLM client configured")
+                    raise LLMStreamError(f"{LLM_ERROR_PREFIX} No LLM client configured.")
+
+            except LLMStreamError:
+                raise
+            except Exception as e:
+                llm_span.record_error(e)
+                print(f"Error streaming LLM response: {e}")
+                raise LLMStreamError(f"{LLM_ERROR_PREFIX} Unable to generate enhanced response. {str(e)}") from e
 
 def main():
     """Example usage of the RAG system."""
@@ -602,6 +874,26 @@ def main():
         default="llama3.2:1b",
         help="Ollama model name (default: llama3.2:1b)"
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Answer every query afresh instead of reusing cached recommendations"
+    )
+    parser.add_argument(
+        "--cache-similarity",
+        type=float,
+        help="Reuse the cached answer of a question at least this similar (cosine, e.g. 0.95)"
+    )
+    parser.add_argument(
+        "--cache-stats",
+        action="store_true",
+        help="Show the recommendation cache's most used entries"
+    )
+    parser.add_argument(
+        "--clear-cache",
+        action="store_true",
+        help="Delete all cached recommendations"
+    )
 
     args = parser.parse_args()
 
@@ -613,12 +905,25 @@ def main():
             use_llm=not args.no_llm,
             llm_provider=args.llm,
             anthropic_api_key=args.api_key,
-            ollama_model=args.ollama_model
+            ollama_model=args.ollama_model,
+            use_cache=not args.no_cache,
+            cache_similarity=args.cache_similarity
         )
     except Exception as e:
         print(f"Error initializing RAG system: {e}")
         return 1
 
+    # Cache maintenance
+    if args.clear_cache or args.cache_stats:
+        if rag.cache is None:
+            print("Recommendation cache is disabled")
+            return 1
+        if args.clear_cache:
+            print(f"Deleted {rag.cache.clear()} cached recommendations")
+        if args.cache_stats:
+            print(json.dumps({**rag.cache.stats(), "top_entries": rag.cache.entries()}, indent=2))
+        return 0
+
     # Compare mode
     if args.compare:
         print("\nComparing printers...")
@@ -0,0 +1,268 @@
+"""
+Recommendation Cache
+Persistent cache of PrinterRAG recommendations (ranked printers and LLM text), shared by every process
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recommendations (
+    key TEXT PRIMARY KEY,
+    context TEXT NOT NULL,
+    requirements TEXT NOT NULL,
+    version TEXT NOT NULL,
+    response TEXT NOT NULL,
+    embedding BLOB,
+    created_at REAL NOT NULL,
+    last_hit_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_recommendations_context ON recommendations(context, version);
+CREATE INDEX IF NOT EXISTS idx_recommendations_last_hit ON recommendations(last_hit_at);
+"""
+
+
+# Sentence-ending punctuation dropped from the end of a question
+TRAILING_PUNCTUATION = "?!.,;:"
+
+
+def normalize_requirements(requirements: str) -> str:
+    """
+    Canonical form of a question for exact cache matches.
+
+    Case, whitespace and trailing punctuation differences map to the same
+    string, e.g. "Fast desktop printer?" and "fast  desktop printer". Other
+    characters are kept: "printer > 300 dpi" and "printer < 300 dpi", or
+    "C++ SDK" and "C SDK", are different questions.
+    """
+    text = " ".join(requirements.lower().split())
+    return text.rstrip(TRAILING_PUNCTUATION).rstrip()
+
+
+def collection_fingerprint(collection) -> str:
+    """
+    Hash of a Chroma collection's ids, documents and metadata.
+
+    Changes whenever the collection is re-ingested, cleared or extended.
+    """
+    data = collection.get(include=["documents", "metadatas"])
+    rows = sorted(zip(data["ids"], data["documents"] or [], data["metadatas"] or []), key=lambda r: r[0])
+    digest = hashlib.sha256()
+    for doc_id, document, metadata in rows:
+        digest.update(json.dumps([doc_id, document, metadata], sort_keys=True, default=str).encode("utf-8"))
+    return f"{len(rows)}:{digest.hexdigest()[:16]}"
+
+
+class RecommendationCache:
+    """
+    Cache of recommend_printer() results in SQLite.
+
+    An entry is keyed on the normalized requirements plus a context: the
+    detected filters, n_results and the LLM that wrote the answer. It stores
+    the whole response, i.e. the ranked recommendations and the LLM text. Optionally,
+    a question with the same context whose embedding is within
+    similarity_threshold (cosine) of a cached one also hits.
+
+    Entries belong to a collection version (collection_fingerprint()),
+    re-checked at most every check_interval_s. When the collection changes,
+    older entries stop matching and are deleted. The database is a file
+    (WAL mode), so the CLI and every gunicorn worker share one cache.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        collection,
+        similarity_threshold: Optional[float] = None,
+        check_interval_s: float = 30.0,
+        max_entries: int = 1000
+    ):
+        """
+        Args:
+            path: SQLite file for the cache
+            collection: Chroma collection the recommendations come from
+            similarity_threshold: Cosine similarity for an embedding match (None: exact matches only)
+            check_interval_s: Minimum seconds between collection fingerprint checks
+            max_entries: Entries kept; the least recently used are deleted
+        """
+        self.path = path
+        self.collection = collection
+        self.similarity_threshold = similarity_threshold
+        self.check_interval_s = check_interval_s
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._checked_at = 0.0
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Per-thread connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def version(self) -> str:
+        """Current collection version; entries of other versions are dropped when it changes"""
+        now = time.monotonic()
+        with self._lock:
+            if self._version is not None and now - self._checked_at < self.check_interval_s:
+                return self._version
+            version = collection_fingerprint(self.collection)
+            if version != self._version:
+                deleted = self._connection().execute(
+                    "DELETE FROM recommendations WHERE version != ?", (version,)
+                ).rowcount
+                if deleted:
+                    print(f"Collection changed: dropped {deleted} cached recommendations")
+            self._version = version
+            self._checked_at = now
+            return version
+
+    @staticmethod
+    def context_key(filters: Dict[str, Any], n_results: int, llm: str) -> str:
+        """Everything besides the question that shapes a response"""
+        return json.dumps({"filters": filters, "n_results": n_results, "llm": llm}, sort_keys=True)
+
+    @staticmethod
+    def _key(context: str, requirements: str, version: str) -> str:
+        return hashlib.sha256(f"{version}\n{context}\n{requirements}".encode("utf-8")).hexdigest()
+
+    def _hit(self, key: str, response_json: str, match: str) -> Dict[str, Any]:
+        self._connection().execute(
+            "UPDATE recommendations SET hits = hits + 1, last_hit_at = ? WHERE key = ?", (time.time(), key)
+        )
+        response = json.loads(response_json)
+        response["cache"] = match
+        return response
+
+    def get(self, requirements: str, context: str) -> Optional[Dict[str, Any]]:
+        """
+        Cached response for exactly this question (after normalization).
+
+        Returns:
+            Response with "cache": "exact", or None
+        """
+        version = self.version()
+        key = self._key(context, normalize_requirements(requirements), version)
+        row = self._connection().execute("SELECT response FROM recommendations WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self.hits += 1
+        return self._hit(key, row[0], "exact")
+
+    def get_similar(self, context: str, embedding: Sequence[float]) -> Optional[Dict[str, Any]]:
+        """
+        Cached response of the most similar question with the same context.
+
+        Returns:
+            Response with "cache": "similar" and "similarity", or None below similarity_threshold
+        """
+        if self.similarity_threshold is None:
+            return None
+        rows = self._connection().execute(
+            "SELECT key, embedding FROM recommendations WHERE context = ? AND version = ? AND embedding IS NOT NULL",
+            (context, self.version())
+        ).fetchall()
+        if not rows:
+            return None
+
+        matrix = np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+        query = np.asarray(embedding, dtype=np.float32)
+        scores = matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query) + 1e-12)
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None
+
+        row = self._connection().execute(
+            "SELECT response FROM recommendations WHERE key = ?", (rows[best][0],)
+        ).fetchone()
+        if row is None:
+            return None
+        self.similar_hits += 1
+        response = self._hit(rows[best][0], row[0], "similar")
+        response["similarity"] = round(float(scores[best]), 4)
+        return response
+
+    def put(
+        self,
+        requirements: str,
+        context: str,
+        response: Dict[str, Any],
+        embedding: Optional[Sequence[float]] = None
+    ):
+        """
+        Store a response.
+
+        Args:
+            requirements: Question as asked (normalized here)
+            context: context_key() of the response
+            response: recommend_printer() result
+            embedding: Question embedding for similarity matches
+        """
+        version = self.version()
+        normalized = normalize_requirements(requirements)
+        blob = np.asarray(embedding, dtype=np.float32).tobytes() if embedding is not None else None
+        now = time.time()
+        response = {k: v for k, v in response.items() if k not in ("cache", "similarity")}
+
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO recommendations "
+            "(key, context, requirements, version, response, embedding, created_at, last_hit_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (self._key(context, normalized, version), context, normalized, version,
+             json.dumps(response, default=str), blob, now, now)
+        )
+        conn.execute(
+            "DELETE FROM recommendations WHERE key IN "
+            "(SELECT key FROM recommendations ORDER BY last_hit_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def record_miss(self):
+        self.misses += 1
+
+    def clear(self) -> int:
+        """Delete every entry; returns how many there were"""
+        return self._connection().execute("DELETE FROM recommendations").rowcount
+
+    def entries(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most used entries (question, context, hits)"""
+        rows = self._connection().execute(
+            "SELECT requirements, context, hits, created_at FROM recommendations ORDER BY hits DESC LIMIT ?",
+            (limit,)
+        ).fetchall()
+        return [
+            {"requirements": r[0], "context": json.loads(r[1]), "hits": r[2], "created_at": r[3]}
+            for r in rows
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry count, collection version and this process's hit/miss counters"""
+        count = self._connection().execute("SELECT COUNT(*) FROM recommendations").fetchone()[0]
+        return {
+            "entries": count,
+            "version": self._version,
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses
+        }
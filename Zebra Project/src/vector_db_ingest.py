@@ -5,12 +5,11 @@ Processes JSON files and loads them into ChromaDB for RAG retrieval
 
 import chromadb
 from chromadb.config import Settings
-from chromadb.utils import embedding_functions
 import json
-import os
 from pathlib import Path
 from typing import List, Dict, Any
 from vector_db_schema import PrinterVectorSchema, PrinterDocument
+from embeddings import create_embedding_function
 import argparse
 
 
@@ -31,12 +30,8 @@ class VectorDBIngestion:
         # Initialize ChromaDB client
         self.client = chromadb.PersistentClient(path=db_path)
 
-        # Use sentence transformers for embeddings (free, local)
-        # Uses HF_TOKEN environment variable if available
-        self.embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="all-MiniLM-L6-v2",  # Fast, efficient, 384-dimensional embeddings
-            model_kwargs={'token': os.environ.get('HF_TOKEN')}
-        )
+        # all-MiniLM-L6-v2 embeddings (free, local); ZEBRA_EMBEDDING_BACKEND picks torch or int8 ONNX
+        self.embedding_function = create_embedding_function()
 
         # Get or create collection
         self.collection = self.client.get_or_create_collection(
@@ -0,0 +1,48 @@
+"""
+Tests for the recommendation cache key normalization
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from recommendation_cache import RecommendationCache, normalize_requirements
+
+
+class FakeCollection:
+    """Chroma collection stand-in with a fixed set of documents"""
+
+    def get(self, include=None):
+        return {"ids": ["p1"], "documents": ["ZT411"], "metadatas": [{"dpi": 300}]}
+
+
+@pytest.mark.parametrize("first, second", [
+    ("printer > 300 dpi", "printer < 300 dpi"),
+    ("C++ SDK", "C SDK"),
+    ("printer under $500", "printer under 500"),
+    ("4.5 inch label width", "45 inch label width"),
+    ("ZT411 + RFID", "ZT411 RFID"),
+])
+def test_distinct_questions_do_not_collide(first, second):
+    assert normalize_requirements(first) != normalize_requirements(second)
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Fast desktop printer?", "fast  desktop printer"),
+    ("Fast desktop printer.", "FAST desktop printer"),
+    ("  rugged mobile printer !", "rugged mobile printer"),
+])
+def test_equivalent_questions_share_a_key(first, second):
+    assert normalize_requirements(first) == normalize_requirements(second)
+
+
+def test_cache_does_not_serve_opposite_operator(tmp_path):
+    cache = RecommendationCache(str(tmp_path / "cache.db"), FakeCollection())
+    context = RecommendationCache.context_key({}, 3, "claude")
+    cache.put("printer > 300 dpi", context, {"recommendations": ["ZT411"]})
+
+    assert cache.get("printer < 300 dpi", context) is None
+    assert cache.get("Printer > 300 DPI?", context)["recommendations"] == ["ZT411"]
@@ -2,10 +2,173 @@
 """
 Initialize Vector Databases for Docker Container
 Sets up vector databases for both GEN AI Agent (Milvus) and Zebra Project (ChromaDB)
+
+Both builds run concurrently in separate processes. Each built database is
+keyed on a hash of its inputs (source data, embedding model, builder code);
+when nothing changed, the existing database or a cached artifact is reused
+instead of re-embedding everything.
 """
-import sys
+import hashlib
+import multiprocessing
 import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
 from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+APP_DIR = Path(__file__).resolve().parent
+ZEBRA_DIR = APP_DIR / "Zebra Project"
+GEN_AI_DIR = APP_DIR / "GEN AI Agent" / "Archive"
+
+# Directory holding previously built databases keyed by input hash. The Dockerfile
+# mounts a BuildKit cache here; .dockerignore keeps host databases out of the image,
+# so this is what lets an image rebuild skip embedding. Empty disables the cache.
+DEFAULT_CACHE_DIR = "/vector-db-cache"
+CACHE_DIR = os.environ.get("VECTOR_DB_CACHE_DIR", DEFAULT_CACHE_DIR if os.path.isdir(DEFAULT_CACHE_DIR) else "")
+
+# Stamp file written next to each built database with its input hash
+BUILD_HASH_FILE = ".build_hash"
+
+# Embedding model used by the Zebra ingestion (see embeddings.py)
+ZEBRA_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+
+def _hash_files(hasher, paths: Iterable[Path]):
+    """Feed file names and contents into a hasher in 1 MB chunks"""
+    for path in paths:
+        hasher.update(path.name.encode())
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                hasher.update(chunk)
+
+
+def _stamp_path(db_path: Path) -> Path:
+    """Location of the build-hash stamp for a database directory or file"""
+    if db_path.is_dir():
+        return db_path / BUILD_HASH_FILE
+    return db_path.with_name(db_path.name + BUILD_HASH_FILE)
+
+
+def _read_stamp(db_path: Path) -> Optional[str]:
+    """Return the input hash the database at db_path was built from, if known"""
+    stamp = _stamp_path(db_path)
+    if db_path.exists() and stamp.exists():
+        return stamp.read_text().strip()
+    return None
+
+
+def _write_stamp(db_path: Path, input_hash: str):
+    """Record the input hash next to a freshly built database"""
+    _stamp_path(db_path).write_text(input_hash + "\n")
+
+
+def _copy_path(src: Path, dest: Path):
+    """Replace dest with a copy of src (file or directory)"""
+    if dest.is_dir():
+        shutil.rmtree(dest)
+    elif dest.exists():
+        dest.unlink()
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if src.is_dir():
+        shutil.copytree(src, dest)
+    else:
+        shutil.copy2(src, dest)
+
+
+def restore_cached_artifact(name: str, db_path: Path, input_hash: str) -> bool:
+    """
+    Reuse a database built from the same inputs, if one is available
+
+    Args:
+        name: Artifact name (used as cache key prefix)
+        db_path: Where the database should live
+        input_hash: Hash of the database inputs
+
+    Returns:
+        True if db_path now holds a database built from these inputs
+    """
+    if _read_stamp(db_path) == input_hash:
+        print(f"✓ {name}: existing database matches inputs ({input_hash[:12]}), skipping build")
+        return True
+
+    if not CACHE_DIR:
+        return False
+
+    artifact = Path(CACHE_DIR) / f"{name}-{input_hash}" / db_path.name
+    if not artifact.exists():
+        print(f"ℹ {name}: no cached artifact for inputs {input_hash[:12]}")
+        return False
+
+    print(f"✓ {name}: restoring cached artifact {artifact}")
+    _copy_path(artifact, db_path)
+    _write_stamp(db_path, input_hash)
+    return True
+
+
+def store_cached_artifact(name: str, db_path: Path, input_hash: str):
+    """Stamp a freshly built database and copy it into the artifact cache"""
+    _write_stamp(db_path, input_hash)
+
+    if not CACHE_DIR:
+        return
+
+    try:
+        artifact = Path(CACHE_DIR) / f"{name}-{input_hash}" / db_path.name
+        _copy_path(db_path, artifact)
+        print(f"✓ {name}: cached artifact at {artifact}")
+    except Exception as e:
+        print(f"⚠️  {name}: could not cache artifact: {e}")
+
+
+def restore_gen_ai_artifacts(db_path: Path, sidecars: Dict[str, Path], input_hash: str) -> bool:
+    """Reuse the Milvus database and the files built next to it; any one missing means a rebuild"""
+    return restore_cached_artifact("gen-ai-milvus", db_path, input_hash) and all(
+        restore_cached_artifact(name, path, input_hash) for name, path in sidecars.items()
+    )
+
+
+def zebra_input_hash(json_files: Iterable[Path]) -> str:
+    """Hash the printer spec JSON files, chunking/ingestion code and embedding model"""
+    hasher = hashlib.sha256()
+    hasher.update(ZEBRA_EMBEDDING_MODEL.encode())
+    hasher.update(os.environ.get("ZEBRA_EMBEDDING_BACKEND", "torch").encode())
+    _hash_files(hasher, [
+        ZEBRA_DIR / "src" / "vector_db_schema.py",
+        ZEBRA_DIR / "src" / "vector_db_ingest.py",
+        ZEBRA_DIR / "src" / "embeddings.py",
+        # The ONNX encoder Zebra's embeddings.py imports from the Archive
+        GEN_AI_DIR / "src" / "onnx_encoder.py"
+    ])
+    _hash_files(hasher, sorted(json_files))
+    return hasher.hexdigest()
+
+
+def gen_ai_input_hash(config, workbook_hash: str) -> str:
+    """Hash the workbook content, embedding model, index/tuning/layout/router settings and builder code"""
+    hasher = hashlib.sha256()
+    hasher.update(workbook_hash.encode())
+    hasher.update(f"{config.EMBEDDING_MODEL}:{config.EMBEDDING_BACKEND}".encode())
+    index_settings = f"{config.INDEX_TYPE}:{config.METRIC_TYPE}:{config.M}:{config.EF_CONSTRUCTION}:{config.NLIST}"
+    hasher.update(index_settings.encode())
+    hasher.update(f"{config.CONTENT_SHEET_LAYOUT}:{config.CONTENT_NUM_PARTITIONS}".encode())
+    # Sheet-router centroids are stored inside the database
+    hasher.update(f"{config.SHEET_ROUTER_CENTROIDS}".encode())
+    hasher.update(f"{config.CONTENT_ROW_STORE}".encode())
+    # Tuned ef/nprobe are stored inside the database
+    hasher.update(f"{config.TARGET_RECALL}:{config.TUNING_QUERIES}:{config.TOP_K_STRUCTURE}:{config.TOP_K_CONTENT}".encode())
+    _hash_files(hasher, [
+        GEN_AI_DIR / "src" / "structure_db.py",
+        GEN_AI_DIR / "src" / "content_db.py",
+        GEN_AI_DIR / "src" / "search_tuning.py",
+        GEN_AI_DIR / "src" / "sheet_router.py",
+        GEN_AI_DIR / "src" / "table_store.py",
+        GEN_AI_DIR / "src" / "row_store.py",
+        GEN_AI_DIR / "src" / "onnx_encoder.py"
+    ])
+    return hasher.hexdigest()
+
 
 def init_zebra_chromadb():
     """Initialize Zebra Project ChromaDB with printer specifications"""
@@ -15,21 +178,18 @@ def init_zebra_chromadb():
 
     try:
         # Change to Zebra Project directory
-        zebra_dir = Path("/app/Zebra Project")
-        os.chdir(zebra_dir)
-        sys.path.insert(0, str(zebra_dir / "src"))
-
-        from src.vector_db_ingest import VectorDBIngestion
+        os.chdir(ZEBRA_DIR)
+        sys.path.insert(0, str(ZEBRA_DIR / "src"))
 
         # Initialize with container paths
-        db_path = str(zebra_dir / "chroma_db")
-        json_dir = str(zebra_dir / "output")
+        db_path = ZEBRA_DIR / "chroma_db"
+        json_dir = ZEBRA_DIR / "output"
 
         print(f"Database path: {db_path}")
         print(f"JSON directory: {json_dir}")
 
         # Check if JSON files exist
-        json_files = list(Path(json_dir).glob("*.json"))
+        json_files = list(json_dir.glob("*.json"))
         if not json_files:
             print(f"⚠️  No JSON files found in {json_dir}")
             print("Skipping Zebra ChromaDB initialization")
@@ -37,12 +197,20 @@ def init_zebra_chromadb():
 
         print(f"Found {len(json_files)} JSON files to process")
 
+        input_hash = zebra_input_hash(json_files)
+        if restore_cached_artifact("zebra-chroma", db_path, input_hash):
+            return True
+
+        from vector_db_ingest import VectorDBIngestion
+
         # Create ingestion instance and load data
-        ingestion = VectorDBIngestion(db_path=db_path)
+        ingestion = VectorDBIngestion(db_path=str(db_path))
 
         # Clear existing and ingest
         ingestion.clear_collection()
-        stats = ingestion.ingest_directory(json_dir)
+        stats = ingestion.ingest_directory(str(json_dir))
+
+        store_cached_artifact("zebra-chroma", db_path, input_hash)
 
         print(f"\n✅ Zebra ChromaDB initialized successfully!")
         print(f"   Total documents: {stats['final_document_count']}")
@@ -65,70 +233,85 @@ def init_gen_ai_milvus():
 
     try:
         # Change to GEN AI Agent directory
-        gen_ai_dir = Path("/app/GEN AI Agent/Archive")
-        os.chdir(gen_ai_dir)
-        sys.path.insert(0, str(gen_ai_dir / "src"))
+        os.chdir(GEN_AI_DIR)
+        sys.path.insert(0, str(GEN_AI_DIR))
 
-        from src.content_db import ContentVectorDB
-        from src.structure_db import StructureVectorDB
         from src import config
-        from src.gcs_utils import read_xlsx_from_local_or_gcs
 
-        db_path = str(gen_ai_dir / "milvus_edelivery.db")
+        db_path = GEN_AI_DIR / "milvus_edelivery.db"
+        from src.row_store import row_store_path
+        from src.table_store import table_store_path
+        store_path = Path(table_store_path(str(db_path)))
+        # Files built next to the database (the row store only exists for slim collections)
+        sidecars = {"gen-ai-tables": store_path}
+        if config.CONTENT_ROW_STORE == "arrow":
+            sidecars["gen-ai-rows"] = Path(row_store_path(str(db_path)))
 
         # Check for GCS configuration
         use_gcs = os.environ.get('USE_GCS', 'false').lower() == 'true'
         bucket_name = os.environ.get('GCS_BUCKET_NAME') if use_gcs else None
 
-        if use_gcs and bucket_name:
-            print(f"Using GCS bucket: {bucket_name}")
-            file_path = os.environ.get('GCS_FILE_PATH', 'edeliverydata/eDelivery_AIeDelivery_Database_V1.xlsx')
-            excel_path = file_path
-        else:
-            print("Using local Excel file")
-            excel_path = str(gen_ai_dir / "eDelivery_AIeDelivery_Database_V1.xlsx")
-            bucket_name = None
-
-            # Check if local file exists
-            if not Path(excel_path).exists():
-                print(f"⚠️  Excel file not found: {excel_path}")
-                print("Skipping GEN AI Milvus initialization")
-                return False
-
-        print(f"Database path: {db_path}")
-        print(f"Excel path: {excel_path}")
-
-        # Initialize databases
-        content_db = ContentVectorDB(db_path=db_path)
-        structure_db = StructureVectorDB(db_path=db_path)
-
-        # Build structure database (lightweight, always runs)
-        print("\n📊 Building Structure Database...")
-        if bucket_name:
-            # Read from GCS
-            df = read_xlsx_from_local_or_gcs(excel_path, bucket_name=bucket_name)
-            # For structure DB, we need to pass the dataframe
-            structure_db.create_collection(drop_existing=True)
-            # Extract structure from sheets
-            import pandas as pd
-            all_sheets = pd.read_excel(excel_path, sheet_name=None) if not bucket_name else {sheet: df for sheet in [df.name] if hasattr(df, 'name')}
-            structure_df = structure_db.extract_structure_from_excel_sheets(all_sheets)
-            structure_db.insert_structure_batched(structure_df)
-        else:
+        with ExitStack() as stack:
+            if use_gcs and bucket_name:
+                from src.gcs_utils import fetch_xlsx_from_gcs, get_gcs_content_hash
+
+                file_path = os.environ.get('GCS_FILE_PATH', 'edeliverydata/eDelivery_AIeDelivery_Database_V1.xlsx')
+                print(f"Using GCS bucket: {bucket_name}")
+                print(f"Excel path: gs://{bucket_name}/{file_path}")
+
+                # GCS metadata carries the content hash, so a cache hit needs no download
+                workbook_hash = get_gcs_content_hash(bucket_name, file_path)
+                input_hash = gen_ai_input_hash(config, workbook_hash)
+                if restore_gen_ai_artifacts(db_path, sidecars, input_hash):
+                    return True
+
+                excel_path = stack.enter_context(
+                    fetch_xlsx_from_gcs(bucket_name, file_path, cache_dir=config.EXCEL_CACHE_DIR or None)
+                )
+            else:
+                print("Using local Excel file")
+                excel_path = str(GEN_AI_DIR / "eDelivery_AIeDelivery_Database_V1.xlsx")
+
+                # Check if local file exists
+                if not Path(excel_path).exists():
+                    print(f"⚠️  Excel file not found: {excel_path}")
+                    print("Skipping GEN AI Milvus initialization")
+                    return False
+
+                hasher = hashlib.sha256()
+                _hash_files(hasher, [Path(excel_path)])
+                input_hash = gen_ai_input_hash(config, hasher.hexdigest())
+                if restore_gen_ai_artifacts(db_path, sidecars, input_hash):
+                    return True
+
+            print(f"Database path: {db_path}")
+            print(f"Excel path: {excel_path}")
+
+            from src.content_db import ContentVectorDB
+            from src.structure_db import StructureVectorDB
+            from src.table_store import build_table_store
+
+            # Build structure database (lightweight)
+            print("\n📊 Building Structure Database...")
+            structure_db = StructureVectorDB(db_path=str(db_path))
             structure_db.build_from_excel(excel_path, drop_existing=True)
 
-        # Build content database (heavy, only if not exists or forced)
-        print("\n📄 Building Content Database...")
-        if bucket_name:
-            df = read_xlsx_from_local_or_gcs(excel_path, bucket_name=bucket_name)
-            # Save temporarily for content_db processing
-            temp_path = "/tmp/edelivery_temp.xlsx"
-            df.to_excel(temp_path, index=False)
-            content_db.build_from_excel(temp_path, drop_existing=True)
-            os.remove(temp_path)
-        else:
+            # Build content database (heavy)
+            print("\n📄 Building Content Database...")
+            content_db = ContentVectorDB(db_path=str(db_path))
             content_db.build_from_excel(excel_path, drop_existing=True)
 
+            # Copy every sheet into SQLite for exact aggregate answers
+            print("\n🧮 Building Table Store...")
+            build_table_store(excel_path, str(store_path))
+
+        # Release the Milvus Lite file before copying it into the cache
+        structure_db.client.close()
+        content_db.client.close()
+        store_cached_artifact("gen-ai-milvus", db_path, input_hash)
+        for name, path in sidecars.items():
+            store_cached_artifact(name, path, input_hash)
+
         print(f"\n✅ GEN AI Milvus initialized successfully!")
         print(f"   Database: {db_path}")
 
@@ -146,17 +329,24 @@ def main():
     print("\n" + "="*80)
     print("VECTOR DATABASE INITIALIZATION")
     print("="*80)
-
-    results = {
-        'zebra': False,
-        'gen_ai': False
-    }
-
-    # Initialize Zebra ChromaDB
-    results['zebra'] = init_zebra_chromadb()
-
-    # Initialize GEN AI Milvus
-    results['gen_ai'] = init_gen_ai_milvus()
+    if CACHE_DIR:
+        print(f"Artifact cache: {CACHE_DIR}")
+
+    # Each build gets its own spawned process: both projects import a top-level
+    # "src" and change directory, so they cannot share an interpreter.
+    # max_tasks_per_child=1 keeps a worker that finished one build from taking the other
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=2, mp_context=ctx, max_tasks_per_child=1) as executor:
+        zebra_future = executor.submit(init_zebra_chromadb)
+        gen_ai_future = executor.submit(init_gen_ai_milvus)
+
+        results = {}
+        for name, future in [('zebra', zebra_future), ('gen_ai', gen_ai_future)]:
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                print(f"❌ {name} initialization process failed: {e}")
+                results[name] = False
 
     # Summary
     print("\n" + "="*80)